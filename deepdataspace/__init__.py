@@ -1,5 +1,8 @@
 """
 The deepdataspace package.
+
+| DDS and the data models are loaded on first access, such as ``from deepdataspace import DataSet``,
+  so a command line tool importing this package doesn't pay for django, pymongo and numpy unless it needs them.
 """
 
 import logging
@@ -8,17 +11,33 @@ import sys
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
-from deepdataspace.services import DDS
 from deepdataspace.services import config
 from deepdataspace.constants import RunningEnv
 
 env = os.environ.get("DDS_DEPLOY", RunningEnv.Local)
+_models_available = True
 if env == RunningEnv.Local and not config.load_all_env():  # this runs as early as possible
+    _models_available = False
     if not os.environ.get("DDS_STARTING", None):
         msg = "\ndeepdataspace package is not available before dds services are started. \n" \
               "You can start dds services by one of the two methods:\n" \
               "1. CLI tool: dds start --quickstart\n" \
               "2. Python API: from deepdataspace import DDS; DDS(quickstart=True).start()\n"
         logging.warning(msg)
-else:
-    from deepdataspace.model import *
+
+
+# the names exported from deepdataspace.model
+_model_names = {"Category", "DataSet", "Image", "ImageModel", "ImportCheckpoint", "Label", "LabelProject", "LabelTask",
+                "LabelTaskImage", "LabelTaskImageModel", "ProjectRole", "TaskRole", "Object", "User", "UserToken"}
+
+
+def __getattr__(name: str):
+    if name == "DDS":
+        from deepdataspace.services.dds import DDS
+        return DDS
+
+    if _models_available is True and name in _model_names:
+        import deepdataspace.model as model
+        return getattr(model, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,7 +7,6 @@ This module provides a algorithm for resorting dataset by seed images.
 import logging
 
 import numpy as np
-from sklearn.svm import SVC
 
 logger = logging.getLogger("algos.refine_by_seed")
 
@@ -93,6 +92,9 @@ def train_svm_model(pos_seed_embd, neg_seed_embd):
     :param neg_seed_embd: np.ndarray of neg seed images embedding matrix
     :return model: a trained svc model
     """
+
+    from sklearn.svm import SVC  # sklearn takes seconds to import, only import it when we train a model
+
     pos_y = np.ones(pos_seed_embd.shape[0])
     neg_y = np.zeros(neg_seed_embd.shape[0])
     X = np.concatenate((pos_seed_embd, neg_seed_embd), axis=0)
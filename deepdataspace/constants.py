@@ -23,15 +23,23 @@ class RunningEnv:
 class DatasetType:
     """
     | The dataset file format types dds can handle.
-    | DDS can import two kinds of dataset file formats with two built-in importer:
+    | DDS can import six kinds of dataset file formats with six built-in importer:
 
         #. :class:`deepdataspace.plugins.tsv.importer.TSVImporter` for idea's tsv format.
         #. :class:`deepdataspace.plugins.coco2017.importer.COCO2017Importer` for coco2017 format.
+        #. :class:`deepdataspace.plugins.webdataset.importer.WebDatasetImporter` for webdataset tar shards.
+        #. :class:`deepdataspace.plugins.parquet.importer.ParquetImporter` for parquet or arrow tables.
+        #. :class:`deepdataspace.plugins.yolo.importer.YOLOImporter` for yolo format.
+        #. :class:`deepdataspace.plugins.voc.importer.VOCImporter` for pascal voc format.
 
     | Datasets imported with Python API without knowing the format are identified as :attr:`Simple`.
     """
     TSV = "tsv"  #: Identifies datasets imported by :class:`deepdataspace.plugins.tsv.importer.TSVImporter`.
     COCO2017 = "coco2017"  #: Identifies datasets imported by :class:`deepdataspace.plugins.coco2017.importer.COCO2017Importer`.
+    WebDataset = "webdataset"  #: Identifies datasets imported by :class:`deepdataspace.plugins.webdataset.importer.WebDatasetImporter`.
+    Parquet = "parquet"  #: Identifies datasets imported by :class:`deepdataspace.plugins.parquet.importer.ParquetImporter`.
+    YOLO = "yolo"  #: Identifies datasets imported by :class:`deepdataspace.plugins.yolo.importer.YOLOImporter`.
+    VOC = "voc"  #: Identifies datasets imported by :class:`deepdataspace.plugins.voc.importer.VOCImporter`.
     Simple = "simple"  #: Identifies datasets imported by Python API without knowing the format.
 
 
@@ -348,6 +356,7 @@ class LabelImageQAActions:
 
 class RedisKey:
     DatasetImageDirs = "DatasetImageDirs"  #: A redis set storing the directories of all imported dataset images.
+    ModelCacheInvalidation = "ModelCacheInvalidation"  #: A redis channel broadcasting model cache invalidations.
 
 
 class ErrCode:
@@ -55,6 +55,12 @@ which are written to ``~/.deepdataspace/dds.env``.
 
     :default: ``$DDS_RUNTIME_DIR/mongodb``
 
+.. data:: DDS_THUMBNAIL_DIR
+
+    The directory of thumbnails generated at import, see ``DDS_IMPORT_THUMBNAIL_SIZE``.
+
+    :default: ``$DDS_RUNTIME_DIR/thumbnails``
+
 .. data:: DDS_DATA_DIR
 
     | The dataset directory which holds datasets.
@@ -75,6 +81,134 @@ which are written to ``~/.deepdataspace/dds.env``.
     The celery worker pool type.
 
     :default: `'prefork'`
+
+.. data:: DDS_DB_SLOW_MS
+
+    Mongodb commands slower than this are logged by the ``db.slow`` logger, in millisecond.
+
+    :default: `100`
+
+.. data:: DDS_DB_EXPLAIN_RATE
+
+    The sample rate of slow mongodb commands to explain, 0 to disable explaining.
+
+    :default: `0`
+
+.. data:: DDS_IMPORT_WORKERS
+
+    | The number of parse worker processes of the pipelined dataset import, 0 or 1 for the serial import.
+    | Only importers supporting shards, such as tsv and coco2017, are pipelined.
+
+    :default: `0`
+
+.. data:: DDS_IMPORT_STREAM_MB
+
+    | The total size in MB of annotation files of a coco2017 dataset, above which they are streamed
+      into a temporary on-disk store instead of being loaded into memory, 0 to always stream.
+
+    :default: `512`
+
+.. data:: DDS_IMPORT_CACHE_DIR
+
+    | The directory of parse caches of imported dataset files, an empty string to disable the cache.
+    | Re-importing unchanged files reads their parsed records from the cache instead of parsing them again.
+
+    :default: ``$DDS_RUNTIME_DIR/import_cache``
+
+.. data:: DDS_IMPORT_PROBE_THREADS
+
+    | The number of threads probing the width and height of local image files missing them at import,
+      0 to disable probing. Only header bytes of jpeg, png, webp, gif and bmp files are read.
+    | Probed sizes are cached under ``$DDS_IMPORT_CACHE_DIR`` by the path, size and mtime of files.
+
+    :default: `8`
+
+.. data:: DDS_IMPORT_SCAN_THREADS
+
+    | The number of threads listing directories, reading label files and probing image sizes
+      of yolo and voc datasets at import, their many small files are mostly waiting for the disk,
+      especially on network filesystems.
+    | Annotations are parsed in the parse worker processes of ``DDS_IMPORT_WORKERS``.
+
+    :default: `16`
+
+.. data:: DDS_IMPORT_TASK_RANGES
+
+    | The number of celery tasks a large dataset is split into, each one imports a range of it in parallel,
+      0 or 1 to import a dataset in one task.
+    | Only tsv datasets of more than one range of ``Importer.shard_size`` lines are split,
+      by the line index of their ground truth file. A failed import by ranges can't be resumed.
+
+    :default: `0`
+
+.. data:: DDS_IMPORT_THUMBNAIL_SIZE
+
+    | The max width and height in pixels of thumbnails generated for imported images without one,
+      0 to disable generating thumbnails. Images no larger than this are shown as they are.
+    | Thumbnails are generated by a pool of worker processes, and saved by the md5 of the image content
+      under ``$DDS_THUMBNAIL_DIR``, so unchanged images are never generated again.
+      This requires the ``Pillow`` package.
+
+    :default: `0`
+
+.. data:: DDS_IMPORT_THUMBNAIL_FORMAT
+
+    The format of generated thumbnails, ``jpeg`` or ``webp``.
+
+    :default: `'jpeg'`
+
+.. data:: DDS_BINARY_OBJECTS
+
+    | Store segmentations and keypoints of imported objects in a compact binary encoding instead of text and lists,
+      see :mod:`deepdataspace.model.object_codec`.
+    | It shrinks image documents of dense segmentation and keypoint datasets several times.
+      Existing datasets are converted by ``ddsop migrate 2026101801``.
+
+    :default: `False`
+
+.. data:: DDS_MONGODB_POOL_SIZE
+
+    The max number of connections in the mongodb connection pool of every process, 0 for no limit.
+
+    :default: `100`
+
+.. data:: DDS_MONGODB_CONNECT_TIMEOUT_MS
+
+    The timeout of connecting to mongodb, in millisecond.
+
+    :default: `20000`
+
+.. data:: DDS_MONGODB_SERVER_SELECTION_TIMEOUT_MS
+
+    The timeout of finding an available mongodb server, in millisecond.
+
+    :default: `30000`
+
+.. data:: DDS_MONGODB_SOCKET_TIMEOUT_MS
+
+    The timeout of waiting for a mongodb response, in millisecond, 0 for no timeout.
+
+    :default: `0`
+
+.. data:: DDS_MONGODB_COMPRESSORS
+
+    | The comma separated wire compressors of mongodb connections, such as ``zstd,snappy,zlib``.
+    | zstd and snappy require the ``zstandard`` and ``python-snappy`` packages.
+      A compressor not supported by the packages or the server is ignored.
+
+    :default: `''`
+
+.. data:: DDS_REDIS_POOL_SIZE
+
+    The max number of connections in the redis connection pool of every process, 0 for no limit.
+
+    :default: `0`
+
+.. data:: DDS_REDIS_SOCKET_TIMEOUT
+
+    The timeout of connecting to redis and waiting for a redis response, in second, 0 for no timeout.
+
+    :default: `0`
 """
 
 import os
@@ -96,6 +230,7 @@ REDIS_DIR = str(os.environ.get("DDS_REDIS_DIR", Path(RUNTIME_DIR, "redis")))
 DJANGO_DIR = str(os.environ.get("DDS_DJANGO_DIR", Path(RUNTIME_DIR, "django")))
 CELERY_DIR = str(os.environ.get("DDS_CELERY_DIR", Path(RUNTIME_DIR, "celery")))
 MONGODB_DIR = str(os.environ.get("DDS_MONGODB_DIR", Path(RUNTIME_DIR, "mongodb")))
+THUMBNAIL_DIR = str(os.environ.get("DDS_THUMBNAIL_DIR", Path(RUNTIME_DIR, "thumbnails")))
 DATASET_DIR = os.environ["DDS_DATA_DIR"]
 
 # database configuration
@@ -111,6 +246,8 @@ REDIS_HOST = os.environ["DDS_REDIS_HOST"]
 REDIS_PORT = os.environ["DDS_REDIS_PORT"]
 REDIS_PASS = os.environ["DDS_REDIS_PASS"]
 REDIS_DBNAME = os.environ["DDS_REDIS_DBNAME"]
+REDIS_POOL_SIZE = int(os.environ.get("DDS_REDIS_POOL_SIZE", 0))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("DDS_REDIS_SOCKET_TIMEOUT", 0))
 
 # mongodb configurations
 MONGODB_HOST = os.environ["DDS_MONGODB_HOST"]
@@ -118,6 +255,26 @@ MONGODB_PORT = os.environ["DDS_MONGODB_PORT"]
 MONGODB_USER = os.environ["DDS_MONGODB_USER"]
 MONGODB_PASS = os.environ["DDS_MONGODB_PASS"]
 MONGODB_DBNAME = os.environ["DDS_MONGODB_DBNAME"]
+MONGODB_POOL_SIZE = int(os.environ.get("DDS_MONGODB_POOL_SIZE", 100))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.environ.get("DDS_MONGODB_CONNECT_TIMEOUT_MS", 20000))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("DDS_MONGODB_SERVER_SELECTION_TIMEOUT_MS", 30000))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.environ.get("DDS_MONGODB_SOCKET_TIMEOUT_MS", 0))
+MONGODB_COMPRESSORS = str(os.environ.get("DDS_MONGODB_COMPRESSORS", ""))
+
+# mongodb instrumentation
+DB_SLOW_MS = float(os.environ.get("DDS_DB_SLOW_MS", 100))
+DB_EXPLAIN_RATE = float(os.environ.get("DDS_DB_EXPLAIN_RATE", 0))
+
+# dataset import
+IMPORT_WORKERS = int(os.environ.get("DDS_IMPORT_WORKERS", 0))
+IMPORT_STREAM_MB = float(os.environ.get("DDS_IMPORT_STREAM_MB", 512))
+IMPORT_CACHE_DIR = str(os.environ.get("DDS_IMPORT_CACHE_DIR", Path(RUNTIME_DIR, "import_cache")))
+IMPORT_PROBE_THREADS = int(os.environ.get("DDS_IMPORT_PROBE_THREADS", 8))
+IMPORT_SCAN_THREADS = int(os.environ.get("DDS_IMPORT_SCAN_THREADS", 16))
+IMPORT_TASK_RANGES = int(os.environ.get("DDS_IMPORT_TASK_RANGES", 0))
+IMPORT_THUMBNAIL_SIZE = int(os.environ.get("DDS_IMPORT_THUMBNAIL_SIZE", 0))
+IMPORT_THUMBNAIL_FORMAT = str(os.environ.get("DDS_IMPORT_THUMBNAIL_FORMAT", "jpeg"))
+BINARY_OBJECTS = bool(os.environ.get("DDS_BINARY_OBJECTS", False))
 
 # django configurations
 DJANGO_SECRET = os.environ["DDS_DJANGO_KEY"]
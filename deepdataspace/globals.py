@@ -5,7 +5,7 @@ The runtime global variables.
 
 .. data:: MongoDB
 
-    | The MongoDB client.
+    | The MongoDB database.
     | It's the underlying mongodb connection for every instance of :class:`deepdataspace.model._base.BaseModel`.
 
 .. data:: Redis
@@ -15,34 +15,134 @@ The runtime global variables.
     #. caching
     #. celery broker
 
+| Both of them are lazy proxies, the real clients are created on first use,
+  so importing this module never connects to any server.
+| The clients are created again in a forked child process, such as a celery prefork worker,
+  so a child never shares sockets with its parent.
+| Pool sizes, timeouts and wire compressors are configured by :mod:`deepdataspace.environs`.
 """
 
+import os
+import threading
 import urllib.parse
+from typing import Callable
 
-import redis
-import sentry_sdk
-from pymongo import MongoClient
-
-from deepdataspace.constants import RunningEnv
-from deepdataspace.environs import ENV
+from deepdataspace.environs import DB_EXPLAIN_RATE
+from deepdataspace.environs import DB_SLOW_MS
+from deepdataspace.environs import MONGODB_COMPRESSORS
+from deepdataspace.environs import MONGODB_CONNECT_TIMEOUT_MS
 from deepdataspace.environs import MONGODB_DBNAME
 from deepdataspace.environs import MONGODB_HOST
 from deepdataspace.environs import MONGODB_PASS
+from deepdataspace.environs import MONGODB_POOL_SIZE
 from deepdataspace.environs import MONGODB_PORT
+from deepdataspace.environs import MONGODB_SERVER_SELECTION_TIMEOUT_MS
+from deepdataspace.environs import MONGODB_SOCKET_TIMEOUT_MS
 from deepdataspace.environs import MONGODB_USER
 from deepdataspace.environs import REDIS_DBNAME
 from deepdataspace.environs import REDIS_HOST
 from deepdataspace.environs import REDIS_PASS
+from deepdataspace.environs import REDIS_POOL_SIZE
 from deepdataspace.environs import REDIS_PORT
-from deepdataspace.environs import SENTRY_DSN
-from deepdataspace.utils.os import get_os_username
+from deepdataspace.environs import REDIS_SOCKET_TIMEOUT
+from deepdataspace.utils.db_perf import CommandPerfListener
+
+
+class LazyClient:
+    """
+    | A proxy of a client object, which is created by the factory on first use.
+    | The client is created again if the proxy is used in another process, i.e. after fork.
+    """
+
+    def __init__(self, factory: Callable, name: str):
+        """
+        :param factory: a function creating the client.
+        :param name: the name of the client, for repr only.
+        """
+
+        self.__dict__["_factory"] = factory
+        self.__dict__["_name"] = name
+        self.__dict__["_client"] = None
+        self.__dict__["_pid"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def get_client(self):
+        """
+        Get the client of current process, create it if necessary.
+        """
+
+        pid = os.getpid()
+        client = self._client
+        if client is not None and self._pid == pid:
+            return client
+
+        if self._pid != pid:
+            # the lock may be held by a thread that does not exist in the forked child
+            self.__dict__["_lock"] = threading.Lock()
+
+        with self._lock:
+            if self._client is None or self._pid != pid:
+                # never close the client of the parent process, its sockets are still used by the parent
+                self.__dict__["_client"] = self._factory()
+                self.__dict__["_pid"] = pid
+            return self._client
+
+    def __getattr__(self, item):
+        # don't create the client for probes of special attributes, such as pydantic inspecting class attributes
+        if item.startswith("__") and item.endswith("__"):
+            raise AttributeError(item)
+        return getattr(self.get_client(), item)
+
+    def __setattr__(self, key, value):
+        setattr(self.get_client(), key, value)
+
+    def __getitem__(self, item):
+        return self.get_client()[item]
+
+    def __repr__(self):
+        created = self._client is not None and self._pid == os.getpid()
+        return f"<LazyClient {self._name}, created={created}>"
+
+
+_command_listener = CommandPerfListener(slow_ms=DB_SLOW_MS, explain_rate=DB_EXPLAIN_RATE)
+
+
+def _create_mongo_client():
+    from pymongo import MongoClient
+
+    user = urllib.parse.quote_plus(MONGODB_USER)
+    password = urllib.parse.quote_plus(MONGODB_PASS)
+    url = f"mongodb://{user}:{password}@{MONGODB_HOST}:{MONGODB_PORT}/{MONGODB_DBNAME}"
+
+    options = dict(maxPoolSize=MONGODB_POOL_SIZE or None,
+                   connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+                   serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                   socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS or None)
+    compressors = [c.strip() for c in MONGODB_COMPRESSORS.split(",") if c.strip()]
+    if compressors:
+        options["compressors"] = compressors
+
+    client = MongoClient(url, authMechanism="SCRAM-SHA-256", event_listeners=[_command_listener], **options)
+    _command_listener.bind(client)
+    return client
+
+
+def _create_mongo_db():
+    return _MongoClient.get_client()[MONGODB_DBNAME]
+
+
+def _create_redis_client():
+    import redis
+
+    return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DBNAME, password=REDIS_PASS,
+                       max_connections=REDIS_POOL_SIZE or None,
+                       socket_timeout=REDIS_SOCKET_TIMEOUT or None,
+                       socket_connect_timeout=REDIS_SOCKET_TIMEOUT or None)
+
 
 # init mongodb client
-_mongo_user = urllib.parse.quote_plus(MONGODB_USER)
-_mongo_pass = urllib.parse.quote_plus(MONGODB_PASS)
-_mongo_url = f"mongodb://{_mongo_user}:{_mongo_pass}@{MONGODB_HOST}:{MONGODB_PORT}/{MONGODB_DBNAME}"
-_mongo_client = MongoClient(_mongo_url, authMechanism="SCRAM-SHA-256", maxPoolSize=None)
-MongoDB = _mongo_client[MONGODB_DBNAME]
+_MongoClient = LazyClient(_create_mongo_client, "mongodb client")
+MongoDB = LazyClient(_create_mongo_db, f"mongodb database {MONGODB_DBNAME}")
 
 # init redis client
-Redis = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DBNAME, password=REDIS_PASS)
+Redis = LazyClient(_create_redis_client, "redis client")
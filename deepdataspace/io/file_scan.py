@@ -0,0 +1,90 @@
+"""
+deepdataspace.io.file_scan
+
+List and read the many small files of directory datasets, such as yolo and voc, in a thread pool.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from deepdataspace.environs import IMPORT_SCAN_THREADS
+
+logger = logging.getLogger("io.file_scan")
+
+
+def _scan_dir(path: str) -> Tuple[List[str], List[str]]:
+    """
+    List a directory, return the paths of its files and sub directories.
+    """
+
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file():
+                    files.append(entry.path)
+    except OSError as err:
+        logger.warning(f"Failed to list directory {path}: {err}")
+    return files, dirs
+
+
+def _read_file(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as fp:
+            return fp.read()
+    except FileNotFoundError:
+        return None
+    except OSError as err:
+        logger.warning(f"Failed to read file {path}: {err}")
+        return None
+
+
+def _map(func, items: list, num_threads: int) -> Iterable:
+    if num_threads <= 1 or len(items) <= 1:
+        return map(func, items)
+    with ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix="file-scan") as executor:
+        return list(executor.map(func, items))
+
+
+def scan_files(root: str, exts: Iterable[str], num_threads: int = None) -> List[str]:
+    """
+    | List the files with one of the extensions under a directory recursively, sorted by their paths.
+    | Directories of the same depth are listed concurrently by os.scandir in a thread pool,
+      symbolic links of directories are not followed.
+
+    :param root: the directory to list.
+    :param exts: the file extensions in lower case, such as [".jpg", ".png"].
+    :param num_threads: the number of threads, defaults to DDS_IMPORT_SCAN_THREADS.
+    """
+
+    num_threads = IMPORT_SCAN_THREADS if num_threads is None else num_threads
+    exts = tuple(exts)
+
+    result = []
+    level = [root]
+    while level:
+        next_level = []
+        for files, dirs in _map(_scan_dir, level, num_threads):
+            result.extend(path for path in files if path.lower().endswith(exts))
+            next_level.extend(dirs)
+        level = next_level
+    return sorted(result)
+
+
+def read_files(paths: List[str], num_threads: int = None) -> List[Optional[bytes]]:
+    """
+    Read the content of files in a thread pool, in the order of paths, None for missing or unreadable files.
+
+    :param paths: the file paths.
+    :param num_threads: the number of threads, defaults to DDS_IMPORT_SCAN_THREADS.
+    """
+
+    num_threads = IMPORT_SCAN_THREADS if num_threads is None else num_threads
+    return list(_map(_read_file, paths, num_threads))
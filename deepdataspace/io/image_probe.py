@@ -0,0 +1,131 @@
+"""
+deepdataspace.io.image_probe
+
+Probe the width and height of local image files for the import, by their header bytes in a thread pool.
+"""
+
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from deepdataspace.environs import IMPORT_CACHE_DIR
+from deepdataspace.environs import IMPORT_PROBE_THREADS
+from deepdataspace.utils.image_size import read_file_image_size
+
+logger = logging.getLogger("io.image_probe")
+
+_QUERY_SIZE = 500  # the max number of paths in one query of the cache
+
+
+def _file_stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ImageSizeCache:
+    """
+    | The probed sizes of image files, saved in a sqlite file under the cache dir,
+      so they are shared by processes and kept across imports.
+    | A size is keyed by the path of the file, and only used while the size and mtime of the file are unchanged.
+      Files failed to be probed are cached too, with a width and height of None.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        :param path: the sqlite file, defaults to image_sizes.sqlite3 under DDS_IMPORT_CACHE_DIR.
+        """
+
+        self.path = path or os.path.join(IMPORT_CACHE_DIR, "image_sizes.sqlite3")
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("CREATE TABLE IF NOT EXISTS sizes "
+                     "(path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, width INTEGER, height INTEGER)")
+        return conn
+
+    def get_many(self, stats: Dict[str, Tuple[int, int]]) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        """
+        Get the cached sizes of files, {path: (width, height)}.
+
+        :param stats: the current (size, mtime) of the files, {path: (size, mtime)}.
+        """
+
+        paths = list(stats.keys())
+        result = {}
+        conn = self._connect()
+        try:
+            for beg in range(0, len(paths), _QUERY_SIZE):
+                batch = paths[beg:beg + _QUERY_SIZE]
+                marks = ",".join("?" * len(batch))
+                sql = f"SELECT path, size, mtime, width, height FROM sizes WHERE path IN ({marks})"
+                for path, size, mtime, width, height in conn.execute(sql, batch):
+                    if stats[path] == (size, mtime):
+                        result[path] = (width, height)
+        finally:
+            conn.close()
+        return result
+
+    def put_many(self, items: List[Tuple[str, int, int, Optional[int], Optional[int]]]):
+        """
+        Save probed sizes, [(path, size, mtime, width, height), ...].
+        """
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO sizes VALUES (?, ?, ?, ?, ?)", items)
+        finally:
+            conn.close()
+
+
+def probe_image_sizes(paths: List[str], num_threads: int = None) -> Dict[str, Tuple[int, int]]:
+    """
+    | Probe the (width, height) of local image files by their header bytes, see utils.image_size.
+    | Files are stat-ed and probed in a thread pool, as the time is mostly spent waiting for the disk.
+      Sizes are cached by the path, size and mtime of files, see :class:`ImageSizeCache`.
+    | Return {path: (width, height)} of the files probed successfully.
+
+    :param paths: the paths of image files.
+    :param num_threads: the number of probe threads, defaults to DDS_IMPORT_PROBE_THREADS.
+    """
+
+    num_threads = IMPORT_PROBE_THREADS if num_threads is None else num_threads
+    paths = list(dict.fromkeys(paths))
+    if not paths or num_threads <= 0:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix="image-probe") as executor:
+        stats = {path: stat for path, stat in zip(paths, executor.map(_file_stat, paths)) if stat is not None}
+
+        cache = None
+        cached = {}
+        if IMPORT_CACHE_DIR:
+            cache = ImageSizeCache()
+            try:
+                cached = cache.get_many(stats)
+            except (sqlite3.Error, OSError) as err:
+                logger.warning(f"Failed to read image size cache {cache.path}: {err}")
+                cache = None
+
+        missing = [path for path in stats if path not in cached]
+        probed = dict(zip(missing, executor.map(read_file_image_size, missing)))
+
+    if cache is not None and probed:
+        items = [(path, *stats[path], *(size or (None, None))) for path, size in probed.items()]
+        try:
+            cache.put_many(items)
+        except (sqlite3.Error, OSError) as err:
+            logger.warning(f"Failed to save image size cache {cache.path}: {err}")
+
+    result = {path: size for path, size in cached.items() if size[0] is not None}
+    result.update({path: size for path, size in probed.items() if size is not None})
+    return result
@@ -9,15 +9,27 @@ import copy
 import json
 import logging
 import os
+import queue
+import threading
 import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from itertools import repeat
+from typing import Any
 from typing import Dict
+from typing import Iterable
 from typing import List
 from typing import Literal
+from typing import Optional
 from typing import Tuple
 from typing import Type
 from typing import Union
 
+from pymongo import ReplaceOne
+from pymongo import UpdateOne
 from pymongo import WriteConcern
+from pymongo.collection import Collection
 from tqdm import tqdm
 
 from deepdataspace import constants
@@ -28,18 +40,60 @@ from deepdataspace.constants import FileReadMode
 from deepdataspace.constants import LabelName
 from deepdataspace.constants import LabelType
 from deepdataspace.constants import RedisKey
+from deepdataspace.environs import BINARY_OBJECTS
+from deepdataspace.environs import IMPORT_PROBE_THREADS
+from deepdataspace.environs import IMPORT_THUMBNAIL_FORMAT
+from deepdataspace.environs import IMPORT_THUMBNAIL_SIZE
+from deepdataspace.environs import IMPORT_WORKERS
 from deepdataspace.globals import Redis
+from deepdataspace.io.image_probe import probe_image_sizes
+from deepdataspace.io.parse_cache import ParseCache
+from deepdataspace.io.parse_cache import memoized_can_import
+from deepdataspace.io.thumbnail import make_thumbnail
+from deepdataspace.io.thumbnail import thumbnails_available
 from deepdataspace.model import DataSet
+from deepdataspace.model._base import BatchWriter
+from deepdataspace.model._base import ensure_collection_indexes
 from deepdataspace.model.category import Category
 from deepdataspace.model.image import Image
 from deepdataspace.model.image import ImageModel
+from deepdataspace.model.import_checkpoint import ImportCheckpoint
 from deepdataspace.model.label import Label
+from deepdataspace.model.object_codec import encode_points
+from deepdataspace.model.object_codec import encode_segmentation
 from deepdataspace.utils.file import create_file_url
+from deepdataspace.utils.file import parse_file_url
 from deepdataspace.utils.function import count_block_time
 from deepdataspace.utils.string import get_str_md5
 
 logger = logging.getLogger("io.importer")
 
+_parse_worker = None  # the importer copy of a parse worker process, see _init_parse_worker
+_STATUS_KEY = "Importer"  # the key of the import status in DataSet.detail_status
+
+
+def _init_parse_worker(importer_cls: Type["Importer"], state: dict):
+    """
+    Initialize a parse worker process of the pipelined import with a copy of the importer.
+    The copy only holds the picklable state returned by Importer.worker_state, it never touches the database.
+    """
+
+    global _parse_worker
+
+    importer = importer_cls.__new__(importer_cls)
+    importer.__dict__.update(state)
+    _parse_worker = importer
+
+
+def _parse_shard(shard: Any) -> List[Tuple[Dict, List[Dict]]]:
+    """
+    | The parse and normalize stages of the pipelined import, running in a parse worker process.
+    | Every image of the shard is returned with its normalized objects, which are ready to insert.
+    """
+
+    importer = _parse_worker
+    return importer.normalize_records(importer.parse_shard(shard))
+
 
 class ImportHelper:
     """
@@ -100,14 +154,25 @@ class ImportHelper:
 class Importer(ImportHelper, abc.ABC):
     """
     The importer interface.
+    A full import builds the new version of the dataset in a staging collection,
+    and replaces the images collection with it when it's done,
+    so the previous version of a ready dataset stays readable during the import.
     Any subclass of Importer should implement the following methods:
         - __init__: do the initialization works.
         - __iter__: yield a tuple of image and annotation list in every iteration.
     And the following methods are optional:
         - pre_run: a hook before the importing process.
+        - load_source: a hook to load the dataset source before iterating it, skipped if the parse cache is read.
         - post_run: a hook after the importing process.
+        - make_shards, parse_shard and worker_state: support the pipelined import, see run_import.
+        - source_position and seek_source: support resuming a failed import from its checkpoint, see run.
     """
 
+    shard_size: int = 2000  # the number of images in a shard of the pipelined import
+    acknowledged_writes: bool = False  # wait for the acknowledgement of every image insertion
+    incremental: bool = False  # re-import by diffing fingerprints against the existing images in place, opt-in
+    parse_version: int = 1  # bump it when the importer parses the dataset source differently, see ParseCache
+
     def __init__(self, name: str, id_: str = None):
         """
         :param name: the name of the dataset.
@@ -123,7 +188,21 @@ class Importer(ImportHelper, abc.ABC):
         self._user_data = {}  # {image_id: {}}
         self._import_queue = {}
         self._batch_size = 200
+        self._saved_labels = {}  # {label_name: label_id}, labels saved by this import
+        self._saved_categories = {}  # {category_name: category_id}, categories saved by this import
+        self._object_types = set()  # object types of all imported images
+        self._checkpoint = None  # the checkpoint this import resumes from, see run
+        self._replay_until = 0  # images before this idx may be written by a failed import, see bulk_write_images
+        self._existing_images = None  # {image_id: (fingerprint, idx)} of existing images in an incremental re-import
+        self._staging = False  # write images to the staging collection, see get_images_collection
+        self._readable = False  # the previous version of the dataset stays readable during the import
+        self._parse_cache = None  # the parse cache written by this import, see run_import
+        self._reading_cache = False  # are records read from the parse cache
+        self._thumbnail_pool = None  # the worker processes generating thumbnails, see generate_thumbnails
+        self._range = None  # the range of the dataset source imported by this task, see import_range
+        self._writer = None  # the batch writer of labels and categories of this import, see open_writer
         self.IModel = Image(self.dataset.id)
+        self.num_workers = IMPORT_WORKERS  # the number of parse worker processes, 0 or 1 for the serial import
 
     @staticmethod
     def get_importing_dataset(name: str,
@@ -158,7 +237,8 @@ class Importer(ImportHelper, abc.ABC):
                              id_: int = None,
                              metadata: dict = None,
                              flag: int = 0,
-                             flag_ts: int = 0, ) -> dict:
+                             flag_ts: int = 0,
+                             fingerprint: str = None, ) -> dict:
         full_uri = uri
         thumb_uri = full_uri if thumb_uri is None else thumb_uri
         if full_uri.startswith("file://"):
@@ -176,7 +256,8 @@ class Importer(ImportHelper, abc.ABC):
                      url=thumb_uri, url_full_res=full_uri,
                      width=width, height=height,
                      flag=flag, flag_ts=flag_ts,
-                     objects=[], metadata=metadata, )
+                     objects=[], metadata=metadata,
+                     fingerprint=fingerprint, )
 
         self._import_queue[id_] = image
         dataset.num_images += 1
@@ -198,45 +279,249 @@ class Importer(ImportHelper, abc.ABC):
                                 keypoint_names: List[str] = None,
                                 caption: str = None):
 
+        annotation = dict(category=category, label=label, label_type=label_type, conf=conf, is_group=is_group,
+                          segmentation=segmentation, alpha_uri=alpha_uri,
+                          keypoints=keypoints, keypoint_colors=keypoint_colors,
+                          keypoint_skeleton=keypoint_skeleton, keypoint_names=keypoint_names, caption=caption)
         bbox = ImageModel.format_bbox(image["width"], image["height"], bbox)
-        segmentation = ImageModel.format_segmentation(segmentation)
-        points, colors, lines, names = ImageModel.format_keypoints(keypoints,
-                                                                   keypoint_colors,
-                                                                   keypoint_skeleton,
-                                                                   keypoint_names)
+        image["objects"].append(Importer._format_object(annotation, bbox))
+
+    @staticmethod
+    def _format_object(annotation: dict, bounding_box: dict) -> dict:
+        """
+        | Convert an annotation to an object ready to insert, its bbox is converted already.
+        | With DDS_BINARY_OBJECTS, the segmentation and keypoints are encoded in binary, see model.object_codec.
+
+        :param annotation: the annotation, in the format of ImportHelper.format_annotation.
+        :param bounding_box: the bbox in the internal format, see ImageModel.format_bbox.
+        """
+
+        raw_segmentation = annotation.get("segmentation", None)
+        segmentation = encode_segmentation(raw_segmentation) if BINARY_OBJECTS else None
+        if segmentation is None:
+            segmentation = ImageModel.format_segmentation(raw_segmentation)
+
+        points, colors, lines, names = ImageModel.format_keypoints(annotation.get("keypoints", None),
+                                                                   annotation.get("keypoint_colors", None),
+                                                                   annotation.get("keypoint_skeleton", None),
+                                                                   annotation.get("keypoint_names", None))
+        if BINARY_OBJECTS:
+            encoded_points = encode_points(points)
+            points = points if encoded_points is None else encoded_points
+        alpha_uri = annotation.get("alpha_uri", None)
         if alpha_uri and alpha_uri.startswith("file://"):
             alpha_path = alpha_uri[7:]
             alpha_uri = create_file_url(file_path=alpha_path,
                                         read_mode=FileReadMode.Binary)
 
-        anno_obj = dict(label_name=label, label_type=label_type,
-                        category_name=category, caption=caption,
-                        bounding_box=bbox, segmentation=segmentation, alpha=alpha_uri,
-                        points=points, lines=lines, point_colors=colors, point_names=names,
-                        conf=conf, is_group=is_group)
-        image["objects"].append(anno_obj)
+        return dict(label_name=annotation.get("label", LabelName.GroundTruth),
+                    label_type=annotation.get("label_type", LabelType.GroundTruth),
+                    category_name=annotation["category"], caption=annotation.get("caption", None),
+                    bounding_box=bounding_box, segmentation=segmentation, alpha=alpha_uri,
+                    points=points, lines=lines, point_colors=colors, point_names=names,
+                    conf=annotation.get("conf", 1.0), is_group=annotation.get("is_group", False))
 
-    def bulk_write_images(self, image_queue: list):
-        co = self.IModel.get_collection()
-        wc = WriteConcern(w=0)
+    def get_images_collection(self) -> Collection:
+        """
+        The collection this import writes images to, it's the staging collection of a full import.
+        """
+
+        if self._staging:
+            return self.IModel.get_staging_collection()
+        return self.IModel.get_collection()
+
+    def normalize_records(self, records: Iterable[Tuple[Dict, List[Dict]]]) -> List[Tuple[Dict, List[Dict]]]:
+        """
+        | Normalize a batch of images and their annotations yielded by the dataset iterator,
+          the result of every image is its image data with the fingerprint, and its objects ready to insert.
+        | Bboxes of all annotations in the batch are converted at once, see ImageModel.format_bboxes.
+        | Missing sizes of local images are probed before, so they are covered by fingerprints.
+        """
+
+        records = list(records)
+        self.probe_image_sizes([image for image, _ in records])
+
+        annotations, widths, heights = [], [], []
+        for image, anno_list in records:
+            image["fingerprint"] = self.record_fingerprint(image, anno_list)
+            annotations.extend(anno_list)
+            widths.extend([image["width"]] * len(anno_list))
+            heights.extend([image["height"]] * len(anno_list))
+
+        bboxes = ImageModel.format_bboxes([anno.get("bbox", None) for anno in annotations], widths, heights)
+        objects = [self._format_object(anno, bbox) for anno, bbox in zip(annotations, bboxes)]
+
+        result = []
+        beg = 0
+        for image, anno_list in records:
+            end = beg + len(anno_list)
+            result.append((image, objects[beg:end]))
+            beg = end
+        return result
+
+    @staticmethod
+    def probe_image_sizes(images: List[Dict]):
+        """
+        Fill in the missing width and height of images of local files in place, by probing their file headers,
+        see io.image_probe.probe_image_sizes.
+        """
+
+        missing = [image for image in images
+                   if (image.get("width", None) is None or image.get("height", None) is None)
+                   and str(image.get("uri", None)).startswith("file://")]
+        if not missing or IMPORT_PROBE_THREADS <= 0:
+            return
+
+        sizes = probe_image_sizes([image["uri"][7:] for image in missing])
+        failed = []
+        for image in missing:
+            size = sizes.get(image["uri"][7:], None)
+            if size is None:
+                failed.append(image["uri"])
+            else:
+                image["width"], image["height"] = size
+
+        if failed:
+            logger.warning(f"failed to probe the size of {len(failed)} images, such as [{failed[0]}]")
+
+    @staticmethod
+    def record_fingerprint(image: dict, anno_list: List[Dict]) -> str:
+        """
+        | The content fingerprint of an image and its annotations yielded by the dataset iterator.
+        | It covers the ground truth and prediction records of the image,
+          so it changes if any of them changes in the dataset source.
+        """
+
+        record = json.dumps([image, anno_list], sort_keys=True, default=str)
+        return get_str_md5(record)
+
+    @staticmethod
+    def _id_range_query(id_range: List[int] = None) -> dict:
+        if id_range is None:
+            return {}
+        beg, end = id_range
+        return {"_id": {"$gte": beg}} if end is None else {"_id": {"$gte": beg, "$lt": end}}
+
+    def load_existing_fingerprints(self, id_range: List[int] = None) -> Dict[int, Tuple[str, int]]:
+        """
+        Load the fingerprint and idx of every existing image, for the incremental re-import.
+
+        :param id_range: only load images of ids in [beg, end), end is None for no upper bound.
+        """
+
+        query = self._id_range_query(id_range)
+        cursor = self.IModel.get_collection().find(query, {"fingerprint": 1, "idx": 1})
+        return {image["_id"]: (image.get("fingerprint", None), image.get("idx", None)) for image in cursor}
+
+    @staticmethod
+    def _upsert_image_op(image: dict) -> UpdateOne:
+        """
+        | Update a changed image in place, or insert a new one.
+        | User added objects and flags of the existing image are kept by the server,
+          so they never make a round trip to the importer.
+        """
+
+        keep_fields = {"_id", "objects", "flag", "flag_ts"}
+        fields = {key: {"$literal": value} for key, value in image.items() if key not in keep_fields}
+
+        user_objects = {"$filter": {"input": {"$ifNull": ["$objects", []]},
+                                    "as"   : "object",
+                                    "cond" : {"$eq": ["$$object.label_type", LabelType.User]}}}
+        fields["objects"] = {"$concatArrays": [{"$literal": image["objects"]}, user_objects]}
+        fields["flag"] = {"$ifNull": ["$flag", image["flag"]]}
+        fields["flag_ts"] = {"$ifNull": ["$flag_ts", image["flag_ts"]]}
+        return UpdateOne({"_id": image["_id"]}, [{"$set": fields}], upsert=True)
+
+    def bulk_write_images(self, image_queue: list, acknowledged: bool = False):
+        """
+        Insert a batch of images.
+        Images written by a failed import after its last checkpoint are upserted instead when the import is resumed,
+        so replaying a partially written batch is safe.
+        In an incremental re-import, only new or changed images are written, and unchanged ones are skipped.
+
+        :param acknowledged: wait for the acknowledgement, such as before saving a checkpoint.
+        """
+
+        co = self.get_images_collection()
+        wc = WriteConcern(w=1 if acknowledged or self.acknowledged_writes else 0)
         co = co.with_options(write_concern=wc)
-        co.insert_many(image_queue)
+        if self._existing_images is not None:
+            ops = []
+            for image in image_queue:
+                fingerprint, idx = self._existing_images.pop(image["_id"], (None, None))
+                if fingerprint is None or fingerprint != image["fingerprint"]:
+                    ops.append(self._upsert_image_op(image))
+                elif idx != image["idx"]:
+                    ops.append(UpdateOne({"_id": image["_id"]}, {"$set": {"idx": image["idx"]}}))
+            if ops:
+                co.bulk_write(ops, ordered=False)
+        elif image_queue[0]["idx"] < self._replay_until:
+            ops = [ReplaceOne({"_id": image["_id"]}, image, upsert=True) for image in image_queue]
+            co.bulk_write(ops, ordered=False)
+        else:
+            co.insert_many(image_queue)
+
+    def open_writer(self) -> BatchWriter:
+        """
+        | The batch writer of labels and categories of this import, it's flushed by every batch of images,
+          and closed when the import is finished or aborted.
+        | It's a writer of this import, so it never flushes or waits for other imports running in the same process.
+        """
+
+        if self._writer is None:
+            self._writer = BatchWriter(batch_size=self._batch_size, name=f"import-{self.dataset.id}")
+        return self._writer
+
+    def close_writer(self):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+
+    def save_checkpoint(self, position: dict, num_images: int):
+        """
+        Save the progress of this import after a batch of images is committed.
+
+        :param position: where to continue reading the dataset source, see source_position.
+        :param num_images: the number of committed images.
+        """
 
-    def _dataset_flush_importing(self):
-        if not self._import_queue:
+        checkpoint = ImportCheckpoint(id=self.dataset.id,
+                                      position=json.dumps(position),
+                                      num_images=num_images,
+                                      labels=json.dumps(self._saved_labels),
+                                      categories=json.dumps(self._saved_categories),
+                                      object_types=sorted(self._object_types),
+                                      staging=self._staging)
+        checkpoint.save()
+
+    def _dataset_flush_importing(self, import_queue: Dict[int, dict] = None, position: dict = None):
+        """
+        Write a batch of images, along with their labels and categories.
+
+        :param import_queue: the batch of images, default to the import queue of this importer.
+        :param position: the source position right after the batch, a checkpoint is saved if it's provided.
+        """
+
+        import_queue = self._import_queue if import_queue is None else import_queue
+        if not import_queue:
             return
 
+        with count_block_time("generate thumbnails", logger.debug):
+            self.generate_thumbnails(list(import_queue.values()))
+
         with count_block_time("prepare batch setup", logger.debug):
             dataset_id = self.dataset.id
-            waiting_labels = dict()
-            waiting_categories = dict()
-            object_types = set()
+            waiting_labels = self._saved_labels
+            waiting_categories = self._saved_categories
+            object_types = self._object_types
             whitelist_dirs = set()
+            num_images = max(image["idx"] for image in import_queue.values()) + 1
 
+        writer = self.open_writer()
         with count_block_time("prepare batch data", logger.debug):
             image_insert_queue = []
 
-            for image_id, image in self._import_queue.items():
+            for image_id, image in import_queue.items():
                 for obj in image["objects"]:
                     # setup label
                     label_name = obj["label_name"]
@@ -244,7 +529,7 @@ class Importer(ImportHelper, abc.ABC):
                     if label_id is None:
                         label_id = get_str_md5(f"{dataset_id}_{label_name}")
                         label = Label(name=label_name, id=label_id, type=obj["label_type"], dataset_id=dataset_id)
-                        label.batch_save(batch_size=self._batch_size)
+                        label.batch_save(writer=writer)
                         waiting_labels[label_name] = label_id
                     obj["label_id"] = label_id
 
@@ -254,7 +539,7 @@ class Importer(ImportHelper, abc.ABC):
                     if category_id is None:
                         category_id = get_str_md5(f"{dataset_id}_{cat_name}")
                         category = Category(name=cat_name, id=category_id, dataset_id=dataset_id)
-                        category.batch_save(batch_size=self._batch_size)
+                        category.batch_save(writer=writer)
                         waiting_categories[cat_name] = category_id
                     obj["category_id"] = category_id
 
@@ -280,27 +565,70 @@ class Importer(ImportHelper, abc.ABC):
 
         # finish batch saves
         with count_block_time("finish batch save", logger.debug):
-            Label.finish_batch_save()
-            Category.finish_batch_save()
-            self.bulk_write_images(image_insert_queue)
+            writer.flush()
+            self.bulk_write_images(image_insert_queue, acknowledged=position is not None)
 
-        # setup dataset
+        # setup dataset, a readable dataset is saved when the new version replaces it
         with count_block_time("setup dataset", logger.debug):
             self.dataset.object_types = list(sorted(list(object_types)))
-            self.dataset.save()
+            if not self._readable and self._range is None:
+                self.dataset.save()
 
         # save whitelist to redis
         with count_block_time("save whitelist", logger.debug):
             if whitelist_dirs:
                 Redis.sadd(RedisKey.DatasetImageDirs, *whitelist_dirs)
 
-            self._import_queue.clear()
+            import_queue.clear()
+
+        if position is not None:
+            with count_block_time("save checkpoint", logger.debug):
+                self.save_checkpoint(position, num_images)
+
+    def generate_thumbnails(self, images: List[Dict]):
+        """
+        | Generate thumbnails of local images without one, when DDS_IMPORT_THUMBNAIL_SIZE is set,
+          and point their url to the thumbnail, see io.thumbnail.make_thumbnail.
+        | Thumbnails are generated by a pool of worker processes, and their fingerprints cover the thumbnail settings,
+          so unchanged images of an incremental re-import are skipped, and images are rewritten if the settings change.
+        """
+
+        size = IMPORT_THUMBNAIL_SIZE
+        if size <= 0 or not images or not thumbnails_available():
+            return
+
+        existing = self._existing_images or {}
+        candidates = []
+        for image in images:
+            if image["url"] != image["url_full_res"] or parse_file_url(image["url"]) is None:
+                continue
+            image["fingerprint"] = get_str_md5(f"{image['fingerprint']}-{size}-{IMPORT_THUMBNAIL_FORMAT}")
+            if existing.get(image["id"], (None, None))[0] != image["fingerprint"]:
+                candidates.append(image)
+        if not candidates:
+            return
+
+        num_workers = os.cpu_count() or 1
+        if self._thumbnail_pool is None:
+            self._thumbnail_pool = ProcessPoolExecutor(max_workers=num_workers)
+        urls = [image["url"] for image in candidates]
+        chunksize = max(1, len(urls) // (num_workers * 4))
+        thumbs = self._thumbnail_pool.map(make_thumbnail, urls, repeat(size), repeat(IMPORT_THUMBNAIL_FORMAT),
+                                          chunksize=chunksize)
+        for image, thumb_path in zip(candidates, thumbs):
+            if thumb_path is not None:
+                image["url"] = create_file_url(thumb_path, read_mode=FileReadMode.Binary)
+
+    def close_thumbnail_pool(self):
+        if self._thumbnail_pool is not None:
+            self._thumbnail_pool.shutdown()
+            self._thumbnail_pool = None
 
     def dataset_flush_importing(self):
         batch_is_full = len(self._import_queue) >= self._batch_size
         if batch_is_full:
             with count_block_time("_dataset_flush_importing", logger.debug):
-                self._dataset_flush_importing()
+                self._dataset_flush_importing(position=self.checkpoint_position())
             return True
         return False
 
@@ -310,57 +638,164 @@ class Importer(ImportHelper, abc.ABC):
         This saves all images in the buffer queue to database.
         """
         self._dataset_flush_importing()
+        self.close_thumbnail_pool()
+        self.delete_vanished_images()
+        if self._staging:
+            self.swap_staging_collection()
+        self.dataset.save()
         self.dataset.add_cover()
 
+    def swap_staging_collection(self):
+        """
+        Build the indexes of the staging collection, then replace the images collection with it atomically,
+        so readers switch from the previous version of the dataset to the new one at once.
+        """
+
+        staging = self.IModel.get_staging_collection()
+        target = self.IModel.get_collection()
+        if staging.database.list_collection_names(filter={"name": staging.name}):
+            with count_block_time("build staging indexes", logger.info):
+                ensure_collection_indexes(staging, ImageModel.indexes)
+            staging.rename(target.name, dropTarget=True)
+        else:  # the new version has no images
+            target.drop()
+        self._staging = False
+        logger.info(f"replaced images of dataset [{self.dataset.name}]@[{self.dataset.id}] with the staging collection")
+
+    def delete_vanished_images(self):
+        """
+        Delete existing images which are not in the dataset source any more, after an incremental re-import.
+        """
+
+        if not self._existing_images:
+            return
+
+        image_ids = list(self._existing_images.keys())
+        co = self.IModel.get_collection()
+        for beg in range(0, len(image_ids), 10000):
+            co.delete_many({"_id": {"$in": image_ids[beg:beg + 10000]}})
+        logger.info(f"deleted {len(image_ids)} vanished images of dataset [{self.dataset.name}]@[{self.dataset.id}]")
+        self._existing_images = {}
+
     def pre_run(self):
         """
         A pre-run hook for subclass importers to prepare data.
         """
 
-        self.load_existing_user_data()
+        self._readable = self.dataset.status == constants.DatasetStatus.Ready
+        self.open_writer()
+
+        checkpoint = self._checkpoint
+        if checkpoint is not None:
+            # keep committed images, and merge user data back to images written after the checkpoint
+            self._staging = checkpoint.staging
+            self.load_existing_user_data()
+            self.dataset.num_images = checkpoint.num_images
+            self._saved_labels = json.loads(checkpoint.labels)
+            self._saved_categories = json.loads(checkpoint.categories)
+            self._object_types = set(checkpoint.object_types)
+            last_image = self.get_images_collection().find_one({}, {"idx": 1}, sort=[("idx", -1)])
+            self._replay_until = last_image["idx"] + 1 if last_image else 0
+            self.set_importing_status()
+            return
+
+        ImportCheckpoint.delete_many({"id": self.dataset.id})
+        if self.incremental:
+            # existing images are kept in place, and diffed against the dataset source by bulk_write_images
+            self._existing_images = self.load_existing_fingerprints() or None
+        if self._existing_images is None:
+            # a full import or re-import builds the new version in the staging collection,
+            # the existing images stay untouched until swap_staging_collection replaces them
+            self.load_existing_user_data()
+            self._staging = True
+            self.get_images_collection().drop()
+
         self.dataset.num_images = 0
-        self.dataset.status = constants.DatasetStatus.Importing
-        self.dataset.save()
-        Image(self.dataset.id).get_collection().drop()
+        self.set_importing_status()
+
+    def set_importing_status(self):
+        """
+        | Set the dataset status to importing.
+        | A ready dataset keeps its status, so it's readable until the new version replaces it,
+          only its import status in detail_status is changed.
+        """
+
+        self.dataset.detail_status[_STATUS_KEY] = DatasetStatus.Importing
+        if self._readable:
+            DataSet.update_one({"id": self.dataset.id}, {f"detail_status.{_STATUS_KEY}": DatasetStatus.Importing})
+        else:
+            self.dataset.status = constants.DatasetStatus.Importing
+            self.dataset.save()
 
     def post_run(self):
         """
         A post-run hook for subclass importers.
         """
+        self.close_writer()
+
         logger.info(f"Add cover to dataset [{self.dataset.name}]@[{self.dataset.id}]")
         self.dataset.add_cover()
 
         logger.info(f"Add indices to dataset [{self.dataset.name}]@[{self.dataset.id}]")
-        dataset_id = self.dataset.id
-        Image(dataset_id).get_collection().create_index([
-            ("objects.category_id", 1),
-        ])
-
-        Image(dataset_id).get_collection().create_index([
-            ("idx", 1)
-        ])
+        Image(self.dataset.id).ensure_indexes()
 
         logger.info(f"Set status ready for dataset [{self.dataset.name}]@[{self.dataset.id}]")
-        DataSet.update_one({"id": self.dataset.id}, {"status": DatasetStatus.Ready})
+        DataSet.update_one({"id": self.dataset.id}, {"status"                     : DatasetStatus.Ready,
+                                                     f"detail_status.{_STATUS_KEY}": DatasetStatus.Ready})
+        ImportCheckpoint.delete_many({"id": self.dataset.id})
         self.dataset = DataSet.find_one({"id": self.dataset.id})
 
     def on_error(self, err: Exception):
         """
-        A hook to handle error.
+        A hook to handle error, see abort_import.
         """
 
         try:
-            DataSet.cascade_delete(self.dataset)
-            self.dataset = None
+            self.abort_import()
         finally:
             raise err
 
-    def load_existing_user_data(self):
+    def abort_import(self):
+        """
+        | Clean up a failed import.
+        | If any batch is committed, the import can be resumed from its checkpoint, so its images are kept.
+        | Otherwise, only the staging collection is dropped.
+        | A readable dataset stays readable, and other datasets are marked as failed, or deleted if nothing is kept.
+        """
+
+        try:
+            self.close_writer()  # labels and categories submitted before the error are written
+        finally:
+            self.close_thumbnail_pool()
+        if self._parse_cache is not None:
+            self._parse_cache.abort()
+            self._parse_cache = None
+
+        has_checkpoint = ImportCheckpoint.find_one({"id": self.dataset.id}) is not None
+        if has_checkpoint:
+            logger.warning(f"import of dataset [{self.dataset.name}]@[{self.dataset.id}] failed, "
+                           f"resume it by: ddsop import_one --resume {self.dataset.path}")
+        elif self._staging:
+            self.get_images_collection().drop()
+
+        if self._readable:
+            DataSet.update_one({"id": self.dataset.id}, {f"detail_status.{_STATUS_KEY}": DatasetStatus.Failed})
+        elif has_checkpoint:
+            DataSet.update_one({"id": self.dataset.id}, {"status": DatasetStatus.Failed})
+        else:
+            DataSet.cascade_delete(self.dataset)
+            self.dataset = None
+
+    def load_existing_user_data(self, id_range: List[int] = None):
         """
         load existing user added data from mongodb, so they are not lost when re-importing the database.
+
+        :param id_range: only load images of ids in [beg, end), end is None for no upper bound.
         """
 
+        query = self._id_range_query(id_range)
         pipeline = [
+            {"$match": query},
             {"$project": {"flag"   : 1,
                           "flag_ts": 1,
                           "objects": {
@@ -405,30 +840,367 @@ class Importer(ImportHelper, abc.ABC):
         image["flag"] = user_data["flag"]
         image["flag_ts"] = user_data["flag_ts"]
 
-    def run_import(self):
+    def load_source(self):
         """
-        The main process of importing the dataset.
-        This Iterates over the dataset and import every image and annotations.
+        A hook to load the dataset source before iterating it, such as parsing a json file.
+        It's skipped if records are read from the parse cache.
+        """
+
+        pass
+
+    def open_parse_cache(self) -> Optional[ParseCache]:
+        """
+        The parse cache of the dataset source, return None if the importer does not support it, which is the default.
+        """
+
+        return None
+
+    def checkpoint_position(self) -> Optional[dict]:
+        """
+        The position saved in the checkpoint, it's the number of read records if they are read from the parse cache.
+        """
+
+        if self._reading_cache:
+            return {"parse_cache": self.dataset.num_images}
+        return self.source_position()
+
+    def source_position(self) -> Optional[dict]:
+        """
+        | The position in the dataset source right after the last yielded image, such as byte offsets of a tsv file.
+        | It's saved in the checkpoint, so it must be json serializable.
+        | Return None if the importer does not support resuming, which is the default.
+        """
+
+        return None
+
+    def seek_source(self, position: dict):
+        """
+        Continue iterating the dataset source from a position returned by source_position.
+        """
+
+        raise NotImplementedError
+
+    def make_shards(self, position: dict = None) -> list:
+        """
+        | Split the dataset into shards for the pipelined import, such as byte ranges of a tsv file.
+        | A shard is a picklable object passed to parse_shard in a parse worker process.
+        | Shards are imported in order, so image idx are the same as the serial import.
+        | If a shard is a dict with an "end_position" key, the source position right after the shard,
+          a checkpoint is saved when the shard is committed.
+        | Return an empty list if the importer does not support the pipelined import, which is the default.
+
+        :param position: start from this source position instead of the beginning, see source_position.
+        """
+
+        return []
+
+    def parse_shard(self, shard: Any) -> Iterable[Tuple[Dict, List[Dict]]]:
+        """
+        | Yield a tuple of image and annotation list for every image of the shard, just like __iter__.
+        | This runs in a parse worker process, on a copy of the importer created from worker_state.
+        """
+
+        raise NotImplementedError
+
+    def worker_state(self) -> dict:
+        """
+        The attributes of the importer copy in a parse worker process, they must be picklable.
+        """
+
+        return {"dataset_name": self.dataset_name, "dataset": self.dataset}
+
+    def make_ranges(self, num_ranges: int) -> list:
+        """
+        | Split the dataset source into about num_ranges ranges, which are imported by separate tasks,
+          see import_dataset_by_ranges. Return [] if the importer does not support it, which is the default.
+        | A range is a shard of parse_shard, along with the idx of its first image as "idx",
+          and the [beg, end) ids of its images as "ids", end is None for the last range.
+        """
+
+        return []
+
+    def prepare_range_import(self, num_ranges: int) -> list:
+        """
+        | Prepare the import of the dataset by ranges, and return the ranges, see make_ranges.
+        | It sets the dataset importing, and decides how the ranges write images, like pre_run does:
+          the new version is built in the staging collection,
+          unless existing images are re-imported in place by an incremental import.
+        | Return [] if the dataset is not split, it's imported by run as usual then.
+        """
+
+        ranges = self.make_ranges(num_ranges) if num_ranges > 1 else []
+        if not ranges:
+            return []
+
+        self._readable = self.dataset.status == constants.DatasetStatus.Ready
+        ImportCheckpoint.delete_many({"id": self.dataset.id})
+        self._staging = True
+        if self.incremental:
+            self._staging = self.IModel.get_collection().find_one({}, {"_id": 1}) is None
+        if self._staging:
+            self.get_images_collection().drop()
+
+        self.dataset.num_images = 0
+        self.set_importing_status()
+        for range_ in ranges:
+            range_["staging"] = self._staging
+            range_["readable"] = self._readable
+        logger.info(f"import dataset[{self.dataset.name}@{self.dataset.id}] by {len(ranges)} ranges, "
+                    f"staging={self._staging}")
+        return ranges
+
+    def import_range(self, range_: dict) -> dict:
+        """
+        | Import a range of the dataset source made by prepare_range_import, in one task of the range import.
+        | Images are written with the idx pre-assigned to the range, and no checkpoint is saved.
+          Images of the range written by a failed attempt of the task are upserted, so the task can be retried.
+        | Return the labels, categories and object types saved by the range, and its number of images,
+          they are merged by finish_range_import.
+        """
+
+        self._range = range_
+        self._staging = range_["staging"]
+        self._readable = range_["readable"]
+        if self._staging:
+            self.load_existing_user_data(range_["ids"])
+        else:
+            self._existing_images = self.load_existing_fingerprints(range_["ids"])
+
+        beg = range_["idx"]
+        last_image = self.get_images_collection().find_one({"idx": {"$gte": beg, "$lt": beg + range_["num_lines"]}},
+                                                           {"idx": 1}, sort=[("idx", -1)])
+        self._replay_until = last_image["idx"] + 1 if last_image else 0
+        self.dataset.num_images = beg
+
+        desc = f"dataset[{self.dataset.name}@{self.dataset.id}] range {beg} import progress"
+        try:
+            records = self._iter_normalized(records=self.parse_shard(range_))
+            for image_data, objects in tqdm(records, desc=desc, unit=" images"):
+                image = self.dataset_import_image(self.dataset, **image_data)
+                self.image_add_user_data(image)
+                image["objects"].extend(objects)
+                if len(self._import_queue) >= self._batch_size:
+                    self._dataset_flush_importing()
+
+            self._dataset_flush_importing()
+        finally:
+            self.close_writer()
+        self.close_thumbnail_pool()
+        self.delete_vanished_images()
+        return {"labels"      : self._saved_labels,
+                "categories"  : self._saved_categories,
+                "object_types": sorted(self._object_types),
+                "num_images"  : self.dataset.num_images - beg}
+
+    def finish_range_import(self, results: List[dict], staging: bool):
+        """
+        | Finish the import by ranges after all of them are imported, see import_range.
+        | Labels, categories and object types of all ranges are merged into the dataset,
+          and the staging collection replaces the images collection if the ranges are written there.
+        """
+
+        for result in results:
+            self._saved_labels.update(result["labels"])
+            self._saved_categories.update(result["categories"])
+            self._object_types.update(result["object_types"])
+        self.dataset.num_images = sum(result["num_images"] for result in results)
+        self.dataset.object_types = sorted(self._object_types)
+
+        self._staging = staging
+        if self._staging:
+            self.swap_staging_collection()
+        self.dataset.save()
+        logger.info(f"imported dataset [{self.dataset.name}]@[{self.dataset.id}] by {len(results)} ranges, "
+                    f"{self.dataset.num_images} images, {len(self._saved_labels)} labels, "
+                    f"{len(self._saved_categories)} categories")
+        self.post_run()
+
+    def _write_batches(self, batches: queue.Queue, errors: list):
+        """
+        The writer stage of the pipelined import.
+        It writes batches in the order they are queued, and keeps draining the queue after an error.
+        """
+
+        while True:
+            item = batches.get()
+            if item is None:
+                return
+            if errors:
+                continue
+
+            batch, position = item
+            try:
+                with count_block_time("_dataset_flush_importing", logger.debug):
+                    self._dataset_flush_importing(batch, position=position)
+            except Exception as err:
+                errors.append(err)
+
+    def _run_import_pipelined(self, shards: list):
+        """
+        | The pipelined import, it runs three stages concurrently:
+        | 1. parse and normalize: worker processes parse shards and normalize their annotations.
+        | 2. order: this thread takes parsed shards in order, assigns image idx and merges user data.
+        | 3. write: a writer thread resolves labels and categories, and inserts images batch by batch.
+        | Stages are connected by bounded queues, so a slow stage blocks the others instead of piling up data.
+        """
+
+        batches = queue.Queue(maxsize=4)
+        errors = []
+        writer = threading.Thread(target=self._write_batches, args=(batches, errors),
+                                  name=f"import-writer-{self.dataset.id}", daemon=True)
+
+        desc = f"dataset[{self.dataset.name}@{self.dataset.id}] import progress"
+        progress = tqdm(desc=desc, unit=" images")
+        max_pending = self.num_workers * 2
+        with ProcessPoolExecutor(max_workers=self.num_workers,
+                                 initializer=_init_parse_worker,
+                                 initargs=(type(self), self.worker_state())) as executor:
+            writer.start()
+            try:
+                pending = deque()  # the shards being parsed and their futures, in shard order
+                shards = deque(shards)
+                while shards and len(pending) < max_pending:
+                    shard = shards.popleft()
+                    pending.append((shard, executor.submit(_parse_shard, shard)))
+
+                while pending and not errors:
+                    shard, future = pending.popleft()
+                    items = future.result()
+                    if shards:
+                        next_shard = shards.popleft()
+                        pending.append((next_shard, executor.submit(_parse_shard, next_shard)))
+
+                    for image_data, objects in items:
+                        if self._parse_cache is not None:
+                            self._parse_cache.write((image_data, objects))
+                        image = self.dataset_import_image(self.dataset, **image_data)
+                        self.image_add_user_data(image)
+                        image["objects"].extend(objects)
+                        if len(self._import_queue) >= self._batch_size:
+                            batches.put((self._import_queue, None))
+                            self._import_queue = {}
+                    progress.update(len(items))
+
+                    # checkpoint at the end of the shard
+                    end_position = shard.get("end_position", None) if isinstance(shard, dict) else None
+                    if end_position is not None and self._import_queue:
+                        batches.put((self._import_queue, end_position))
+                        self._import_queue = {}
+
+                for _, future in pending:
+                    future.cancel()
+            finally:
+                batches.put((self._import_queue, None))
+                batches.put(None)
+                self._import_queue = {}
+                writer.join()
+                progress.close()
+
+        if errors:
+            raise errors[0]
+        self.commit_parse_cache()
+        self.dataset_finish_importing()
+
+    def _run_import_serial(self, records: Iterable[Tuple[Dict, List[Dict]]]):
+        """
+        The serial import of normalized records, see normalize_records.
         """
 
         desc = f"dataset[{self.dataset.name}@{self.dataset.id}] import progress"
-        for (image, anno_list) in tqdm(self, desc=desc, unit=" images"):
-            # for (image, anno_list) in self:
-            image = self.dataset_import_image(self.dataset, **image)
+        for (image_data, objects) in tqdm(records, desc=desc, unit=" images"):
+            if self._parse_cache is not None:
+                self._parse_cache.write((image_data, objects))
+            image = self.dataset_import_image(self.dataset, **image_data)
             self.image_add_user_data(image)
-            for anno in anno_list:
-                self.image_import_annotation(image, **anno)
+            image["objects"].extend(objects)
             self.dataset_flush_importing()
 
+        self.commit_parse_cache()
         self.dataset_finish_importing()
 
-    def run(self):
+    def commit_parse_cache(self):
+        if self._parse_cache is not None:
+            self._parse_cache.commit()
+            self._parse_cache = None
+
+    def run_import(self):
+        """
+        The main process of importing the dataset.
+        This Iterates over the dataset and import every image and annotations.
+        If the dataset source is unchanged since it's cached, records are read from the parse cache instead.
+        If num_workers > 1 and the importer supports shards, the dataset is imported by a pipeline of processes.
+        """
+
+        position = None
+        if self._checkpoint is not None:
+            position = json.loads(self._checkpoint.position)
+            logger.info(f"resume importing dataset[{self.dataset.name}@{self.dataset.id}] "
+                        f"from image {self._checkpoint.num_images}, position={position}")
+
+        cache = self.open_parse_cache()
+        if cache is not None and cache.exists():
+            logger.info(f"import dataset[{self.dataset.name}@{self.dataset.id}] from parse cache {cache.path}")
+            self._reading_cache = True
+            self._run_import_serial(cache.read(skip=self.dataset.num_images))
+            return
+
+        self.load_source()
+        skip = 0
+        if position is not None and "parse_cache" in position:
+            # the failed import read the parse cache, which is gone, so skip the committed records of the source
+            skip, position = self.dataset.num_images, None
+        elif position is None and cache is not None:
+            # only a whole pass over the dataset source is cached
+            self._parse_cache = cache
+            cache.begin_write()
+
+        shards = self.make_shards(position) if self.num_workers > 1 and not skip else []
+        if shards:
+            logger.info(f"import dataset[{self.dataset.name}@{self.dataset.id}] by {self.num_workers} workers, "
+                        f"{len(shards)} shards")
+            self._run_import_pipelined(shards)
+            return
+
+        if position is not None:
+            self.seek_source(position)
+
+        self._run_import_serial(self._iter_normalized(skip))
+
+    def _iter_normalized(self, skip: int = 0, records: Iterable[Tuple[Dict, List[Dict]]] = None
+                         ) -> Iterable[Tuple[Dict, List[Dict]]]:
+        """
+        Iterate over the dataset, and normalize its records batch by batch.
+
+        :param skip: the number of leading records to skip.
+        :param records: the records to normalize, defaults to the records of the whole dataset.
+        """
+
+        records = iter(self) if records is None else iter(records)
+        if skip:
+            records = islice(records, skip, None)
+
+        # batches are as large as flushes, so the source position at a flush is right after the flushed images
+        while True:
+            batch = list(islice(records, self._batch_size))
+            if not batch:
+                return
+            yield from self.normalize_records(batch)
+
+    def run(self, resume: bool = False):
         """
         The start point of the importing process.
+
+        :param resume: continue from the checkpoint of a failed import, instead of importing from the start.
+                       The dataset is imported from the start if there is no checkpoint.
         """
 
         with count_block_time(f"import {self.dataset_name}", logger.info):
             try:
+                if resume is True:
+                    self._checkpoint = ImportCheckpoint.find_one({"id": self.dataset.id})
+                    if self._checkpoint is None:
+                        logger.info(f"no checkpoint of dataset [{self.dataset_name}]@[{self.dataset.id}], "
+                                    f"import it from the start")
                 self.pre_run()
                 self.run_import()
             except Exception as err:
@@ -458,8 +1230,11 @@ class FileImporter(Importer, abc.ABC):
         - collect_files: collect the files related to this dataset, {file_tag: file_path}.
             By default, this function returns {LabelName.GroundTruth: dataset_file_path}.
             If there are other related files, such as prediction files, they should be collected here too.
+    Importers are tried by their priority, see choose_importer_cls.
     """
 
+    priority: int = 0  # importers of higher priority are tried first, for paths more than one of them can import
+
     def __init__(self, path: str, name: str = None, id_: str = None, enforce: bool = False):
         """
         :param path: the path of the dataset.
@@ -491,6 +1266,15 @@ class FileImporter(Importer, abc.ABC):
 
         return {DatasetFileType.GroundTruth: self.path}
 
+    def open_parse_cache(self) -> Optional[ParseCache]:
+        """
+        The parse cache keyed by the dataset files and the importer version.
+        """
+
+        if not ParseCache.enabled():
+            return None
+        return ParseCache(type(self), self.dataset.files)
+
     @staticmethod
     @abc.abstractmethod
     def can_import(path: str):
@@ -500,16 +1284,18 @@ class FileImporter(Importer, abc.ABC):
 
         raise NotImplementedError
 
-    def run(self):
+    def run(self, resume: bool = False):
         """
         The start point of the importing process.
         """
 
         if self.dataset.status == constants.DatasetStatus.Ready and not self.enforce:
-            logger.info(f"Dataset {self.dataset_name} is already imported, skip.")
-            return self.dataset
+            # a failed re-import of a ready dataset can be resumed without enforce
+            if not resume or ImportCheckpoint.find_one({"id": self.dataset.id}) is None:
+                logger.info(f"Dataset {self.dataset_name} is already imported, skip.")
+                return self.dataset
 
-        return super(FileImporter, self).run()
+        return super(FileImporter, self).run(resume=resume)
 
     @classmethod
     def get_subclasses(cls):
@@ -529,33 +1315,99 @@ class FileImporter(Importer, abc.ABC):
 def choose_importer_cls(target_path: str) -> Union[Type[FileImporter], None]:
     """
     Choose the proper importer class for target_path.
-    The right importer is the importer class which returns true on importer_class.can_import(target_path).
+    The right importer is the importer class which returns true on importer_class.can_import(target_path),
+    the result is memoized for files, see memoized_can_import.
+    Importers are tried in the order of their priority, and then their names, so the choice is deterministic.
 
     :param target_path: the target path to import, either a dataset or a dataset group.
     """
 
     # try to import as a dataset
-    importers = FileImporter.get_subclasses()
+    importers = sorted(FileImporter.get_subclasses(), key=lambda cls: (-cls.priority, cls.__name__))
     for imp_cls in importers:
-        if imp_cls.can_import(target_path):
+        if memoized_can_import(imp_cls, target_path):
             logger.info(f"choose_importer_cls: {imp_cls.__name__} is chosen for target_path {target_path}")
             return imp_cls
 
     return None
 
 
-def import_dataset(target_path: str, enforce: bool = False) -> DataSet:
+def import_dataset(target_path: str,
+                   enforce: bool = False,
+                   resume: bool = False,
+                   incremental: bool = False) -> DataSet:
     """
     Choose the right auto importer for target path, and run the import task.
 
     :param target_path: the target path to import, either a dataset or a dataset group.
     :param enforce: enforce the import task, even though the dataset is imported into mongodb before.
+    :param resume: continue from the checkpoint of a failed import of the dataset.
+    :param incremental: re-import the existing images in place by diffing their fingerprints,
+        instead of rebuilding the dataset from scratch, see Importer.incremental.
     """
 
-    logger.info(f"import_dataset starts, target_path={target_path}, enforce={enforce}")
+    logger.info(f"import_dataset starts, target_path={target_path}, enforce={enforce}, resume={resume}, "
+                f"incremental={incremental}")
     importer_cls = choose_importer_cls(target_path)
     if importer_cls is not None:
         importer = importer_cls(target_path, enforce=enforce)
-        return importer.run()
+        importer.incremental = incremental
+        return importer.run(resume=resume)
     else:
         logger.warning(f"cannot find any importer for {target_path}, skip it...")
+
+
+def prepare_dataset_ranges(target_path: str, enforce: bool = False, num_ranges: int = 0,
+                           incremental: bool = False) -> list:
+    """
+    Prepare the import of a dataset by ranges, see Importer.prepare_range_import.
+    Return [] if the dataset is not imported by ranges,
+    such as it's imported before and not enforced, or its importer does not support ranges.
+
+    :param target_path: the dataset path.
+    :param enforce: enforce the import task, even though the dataset is imported into mongodb before.
+    :param num_ranges: the number of ranges to split the dataset into.
+    :param incremental: re-import the existing images in place, see import_dataset.
+    """
+
+    importer_cls = choose_importer_cls(target_path)
+    if importer_cls is None:
+        return []
+
+    importer = importer_cls(target_path, enforce=enforce)
+    importer.incremental = incremental
+    if importer.dataset.status == constants.DatasetStatus.Ready and not enforce:
+        return []
+    return importer.prepare_range_import(num_ranges)
+
+
+def import_dataset_range(target_path: str, range_: dict) -> dict:
+    """
+    Import a range of a dataset, see Importer.import_range.
+    """
+
+    importer = choose_importer_cls(target_path)(target_path)
+    return importer.import_range(range_)
+
+
+def finish_dataset_ranges(target_path: str, results: List[dict], staging: bool) -> DataSet:
+    """
+    Finish the import of a dataset by ranges, see Importer.finish_range_import.
+    """
+
+    importer = choose_importer_cls(target_path)(target_path)
+    importer.finish_range_import(results, staging)
+    return importer.dataset
+
+
+def abort_dataset_ranges(target_path: str, range_: dict):
+    """
+    Clean up the failed import of a dataset by ranges, see Importer.abort_import.
+
+    :param range_: any range of the import, which tells how the ranges write images.
+    """
+
+    importer = choose_importer_cls(target_path)(target_path)
+    importer._staging = range_["staging"]
+    importer._readable = range_["readable"]
+    importer.abort_import()
@@ -0,0 +1,194 @@
+"""
+deepdataspace.io.parse_cache
+
+The cache of parsed dataset files, so re-importing unchanged files skips parsing them.
+"""
+
+import json
+import logging
+import os
+import pickle
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Tuple
+from typing import Type
+
+from deepdataspace.environs import BINARY_OBJECTS
+from deepdataspace.environs import IMPORT_CACHE_DIR
+from deepdataspace.utils.string import get_str_md5
+
+logger = logging.getLogger("io.parse_cache")
+
+_CACHE_FORMAT = 1  # bump it when the layout of cache files or normalized records changes
+_MAX_MEMO_SIZE = 10000  # the memo of can_import is cleared when it grows beyond this size
+_can_import_memo = None  # {memo key: can import}, loaded from the memo file on first use
+
+
+def _file_stat(path: str) -> Tuple[str, int, int]:
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def _importer_name(importer_cls: Type) -> str:
+    return f"{importer_cls.__module__}.{importer_cls.__qualname__}@{importer_cls.parse_version}"
+
+
+class ParseCache:
+    """
+    | The normalized records of a dataset, in the order the importer yields them.
+    | A cache is keyed by the path, size and mtime of every dataset file, and by the importer version,
+      so it's ignored once any file or the way the importer parses them changes.
+    | Records are pickled one by one when they are written, so reading and writing are streamed,
+      and records changed by the import afterwards are cached as they are yielded.
+    """
+
+    def __init__(self, importer_cls: Type, files: Dict[str, str]):
+        """
+        :param importer_cls: the importer class parsing the files.
+        :param files: the dataset files, {file_tag: file_path}.
+        """
+
+        stats = sorted((tag, _file_stat(path)) for tag, path in files.items())
+        # normalized objects are encoded differently with DDS_BINARY_OBJECTS
+        key = json.dumps([_CACHE_FORMAT, _importer_name(importer_cls), BINARY_OBJECTS, stats])
+
+        # caches of the same files are named with the same prefix, so the outdated ones can be found
+        self.prefix = get_str_md5(json.dumps(sorted(os.path.abspath(p) for p in files.values())))
+        self.path = os.path.join(IMPORT_CACHE_DIR, f"{self.prefix}-{get_str_md5(key)}.pkl")
+        self._tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self._fp = None
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(IMPORT_CACHE_DIR)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def read(self, skip: int = 0) -> Iterator[Tuple[Dict, List[Dict]]]:
+        """
+        Iterate over cached records.
+
+        :param skip: the number of leading records to skip, such as the ones committed before resuming.
+        """
+
+        with open(self.path, "rb") as fp:
+            while True:
+                try:
+                    record = pickle.load(fp)  # a new unpickler for every record, as they are pickled separately
+                except EOFError:
+                    return
+
+                if skip > 0:
+                    skip -= 1
+                    continue
+                yield record
+
+    def begin_write(self):
+        try:
+            os.makedirs(IMPORT_CACHE_DIR, exist_ok=True)
+            self._fp = open(self._tmp_path, "wb")
+        except OSError as err:
+            logger.warning(f"Failed to write parse cache {self.path}: {err}")
+
+    def write(self, record: Tuple[Dict, List[Dict]]):
+        """
+        Write a record, the cache is given up on any io error, so it never fails the import.
+        """
+
+        if self._fp is None:
+            return
+
+        try:
+            pickle.dump(record, self._fp, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as err:
+            logger.warning(f"Failed to write parse cache {self.path}: {err}")
+            self.abort()
+
+    def commit(self):
+        """
+        Finish writing, the cache is only visible after all records are written.
+        Outdated caches of the same files are removed.
+        """
+
+        if self._fp is None:
+            return
+
+        try:
+            self._fp.close()
+            self._fp = None
+            os.replace(self._tmp_path, self.path)
+
+            for name in os.listdir(IMPORT_CACHE_DIR):
+                path = os.path.join(IMPORT_CACHE_DIR, name)
+                if name.startswith(f"{self.prefix}-") and name.endswith(".pkl") and path != self.path:
+                    os.remove(path)
+        except OSError as err:
+            logger.warning(f"Failed to save parse cache {self.path}: {err}")
+            self.abort()
+        else:
+            logger.info(f"saved parse cache {self.path}")
+
+    def abort(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+def _load_memo() -> dict:
+    try:
+        with open(os.path.join(IMPORT_CACHE_DIR, "can_import.json"), "r", encoding="utf8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_memo(memo: dict):
+    memo_path = os.path.join(IMPORT_CACHE_DIR, "can_import.json")
+    tmp_path = f"{memo_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(IMPORT_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf8") as fp:
+            json.dump(memo, fp)
+        os.replace(tmp_path, memo_path)
+    except OSError as err:
+        logger.warning(f"Failed to save the memo of can_import: {err}")
+
+
+def memoized_can_import(importer_cls: Type, path: str) -> bool:
+    """
+    | Call importer_cls.can_import(path), with its result memoized by the path, size and mtime of the file.
+    | The memo is saved under the cache dir, so it's shared by processes and kept across restarts.
+    """
+
+    global _can_import_memo
+
+    # the mtime of a directory misses changes of files inside, so only files are memoized
+    if not IMPORT_CACHE_DIR or not os.path.isfile(path):
+        return importer_cls.can_import(path)
+
+    try:
+        stat = _file_stat(path)
+    except OSError:
+        return importer_cls.can_import(path)
+
+    key = get_str_md5(json.dumps([_CACHE_FORMAT, _importer_name(importer_cls), stat]))
+    if _can_import_memo is None:
+        _can_import_memo = _load_memo()
+    if key in _can_import_memo:
+        return _can_import_memo[key]
+
+    result = bool(importer_cls.can_import(path))
+    memo = _load_memo()  # merge the results saved by other processes
+    if len(memo) >= _MAX_MEMO_SIZE:
+        memo = {}
+    memo[key] = result
+    _save_memo(memo)
+    _can_import_memo = memo
+    return result
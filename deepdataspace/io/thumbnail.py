@@ -0,0 +1,113 @@
+"""
+deepdataspace.io.thumbnail
+
+Generate thumbnails of imported images, which are saved under DDS_THUMBNAIL_DIR by the md5 of the image content.
+"""
+
+import base64
+import hashlib
+import io
+import logging
+import os
+import uuid
+from functools import lru_cache
+from typing import Optional
+
+from deepdataspace.constants import ContentEncoding
+from deepdataspace.environs import THUMBNAIL_DIR
+from deepdataspace.utils.file import parse_file_url
+
+logger = logging.getLogger("io.thumbnail")
+
+# {format: (pillow format, file extension, save options)}
+_FORMATS = {
+    "jpeg": ("JPEG", "jpg", {"quality": 85}),
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+}
+
+
+@lru_cache(maxsize=None)
+def thumbnails_available() -> bool:
+    """
+    Thumbnails are generated by Pillow, which is an optional dependency, it warns once if Pillow is not installed.
+    """
+
+    try:
+        import PIL.Image  # noqa
+    except ImportError:
+        logger.warning("DDS_IMPORT_THUMBNAIL_SIZE is set but Pillow is not installed, "
+                       "no thumbnails are generated, install it by: pip install Pillow")
+        return False
+    return True
+
+
+def read_image_url(url: str) -> Optional[bytes]:
+    """
+    Read the image bytes of a local file url, see utils.file.create_file_url and create_file_range_url.
+    Return None if it's not a local file url.
+    """
+
+    parsed = parse_file_url(url)
+    if parsed is None:
+        return None
+
+    local_path, file_encoding, _, beg_pos, end_pos = parsed
+    with open(local_path, "rb") as fp:
+        if beg_pos >= 0 and end_pos >= 0:
+            fp.seek(beg_pos)
+            content = fp.read(end_pos - beg_pos)
+        else:
+            content = fp.read()
+
+    if file_encoding == ContentEncoding.Base64:
+        content = base64.b64decode(content)
+    return content
+
+
+def make_thumbnail(url: str, size: int, fmt: str = "jpeg") -> Optional[str]:
+    """
+    | Generate the thumbnail of an image, which fits in a square of the size, and return its path.
+    | The thumbnail is saved by the md5 of the image content, an existing one is returned without decoding the image.
+      Return None if the image is no larger than the size, or it can't be read or decoded.
+    | This runs in worker processes of the importer, see Importer.generate_thumbnails.
+
+    :param url: the local file url of the image.
+    :param size: the max width and height of the thumbnail.
+    :param fmt: the thumbnail format, jpeg or webp.
+    """
+
+    from PIL import Image
+    from PIL import ImageOps
+
+    pil_format, ext, options = _FORMATS[fmt]
+    try:
+        content = read_image_url(url)
+        if content is None:
+            return None
+
+        digest = hashlib.md5(content).hexdigest()
+        thumb_path = os.path.join(THUMBNAIL_DIR, digest[:2], f"{digest}-{size}.{ext}")
+        if os.path.exists(thumb_path):
+            return thumb_path
+
+        with Image.open(io.BytesIO(content)) as img:
+            if max(img.size) <= size:
+                return None
+            img.draft("RGB", (size, size))  # let jpeg decoders scale down while decoding
+            img = ImageOps.exif_transpose(img)
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha and pil_format == "WEBP" else "RGB")
+            img.thumbnail((size, size))
+
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            tmp_path = f"{thumb_path}.{uuid.uuid4().hex}.tmp"  # never expose a partial thumbnail
+            try:
+                img.save(tmp_path, pil_format, **options)
+                os.replace(tmp_path, thumb_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return thumb_path
+    except (OSError, ValueError, Image.DecompressionBombError) as err:
+        logger.warning(f"Failed to generate thumbnail of {url}: {err}")
+        return None
@@ -8,6 +8,7 @@ from deepdataspace.model.category import Category
 from deepdataspace.model.dataset import DataSet
 from deepdataspace.model.image import Image
 from deepdataspace.model.image import ImageModel
+from deepdataspace.model.import_checkpoint import ImportCheckpoint
 from deepdataspace.model.label import Label
 from deepdataspace.model.label_task import LabelProject
 from deepdataspace.model.label_task import LabelTask
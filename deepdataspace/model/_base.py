@@ -5,30 +5,54 @@ This module defines the common model apis.
 """
 
 import abc
+import atexit
+import base64
+import copy
+import json
 import logging
+import os
+import queue
+import threading
 import time
+from dataclasses import dataclass
+from dataclasses import field as dc_field
 from threading import Lock
+from typing import Any
+from typing import Callable
 from typing import ClassVar
 from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Tuple
 
 from pydantic import BaseModel as _Base
+from pydantic.fields import SHAPE_LIST
+from pydantic.fields import ModelField
+from pymongo import IndexModel
 from pymongo import WriteConcern
 from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+from pymongo.errors import OperationFailure
 from pymongo.operations import UpdateOne
 from pymongo.typings import _DocumentType
 
 from deepdataspace.globals import MongoDB
+from deepdataspace.model._cache import ModelCache
+from deepdataspace.model._cache import get_model_cache
 
-_lock_lock = Lock()  # the lock for creating a batch operation lock for a collection
-_batch_lock = {}  # a dict of batch operation lock for every collection, {'collection_name': batch_op_lock, }
-_batch_save_queue = {}  # a dict of batch save queue for every collection, {'collection_name': batch_save_queue, }
-_batch_update_queue = {}  # a dict of batch update queue for every collection, {'collection_name': batch_update_queue, }
+_write_behind_lock = Lock()  # the lock for creating the default write-behind flusher
+_write_behind = None  # the default write-behind flusher of current process, see get_write_behind
+_trusted_fields = {}  # a dict of nested model fields for every model class, {model_class: {field_name: (lazy, model)}}
 
 logger = logging.getLogger("model.base")
 
 
+class InvalidCursor(ValueError):
+    """
+    Raised by :meth:`BaseModel.find_page` if a page cursor is broken, or not made by the same sort conditions.
+    """
+
+
 def current_ts():
     """
     Get current timestamp in millisecond.
@@ -36,6 +60,665 @@ def current_ts():
     return int(time.time() * 1000)
 
 
+def _has_nested_model(field: ModelField):
+    """
+    Check if a model field contains a nested pydantic model anywhere in its type.
+    """
+
+    if isinstance(field.type_, type) and issubclass(field.type_, _Base):
+        return True
+    return any(_has_nested_model(f) for f in field.sub_fields or [])
+
+
+class LazyModelList(list):
+    """
+    | A list of nested models hydrated from raw mongodb documents.
+    | The raw documents are only converted to model objects when the list is read for the first time,
+      so images loaded only for their scalar fields never pay for building their objects.
+    | Without a model class, it behaves exactly like a plain python list.
+    """
+
+    def __init__(self, items=(), model=None):
+        super(LazyModelList, self).__init__(items)
+        self._model = model
+
+    def _materialize(self):
+        model = self._model
+        if model is None:
+            return
+
+        self._model = None
+        hydrate = model.from_trusted_dict if issubclass(model, BaseModel) else model.parse_obj
+        for idx, item in enumerate(list.__iter__(self)):
+            if isinstance(item, dict):
+                list.__setitem__(self, idx, hydrate(item))
+
+    def __iter__(self):
+        self._materialize()
+        return super(LazyModelList, self).__iter__()
+
+    def __reversed__(self):
+        self._materialize()
+        return super(LazyModelList, self).__reversed__()
+
+    def __getitem__(self, item):
+        self._materialize()
+        return super(LazyModelList, self).__getitem__(item)
+
+    def __contains__(self, item):
+        self._materialize()
+        return super(LazyModelList, self).__contains__(item)
+
+    def __eq__(self, other):
+        self._materialize()
+        return super(LazyModelList, self).__eq__(other)
+
+    def __repr__(self):
+        self._materialize()
+        return super(LazyModelList, self).__repr__()
+
+    def __copy__(self):
+        self._materialize()
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.__copy__(), memo)
+
+    def copy(self):
+        return self.__copy__()
+
+    def index(self, *args):
+        self._materialize()
+        return super(LazyModelList, self).index(*args)
+
+    def count(self, value):
+        self._materialize()
+        return super(LazyModelList, self).count(value)
+
+    def pop(self, *args):
+        self._materialize()
+        return super(LazyModelList, self).pop(*args)
+
+    def remove(self, value):
+        self._materialize()
+        return super(LazyModelList, self).remove(value)
+
+    def sort(self, *args, **kwargs):
+        self._materialize()
+        return super(LazyModelList, self).sort(*args, **kwargs)
+
+
+@dataclass
+class FlushResult:
+    """
+    The acknowledged result of one bulk write sent by :class:`WriteBehindFlusher`.
+    """
+
+    collection: str  # the full name of the collection, "db.collection"
+    num_ops: int  # the number of operations in the bulk write
+    inserted: int = 0
+    matched: int = 0
+    modified: int = 0
+    upserted: int = 0
+    failed_ops: List[Tuple[Any, dict]] = dc_field(default_factory=list)  # [(operation, error_detail), ]
+
+    @property
+    def ok(self):
+        return not self.failed_ops
+
+
+class BatchWriteError(Exception):
+    """
+    Raised by :meth:`WriteBehindFlusher.flush` if some operations are failed to write.
+    """
+
+    def __init__(self, results: List[FlushResult]):
+        self.results = results
+        self.failed_ops = [f for r in results for f in r.failed_ops]
+        super(BatchWriteError, self).__init__(f"{len(self.failed_ops)} operation(s) failed to write")
+
+
+class _FlushBuffer:
+    """
+    The pending operations of one collection, only accessed by the writer thread.
+    """
+
+    def __init__(self, collection: Collection, batch_size: int):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.ops = []
+        self.keys = set()  # filters of pending operations, an operation on a pending document flushes the buffer first
+        self.created = time.monotonic()
+
+
+class WriteBehindFlusher:
+    """
+    | A write-behind engine for batch writes.
+    | Producers submit write operations and return immediately,
+      a dedicated writer thread groups them by collection and sends them by ``bulk_write(ordered=False)``.
+    | A collection buffer is flushed when it holds batch_size operations, or when its oldest operation is max_age old.
+    | The submit queue is bounded, so producers are blocked if the writer falls behind.
+    | Every bulk write is acknowledged, its result is kept until it is popped by :meth:`flush` or :meth:`pop_results`.
+
+    Example::
+
+        flusher = WriteBehindFlusher(batch_size=200, max_age=1.0)
+        for doc in docs:
+            flusher.submit(collection, UpdateOne({"_id": doc["_id"]}, {"$set": doc}, upsert=True))
+        results = flusher.flush(collection)
+    """
+
+    _OP = 0
+    _FLUSH = 1
+    _STOP = 2
+
+    def __init__(self,
+                 batch_size: int = 20,
+                 max_age: float = 1.0,
+                 max_pending: int = 10000,
+                 write_concern: WriteConcern = None,
+                 on_flush: Callable[[FlushResult], Any] = None,
+                 name: str = "write-behind"):
+        """
+        :param batch_size: the default number of operations sent in one bulk write.
+        :param max_age: the max seconds an operation waits in the buffer before it is sent.
+        :param max_pending: the max number of submitted operations waiting for the writer thread.
+        :param write_concern: the write concern of bulk writes, default to acknowledged writes.
+        :param on_flush: an optional callback called by the writer thread with every FlushResult.
+        :param name: the name of the writer thread.
+        """
+
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.write_concern = write_concern or WriteConcern(w=1)
+        self.on_flush = on_flush
+        self.name = name
+        self.pid = os.getpid()
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._buffers: Dict[str, _FlushBuffer] = {}
+        self._results: Dict[str, List[FlushResult]] = {}
+        self._results_lock = Lock()
+        self._thread_lock = Lock()
+        self._thread = None
+        self._error = None  # the error killed the writer thread
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._error = None
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, collection: Collection, op, batch_size: int = None):
+        """
+        Submit a write operation, blocking if there are already max_pending operations waiting.
+
+        :param collection: the target collection.
+        :param op: a pymongo write operation, such as UpdateOne or InsertOne.
+        :param batch_size: the batch size of the target collection, default to self.batch_size.
+        """
+
+        self._ensure_thread()
+        self._queue.put((self._OP, collection, op, batch_size or self.batch_size))
+
+    def flush(self, collection: Collection = None, raise_on_error: bool = False) -> List[FlushResult]:
+        """
+        Send all pending operations and wait until they are acknowledged.
+
+        :param collection: only flush this collection, default to all collections.
+        :param raise_on_error: raise BatchWriteError if any operation failed.
+        :return: the results of this collection(or all collections) not popped yet.
+        :raises RuntimeError: the writer thread is dead, so the pending operations are never written.
+        """
+
+        name = None if collection is None else collection.full_name
+        thread = self._thread
+        done = threading.Event()
+        if thread is not None and thread.is_alive():
+            self._queue.put((self._FLUSH, name, done, None))
+            self._wait_thread(thread, done)
+        if thread is not None and not done.is_set() and (self._error is not None or not self._queue.empty()):
+            msg = f"writer thread {self.name} is not alive, pending operations are not written"
+            raise RuntimeError(msg) from self._error
+
+        results = self.pop_results(collection)
+        if raise_on_error and any(not r.ok for r in results):
+            raise BatchWriteError(results)
+        return results
+
+    def pop_results(self, collection: Collection = None) -> List[FlushResult]:
+        """
+        Pop the results of this collection(or all collections) acknowledged so far.
+        """
+
+        with self._results_lock:
+            if collection is None:
+                results = [r for rs in self._results.values() for r in rs]
+                self._results.clear()
+            else:
+                results = self._results.pop(collection.full_name, [])
+        return results
+
+    def close(self):
+        """
+        Flush all pending operations and stop the writer thread.
+        """
+
+        if self._thread is None or not self._thread.is_alive():
+            return
+
+        thread = self._thread
+        done = threading.Event()
+        self._queue.put((self._STOP, None, done, None))
+        self._wait_thread(thread, done)
+        thread.join()
+
+    @staticmethod
+    def _wait_thread(thread: threading.Thread, done: threading.Event):
+        """
+        Wait until the writer thread sets done, or it is dead.
+        """
+
+        while not done.wait(timeout=1.0) and thread.is_alive():
+            pass
+
+    def _next_timeout(self):
+        if not self._buffers:
+            return None
+        oldest = min(b.created for b in self._buffers.values())
+        return max(0.0, oldest + self.max_age - time.monotonic())
+
+    def _run(self):
+        try:
+            self._loop()
+        except Exception as err:
+            logger.exception(f"writer thread {self.name} of write-behind flusher died, err={str(err)}")
+            self._error = err
+
+    def _loop(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._next_timeout())
+            except queue.Empty:
+                item = None
+
+            if item is not None:
+                kind, target, payload, batch_size = item
+                if kind == self._OP:
+                    self._buffer_op(target, payload, batch_size)
+                elif kind == self._FLUSH:
+                    try:
+                        for name in list(self._buffers.keys()):
+                            if target is None or target == name:
+                                self._flush_buffer(name)
+                    finally:
+                        payload.set()
+                elif kind == self._STOP:
+                    try:
+                        for name in list(self._buffers.keys()):
+                            self._flush_buffer(name)
+                    finally:
+                        payload.set()
+                    return
+
+            now = time.monotonic()
+            for name, buffer in list(self._buffers.items()):
+                if now - buffer.created >= self.max_age:
+                    self._flush_buffer(name)
+
+    def _buffer_op(self, collection: Collection, op, batch_size: int):
+        name = collection.full_name
+        buffer = self._buffers.get(name, None)
+
+        # operations in a bulk write are unordered,
+        # so flush the buffer first if it is already holding an operation on the same document.
+        key = repr(getattr(op, "_filter", None) or getattr(op, "_doc", {}).get("_id", id(op)))
+        if buffer is not None and key in buffer.keys:
+            self._flush_buffer(name)
+            buffer = None
+
+        if buffer is None:
+            buffer = self._buffers[name] = _FlushBuffer(collection, batch_size)
+        buffer.batch_size = batch_size
+        buffer.ops.append(op)
+        buffer.keys.add(key)
+
+        if len(buffer.ops) >= buffer.batch_size:
+            self._flush_buffer(name)
+
+    def _flush_buffer(self, name: str):
+        buffer = self._buffers.pop(name)
+        ops = buffer.ops
+        if not ops:
+            return
+
+        result = FlushResult(collection=name, num_ops=len(ops))
+        co = buffer.collection.with_options(write_concern=self.write_concern)
+        try:
+            ret = co.bulk_write(ops, ordered=False)
+        except BulkWriteError as err:
+            details = err.details
+            result.inserted = details.get("nInserted", 0)
+            result.matched = details.get("nMatched", 0)
+            result.modified = details.get("nModified", 0)
+            result.upserted = details.get("nUpserted", 0)
+            result.failed_ops = [(ops[e["index"]], e) for e in details.get("writeErrors", [])]
+            for err_detail in details.get("writeConcernErrors", []):
+                result.failed_ops.append((None, err_detail))
+        except Exception as err:  # PyMongoError, or any error of an invalid operation
+            result.failed_ops = [(op, {"errmsg": str(err)}) for op in ops]
+        else:
+            if ret.acknowledged:
+                result.inserted = ret.inserted_count
+                result.matched = ret.matched_count
+                result.modified = ret.modified_count
+                result.upserted = ret.upserted_count
+
+        if result.failed_ops:
+            logger.warning(f"{len(result.failed_ops)} of {result.num_ops} operation(s) failed to write to {name}, "
+                           f"first error: {result.failed_ops[0][1]}")
+
+        with self._results_lock:
+            self._results.setdefault(name, []).append(result)
+
+        if self.on_flush is not None:
+            try:
+                self.on_flush(result)
+            except Exception as err:
+                logger.warning(f"on_flush callback of write-behind flusher failed, err={str(err)}")
+
+
+def get_write_behind() -> WriteBehindFlusher:
+    """
+    | Get the default write-behind flusher of current process, which serves BaseModel.batch_save/batch_update.
+    | A new flusher is created after fork, as the writer thread does not survive in the child process.
+    """
+
+    global _write_behind
+
+    pid = os.getpid()
+    flusher = _write_behind
+    if flusher is None or flusher.pid != pid:
+        with _write_behind_lock:
+            flusher = _write_behind
+            if flusher is None or flusher.pid != pid:
+                flusher = WriteBehindFlusher(name="model-write-behind")
+                atexit.register(flusher.close)
+                _write_behind = flusher
+    return flusher
+
+
+@dataclass
+class BatchWriterStats:
+    """
+    The counters of a :class:`BatchWriter`.
+    """
+
+    submitted: int = 0  # the number of submitted operations
+    flushes: int = 0  # the number of bulk writes sent
+    inserted: int = 0
+    matched: int = 0
+    modified: int = 0
+    upserted: int = 0
+    failed: int = 0  # the number of failed operations
+    cost: float = 0.0  # the seconds from the first submit to the last flush
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class BatchWriter:
+    """
+    | A batch writer of model objects, which owns its write-behind flusher, flush policy and stats.
+    | Unlike the default flusher shared by the whole process,
+      flushing or closing a batch writer never waits for or sends the operations of another job.
+      So several importers or processors can write the same models concurrently in one process.
+    | Exiting the context flushes all pending operations, stops the writer thread,
+      and drops the cached lookups of every written model.
+
+    Example::
+
+        with BatchWriter(batch_size=200) as writer:
+            for image in images:
+                image.batch_save(writer=writer)
+            Label.batch_update({"id": label_id}, {"name": "gt"}, writer=writer)
+        print(writer.stats)
+    """
+
+    def __init__(self,
+                 batch_size: int = 20,
+                 max_age: float = 1.0,
+                 max_pending: int = 10000,
+                 raise_on_error: bool = False,
+                 name: str = "batch-writer"):
+        """
+        :param batch_size: the default number of operations sent in one bulk write.
+        :param max_age: the max seconds an operation waits in the buffer before it is sent.
+        :param max_pending: the max number of submitted operations waiting for the writer thread.
+        :param raise_on_error: raise BatchWriteError on flush or exit if any operation failed.
+        :param name: the name of the writer thread.
+        """
+
+        self.batch_size = batch_size
+        self.raise_on_error = raise_on_error
+        self.stats = BatchWriterStats()
+
+        self._flusher = WriteBehindFlusher(batch_size=batch_size,
+                                           max_age=max_age,
+                                           max_pending=max_pending,
+                                           on_flush=self._on_flush,
+                                           name=name)
+        self._models = {}  # the written models of every collection, {collection_name: model_class}
+        self._lock = Lock()
+        self._start = None
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # operations submitted before an exception are still written, but their errors don't hide the exception
+        self.close(raise_on_error=self.raise_on_error and exc_type is None)
+
+    def _on_flush(self, result: FlushResult):
+        with self._lock:
+            stats = self.stats
+            stats.flushes += 1
+            stats.inserted += result.inserted
+            stats.matched += result.matched
+            stats.modified += result.modified
+            stats.upserted += result.upserted
+            stats.failed += len(result.failed_ops)
+            stats.cost = time.monotonic() - self._start
+
+    def submit(self, model, collection: Collection, op, batch_size: int = None):
+        """
+        Submit a write operation of a model.
+
+        :param model: the model class of the target collection, its cache is dropped when the operation is flushed.
+        :param collection: the target collection.
+        :param op: a pymongo write operation, such as UpdateOne or InsertOne.
+        :param batch_size: the batch size of the target collection, default to self.batch_size.
+        """
+
+        if self._closed:
+            raise RuntimeError("can't submit operations to a closed batch writer")
+
+        with self._lock:
+            if self._start is None:
+                self._start = time.monotonic()
+            self.stats.submitted += 1
+            self._models[collection.full_name] = model
+        self._flusher.submit(collection, op, batch_size=batch_size or self.batch_size)
+
+    def save(self, obj: "BaseModel", set_on_insert: Dict = None, batch_size: int = None):
+        """
+        Batch save a model object, the same as obj.batch_save(writer=self).
+        """
+
+        obj.batch_save(batch_size=batch_size, set_on_insert=set_on_insert, writer=self)
+
+    def update(self, model, filters: dict, set_data: dict = None, unset_data: dict = None, batch_size: int = None):
+        """
+        Batch update a model, the same as model.batch_update(..., writer=self).
+        """
+
+        model.batch_update(filters, set_data, unset_data, batch_size=batch_size, writer=self)
+
+    def flush(self, model=None, raise_on_error: bool = None) -> List[FlushResult]:
+        """
+        Send the pending operations of this writer and wait until they are acknowledged.
+
+        :param model: only flush the collection of this model, default to all collections of this writer.
+        :param raise_on_error: raise BatchWriteError if any operation failed, default to self.raise_on_error.
+        :return: the results of bulk writes not popped yet.
+        """
+
+        co = None if model is None else model.get_collection()
+        results = self._flusher.flush(co)
+        self._finish(results, raise_on_error)
+        return results
+
+    def close(self, raise_on_error: bool = None) -> List[FlushResult]:
+        """
+        Flush all pending operations and stop the writer thread.
+        """
+
+        if self._closed:
+            return []
+
+        self._closed = True
+        self._flusher.close()
+        results = self._flusher.pop_results()
+        self._finish(results, raise_on_error)
+        return results
+
+    def _finish(self, results: List[FlushResult], raise_on_error: bool = None):
+        with self._lock:
+            models = [self._models[r.collection] for r in results if r.collection in self._models]
+        for model in {id(m): m for m in models}.values():
+            model.invalidate_cache()  # drop lookups cached while the operations were pending
+
+        num_failed = sum(len(r.failed_ops) for r in results)
+        if num_failed:
+            logger.warning(f"{self._flusher.name} finished batch writes with {num_failed} failed operation(s)")
+
+        raise_on_error = self.raise_on_error if raise_on_error is None else raise_on_error
+        if raise_on_error and num_failed:
+            raise BatchWriteError(results)
+
+
+def ensure_collection_indexes(collection: Collection, indexes: List[IndexModel]) -> List[str]:
+    """
+    | Create the declared indexes missing from a collection, and return the names of the created indexes.
+    | Indexes are compared by their keys, so an existing index of the same keys is never rebuilt.
+    | This is idempotent and safe to run concurrently, mongodb ignores creating an identical index.
+    """
+
+    if not indexes:
+        return []
+
+    def _normalize(keys):
+        # mongodb may return index directions as float, such as 1.0
+        return tuple((f, int(d) if isinstance(d, float) else d) for f, d in keys)
+
+    existing = {}  # {index_keys: index_name}
+    for name, info in collection.index_information().items():
+        existing[_normalize(info["key"])] = name
+
+    missing = []
+    for index in indexes:
+        keys = _normalize(index.document["key"].items())
+        if keys in existing:
+            if existing[keys] != index.document["name"]:
+                logger.debug(f"index {keys} of {collection.name} exists as [{existing[keys]}], skip it")
+            continue
+        missing.append(index)
+
+    if not missing:
+        return []
+
+    names = [i.document["name"] for i in missing]
+    try:
+        collection.create_indexes(missing)
+    except OperationFailure as err:
+        logger.warning(f"failed to create indexes {names} on {collection.name}, err={str(err)}")
+        return []
+
+    logger.info(f"created indexes {names} on {collection.name}")
+    return names
+
+
+def _get_doc_value(doc: dict, field: str):
+    """
+    Get the value of a dotted field path from a mongodb document, None if it is missing.
+    """
+
+    value = doc
+    for key in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key, None)
+    return value
+
+
+def _encode_cursor(sort: List[Tuple[str, int]], values: list) -> str:
+    """
+    Encode the sort key of the last document of a page to an opaque cursor.
+    """
+
+    data = {"s": [list(s) for s in sort], "v": values}
+    data = json.dumps(data, separators=(",", ":")).encode("utf8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(sort: List[Tuple[str, int]], cursor: str) -> list:
+    """
+    Decode a cursor made by _encode_cursor, and check it is made by the same sort conditions.
+    """
+
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(data)
+        cursor_sort, values = data["s"], data["v"]
+    except Exception as err:
+        raise InvalidCursor(f"invalid cursor[{cursor}], err={str(err)}")
+
+    if cursor_sort != [list(s) for s in sort] or len(values) != len(sort):
+        raise InvalidCursor(f"cursor[{cursor}] is not made by sort conditions {sort}")
+    return values
+
+
+def _make_seek_filters(sort: List[Tuple[str, int]], values: list) -> dict:
+    """
+    | Make the filters to match the documents after the sort key values, in the sort order.
+    | For sort [(a, 1), (b, -1)] and values [x, y], this is: a > x or (a == x and b < y).
+    | Missing fields are sorted as null, the smallest value, by mongodb.
+    """
+
+    branches = []
+    for i, (field, order) in enumerate(sort):
+        value = values[i]
+        conditions = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        if order == 1 and value is None:
+            conditions[field] = {"$ne": None}
+        elif order == 1:
+            conditions[field] = {"$gt": value}
+        elif value is None:
+            continue  # nothing is smaller than null
+        else:
+            conditions = {"$and": [conditions, {"$or": [{field: {"$lt": value}}, {field: None}]}]}
+        branches.append(conditions)
+
+    if not branches:
+        return {"_id": {"$exists": False}}  # match nothing
+    return {"$or": branches}
+
+
 class BaseModel(_Base):
     """
     | Base model for all models.
@@ -46,7 +729,21 @@ class BaseModel(_Base):
         underscore_attrs_are_private = True
 
     db: ClassVar = MongoDB
-    cache: ClassVar = {}
+
+    # The indexes of the model collection, created by :meth:`ensure_indexes`.
+    indexes: ClassVar[List[IndexModel]] = []
+
+    # Lookups of find_one/find_many are cached in memory for cache_ttl seconds, 0 to disable the cache.
+    # Any write through this model invalidates the cache, in current process and in other processes.
+    # This is only suitable for small collections that are read much more than written.
+    cache_ttl: ClassVar[float] = 0
+    cache_size: ClassVar[int] = 1024
+    cache_max_docs: ClassVar[int] = 1000  # find_many results larger than this are not cached
+
+    # Documents read back from mongodb are written by ourselves, so they can be trusted.
+    # If this is True, they are hydrated without validation, see :meth:`from_trusted_dict`.
+    # This can also be switched on or off for a single query by the 'trusted' argument of find_many/find_one.
+    trusted_hydration: ClassVar[bool] = False
 
     @classmethod
     @abc.abstractmethod
@@ -57,6 +754,14 @@ class BaseModel(_Base):
 
         raise NotImplementedError
 
+    @classmethod
+    def ensure_indexes(cls) -> List[str]:
+        """
+        Create the declared indexes missing from the model collection, see :func:`ensure_collection_indexes`.
+        """
+
+        return ensure_collection_indexes(cls.get_collection(), cls.indexes)
+
     @classmethod
     def from_dict(cls, data: dict):
         """
@@ -75,6 +780,81 @@ class BaseModel(_Base):
         exclude = set(exclude) if exclude else None
         return self.dict(include=include, exclude=exclude)
 
+    @classmethod
+    def _get_trusted_fields(cls):
+        """
+        Get the fields that contain nested models, {field_name: (lazy, model)}.
+        List fields of models are hydrated lazily, other fields containing models are validated as usual.
+        """
+
+        fields = _trusted_fields.get(cls, None)
+        if fields is None:
+            fields = {}
+            for name, field in cls.__fields__.items():
+                if not _has_nested_model(field):
+                    continue
+                lazy = field.shape == SHAPE_LIST and isinstance(field.type_, type) and issubclass(field.type_, _Base)
+                fields[name] = (lazy, field.type_ if lazy else field)
+            _trusted_fields[cls] = fields
+        return fields
+
+    @classmethod
+    def from_trusted_dict(cls, data: dict):
+        """
+        | Convert a trusted python dict, such as a document read back from mongodb, to a model object.
+        | This skips the validation of :meth:`from_dict`, and nested model lists are hydrated lazily on first access.
+        | Unknown keys are dropped, missing keys are set to the field defaults.
+        """
+
+        fields = cls.__fields__
+        values = {k: v for k, v in data.items() if k in fields}
+        for name, (lazy, model) in cls._get_trusted_fields().items():
+            value = values.get(name, None)
+            if value is None:
+                continue
+            if lazy is True:
+                values[name] = LazyModelList(value, model=model)
+            else:
+                value, errors = model.validate(value, values, loc=name, cls=cls)
+                if errors:
+                    raise ValueError(f"failed to hydrate field[{name}] of {cls.__name__}: {errors}")
+                values[name] = value
+
+        return cls.construct(**values)
+
+    @classmethod
+    def get_cache(cls) -> ModelCache:
+        """
+        Get the read-through cache of this model, or None if the cache is disabled.
+        """
+
+        if not cls.cache_ttl:
+            return None
+        return get_model_cache(cls.get_cls_id(), max_size=cls.cache_size, ttl=cls.cache_ttl)
+
+    @classmethod
+    def invalidate_cache(cls, broadcast: bool = True):
+        """
+        Drop all cached lookups of this model.
+
+        :param broadcast: also drop the cached lookups in other processes.
+        """
+
+        cache = cls.get_cache()
+        if cache is not None:
+            cache.invalidate(broadcast=broadcast)
+
+    @classmethod
+    def cache_stats(cls) -> dict:
+        """
+        Get the hit/miss counters of the read-through cache of this model.
+        """
+
+        cache = cls.get_cache()
+        if cache is None:
+            return {}
+        return cache.stats()
+
     @classmethod
     def convert_id_for_python(cls, data: dict):
         """
@@ -95,12 +875,18 @@ class BaseModel(_Base):
             data["_id"] = data.pop("id")
 
     @classmethod
-    def _from_mongo_doc(cls, data: dict):
+    def _from_mongo_doc(cls, data: dict, trusted: bool = None):
         """
         Convert a mongo document to a model object.
+
+        :param data: the mongo document.
+        :param trusted: hydrate the document without validation, default to cls.trusted_hydration.
         """
 
         cls.convert_id_for_python(data)
+        trusted = cls.trusted_hydration if trusted is None else trusted
+        if trusted is True:
+            return cls.from_trusted_dict(data)
         return cls.from_dict(data)
 
     @classmethod
@@ -110,7 +896,8 @@ class BaseModel(_Base):
                   sort: List[Tuple[str, int]] = None,
                   skip: int = None,
                   size: int = None,
-                  to_dict: bool = False):
+                  to_dict: bool = False,
+                  trusted: bool = None):
         """
         Find objects matching the filters, retuning an iterable generator.
 
@@ -125,12 +912,44 @@ class BaseModel(_Base):
         :param size: the number of documents to return.
         :param to_dict: If true, python dicts will be yield instead of model objects.
                         The performance is better if we are returning a large number of objects in a json response.
+        :param trusted: If true, model objects are built without validation, see :meth:`from_trusted_dict`.
+                        Default to cls.trusted_hydration.
         """
 
         cls.convert_id_for_mongo(filters)
         co = cls.get_collection()
-        cursor = co.find(filters, includes)
 
+        cache = cls.get_cache()
+        if cache is not None:
+            cursor = cls._find_many_cached(cache, filters, includes, sort, skip, size)
+        else:
+            cursor = co.find(filters, includes)
+            if sort:
+                cursor = cursor.sort(sort)
+            if skip is not None:
+                cursor = cursor.skip(skip)
+            if size is not None:
+                cursor = cursor.limit(size)
+
+        for item in cursor:
+            if to_dict is True:
+                yield cls.convert_id_for_python(item)
+            else:
+                yield cls._from_mongo_doc(item, trusted=trusted)
+
+    @classmethod
+    def _find_many_cached(cls, cache: ModelCache, filters: dict, includes: dict, sort, skip, size) -> list:
+        """
+        Find documents of find_many through the cache.
+        """
+
+        key = cache.make_key("find_many", filters, includes, sort, skip, size)
+        found, docs = cache.get(key)
+        if found is True:
+            return docs
+
+        generation = cache.generation
+        cursor = cls.get_collection().find(filters, includes)
         if sort:
             cursor = cursor.sort(sort)
         if skip is not None:
@@ -138,25 +957,89 @@ class BaseModel(_Base):
         if size is not None:
             cursor = cursor.limit(size)
 
-        for item in cursor:
-            if to_dict is True:
-                yield cls.convert_id_for_python(item)
-            else:
-                yield cls._from_mongo_doc(item)
+        docs = list(cursor)
+        if len(docs) <= cls.cache_max_docs:
+            cache.set(key, docs, generation)
+        return docs
+
+    @classmethod
+    def find_page(cls,
+                  filters: dict,
+                  sort: List[Tuple[str, int]],
+                  cursor: str = None,
+                  size: int = 100,
+                  skip: int = None,
+                  includes: dict = None,
+                  to_dict: bool = False,
+                  trusted: bool = None) -> Tuple[list, Optional[str]]:
+        """
+        | Find a page of objects by keyset pagination.
+        | Instead of skipping all previous documents, the next page is located by the sort key of the last document,
+          so every page costs the same regardless of the page depth, as long as there is an index for the sort.
+
+        :param filters: the filters to match, the same as find_many.
+        :param sort: a list of sort conditions, the same as find_many.
+                     The last sort field must be unique, such as "idx" or "_id", or the page boundary is ambiguous.
+        :param cursor: the cursor returned by previous page, None for the first page.
+        :param size: the number of objects to return.
+        :param skip: the number of documents to skip, only used when cursor is None.
+                     This allows jumping to a page by page_num, and then continuing with cursors.
+        :param includes: the fields to include in the result, sort fields are always included.
+        :param to_dict: If true, python dicts will be returned instead of model objects.
+        :param trusted: If true, model objects are built without validation, see :meth:`from_trusted_dict`.
+        :return: a tuple of (objects, next_cursor), next_cursor is None if there are no more objects.
+        """
+
+        sort = [(field, order) for field, order in sort]
+        cls.convert_id_for_mongo(filters)
+        if cursor:
+            values = _decode_cursor(sort, cursor)
+            filters = {"$and": [filters, _make_seek_filters(sort, values)]}
+            skip = None
+
+        if includes:
+            includes = {**includes, **{field: 1 for field, _ in sort}}
+
+        # fetch one more document to know if there is a next page
+        docs = list(cls.find_many(filters, includes, sort=sort, skip=skip, size=size + 1, to_dict=True))
+        next_cursor = None
+        if len(docs) > size:
+            docs = docs[:size]
+            last = {"_id": docs[-1].get("id", None), **docs[-1]}
+            next_cursor = _encode_cursor(sort, [_get_doc_value(last, field) for field, _ in sort])
+
+        if to_dict is False:
+            docs = [cls._from_mongo_doc(d, trusted=trusted) for d in docs]
+        return docs, next_cursor
 
     @classmethod
-    def find_one(cls, filters: dict):
+    def find_one(cls, filters: dict, trusted: bool = None):
         """
         Find one object matching the filters.
+
+        :param filters: the filters to match.
+        :param trusted: If true, the model object is built without validation, see :meth:`from_trusted_dict`.
+                        Default to cls.trusted_hydration.
         """
 
         cls.convert_id_for_mongo(filters)
         co = cls.get_collection()
-        instance = co.find_one(filters)
+
+        cache = cls.get_cache()
+        if cache is None:
+            instance = co.find_one(filters)
+        else:
+            key = cache.make_key("find_one", filters)
+            found, instance = cache.get(key)
+            if found is False:
+                generation = cache.generation
+                instance = co.find_one(filters)
+                cache.set(key, instance, generation)
+
         if instance is None:
             return None
 
-        return cls._from_mongo_doc(instance)
+        return cls._from_mongo_doc(instance, trusted=trusted)
 
     @classmethod
     def count_num(cls, filters: dict):
@@ -180,7 +1063,9 @@ class BaseModel(_Base):
         cls.convert_id_for_mongo(filters)
         set_data = set_data or dict()
         unset_data = unset_data or dict()
-        return cls.get_collection().update_one(filters, {"$set": set_data, "$unset": unset_data})
+        result = cls.get_collection().update_one(filters, {"$set": set_data, "$unset": unset_data})
+        cls.invalidate_cache()
+        return result
 
     @classmethod
     def update_many(cls, filters: dict, set_data: dict = None, unset_data: dict = None):
@@ -191,33 +1076,29 @@ class BaseModel(_Base):
         cls.convert_id_for_mongo(filters)
         set_data = set_data or dict()
         unset_data = unset_data or dict()
-        return cls.get_collection().update_many(filters, {"$set": set_data, "$unset": unset_data})
+        result = cls.get_collection().update_many(filters, {"$set": set_data, "$unset": unset_data})
+        cls.invalidate_cache()
+        return result
 
     @classmethod
-    def _get_batch_op_lock(cls):
-        """
-        Get the batch operation lock for current thread.
-        """
-
-        cls_id = cls.get_cls_id()
-
-        if _batch_lock.get(cls_id, None) is None:
-            with _lock_lock:
-                _batch_lock[cls_id] = Lock()
-
-        op_lock = _batch_lock[cls_id]
-        return op_lock
-
-    @classmethod
-    def batch_update(cls, filters: dict, set_data: dict = None, unset_data: dict = None, batch_size: int = 20):
+    def batch_update(cls,
+                     filters: dict,
+                     set_data: dict = None,
+                     unset_data: dict = None,
+                     batch_size: int = None,
+                     writer: "BatchWriter" = None):
         """
         This is almost the same as update_one, except that it will batch the update operations.
         The performance is better if we are updating a large number of objects.
+        The operations are written in the background by the write-behind flusher, see :func:`get_write_behind`.
 
         :param filters: the filters to match.
         :param set_data: the fields to set.
         :param unset_data: the fields to delete.
-        :param batch_size: the batch size. We will only send the update operations to mongodb when the batch is full.
+        :param batch_size: the batch size. We will send the update operations to mongodb when the batch is full,
+                           or when the oldest operation has waited long enough. Default to the batch size of the writer.
+        :param writer: write by this batch writer instead of the default flusher of the process,
+                       then flush it by writer.flush instead of finish_batch_update.
         """
 
         cls.convert_id_for_mongo(filters)
@@ -229,39 +1110,45 @@ class BaseModel(_Base):
         co = cls.get_collection()
         if co is None:
             return None
-        wc = WriteConcern(w=0)
-        co = co.with_options(write_concern=wc)
 
         op = UpdateOne(filters, {"$set": set_data, "$unset": unset_data})
+        cls._submit_batch(co, op, batch_size, writer)
 
-        # make sure only one thread is batch updating at the same time.
-        # so the update order will be preserved.
-        cls_id = cls.get_cls_id()
-        op_lock = cls._get_batch_op_lock()
-        with op_lock:
-            queue = _batch_update_queue.setdefault(cls_id, [])
-            queue.append(op)
-            if len(queue) >= batch_size:  # the batch queue is full, send all the update operations to mongodb.
-                co.bulk_write(queue)
-                _batch_update_queue[cls_id] = []
+    @classmethod
+    def _submit_batch(cls, co: Collection, op, batch_size: int, writer: "BatchWriter" = None):
+        if writer is not None:
+            writer.submit(cls, co, op, batch_size=batch_size)
+        else:
+            get_write_behind().submit(co, op, batch_size=batch_size)
+        cls.invalidate_cache(broadcast=False)  # other processes are notified when the batch is finished
 
     @classmethod
-    def finish_batch_update(cls):
+    def _finish_batch(cls) -> List[FlushResult]:
+        """
+        Wait until all batched operations of this model are written, and return their results.
+        """
+
+        co = cls.get_collection()
+        if co is None:
+            return []
+
+        results = get_write_behind().flush(co)
+        cls.invalidate_cache()  # drop lookups cached while the operations were pending
+        num_failed = sum(len(r.failed_ops) for r in results)
+        if num_failed:
+            logger.warning(f"{cls.get_cls_id()} finished batch writes with {num_failed} failed operation(s)")
+        return results
+
+    @classmethod
+    def finish_batch_update(cls) -> List[FlushResult]:
         """
         Send all the update operations left in batch queue to mongodb.
         This must be called after all the batch_update calls.
+
+        :return: the results of every bulk write since the last finish call, including the failed operations.
         """
 
-        cls_id = cls.get_cls_id()
-        op_lock = cls._get_batch_op_lock()
-        with op_lock:
-            co = cls.get_collection()
-            wc = WriteConcern(w=0)
-            co = co.with_options(write_concern=wc)
-            queue = _batch_update_queue.setdefault(cls_id, [])
-            if queue:
-                co.bulk_write(queue)
-                _batch_update_queue[cls_id] = []
+        return cls._finish_batch()
 
     @classmethod
     def aggregate(cls, pipeline: List[Dict]):
@@ -288,6 +1175,7 @@ class BaseModel(_Base):
         data = self.to_dict()
         data.pop("id", None)
         co.update_one({"_id": _id}, {"$set": data}, upsert=True)
+        self.invalidate_cache()
 
         if refresh is True:
             new_self = co.find_one({"_id": _id})
@@ -295,19 +1183,21 @@ class BaseModel(_Base):
             self.__dict__.update(new_self)
         return self
 
-    def batch_save(self, batch_size: int = 20, set_on_insert: Dict = None):
+    def batch_save(self, batch_size: int = None, set_on_insert: Dict = None, writer: "BatchWriter" = None):
         """
         The same as self.save function, but the performance is better if we are saving a large number of objects.
+        The operations are written in the background by the write-behind flusher, see :func:`get_write_behind`.
 
-        :param batch_size: the batch size. We will only write to mongodb when the batch is full.
+        :param batch_size: the batch size. We will write to mongodb when the batch is full,
+                           or when the oldest operation has waited long enough. Default to the batch size of the writer.
         :param set_on_insert: the fields only need to be set when we are inserting a new object.
+        :param writer: write by this batch writer instead of the default flusher of the process,
+                       then flush it by writer.flush instead of finish_batch_save.
         """
         cls = self.__class__
         co = cls.get_collection()
         if co is None:
             return None
-        wc = WriteConcern(w=0)
-        co = co.with_options(write_concern=wc)
 
         _id = self.__dict__.get("id", None)
         if _id is None:
@@ -322,36 +1212,17 @@ class BaseModel(_Base):
             data.pop(key, None)
 
         op = UpdateOne({"_id": _id}, {"$set": data, "$setOnInsert": set_on_insert}, upsert=True, )
-
-        cls_id = cls.get_cls_id()
-        op_lock = cls._get_batch_op_lock()
-        with op_lock:
-            queue = _batch_save_queue.setdefault(cls_id, [])
-            queue.append(op)
-            if len(queue) >= batch_size:
-                co.bulk_write(queue)
-                _batch_save_queue[cls_id] = []
+        cls._submit_batch(co, op, batch_size, writer)
 
     @classmethod
-    def finish_batch_save(cls):
+    def finish_batch_save(cls) -> List[FlushResult]:
         """
         This must be called after all the batch_save calls.
-        """
 
-        cls_id = cls.get_cls_id()
-        if _batch_lock.get(cls_id, None) is None:
-            with _lock_lock:
-                _batch_lock[cls_id] = Lock()
+        :return: the results of every bulk write since the last finish call, including the failed operations.
+        """
 
-        op_lock = _batch_lock[cls_id]
-        with op_lock:
-            co = cls.get_collection()
-            wc = WriteConcern(w=0)
-            co = co.with_options(write_concern=wc)
-            queue = _batch_save_queue.setdefault(cls_id, [])
-            if queue:
-                co.bulk_write(queue)
-                _batch_save_queue[cls_id] = []
+        return cls._finish_batch()
 
     def delete(self):
         """
@@ -366,7 +1237,9 @@ class BaseModel(_Base):
         if _id is None:
             return None
 
-        return co.delete_one({"_id": _id})
+        result = co.delete_one({"_id": _id})
+        self.invalidate_cache()
+        return result
 
     @classmethod
     def delete_many(cls, filters: dict):
@@ -375,7 +1248,9 @@ class BaseModel(_Base):
         """
 
         cls.convert_id_for_mongo(filters)
-        return cls.get_collection().delete_many(filters)
+        result = cls.get_collection().delete_many(filters)
+        cls.invalidate_cache()
+        return result
 
     @classmethod
     def get_cls_id(cls):
@@ -0,0 +1,210 @@
+"""
+deepdataspace.model._cache
+
+The read-through cache of model lookups.
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+from typing import Any
+from typing import Dict
+from typing import Tuple
+
+from deepdataspace.constants import RedisKey
+from deepdataspace.globals import Redis
+
+_caches: Dict[str, "ModelCache"] = {}  # all model caches of current process, {model_cls_id: model_cache}
+_caches_lock = Lock()
+_subscriber = None  # the pid and thread listening to invalidations from other processes, (pid, thread)
+_sender_id = None  # identifies invalidations sent by current process, (pid, sender_id)
+
+logger = logging.getLogger("model.cache")
+
+
+class ModelCache:
+    """
+    | A LRU + TTL cache of mongodb documents of one model.
+    | Documents are deep copied in and out, so callers are free to modify what they get.
+    | Any write to the model invalidates the whole cache of the model,
+      and the invalidation is broadcast to other processes by redis pub/sub.
+    """
+
+    def __init__(self, name: str, max_size: int = 1024, ttl: float = 60):
+        """
+        :param name: the cache name, usually the model cls_id.
+        :param max_size: the max number of cached lookups.
+        :param ttl: how many seconds a cached lookup lives.
+        """
+
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0  # increased on every invalidation
+
+        self._data = OrderedDict()  # {key: (expire_at, value)}
+        self._lock = Lock()
+
+    @staticmethod
+    def make_key(*args) -> str:
+        """
+        Make a cache key from lookup arguments, such as filters and sort conditions.
+        """
+
+        return json.dumps(args, sort_keys=True, default=str)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Get a cached value.
+
+        :return: a tuple of (found, value).
+        """
+
+        with self._lock:
+            item = self._data.get(key, None)
+            if item is not None and item[0] < time.monotonic():
+                self._data.pop(key)
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return False, None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            value = item[1]
+        return True, copy.deepcopy(value)
+
+    def set(self, key: str, value: Any, generation: int):
+        """
+        Cache a value.
+
+        :param key: the cache key.
+        :param value: the value to cache.
+        :param generation: the cache generation when the value is read from mongodb.
+            The value is dropped if the cache is invalidated after that, as it may be stale already.
+        """
+
+        value = copy.deepcopy(value)
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, broadcast: bool = True):
+        """
+        Drop all cached values.
+
+        :param broadcast: also invalidate caches of the same name in other processes.
+        """
+
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+        if broadcast:
+            _broadcast_invalidation(self.name)
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters.
+        """
+
+        with self._lock:
+            return {"name"  : self.name,
+                    "size"  : len(self._data),
+                    "hits"  : self.hits,
+                    "misses": self.misses}
+
+
+def _get_sender_id():
+    global _sender_id
+
+    pid = os.getpid()
+    if _sender_id is None or _sender_id[0] != pid:
+        _sender_id = (pid, uuid.uuid4().hex)
+    return _sender_id[1]
+
+
+def _broadcast_invalidation(name: str):
+    message = json.dumps({"name": name, "sender": _get_sender_id()})
+    try:
+        Redis.publish(RedisKey.ModelCacheInvalidation, message)
+    except Exception as err:
+        logger.warning(f"failed to broadcast invalidation of model cache[{name}], err={str(err)}")
+
+
+def _listen_invalidations():
+    """
+    Listen to invalidations from other processes, runs in a daemon thread.
+    """
+
+    while True:
+        try:
+            pubsub = Redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(RedisKey.ModelCacheInvalidation)
+
+            # invalidations may be missed while we are not subscribing
+            for cache in list(_caches.values()):
+                cache.invalidate(broadcast=False)
+
+            for message in pubsub.listen():
+                data = json.loads(message["data"])
+                if data.get("sender", None) == _get_sender_id():
+                    continue
+
+                cache = _caches.get(data.get("name", None), None)
+                if cache is not None:
+                    cache.invalidate(broadcast=False)
+        except Exception as err:
+            logger.warning(f"model cache invalidation listener is interrupted, err={str(err)}")
+            time.sleep(1)
+
+
+def _ensure_subscriber():
+    global _subscriber
+
+    pid = os.getpid()
+    if _subscriber is not None and _subscriber[0] == pid:
+        return
+
+    thread = threading.Thread(target=_listen_invalidations, name="model-cache-invalidation", daemon=True)
+    thread.start()
+    _subscriber = (pid, thread)
+
+
+def get_model_cache(name: str, max_size: int, ttl: float) -> ModelCache:
+    """
+    Get the cache of a model, create it if it does not exist.
+    """
+
+    cache = _caches.get(name, None)
+    if cache is not None and _subscriber is not None and _subscriber[0] == os.getpid():
+        return cache
+
+    with _caches_lock:
+        _ensure_subscriber()
+        cache = _caches.get(name, None)
+        if cache is None:
+            cache = _caches[name] = ModelCache(name, max_size=max_size, ttl=ttl)
+    return cache
+
+
+def get_all_cache_stats() -> Dict[str, dict]:
+    """
+    Get the counters of all model caches in current process.
+    """
+
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -4,6 +4,11 @@ deepdataspace.model.category
 The category model.
 """
 
+from typing import ClassVar
+from typing import List
+
+from pymongo import IndexModel
+
 from deepdataspace.model._base import BaseModel
 
 
@@ -28,6 +33,11 @@ class Category(BaseModel):
         """
         return cls.db["categories"]
 
+    cache_ttl: ClassVar[float] = 60  # cache lookups, see :meth:`BaseModel.get_cache`
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("dataset_id", 1)]),
+    ]
+
     # the mandatory fields
     name: str  # the category name
     id: str  # category id
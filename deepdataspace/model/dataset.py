@@ -10,6 +10,7 @@ import logging
 import os
 import time
 import uuid
+from typing import ClassVar
 from typing import Dict
 
 from pymongo.collection import Collection
@@ -22,9 +23,11 @@ from deepdataspace.constants import LabelType
 from deepdataspace.constants import RedisKey
 from deepdataspace.globals import Redis
 from deepdataspace.model._base import BaseModel
+from deepdataspace.model._base import BatchWriter
 from deepdataspace.model.category import Category
 from deepdataspace.model.image import Image
 from deepdataspace.model.image import ImageModel
+from deepdataspace.model.import_checkpoint import ImportCheckpoint
 from deepdataspace.model.label import Label
 from deepdataspace.utils.file import create_file_url
 from deepdataspace.utils.function import count_block_time
@@ -84,6 +87,8 @@ class DataSet(BaseModel):
         """
         return cls.db["datasets"]
 
+    cache_ttl: ClassVar[float] = 60  # cache lookups, see :meth:`BaseModel.get_cache`
+
     # the mandatory fields
     name: str  # the dataset name
 
@@ -318,6 +323,7 @@ class DataSet(BaseModel):
         IModel = Image(self.id)
         idx = IModel.count_num({})
         whitelist_dirs = set()
+        writer = BatchWriter(batch_size=self._batch_size, name=f"dataset-{self.id}")
         for image_id, image in self._batch_queue.items():
             for obj in image.objects:
                 # setup label
@@ -325,7 +331,7 @@ class DataSet(BaseModel):
                 if label_id is None:
                     label_id = get_str_md5(f"{self.id}_{obj.label_name}")
                     label = Label(name=obj.label_name, id=label_id, type=obj.label_type, dataset_id=self.id)
-                    label.batch_save(batch_size=self._batch_size)
+                    label.batch_save(writer=writer)
                     waiting_labels[obj.label_name] = label_id
                 obj.label_id = label_id
 
@@ -334,7 +340,7 @@ class DataSet(BaseModel):
                 if category_id is None:
                     category_id = get_str_md5(f"{self.id}_{obj.category_name}")
                     category = Category(name=obj.category_name, id=category_id, dataset_id=self.id)
-                    category.batch_save(batch_size=self._batch_size)
+                    category.batch_save(writer=writer)
                     waiting_categories[obj.category_name] = category_id
                 obj.category_id = category_id
 
@@ -354,16 +360,14 @@ class DataSet(BaseModel):
             # setup image
             image.idx = idx
             image.id = idx if image.id < 0 else image.id
-            image.batch_save(batch_size=self._batch_size, set_on_insert={"idx": image.idx})
+            image.batch_save(set_on_insert={"idx": image.idx}, writer=writer)
             idx += 1
 
             self.add_local_file_url_to_whitelist(image.url, whitelist_dirs)
             self.add_local_file_url_to_whitelist(image.url_full_res, whitelist_dirs)
 
         # finish batch saves
-        IModel.finish_batch_save()
-        Label.finish_batch_save()
-        Category.finish_batch_save()
+        writer.close()
 
         # setup dataset
         self.object_types = list(sorted(list(object_types)))
@@ -413,7 +417,7 @@ class DataSet(BaseModel):
     @staticmethod
     def cascade_delete(dataset: "DataSet"):
         """
-        Cascade delete the dataset, along with all its images, labels, categories and objects.
+        Cascade delete the dataset, along with all its images, labels, categories, objects and import checkpoint.
         """
         if dataset is None:
             return
@@ -429,6 +433,8 @@ class DataSet(BaseModel):
 
         logger.info(f"dataset [{dataset_id}] is found, deleting images...")
         Image(dataset_id).get_collection().drop()
+        Image(dataset_id).get_staging_collection().drop()
+        ImportCheckpoint.delete_many({"id": dataset_id})
 
         DataSet.delete_many({"id": dataset_id})
         logger.info(f"dataset [{dataset_id}] is deleted.")
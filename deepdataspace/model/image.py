@@ -4,7 +4,7 @@ deepdataspace.model.image
 The image model.
 """
 
-import copy
+import array
 import logging
 import os
 from typing import ClassVar
@@ -15,6 +15,8 @@ from typing import Tuple
 from typing import Type
 from typing import Union
 
+from pymongo import IndexModel
+
 from deepdataspace import constants
 from deepdataspace.constants import FileReadMode
 from deepdataspace.constants import LabelName
@@ -29,6 +31,79 @@ from deepdataspace.utils.string import get_str_md5
 
 logger = logging.getLogger("io.model.image")
 
+# The columns can be read by ImageModel.find_columns, {column_name: (field_path, dtype)}.
+# Object columns are read from the unwound objects, the others are image columns.
+# Columns of dtype 'category' are dictionary encoded, see ImageColumns.
+IMAGE_COLUMNS = {
+    "image_id"   : ("_id", "int64"),
+    "image_idx"  : ("idx", "int64"),
+    "width"      : ("width", "float64"),
+    "height"     : ("height", "float64"),
+    "flag"       : ("flag", "int64"),
+    "object_idx" : ("object_idx", "int64"),
+    "label_id"   : ("objects.label_id", "category"),
+    "label_type" : ("objects.label_type", "category"),
+    "category_id": ("objects.category_id", "category"),
+    "xmin"       : ("objects.bounding_box.xmin", "float64"),
+    "ymin"       : ("objects.bounding_box.ymin", "float64"),
+    "xmax"       : ("objects.bounding_box.xmax", "float64"),
+    "ymax"       : ("objects.bounding_box.ymax", "float64"),
+    "conf"       : ("objects.conf", "float64"),
+    "is_group"   : ("objects.is_group", "bool"),
+}
+
+# {dtype: (array typecode, numpy dtype, value for missing fields)}
+# numpy dtypes are named by strings, so numpy is only imported when columns are read.
+_COLUMN_TYPES = {
+    "int64"   : ("q", "int64", -1),
+    "float64" : ("d", "float64", float("nan")),
+    "bool"    : ("b", "bool", False),
+    "category": ("i", "int32", -1),
+}
+
+
+class ImageColumns:
+    """
+    | The columns read by ImageModel.find_columns, every column is a contiguous typed numpy array.
+    | Columns of dtype 'category', such as label_id, are dictionary encoded:
+      the array contains int32 codes, and the code is the index of the value in self.values[column], -1 for missing.
+    """
+
+    def __init__(self, arrays: Dict[str, "np.ndarray"], values: Dict[str, list]):
+        self.arrays = arrays
+        self.values = values
+
+    def __getitem__(self, name: str) -> "np.ndarray":
+        return self.arrays[name]
+
+    def __contains__(self, name: str):
+        return name in self.arrays
+
+    def __len__(self):
+        for arr in self.arrays.values():
+            return len(arr)
+        return 0
+
+    def code_of(self, name: str, value) -> int:
+        """
+        Get the code of a value of a dictionary encoded column, -1 if the value is not found.
+        """
+
+        try:
+            return self.values[name].index(value)
+        except ValueError:
+            return -1
+
+    def decode(self, name: str) -> "np.ndarray":
+        """
+        Decode a dictionary encoded column to an object array of the original values.
+        """
+
+        import numpy as np
+
+        values = np.array(self.values[name] + [None], dtype=object)
+        return values[self.arrays[name]]  # code -1 picks the trailing None
+
 
 class ImageModel(BaseModel):
     """
@@ -82,6 +157,8 @@ class ImageModel(BaseModel):
         The image flag, values can be 0,1,2. Default is 0.
     flag_ts: int
         The image flag timestamp. Default is 0.
+    fingerprint: str
+        The content fingerprint of the image and its annotations in the dataset source. Default is None.
     num_fn: dict
         fn counter of image in the format {"label_id": {90:x, 80: y, ..., 10: z}}. Default is an empty dict.
     num_fn_cat: dict
@@ -100,6 +177,20 @@ class ImageModel(BaseModel):
 
         return cls.db[f"images@dataset_{cls.belong_dataset}"]
 
+    @classmethod
+    def get_staging_collection(cls):
+        """
+        A full import builds the new version of the dataset in this collection,
+        and then replaces the images collection with it, see :class:`deepdataspace.io.importer.Importer`.
+        """
+
+        return cls.db[f"images@dataset_{cls.belong_dataset}@staging"]
+
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("objects.category_id", 1)]),
+        IndexModel([("idx", 1)]),
+    ]
+
     # the mandatory fields
     id: int  # the image id
     idx: int  # the image sorting field
@@ -115,6 +206,7 @@ class ImageModel(BaseModel):
     metadata: str = "{}"  # the image metadata
     flag: int = 0  # the image flag, 0,1,2
     flag_ts: int = 0  # the image flag timestamp
+    fingerprint: str = None  # the content fingerprint in the dataset source, see Importer.record_fingerprint
 
     # fn/fp counter of image
     num_fn: dict = {}  # {"label_id": {90:x, 80: y, ..., 10: z}}
@@ -142,7 +234,7 @@ class ImageModel(BaseModel):
         Instead of returning the class name directly, return the class name with dataset id.
         """
 
-        return f"{cls.__name__}.{cls.belong_dataset}"
+        return f"{ImageModel.__name__}.{cls.belong_dataset}"
 
     @classmethod
     def from_dict(cls, data: dict):
@@ -155,6 +247,87 @@ class ImageModel(BaseModel):
         obj = cls.parse_obj(data)
         return obj
 
+    @classmethod
+    def from_trusted_dict(cls, data: dict):
+        """
+        This is almost the same as the BaseModel.from_trusted_dict method,
+        except that it will set the idx field by id value if idx is not set.
+        """
+
+        data.setdefault("idx", data["id"])
+        return super(ImageModel, cls).from_trusted_dict(data)
+
+    @classmethod
+    def find_columns(cls,
+                     filters: dict = None,
+                     columns: List[str] = None,
+                     unwind: bool = True,
+                     batch_size: int = 10000) -> ImageColumns:
+        """
+        | Read the columns of all images matching the filters, as numpy arrays instead of model objects.
+        | The objects are unwound by mongodb, and only the requested fields are projected,
+          so the whole dataset is read in one streaming pass without building any model object.
+
+        :param filters: the filters to match images, the same as find_many.
+        :param columns: the columns to read, see :data:`IMAGE_COLUMNS`. Default to all columns.
+        :param unwind: If true, every row is an object, and image columns are repeated for every object.
+                       Images without objects are kept as one row with missing object columns.
+                       If false, every row is an image, and object columns are not allowed.
+        :param batch_size: the number of documents mongodb returns in a batch.
+        """
+
+        filters = filters or {}
+        cls.convert_id_for_mongo(filters)
+        columns = columns or list(IMAGE_COLUMNS.keys())
+
+        project = {"_id": 0}
+        for name in columns:
+            if name not in IMAGE_COLUMNS:
+                raise ValueError(f"unknown column[{name}], must be one of {list(IMAGE_COLUMNS.keys())}")
+            path, _ = IMAGE_COLUMNS[name]
+            is_obj_column = path.startswith("objects.") or path == "object_idx"
+            if is_obj_column and not unwind:
+                raise ValueError(f"column[{name}] is an object column, which requires unwind=True")
+            project[name] = f"${path}"
+
+        pipeline = [{"$match": filters}]
+        if unwind:
+            pipeline.append({"$unwind": {"path"                      : "$objects",
+                                         "includeArrayIndex"         : "object_idx",
+                                         "preserveNullAndEmptyArrays": True}})
+        pipeline.append({"$project": project})
+
+        buffers = {}
+        encoders = {}
+        for name in columns:
+            dtype = IMAGE_COLUMNS[name][1]
+            buffers[name] = array.array(_COLUMN_TYPES[dtype][0])
+            if dtype == "category":
+                encoders[name] = {}
+
+        cursor = cls.get_collection().aggregate(pipeline, batchSize=batch_size)
+        for row in cursor:
+            for name, buffer in buffers.items():
+                value = row.get(name, None)
+                encoder = encoders.get(name, None)
+                if encoder is not None:
+                    value = -1 if value is None else encoder.setdefault(value, len(encoder))
+                elif value is None:
+                    value = _COLUMN_TYPES[IMAGE_COLUMNS[name][1]][2]
+                buffer.append(value)
+
+        import numpy as np
+
+        arrays = {}
+        for name, buffer in buffers.items():
+            np_dtype = _COLUMN_TYPES[IMAGE_COLUMNS[name][1]][1]
+            if np_dtype == "bool":
+                arrays[name] = np.frombuffer(buffer, dtype=np.int8).astype(np.bool_)
+            else:
+                arrays[name] = np.frombuffer(buffer, dtype=np_dtype)
+        values = {name: list(encoder.keys()) for name, encoder in encoders.items()}
+        return ImageColumns(arrays, values)
+
     @staticmethod
     def _convert_local_to_url(file_uri: str):
         file_path = file_uri[7:]
@@ -214,6 +387,42 @@ class ImageModel(BaseModel):
                             "ymax": y2 / height}
         return bounding_box
 
+    @staticmethod
+    def format_bboxes(bboxes: List[Tuple[int, int, int, int]], widths: List[int], heights: List[int]) -> List[Dict]:
+        """
+        | Convert bboxes of many objects to the internal format at once, it's the same as format_bbox for each of them.
+        | Bboxes are normalized as a numpy array, which is much faster for a batch of objects.
+
+        :param bboxes: the bbox of every object, as [x, y, w, h], or None.
+        :param widths: the width of the image of every object.
+        :param heights: the height of the image of every object.
+        """
+
+        import numpy as np
+
+        result = [{} for _ in bboxes]
+        idxes = [idx for idx, bbox in enumerate(bboxes) if bbox]
+        if not idxes:
+            return result
+
+        box_widths = [widths[idx] for idx in idxes]
+        box_heights = [heights[idx] for idx in idxes]
+        if None in box_widths or None in box_heights:  # let format_bbox raise for the missing image size
+            for idx in idxes:
+                result[idx] = ImageModel.format_bbox(widths[idx], heights[idx], bboxes[idx])
+            return result
+
+        boxes = np.array([bboxes[idx] for idx in idxes], dtype=np.float64).reshape(-1, 4)
+        widths = np.array(box_widths, dtype=np.float64)
+        heights = np.array(box_heights, dtype=np.float64)
+        xmin = (boxes[:, 0] / widths).tolist()
+        ymin = (boxes[:, 1] / heights).tolist()
+        xmax = ((boxes[:, 0] + boxes[:, 2]) / widths).tolist()
+        ymax = ((boxes[:, 1] + boxes[:, 3]) / heights).tolist()
+        for pos, idx in enumerate(idxes):
+            result[idx] = {"xmin": xmin[pos], "ymin": ymin[pos], "xmax": xmax[pos], "ymax": ymax[pos]}
+        return result
+
     @staticmethod
     def format_segmentation(segmentation: List[List[int]]):
         """
@@ -239,12 +448,14 @@ class ImageModel(BaseModel):
         if len(keypoints) % 4 != 0:
             raise ValueError("coco_keypoints must be a flat list of x1, y1, v1, conf1, x2, y2, v2, conf2, ...")
 
-        points = []
+        # interleave the columns by slice assignments instead of a loop over keypoints
         length = len(keypoints) // 4
-        for idx in range(length):
-            idx *= 4
-            x, y, v, conf = keypoints[idx], keypoints[idx + 1], keypoints[idx + 2], keypoints[idx + 3]
-            points.extend([float(x), float(y), 0.0, 1.0, int(v), conf])  # x, y, z, w, v, conf
+        points = [0.0] * (length * 6)  # x, y, z, w, v, conf
+        points[0::6] = map(float, keypoints[0::4])
+        points[1::6] = map(float, keypoints[1::4])
+        points[3::6] = [1.0] * length
+        points[4::6] = map(int, keypoints[2::4])
+        points[5::6] = keypoints[3::4]
 
         if not colors:
             colors = constants.KeyPointColor.COCO
@@ -440,14 +651,17 @@ class ImageModel(BaseModel):
         self.dataset.batch_save_image()
 
 
-_image_models: Dict[str, Type[ImageModel]] = {}  # a cache for ImageModel for each dataset
+_image_models: Dict[str, Type[ImageModel]] = {}  # a cache for ImageModel subclass of each dataset
 
 
 def Image(dataset_id: str) -> Type[ImageModel]:
     """
     A shortcut to get the ImageModel for specified dataset.
+    Every dataset has its own subclass, so jobs of different datasets can use their models concurrently.
     """
 
-    model = _image_models.setdefault(dataset_id, copy.deepcopy(ImageModel))
-    model.belong_dataset = dataset_id
+    model = _image_models.get(dataset_id, None)
+    if model is None:
+        model = type(f"ImageModel_{dataset_id}", (ImageModel,), {"belong_dataset": dataset_id})
+        model = _image_models.setdefault(dataset_id, model)
     return model
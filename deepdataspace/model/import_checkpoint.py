@@ -0,0 +1,49 @@
+"""
+deepdataspace.model.import_checkpoint
+
+The import checkpoint model.
+"""
+
+from typing import List
+
+from deepdataspace.model._base import BaseModel
+
+
+class ImportCheckpoint(BaseModel):
+    """
+    | ImportCheckpoint is the progress of importing a dataset, saved after every committed batch of images.
+    | A failed import continues from its checkpoint instead of importing the dataset from the start,
+      see :meth:`deepdataspace.io.importer.Importer.run`.
+
+    Attributes:
+    -----------
+    id: str
+        The dataset id.
+    position: str
+        The json of where to continue reading the dataset source, it's defined by the importer.
+    num_images: int
+        The number of committed images, it's the idx of the next image too.
+    labels: str
+        The json of saved labels, {label_name: label_id}.
+    categories: str
+        The json of saved categories, {category_name: category_id}.
+    object_types: list
+        The object types of committed images. See :class:`deepdataspace.constants.AnnotationType`.
+    staging: bool
+        Are images committed to the staging collection? See :meth:`deepdataspace.model.image.ImageModel.get_staging_collection`.
+    """
+
+    @classmethod
+    def get_collection(cls, *args, **kwargs):
+        return cls.db["import_checkpoints"]
+
+    # the mandatory fields
+    id: str  # the dataset id
+
+    # the optional fields
+    position: str = "{}"  # json of where to continue reading the dataset source
+    num_images: int = 0  # the number of committed images
+    labels: str = "{}"  # json of saved labels, {label_name: label_id}
+    categories: str = "{}"  # json of saved categories, {category_name: category_id}
+    object_types: List[str] = []  # the object types of committed images
+    staging: bool = False  # are images committed to the staging collection
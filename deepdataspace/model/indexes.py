@@ -0,0 +1,74 @@
+"""
+deepdataspace.model.indexes
+
+The ensure-indexes pass over all models.
+Every model declares its indexes by the 'indexes' class attribute, see :class:`deepdataspace.model._base.BaseModel`.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from typing import List
+
+from deepdataspace.model._base import ensure_collection_indexes
+from deepdataspace.model.category import Category
+from deepdataspace.model.dataset import DataSet
+from deepdataspace.model.image import Image
+from deepdataspace.model.label import Label
+from deepdataspace.model.label_task import LabelProject
+from deepdataspace.model.label_task import LabelTask
+from deepdataspace.model.label_task import LabelTaskImage
+from deepdataspace.model.label_task import ProjectRole
+from deepdataspace.model.label_task import TaskRole
+from deepdataspace.model.user import User
+from deepdataspace.model.user import UserToken
+
+logger = logging.getLogger("model.indexes")
+
+# models stored in a single collection
+STATIC_MODELS = [DataSet, Label, Category, User, UserToken, LabelProject, LabelTask, ProjectRole, TaskRole]
+
+# model shortcuts of per-dataset collections, called with a dataset id to create the model class
+DATASET_MODELS = [Image, LabelTaskImage]
+
+
+def ensure_indexes(dataset_ids: List[str] = None, static: bool = True, max_workers: int = 4) -> Dict[str, List[str]]:
+    """
+    Create the declared indexes missing from all model collections, concurrently.
+    This is idempotent, existing indexes are not rebuilt.
+
+    :param dataset_ids: the datasets to ensure indexes of per-dataset collections, default to all datasets.
+    :param static: also ensure indexes of the models stored in a single collection.
+    :param max_workers: the number of collections to build indexes concurrently.
+    :return: the names of created indexes for every collection, {collection_name: [index_name]}.
+    """
+
+    if dataset_ids is None:
+        dataset_ids = [d["id"] for d in DataSet.find_many({}, includes={"_id": 1}, to_dict=True)]
+
+    # resolve the collections before submitting jobs, so the jobs only touch the collections
+    jobs = []
+    if static is True:
+        jobs.extend((model.get_collection(), model.indexes) for model in STATIC_MODELS)
+    existing = set(DataSet.db.list_collection_names())
+    for dataset_id in dataset_ids:
+        for shortcut in DATASET_MODELS:
+            model = shortcut(dataset_id)
+            co = model.get_collection()
+            if co.name in existing:  # don't create empty collections, such as label task images of unused datasets
+                jobs.append((co, model.indexes))
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {co.name: executor.submit(ensure_collection_indexes, co, indexes) for co, indexes in jobs}
+        for name, future in futures.items():
+            try:
+                created = future.result()
+            except Exception as err:
+                logger.warning(f"failed to ensure indexes of {name}, err={str(err)}")
+                continue
+            if created:
+                results[name] = created
+
+    logger.info(f"ensured indexes of {len(jobs)} collections, created {sum(len(i) for i in results.values())}")
+    return results
@@ -4,8 +4,11 @@ deepdataspace.model.label
 The label model.
 """
 
+from typing import ClassVar
 from typing import List
 
+from pymongo import IndexModel
+
 from deepdataspace.model._base import BaseModel
 
 
@@ -34,6 +37,11 @@ class Label(BaseModel):
     def get_collection(cls, *args, **kwargs):
         return cls.db["labels"]
 
+    cache_ttl: ClassVar[float] = 60  # cache lookups, see :meth:`BaseModel.get_cache`
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("dataset_id", 1)]),
+    ]
+
     # the mandatory fields
     name: str  # the label name
 
@@ -16,6 +16,7 @@ from typing import Union
 
 from pydantic import BaseModel as _Base
 from pydantic import Field
+from pymongo import IndexModel
 from pymongo.collection import Collection
 from pymongo.typings import _DocumentType
 
@@ -31,6 +32,7 @@ from deepdataspace.constants import LabelTaskQAActions
 from deepdataspace.constants import LabelTaskStatus
 from deepdataspace.constants import LabelType
 from deepdataspace.model._base import BaseModel
+from deepdataspace.model._base import BatchWriter
 from deepdataspace.model.category import Category
 from deepdataspace.model.dataset import DataSet
 from deepdataspace.model.image import Image
@@ -38,7 +40,7 @@ from deepdataspace.model.image import ImageModel
 from deepdataspace.model.label import Label
 from deepdataspace.model.object import Object
 from deepdataspace.model.user import User
-from deepdataspace.utils.http import APIException
+from deepdataspace.utils.exception import APIException
 from deepdataspace.utils.string import get_str_md5
 
 Num = Union[float, int]
@@ -90,6 +92,10 @@ class LabelProject(BaseModel):
 
         return cls.db["label_projects"]
 
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("created_ts", 1), ("_id", 1)]),
+    ]
+
     # the mandatory fields
     id: str
     name: str
@@ -248,6 +254,7 @@ class LabelProject(BaseModel):
 
         # for every dataset, distribute images to tasks
         category_names = set()
+        writer = BatchWriter(name=f"project-{self.id}")
         for dataset in self.datasets:
             dataset_id = dataset["id"]
             IModel = Image(dataset_id)
@@ -313,11 +320,14 @@ class LabelProject(BaseModel):
                     task_id=task.id,
                     url=image["url"],
                     url_full_res=image["url_full_res"])
-                lti.batch_save()
-            LTIModel.finish_batch_save()
+                lti.batch_save(writer=writer)
+            writer.flush(LTIModel)
+            LTIModel.ensure_indexes()
+
+            [task.batch_save(writer=writer) for task in tasks]
+            writer.flush(LabelTask)
 
-            [task.batch_save() for task in tasks]
-            LabelTask.finish_batch_save()
+        writer.close()
 
         self.task_num_total = task_num_total
         self.task_num_waiting = task_num_total
@@ -452,7 +462,8 @@ class LabelProject(BaseModel):
 
         IModel = Image(dataset_id)
         images: Dict[int, ImageModel] = {i.id: i for i in
-                                         IModel.find_many({}, sort=[("id", 1)], size=100, skip=offset)}
+                                         IModel.find_many({}, sort=[("id", 1)], size=100, skip=offset,
+                                                          trusted=True)}
         return images, offset + 100
 
     @staticmethod
@@ -492,6 +503,7 @@ class LabelProject(BaseModel):
         obj_types = set()
 
         # iter every label image, save every annotation to target image
+        writer = BatchWriter(name=f"export-{dataset.id}")
         for ltimage in LTImage.find_many({}, sort=[("image_id", 1)]):
             if not images:  # no more images in the queue, get a new batch
                 images, offset = self._get_image_batch(dataset.id, offset)
@@ -545,9 +557,9 @@ class LabelProject(BaseModel):
                                       bounding_box=bounding_box, segmentation=segmentation, mask=mask,
                                       points=points, lines=lines, point_names=point_names, point_colors=point_colors)
                     image.objects.append(anno_obj)
-                    image.batch_save()
+                    image.batch_save(writer=writer)
 
-        Image(dataset.id).finish_batch_save()
+        writer.close()
 
         cur_obj_types = set(dataset.object_types)
         if cur_obj_types != obj_types:
@@ -608,6 +620,11 @@ class ProjectRole(BaseModel):
     def get_collection(cls, *args, **kwargs) -> Collection[_DocumentType]:
         return cls.db["label_project_roles"]
 
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("user_id", 1), ("project_id", 1)]),
+        IndexModel([("project_id", 1), ("role", 1)]),
+    ]
+
     id: str
     project_id: str
     user_id: str
@@ -633,12 +650,12 @@ class ProjectRole(BaseModel):
             return
 
         roles = []
-        for user_id in user_ids:
-            role_id = gen_uuid()
-            proj_role = cls(id=role_id, project_id=project.id, user_id=user_id, role=role)
-            proj_role.batch_save()
-            roles.append(proj_role)
-        cls.finish_batch_save()
+        with BatchWriter() as writer:
+            for user_id in user_ids:
+                role_id = gen_uuid()
+                proj_role = cls(id=role_id, project_id=project.id, user_id=user_id, role=role)
+                proj_role.batch_save(writer=writer)
+                roles.append(proj_role)
         return roles
 
     @classmethod
@@ -877,6 +894,11 @@ class TaskRole(BaseModel):
     def get_collection(cls, *args, **kwargs) -> Collection[_DocumentType]:
         return cls.db["label_task_roles"]
 
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("task_id", 1), ("user_id", 1), ("is_active", 1)]),
+        IndexModel([("project_id", 1), ("user_id", 1)], partialFilterExpression={"is_active": True}),
+    ]
+
     id: str
     project_id: str
     task_id: str
@@ -964,19 +986,19 @@ class TaskRole(BaseModel):
 
         roles = []
         label_num_waiting = task.num_total
-        for user in users:
-            role_id = gen_uuid()
-            task_role = cls(id=role_id,
-                            label_num_waiting=label_num_waiting,
-                            project_id=task.project_id,
-                            task_id=task.id,
-                            user_id=user.id,
-                            user_name=user.name,
-                            role=role)
-            task_role.batch_save()
-            roles.append(task_role)
-
-        cls.finish_batch_save()
+        with BatchWriter() as writer:
+            for user in users:
+                role_id = gen_uuid()
+                task_role = cls(id=role_id,
+                                label_num_waiting=label_num_waiting,
+                                project_id=task.project_id,
+                                task_id=task.id,
+                                user_id=user.id,
+                                user_name=user.name,
+                                role=role)
+                task_role.batch_save(writer=writer)
+                roles.append(task_role)
+
         ProjectRole.add_roles(task.project, [u.id for u in users], role)
         return roles
 
@@ -1087,9 +1109,9 @@ class TaskRole(BaseModel):
 
         # save status
         old_role.is_active = False
-        old_role.batch_save()
-        new_role.batch_save()
-        TaskRole.finish_batch_save()
+        with BatchWriter() as writer:
+            old_role.batch_save(writer=writer)
+            new_role.batch_save(writer=writer)
 
         # delete old role from project
         filters = {"project_id": task.project_id, "is_active": True,
@@ -1395,9 +1417,9 @@ class TaskRole(BaseModel):
             review_completed = project.review_times == 0 or role.review_num_accepted == task.num_total
             role.review_completed = review_completed
 
-        for role in roles:
-            role.batch_save()
-        TaskRole.finish_batch_save()
+        with BatchWriter() as writer:
+            for role in roles:
+                role.batch_save(writer=writer)
 
         # 5. task status = LabelTaskStatus.Reviewing
         #   if all(role.label_completed == True and role.all review_completed == True for role in roles)
@@ -1417,6 +1439,10 @@ class LabelTask(BaseModel):
     def get_collection(cls, *args, **kwargs) -> Collection[_DocumentType]:
         return cls.db["label_tasks"]
 
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("project_id", 1), ("idx", 1)]),
+    ]
+
     # the mandatory fields
     id: str
     idx: int
@@ -1483,11 +1509,11 @@ class LabelTask(BaseModel):
                 }
 
                 LTIModel = LabelTaskImage(self.dataset_id)
-                for image in LTIModel.find_many(filters):
-                    set_data = {f"role_status.reviewer_{role.user_id}": LabelTaskImageStatus.Reviewing
-                                for role in worker_roles}
-                    LTIModel.batch_update({"id": image.id}, set_data)
-                LTIModel.finish_batch_update()
+                with BatchWriter() as writer:
+                    for image in LTIModel.find_many(filters):
+                        set_data = {f"role_status.reviewer_{role.user_id}": LabelTaskImageStatus.Reviewing
+                                    for role in worker_roles}
+                        LTIModel.batch_update({"id": image.id}, set_data, writer=writer)
                 TaskRole.update_progress_for_all_roles(self.id)
 
         return worker_roles
@@ -1672,13 +1698,21 @@ class LabelTaskImageModel(BaseModel):
 
         return cls.db[f"label_task_images@dataset_{cls.belong_dataset}"]
 
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("task_id", 1), ("idx", 1)]),
+        IndexModel([("task_id", 1), ("role_status.label_leader", 1), ("idx", 1)]),
+        # role status keys of labelers and reviewers are dynamic, such as role_status.labeler_<user_id>
+        IndexModel([("role_status.$**", 1)]),
+        IndexModel([("image_id", 1)]),
+    ]
+
     @classmethod
     def get_cls_id(cls):
         """
         Instead of returning the class name directly, return the class name with dataset id.
         """
 
-        return f"{cls.__name__}.{cls.belong_dataset}"
+        return f"{LabelTaskImageModel.__name__}.{cls.belong_dataset}"
 
     def ensure_status_for_labeling(self, task: LabelTask, labeler: User):
         """
@@ -1959,8 +1993,11 @@ _image_task_models = {}
 def LabelTaskImage(dataset_id: str) -> Type[LabelTaskImageModel]:
     """
     A shortcut to create the LabelTaskImageModel for target dataset.
+    Every dataset has its own subclass, so jobs of different datasets can use their models concurrently.
     """
 
-    model = _image_task_models.setdefault(dataset_id, copy.deepcopy(LabelTaskImageModel))
-    model.belong_dataset = dataset_id
+    model = _image_task_models.get(dataset_id, None)
+    if model is None:
+        model = type(f"LabelTaskImageModel_{dataset_id}", (LabelTaskImageModel,), {"belong_dataset": dataset_id})
+        model = _image_task_models.setdefault(dataset_id, model)
     return model
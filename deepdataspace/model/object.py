@@ -9,7 +9,12 @@ from typing import List
 from typing import Optional
 from typing import Union
 
+from pydantic import validator
+
 from deepdataspace.model._base import BaseModel
+from deepdataspace.model.object_codec import decode_object
+from deepdataspace.model.object_codec import decode_points
+from deepdataspace.model.object_codec import decode_segmentation
 
 
 class Object(BaseModel):
@@ -36,11 +41,11 @@ class Object(BaseModel):
     bounding_box: dict
         The bounding box of the object, {"xmin": 0, "ymin": 0, "xmax": 0, "ymax": 0}.
     segmentation: str
-        The segmentation of the object.
+        The segmentation of the object, it may be stored in binary, see :mod:`deepdataspace.model.object_codec`.
     alpha: str
         The alpha of the object.
     points: list
-        The points of the object.
+        The points of the object, they may be stored in binary, see :mod:`deepdataspace.model.object_codec`.
     lines: list
         The lines of the object.
     point_colors: list
@@ -62,6 +67,16 @@ class Object(BaseModel):
         """
         return None
 
+    @classmethod
+    def from_trusted_dict(cls, data: dict):
+        """
+        Decode the binary segmentation and points before hydrating, as the validators are skipped.
+        """
+
+        if isinstance(data.get("segmentation", None), bytes) or isinstance(data.get("points", None), bytes):
+            data = decode_object(dict(data))  # the data may be cached, never change it in place
+        return super().from_trusted_dict(data)
+
     # the mandatory fields
     # every object must belong to a label set
     label_name: str
@@ -84,3 +99,11 @@ class Object(BaseModel):
     compare_result: Optional[Dict[str, str]] = {}  # {"90": "FP", ..., "10": "OK"}
     matched_det_idx: Optional[int] = None  # The matched ground truth index, for prediction objects only.
     mask: dict = {}
+
+    @validator("segmentation", pre=True)
+    def _decode_segmentation(cls, value):
+        return decode_segmentation(value)
+
+    @validator("points", pre=True)
+    def _decode_points(cls, value):
+        return decode_points(value)
@@ -0,0 +1,309 @@
+"""
+deepdataspace.model.object_codec
+
+The compact binary encoding of object segmentations and keypoints.
+
+| Segmentations are stored as text like "x1,y1,x2,y2/x1,y1,x2,y2" by default,
+  and keypoints as a list of 6 numbers for every point, x, y, z, w, v, conf.
+| With :data:`deepdataspace.environs.DDS_BINARY_OBJECTS`, importers store them as bson binary values instead:
+
+- values are quantized to fixed point int16 or int32 integers of the fewest decimals which keep them exactly,
+  such as 239.97 to 23997 of 2 decimals. Values of more than 6 decimals are stored as float32,
+  which keeps about 7 significant digits.
+- a segmentation is packed as the lengths of its polygons followed by all values,
+  every value is delta encoded against the previous x or y, so most of them fit in int16.
+  Decoded values are formatted with the decimals they are quantized to, such as 12.5 to "12.50" of 2 decimals.
+- keypoints are packed as records of x, y, int8 v and conf,
+  z and w are not stored as they are always 0 and 1. Keypoints of other z or w values are kept as lists.
+
+| Both encodings start with a version byte, so the layout can be changed by a later version.
+| Binary values are decoded back to the text and list format when objects are read through the model,
+  or by :func:`decode_object` for raw documents, so the rest of the code never sees them.
+"""
+
+import base64
+import struct
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+
+from bson import Binary
+
+SEGMENTATION_SUBTYPE = 0x80  # bson user defined binary subtypes
+POINTS_SUBTYPE = 0x81
+
+VERSION = 1
+
+# the binary fields of objects, and their bson subtypes
+BINARY_FIELDS = {"segmentation": SEGMENTATION_SUBTYPE, "points": POINTS_SUBTYPE}
+
+# value dtypes, integers are fixed point values scaled by 10 ** decimals
+_INT16, _INT32, _FLOAT32 = 1, 2, 3
+_DTYPES = {_INT16: "<i2", _INT32: "<i4", _FLOAT32: "<f4"}
+_MAX_DECIMALS = 6
+_INT32_MAX = 2 ** 31 - 1
+
+# segmentation: version, dtype, decimals, number of polygons, the first x and y,
+# followed by the uint32 length of every polygon, and all other values delta encoded against the previous x or y
+_SEG_HEADER = struct.Struct("<BBBIqq")
+
+# keypoints: version, x and y dtype, x and y decimals, conf dtype, conf decimals, number of points,
+# followed by the point records of x, y, int8 v and conf
+_POINTS_HEADER = struct.Struct("<BBBBBI")
+
+
+def _check_version(version: int, subtype: int):
+    if version != VERSION:
+        raise ValueError(f"unsupported version {version} of binary subtype {subtype:#x}")
+
+
+def _quantize(values, delta: bool = False):
+    """
+    | Quantize float64 values to the smallest fixed point integers which keep them exactly,
+      or to float32 values if no such integers with up to 6 decimals fit in int32.
+    | With delta, the first 2 integers are returned as the bases, and every other integer is stored
+      as the difference to the one 2 places before. Neighbouring x or y coordinates of a polygon are close,
+      so most of the differences fit in int16.
+    | Return the dtype, the decimals, the values to store and the bases.
+    """
+
+    import numpy as np
+
+    bases = [0, 0]
+    for decimals in range(_MAX_DECIMALS + 1):
+        scale = 10.0 ** decimals
+        ints = np.rint(values * scale)
+        if (ints / scale == values).all():
+            break
+    else:
+        return _FLOAT32, 0, values.astype(_DTYPES[_FLOAT32]), bases
+
+    if ints.size and np.abs(ints).max() > _INT32_MAX:
+        return _FLOAT32, 0, values.astype(_DTYPES[_FLOAT32]), bases
+
+    ints = ints.astype(np.int64)
+    if delta:
+        first = ints[:2].tolist()
+        bases[:len(first)] = first
+        ints = ints[2:] - ints[:-2]
+
+    dtype = _INT16
+    if ints.size and np.abs(ints).max() > 32767:
+        dtype = _INT32
+    return dtype, decimals, ints.astype(_DTYPES[dtype]), bases
+
+
+def _dequantize(dtype: int, decimals: int, data):
+    """
+    Restore the values returned by :func:`_quantize` without delta, as an int64 array or a float64 array.
+    """
+
+    import numpy as np
+
+    if dtype == _FLOAT32:
+        # float32 values are restored by their shortest repr, so 239.97 is decoded as 239.97 instead of 239.97000122
+        return data.astype(str).astype(np.float64)
+
+    ints = data.astype(np.int64)
+    if decimals == 0:
+        return ints
+    return ints / 10.0 ** decimals  # exact division gives the same float64 as the original decimal value
+
+
+def _to_floats(values):
+    """
+    Convert values to a float64 array, return None if any of them is not a finite number.
+    """
+
+    import numpy as np
+
+    try:
+        values = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+
+    if values.ndim != 1 or not np.isfinite(values).all():
+        return None
+    return values
+
+
+def encode_segmentation(polygons: List[List[Union[float, int]]]) -> Optional[Binary]:
+    """
+    Encode the polygons of a segmentation, [[x1, y1, x2, y2, ...], [x1, y1, ...]].
+    Return None if they can't be encoded, such as a rle segmentation or non-numeric values.
+    """
+
+    import numpy as np
+
+    if not polygons or not isinstance(polygons, (list, tuple)):
+        return None
+
+    try:
+        counts = np.array([len(polygon) for polygon in polygons], dtype="<u4")
+    except TypeError:
+        return None
+
+    values = _to_floats([value for polygon in polygons for value in polygon])
+    if values is None:
+        return None
+
+    dtype, decimals, data, bases = _quantize(values, delta=True)
+    header = _SEG_HEADER.pack(VERSION, dtype, decimals, len(counts), *bases)
+    return Binary(header + counts.tobytes() + data.tobytes(), SEGMENTATION_SUBTYPE)
+
+
+def encode_segmentation_text(segmentation: str) -> Optional[Binary]:
+    """
+    Encode a segmentation of the text format, "x1,y1,x2,y2/x1,y1,x2,y2".
+    """
+
+    if not segmentation or not isinstance(segmentation, str):
+        return None
+
+    try:
+        polygons = [[float(v) for v in polygon.split(",")] for polygon in segmentation.split("/")]
+    except ValueError:
+        return None
+    return encode_segmentation(polygons)
+
+
+def decode_segmentation(value: bytes) -> str:
+    """
+    Decode a binary segmentation to the text format, other values are returned as they are.
+    """
+
+    import numpy as np
+
+    if not isinstance(value, Binary) or value.subtype != SEGMENTATION_SUBTYPE:
+        return value
+
+    version, dtype, decimals, num, base_x, base_y = _SEG_HEADER.unpack_from(value)
+    _check_version(version, SEGMENTATION_SUBTYPE)
+    counts = np.frombuffer(value, dtype="<u4", count=num, offset=_SEG_HEADER.size)
+    data = np.frombuffer(value, dtype=_DTYPES[dtype], offset=_SEG_HEADER.size + counts.nbytes)
+
+    if dtype == _FLOAT32:
+        values = _dequantize(dtype, decimals, data)
+        fmt = "%r"
+    else:
+        ints = np.empty(int(counts.sum()), dtype=np.int64)
+        ints[:2] = [base_x, base_y][:ints.size]
+        ints[2:] = data
+        ints[0::2] = np.cumsum(ints[0::2])
+        ints[1::2] = np.cumsum(ints[1::2])
+        values = _dequantize(dtype, decimals, ints)
+        fmt = "%d" if decimals == 0 else f"%.{decimals}f"
+
+    # formatting all values by one template is much faster than converting them to strings one by one
+    template = "/".join([",".join([fmt] * count) for count in counts.tolist()])
+    return template % tuple(values.tolist())
+
+
+def encode_points(points: List[Union[float, int]]) -> Optional[Binary]:
+    """
+    Encode keypoints of the internal format, [x1, y1, z1, w1, v1, conf1, x2, y2, ...], see ImageModel.format_keypoints.
+    Return None if they can't be encoded, such as points of z other than 0, w other than 1, or v out of int8.
+    """
+
+    import numpy as np
+
+    if not points or not isinstance(points, (list, tuple)) or len(points) % 6 != 0:
+        return None
+
+    values = _to_floats(points)
+    if values is None:
+        return None
+
+    values = values.reshape(-1, 6)
+    if not ((values[:, 2] == 0).all() and (values[:, 3] == 1).all()):
+        return None
+
+    visibles = values[:, 4]
+    if not ((visibles == np.rint(visibles)).all() and (np.abs(visibles) <= 127).all()):
+        return None
+
+    xy_dtype, xy_decimals, xy_data, _ = _quantize(values[:, 0:2].reshape(-1))
+    conf_dtype, conf_decimals, conf_data, _ = _quantize(values[:, 5])
+
+    records = np.empty(len(values), dtype=[("x", _DTYPES[xy_dtype]), ("y", _DTYPES[xy_dtype]),
+                                           ("v", "i1"), ("conf", _DTYPES[conf_dtype])])
+    records["x"] = xy_data[0::2]
+    records["y"] = xy_data[1::2]
+    records["v"] = visibles
+    records["conf"] = conf_data
+
+    header = _POINTS_HEADER.pack(VERSION, xy_dtype, xy_decimals, conf_dtype, conf_decimals, len(records))
+    return Binary(header + records.tobytes(), POINTS_SUBTYPE)
+
+
+def decode_points(value: bytes) -> List[Union[float, int]]:
+    """
+    Decode binary keypoints to the internal format, other values are returned as they are.
+    """
+
+    import numpy as np
+
+    if not isinstance(value, Binary) or value.subtype != POINTS_SUBTYPE:
+        return value
+
+    version, xy_dtype, xy_decimals, conf_dtype, conf_decimals, num = _POINTS_HEADER.unpack_from(value)
+    _check_version(version, POINTS_SUBTYPE)
+    dtype = [("x", _DTYPES[xy_dtype]), ("y", _DTYPES[xy_dtype]), ("v", "i1"), ("conf", _DTYPES[conf_dtype])]
+    records = np.frombuffer(value, dtype=dtype, count=num, offset=_POINTS_HEADER.size)
+
+    length = len(records)
+    points = [0.0] * (length * 6)
+    points[0::6] = _dequantize(xy_dtype, xy_decimals, records["x"]).astype(np.float64).tolist()
+    points[1::6] = _dequantize(xy_dtype, xy_decimals, records["y"]).astype(np.float64).tolist()
+    points[3::6] = [1.0] * length
+    points[4::6] = records["v"].tolist()
+    points[5::6] = _dequantize(conf_dtype, conf_decimals, records["conf"]).astype(np.float64).tolist()
+    return points
+
+
+def encode_object(obj: Dict) -> bool:
+    """
+    Encode the segmentation and keypoints of an object dict in the text and list format in place.
+    Return True if any of them is encoded.
+    """
+
+    encoded = False
+    segmentation = encode_segmentation_text(obj.get("segmentation", None))
+    if segmentation is not None:
+        obj["segmentation"] = segmentation
+        encoded = True
+
+    points = encode_points(obj.get("points", None))
+    if points is not None:
+        obj["points"] = points
+        encoded = True
+    return encoded
+
+
+def decode_object(obj: Dict) -> Dict:
+    """
+    Decode the binary segmentation and keypoints of an object dict in place, such as a raw document from mongodb.
+    """
+
+    if isinstance(obj.get("segmentation", None), Binary):
+        obj["segmentation"] = decode_segmentation(obj["segmentation"])
+    if isinstance(obj.get("points", None), Binary):
+        obj["points"] = decode_points(obj["points"])
+    return obj
+
+
+def pass_through_object(obj: Dict) -> List[str]:
+    """
+    | Replace the binary segmentation and keypoints of an object dict with their base64 strings in place,
+      so they can be sent in json as they are stored.
+    | Return the names of the replaced fields.
+    """
+
+    fields = []
+    for name in BINARY_FIELDS:
+        value = obj.get(name, None)
+        if isinstance(value, Binary):
+            obj[name] = base64.b64encode(value).decode("ascii")
+            fields.append(name)
+    return fields
@@ -6,8 +6,12 @@ The user related models.
 
 import secrets
 import time
+from typing import ClassVar
+from typing import List
 from typing import Union
 
+from pymongo import IndexModel
+
 from deepdataspace.constants import UserStatus
 from deepdataspace.model._base import BaseModel
 from deepdataspace.server.settings import SECRET_KEY
@@ -41,6 +45,10 @@ class UserToken(BaseModel):
         """
         return cls.db["user_tokens"]
 
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("user_id", 1)]),
+    ]
+
     id: str  # the token id
     user_id: str  # the user id
     expire: int  # the token expire timestamp, in second
@@ -71,6 +79,11 @@ class User(BaseModel):
         """
         return cls.db["users"]
 
+    cache_ttl: ClassVar[float] = 60  # cache lookups, see :meth:`BaseModel.get_cache`
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("name", 1)]),
+    ]
+
     id: str  # the user id
     name: str  # the username
     password: str  # the password, encrypted.
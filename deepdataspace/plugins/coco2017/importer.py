@@ -6,6 +6,7 @@ import logging
 import os
 import traceback
 from typing import Dict
+from typing import Iterable
 from typing import List
 from typing import Tuple
 
@@ -13,12 +14,32 @@ from deepdataspace.constants import DatasetFileType
 from deepdataspace.constants import DatasetType
 from deepdataspace.constants import LabelName
 from deepdataspace.constants import LabelType
+from deepdataspace.environs import IMPORT_STREAM_MB
 from deepdataspace.io.importer import FileImporter
+from deepdataspace.plugins.coco2017.store import AnnotationStore
 from deepdataspace.utils.import_utils import import_from_path
+from deepdataspace.utils.json_stream import iter_json_arrays
 
 logger = logging.getLogger("plugins.coco.importer")
 
 
+def _format_keypoints(raw_keypoints: list, stride: int) -> list:
+    """
+    Convert coco keypoints of x, y, v for ground truth, or x, y, v, conf for prediction,
+    to a flat list of x, y, v, conf, the conf of ground truth is 1.0.
+    """
+
+    length = len(raw_keypoints) // stride
+    stop = length * stride
+    keypoints = [1.0] * (length * 4)
+    keypoints[0::4] = map(float, raw_keypoints[0:stop:stride])
+    keypoints[1::4] = map(float, raw_keypoints[1:stop:stride])
+    keypoints[2::4] = map(int, raw_keypoints[2:stop:stride])
+    if stride == 4:
+        keypoints[3::4] = raw_keypoints[3:stop:stride]
+    return keypoints
+
+
 class COCO2017Importer(FileImporter):
     """
     Importer for coco2017 dataset.
@@ -48,6 +69,9 @@ class COCO2017Importer(FileImporter):
         self._images = {}  # {image_id: image}
         self._categories = {}  # {category_id: category}
         self._annotations = {}  # {image_id: [annotation...]}
+        self._image_idx = 0  # the index of the next image to read in self._images
+        self._store = None  # the on-disk store of images and annotations, if the files are streamed
+        self.stream_min_size = IMPORT_STREAM_MB * 1024 * 1024  # stream files larger than this in total
 
     @staticmethod
     def _parse_meta(meta_path: str):
@@ -143,15 +167,130 @@ class COCO2017Importer(FileImporter):
     def format_data(self):
         self._images = [self._images[img_id] for img_id in sorted(self._images.keys())]
 
-    def pre_run(self):
-        super(COCO2017Importer, self).pre_run()
+    def should_stream(self) -> bool:
+        """
+        Stream the annotation files into an on-disk store if they are too large to load into memory.
+        """
+
+        files = [self.ground_truth]
+        for file_tag, file_path in self.dataset.files.items():
+            if file_tag.startswith(f"{DatasetFileType.Prediction}/"):
+                files.append(file_path)
+        return sum(os.path.getsize(f) for f in files) >= self.stream_min_size
+
+    def stream_data(self):
+        """
+        Stream images and annotations of the ground truth and prediction files into an on-disk store,
+        only categories are kept in memory.
+        """
+
+        self._store = AnnotationStore()
+        logger.info(f"Streaming coco files into {self._store.path}")
+
+        images = []
+
+        def _iter_ground_truth():
+            for key, obj, text in iter_json_arrays(self.ground_truth, {"images", "categories", "annotations"}):
+                if key == "images":
+                    images.append((obj["id"], text))
+                    if len(images) >= self._store.batch_size:
+                        self._store.add_images(images)
+                        images.clear()
+                elif key == "categories":
+                    self._categories[obj["id"]] = obj
+                else:
+                    yield obj["image_id"], LabelName.GroundTruth, LabelType.GroundTruth, text
+
+        self._store.add_annotations(_iter_ground_truth())
+        self._store.add_images(images)
+
+        for file_tag, file_path in self.dataset.files.items():
+            if not file_tag.startswith(f"{DatasetFileType.Prediction}/"):
+                continue
+
+            pred_name = file_tag.split("/", 1)[-1]
+            annotations = iter_json_arrays(file_path, {"annotations"})
+            self._store.add_annotations((obj["image_id"], pred_name, LabelType.Prediction, text)
+                                        for _, obj, text in annotations)
+
+        self._store.finish_loading()
+
+    def close_store(self):
+        if self._store is not None:
+            self._store.remove()
+            self._store = None
+
+    def load_source(self):
+        if self.should_stream():
+            self.stream_data()
+        else:
+            self.load_ground_truth()
+            self.load_predictions()
+            self.format_data()
+
+    def on_error(self, err: Exception):
+        try:
+            self.close_store()
+        finally:
+            super(COCO2017Importer, self).on_error(err)
+
+    def post_run(self):
+        try:
+            self.close_store()
+        finally:
+            super(COCO2017Importer, self).post_run()
+
+    def source_position(self) -> dict:
+        return {"image_idx": self._image_idx}
 
-        self.load_ground_truth()
-        self.load_predictions()
-        self.format_data()
+    def seek_source(self, position: dict):
+        self._image_idx = position["image_idx"]
+
+    def make_shards(self, position: dict = None) -> list:
+        """
+        Split the images sorted by id into ranges of shard_size images.
+        """
+
+        start = position["image_idx"] if position else 0
+        num_images = self._store.count_images() if self._store else len(self._images)
+        shards = []
+        for beg in range(start, num_images, self.shard_size):
+            end = min(beg + self.shard_size, num_images)
+            shards.append({"beg": beg, "end": end, "end_position": {"image_idx": end}})
+        return shards
+
+    def parse_shard(self, shard: dict):
+        self._image_idx = shard["beg"]
+        return self._iter_images(self._image_records(shard["beg"], shard["end"]))
+
+    def worker_state(self) -> dict:
+        state = super(COCO2017Importer, self).worker_state()
+        state.update(image_root=self.image_root,
+                     _images=self._images,
+                     _categories=self._categories,
+                     _annotations=self._annotations,
+                     # a new store for workers, they must not share the sqlite connection of this process
+                     _store=AnnotationStore(self._store.path) if self._store else None)
+        return state
 
     def __iter__(self) -> Tuple[Dict, List[Dict]]:
-        for coco_image_data in self._images:
+        return self._iter_images(self._image_records(self._image_idx))
+
+    def _image_records(self, beg: int, end: int = None) -> Iterable[Tuple[Dict, List[Dict]]]:
+        """
+        Iterate over coco images sorted by id from index beg to end, along with their coco annotations.
+        """
+
+        if self._store is not None:
+            yield from self._store.iter_images(beg, end)
+            return
+
+        for coco_image_data in self._images[beg:end]:
+            yield coco_image_data, self._annotations.get(coco_image_data["id"], [])
+
+    def _iter_images(self, records: Iterable[Tuple[Dict, List[Dict]]]) -> Tuple[Dict, List[Dict]]:
+        for coco_image_data, coco_anno_list in records:
+            self._image_idx += 1
             # data_sample = {"license"      : 2,
             #                "file_name"    : "000000000139.jpg",
             #                "coco_url"     : "http://images.cocodataset.org/val2017/000000000139.jpg",
@@ -162,7 +301,6 @@ class COCO2017Importer(FileImporter):
             #                "id"           : 139}
 
             image_id = coco_image_data["id"]
-            coco_anno_list = self._annotations.get(image_id, [])
             # list_sample = [
             #     {
             #       'segmentation'  : [
@@ -248,19 +386,9 @@ class COCO2017Importer(FileImporter):
                         keypoint_colors = [item for sublist in keypoint_colors for item in sublist]
 
                     if label_type == LabelType.GroundTruth:
-                        length = len(raw_keypoints) // 3
-                        for idx in range(length):
-                            idx *= 3
-                            conf = 1.0
-                            x, y, v = raw_keypoints[idx], raw_keypoints[idx + 1], raw_keypoints[idx + 2]
-                            keypoints.extend([float(x), float(y), int(v), conf])  # x, y, v, conf
+                        keypoints = _format_keypoints(raw_keypoints, 3)
                     elif label_type == LabelType.Prediction:
-                        length = len(raw_keypoints) // 4
-                        for idx in range(length):
-                            idx *= 4
-                            x, y, v, conf = raw_keypoints[idx], raw_keypoints[idx + 1], raw_keypoints[idx + 2], \
-                                raw_keypoints[idx + 3]
-                            keypoints.extend([float(x), float(y), int(v), conf])  # x, y, v, conf
+                        keypoints = _format_keypoints(raw_keypoints, 4)
 
                 # prepare is_group
                 is_group = anno_data.pop("is_group", None)
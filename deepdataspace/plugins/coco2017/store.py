@@ -0,0 +1,154 @@
+"""
+deepdataspace.plugins.coco2017.store
+
+The on-disk store of coco images and annotations, for importing coco files larger than memory.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+from itertools import islice
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+logger = logging.getLogger("plugins.coco.store")
+
+
+class AnnotationStore:
+    """
+    | A sqlite file of coco images and their annotations, spilled by streaming the coco json files.
+    | Images are read back in the order of image id, each with its annotations merged in the order they are added,
+      so that the memory of importing is bounded by a page of images instead of the whole dataset.
+    | The store is pickled by its path, so parse workers of the pipelined import read the same file.
+    """
+
+    batch_size = 10000  # the number of rows to insert at a time
+    page_size = 1000  # the number of images to read at a time
+
+    def __init__(self, path: str = None):
+        """
+        :param path: the sqlite file path, a temporary file is created if it's None.
+        """
+
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="dds-coco-", suffix=".sqlite")
+            os.close(fd)
+        self.path = path
+        self._conn = None
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict):
+        self.path = state["path"]
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode = OFF")
+            self._conn.execute("PRAGMA synchronous = OFF")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS images (id PRIMARY KEY, data TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS annotations "
+                               "(image_id, label_name TEXT, label_type TEXT, data TEXT)")
+        return self._conn
+
+    def _insert(self, sql: str, rows: Iterable[tuple]):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.conn.executemany(sql, batch)
+
+    def add_images(self, images: Iterable[Tuple[object, str]]):
+        """
+        Add images, an image replaces the previous one of the same id.
+
+        :param images: an iterable of (image id, image json).
+        """
+
+        self._insert("INSERT OR REPLACE INTO images (id, data) VALUES (?, ?)", images)
+
+    def add_annotations(self, annotations: Iterable[Tuple[object, str, str, str]]):
+        """
+        Add annotations.
+
+        :param annotations: an iterable of (image id, label name, label type, annotation json).
+        """
+
+        self._insert("INSERT INTO annotations (image_id, label_name, label_type, data) VALUES (?, ?, ?, ?)",
+                     annotations)
+
+    def finish_loading(self):
+        """
+        Index annotations by image id and commit, the index is built once after all rows are added.
+        """
+
+        self.conn.execute("CREATE INDEX IF NOT EXISTS annotations_image_id ON annotations (image_id)")
+        self.conn.commit()
+
+    def count_images(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def iter_images(self, beg: int = 0, end: int = None) -> Iterator[Tuple[Dict, List[Dict]]]:
+        """
+        Iterate over images sorted by id, along with their annotations.
+
+        :param beg: the index of the first image.
+        :param end: the index after the last image, None for all the rest.
+        :return: an iterator of (image, [annotation...]), every annotation has its label_name and label_type.
+        """
+
+        remaining = None if end is None else end - beg
+        last_id = None
+        while remaining is None or remaining > 0:
+            size = self.page_size if remaining is None else min(self.page_size, remaining)
+            if last_id is None:
+                sql = "SELECT id, data FROM images ORDER BY id LIMIT ? OFFSET ?"
+                rows = self.conn.execute(sql, (size, beg)).fetchall()
+            else:
+                sql = "SELECT id, data FROM images WHERE id > ? ORDER BY id LIMIT ?"
+                rows = self.conn.execute(sql, (last_id, size)).fetchall()
+            if not rows:
+                return
+
+            annotations = {}
+            sql = "SELECT image_id, label_name, label_type, data FROM annotations " \
+                  "WHERE image_id >= ? AND image_id <= ? ORDER BY image_id, rowid"
+            for image_id, label_name, label_type, data in self.conn.execute(sql, (rows[0][0], rows[-1][0])):
+                annotation = json.loads(data)
+                annotation["label_name"] = label_name
+                annotation["label_type"] = label_type
+                annotations.setdefault(image_id, []).append(annotation)
+
+            for image_id, data in rows:
+                yield json.loads(data), annotations.get(image_id, [])
+
+            last_id = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def remove(self):
+        """
+        Close and delete the sqlite file.
+        """
+
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as err:
+            logger.warning(f"Failed to remove the coco store {self.path}: {err}")
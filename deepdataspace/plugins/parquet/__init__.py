@@ -0,0 +1,7 @@
+"""
+deepdataspace.plugins.parquet
+
+This module supports datasets of parquet and arrow tables.
+"""
+
+from deepdataspace.plugins.parquet.importer import ParquetImporter
@@ -0,0 +1,411 @@
+"""
+Import the datasets of parquet or arrow tables and save metadata into mongodb.
+"""
+
+import logging
+import os
+from functools import lru_cache
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Tuple
+
+from deepdataspace.constants import DatasetFileType
+from deepdataspace.constants import DatasetType
+from deepdataspace.constants import LabelName
+from deepdataspace.constants import LabelType
+from deepdataspace.io.importer import FileImporter
+
+logger = logging.getLogger("plugins.parquet.importer")
+
+_TABLE_EXTS = [".parquet", ".arrow", ".feather"]  # parquet files, and arrow ipc files or streams
+_IMAGE_TABLE = "images"  # the name of the image table, the other tables are box tables
+_IMAGE_COLUMNS = ["image_id", "url"]  # required columns of the image table
+_BOX_COLUMNS = ["image_id", "category", "x", "y", "w", "h"]  # required columns of box tables
+_BATCH_SIZE = 1024 * 1024  # the max number of rows in a batch read from a box table
+
+
+@lru_cache(maxsize=None)
+def arrow_available() -> bool:
+    """
+    Tables are read by pyarrow, which is an optional dependency, it warns once if pyarrow is not installed.
+    """
+
+    try:
+        import pyarrow  # noqa
+    except ImportError:
+        logger.warning("pyarrow is not installed, datasets of parquet or arrow tables can't be imported, "
+                       "install it by: pip install pyarrow")
+        return False
+    return True
+
+
+def _read_ipc_batches(path: str) -> list:
+    """
+    Read the record batches of an arrow ipc file or stream, they are zero-copy views of the mapped file.
+    """
+
+    import pyarrow as pa
+
+    source = pa.memory_map(path)
+    try:
+        reader = pa.ipc.open_file(source)
+        return [reader.get_batch(idx) for idx in range(reader.num_record_batches)]
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return list(pa.ipc.open_stream(source))
+
+
+def read_table(path: str):
+    """
+    Read a parquet or arrow table as a pyarrow.Table.
+    """
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith(".parquet"):
+        return pq.read_table(path)
+    return pa.Table.from_batches(_read_ipc_batches(path))
+
+
+def iter_table_batches(path: str, columns: List[str]) -> Iterable:
+    """
+    Iterate over a parquet or arrow table by record batches, only the columns are read.
+    A parquet table is read by row groups, a batch never holds more than _BATCH_SIZE rows.
+    """
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith(".parquet"):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=_BATCH_SIZE, columns=columns)
+        return
+
+    for batch in _read_ipc_batches(path):
+        yield pa.RecordBatch.from_arrays([batch.column(name) for name in columns], names=columns)
+
+
+def table_columns(path: str) -> List[str]:
+    """
+    The column names of a parquet or arrow table, read from its schema.
+    """
+
+    import pyarrow.parquet as pq
+
+    if path.endswith(".parquet"):
+        return pq.ParquetFile(path).schema_arrow.names
+    batches = _read_ipc_batches(path)
+    return batches[0].schema.names if batches else []
+
+
+def _encode_column(column, codes: Dict[str, int]):
+    """
+    Encode the values of a string column to integer codes, with a numpy array as the result.
+    New values are added to codes, {value: code}, so codes are shared by all batches, nulls are encoded as -1.
+    """
+
+    import numpy as np
+    import pyarrow.compute as pc
+
+    encoded = pc.dictionary_encode(column)
+    values = encoded.dictionary.to_pylist()
+    mapping = np.array([codes.setdefault(value, len(codes)) for value in values] + [-1], dtype=np.int32)
+    indices = encoded.indices.fill_null(len(values)).to_numpy()
+    return mapping[indices]
+
+
+class _ImageIndex:
+    """
+    Find the positions of image ids in the sorted image ids, by a lookup table if the ids are dense enough,
+    which is much faster than the binary search on large tables.
+    """
+
+    def __init__(self, image_ids):
+        import numpy as np
+
+        self.image_ids = image_ids
+        self.lookup = None
+        span = int(image_ids[-1] - image_ids[0]) + 1 if len(image_ids) else 0
+        if 0 < span <= 4 * len(image_ids) + _BATCH_SIZE:
+            self.lookup = np.full(span, -1, dtype=np.int64)
+            self.lookup[image_ids - image_ids[0]] = np.arange(len(image_ids))
+
+    def positions(self, ids):
+        """
+        The positions of ids, -1 for unknown ids.
+        """
+
+        import numpy as np
+
+        image_ids = self.image_ids
+        if not len(image_ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+
+        if self.lookup is not None:
+            offsets = ids - image_ids[0]
+            inside = (offsets >= 0) & (offsets < len(self.lookup))
+            return np.where(inside, self.lookup[np.clip(offsets, 0, len(self.lookup) - 1)], -1)
+
+        pos = np.minimum(np.searchsorted(image_ids, ids), len(image_ids) - 1)
+        return np.where(image_ids[pos] == ids, pos, -1)
+
+
+def _float_column(column, null_value: float):
+    import pyarrow as pa
+
+    return column.cast(pa.float64()).fill_null(null_value).to_numpy()
+
+
+class ParquetImporter(FileImporter):
+    """
+    | Importer for datasets of columnar tables, which is a directory of parquet (``.parquet``)
+      or arrow ipc (``.arrow``, ``.feather``) tables, an image table named ``images``, and any number of box tables.
+    | The image table has one row per image, with the columns of:
+      ``image_id`` (integer), ``url`` (a path relative to the directory, an absolute path, or an http url),
+      and optionally ``width`` and ``height``. The other columns are saved as the image metadata.
+    | Every other table is a box table, with one row per box, joined to images by ``image_id``, with the columns of:
+      ``category``, ``x``, ``y``, ``w``, ``h`` in pixels, optionally ``score``,
+      and optionally ``label_set``, the label name of the box. Boxes of the GroundTruth label set,
+      or without a label set, are ground truth, the others are predictions.
+    | Box tables are read by batches of row groups, and boxes are grouped by image with vectorized sorting,
+      only boxes of the images being imported are converted to python objects.
+      This requires pyarrow, which is an optional dependency.
+    """
+
+    priority = 10  # tried before the webdataset importer, see FileImporter.priority
+
+    def __init__(self, dataset_path: str, enforce: bool = False):
+        """
+        :param dataset_path: path to the directory of tables.
+        :param enforce: if True, the importer will re-import the dataset even if it is already imported.
+        """
+
+        if not arrow_available():
+            raise RuntimeError(f"Cannot import dataset {dataset_path}, pyarrow is not installed")
+
+        dataset_path = os.path.abspath(dataset_path)
+        self.tables = self.list_tables(dataset_path)
+        super(ParquetImporter, self).__init__(dataset_path, enforce=enforce)
+
+        self.dataset.type = DatasetType.Parquet
+        self._images = None  # the image table sorted by image_id
+        self._bounds = None  # boxes of the image at idx i are boxes[bounds[i]:bounds[i + 1]]
+        self._boxes = {}  # {column: numpy array} of all boxes sorted by image, see load_boxes
+        self._categories = []  # category names by category code
+        self._labels = []  # label names by label code
+        self._image_idx = 0  # the index of the next image to read in self._images
+
+    @staticmethod
+    def list_tables(path: str) -> Dict[str, str]:
+        """
+        The tables in a directory, {table_name: table_path}, the table name is the file name without extension.
+        """
+
+        tables = {}
+        for item in sorted(os.listdir(path)):
+            name, ext = os.path.splitext(item)
+            if ext in _TABLE_EXTS:
+                tables.setdefault(name, os.path.join(path, item))
+        return tables
+
+    def load_images(self):
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        image_path = self.tables[_IMAGE_TABLE]
+        images = read_table(image_path)
+        missing = [name for name in _IMAGE_COLUMNS if name not in images.column_names]
+        if missing:
+            raise RuntimeError(f"Image table {image_path} misses columns {missing}")
+
+        # values of these types are not json serializable as metadata
+        for field in images.schema:
+            if pa.types.is_temporal(field.type) or pa.types.is_decimal(field.type):
+                column = images.column(field.name).cast(pa.string())
+                images = images.set_column(images.schema.get_field_index(field.name), field.name, column)
+            elif pa.types.is_binary(field.type) or pa.types.is_large_binary(field.type):
+                logger.warning(f"Binary column {field.name} of image table {image_path} is not imported")
+                images = images.drop([field.name])
+
+        images = images.filter(pc.and_(pc.is_valid(images.column("image_id")), pc.is_valid(images.column("url"))))
+        image_ids = images.column("image_id").cast(pa.int64()).to_numpy()
+        image_ids, rows = np.unique(image_ids, return_index=True)  # sorted ids, and the first row of every id
+        if len(rows) < images.num_rows:
+            logger.warning(f"{images.num_rows - len(rows)} images of duplicated image_id are skipped")
+
+        self._images = images.take(rows)
+        return image_ids
+
+    def load_boxes(self, image_ids):
+        """
+        Read boxes of all box tables by batches, and sort them by the position of their images in self._images.
+        """
+
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        categories = {}  # {category_name: category_code}
+        labels = {LabelName.GroundTruth: 0}  # {label_name: label_code}
+        chunks = {"pos"     : [np.zeros(0, dtype=np.int64)],
+                  "category": [np.zeros(0, dtype=np.int32)],
+                  "label"   : [np.zeros(0, dtype=np.int32)],
+                  "bbox"    : [np.zeros((0, 4), dtype=np.float64)],
+                  "score"   : [np.zeros(0, dtype=np.float64)]}
+
+        image_index = _ImageIndex(image_ids)
+        num_skipped = 0
+        for name, path in self.tables.items():
+            if name == _IMAGE_TABLE:
+                continue
+
+            table_names = table_columns(path)
+            missing = [column for column in _BOX_COLUMNS if column not in table_names]
+            if missing:
+                raise RuntimeError(f"Box table {path} misses columns {missing}")
+            columns = _BOX_COLUMNS + [column for column in ["score", "label_set"] if column in table_names]
+
+            for batch in iter_table_batches(path, columns):
+                ids = batch.column(0).cast(pa.int64())
+                valid = pc.is_valid(ids).to_numpy(zero_copy_only=False)
+                ids = ids.fill_null(0).to_numpy()
+
+                pos = image_index.positions(ids)  # join boxes to images by image_id
+                valid = valid & (pos >= 0)
+
+                category = _encode_column(batch.column(1).cast(pa.string()), categories)
+                valid = valid & (category >= 0)
+                bbox = np.stack([_float_column(batch.column(idx), np.nan) for idx in range(2, 6)], axis=1)
+
+                if "score" in columns:
+                    score = _float_column(batch.column(columns.index("score")), 1.0)
+                else:
+                    score = np.ones(batch.num_rows, dtype=np.float64)
+
+                if "label_set" in columns:
+                    label_set = batch.column(columns.index("label_set")).cast(pa.string())
+                    label = _encode_column(label_set.fill_null(LabelName.GroundTruth), labels)
+                else:
+                    label = np.zeros(batch.num_rows, dtype=np.int32)
+
+                num_skipped += int(batch.num_rows - valid.sum())
+                for key, value in [("pos", pos), ("category", category), ("label", label),
+                                   ("bbox", bbox), ("score", score)]:
+                    chunks[key].append(value[valid])
+
+        if num_skipped:
+            logger.warning(f"{num_skipped} boxes of unknown images or without category are skipped")
+
+        pos = np.concatenate(chunks.pop("pos"))
+        order = np.argsort(pos, kind="stable")  # boxes of an image keep the order in the tables
+        self._bounds = np.concatenate([[0], np.cumsum(np.bincount(pos, minlength=len(image_ids)))])
+        self._boxes = {key: np.concatenate(value)[order] for key, value in chunks.items()}
+        self._categories = list(categories.keys())
+        self._labels = list(labels.keys())
+
+    def load_source(self):
+        image_ids = self.load_images()
+        self.load_boxes(image_ids)
+
+    def load_image(self, row: dict) -> Dict:
+        image_id = row.pop("image_id")
+        uri = row.pop("url")
+        if not uri.startswith("http://") and not uri.startswith("https://"):
+            uri = f"file://{os.path.join(self.path, uri)}"
+
+        width = row.pop("width", None)
+        height = row.pop("height", None)
+        return self.format_image_data(uri, width=width, height=height, id_=image_id, metadata=row)
+
+    def _iter_images(self, beg: int, end: int) -> Iterable[Tuple[Dict, List[Dict]]]:
+        """
+        Iterate over images from index beg to end, rows and boxes are converted to python objects by shard_size images.
+        """
+
+        import numpy as np
+
+        for batch_beg in range(beg, end, self.shard_size):
+            batch_end = min(batch_beg + self.shard_size, end)
+            rows = self._images.slice(batch_beg, batch_end - batch_beg).to_pylist()
+
+            bounds = self._bounds[batch_beg:batch_end + 1]
+            box_beg, box_end = int(bounds[0]), int(bounds[-1])
+            bounds = (bounds - box_beg).tolist()
+            categories = self._boxes["category"][box_beg:box_end].tolist()
+            labels = self._boxes["label"][box_beg:box_end].tolist()
+            bbox_values = self._boxes["bbox"][box_beg:box_end]
+            bboxes = bbox_values.tolist()
+            bbox_valid = (~np.isnan(bbox_values).any(axis=1)).tolist()
+            scores = self._boxes["score"][box_beg:box_end].tolist()
+
+            for offset, row in enumerate(rows):
+                self._image_idx = batch_beg + offset + 1
+                image = self.load_image(row)
+
+                anno_list = []
+                for idx in range(bounds[offset], bounds[offset + 1]):
+                    label_name = self._labels[labels[idx]]
+                    if label_name == LabelName.GroundTruth:
+                        label_type, conf = LabelType.GroundTruth, 1.0
+                    else:
+                        label_type, conf = LabelType.Prediction, scores[idx]
+                    bbox = tuple(bboxes[idx]) if bbox_valid[idx] else None
+                    anno = self.format_annotation(self._categories[categories[idx]],
+                                                  label=label_name, label_type=label_type,
+                                                  conf=conf, bbox=bbox)
+                    anno_list.append(anno)
+
+                yield image, anno_list
+
+    def __iter__(self) -> Tuple[Dict, List[Dict]]:
+        return self._iter_images(self._image_idx, self._images.num_rows)
+
+    def source_position(self) -> dict:
+        return {"image_idx": self._image_idx}
+
+    def seek_source(self, position: dict):
+        self._image_idx = position["image_idx"]
+
+    def make_shards(self, position: dict = None) -> list:
+        """
+        Split the images sorted by image_id into ranges of shard_size images.
+        """
+
+        start = position["image_idx"] if position else 0
+        num_images = self._images.num_rows
+        shards = []
+        for beg in range(start, num_images, self.shard_size):
+            end = min(beg + self.shard_size, num_images)
+            shards.append({"beg": beg, "end": end, "end_position": {"image_idx": end}})
+        return shards
+
+    def parse_shard(self, shard: dict):
+        return self._iter_images(shard["beg"], shard["end"])
+
+    def worker_state(self) -> dict:
+        state = super(ParquetImporter, self).worker_state()
+        state.update(path=self.path,
+                     shard_size=self.shard_size,
+                     _images=self._images,
+                     _bounds=self._bounds,
+                     _boxes=self._boxes,
+                     _categories=self._categories,
+                     _labels=self._labels)
+        return state
+
+    @staticmethod
+    def can_import(path: str):
+        if not os.path.isdir(path):
+            return False
+        if _IMAGE_TABLE not in ParquetImporter.list_tables(path):
+            return False
+        return arrow_available()
+
+    def collect_files(self) -> dict:
+        files = {}
+        for name, path in self.tables.items():
+            tag = DatasetFileType.GroundTruth if name == _IMAGE_TABLE else f"{DatasetFileType.GroundTruth}/{name}"
+            files[tag] = path
+        return files
@@ -5,7 +5,6 @@ Import the tsv dataset and save metadata into mongodb.
 import json
 import logging
 import os
-import re
 import traceback
 from typing import Dict
 from typing import List
@@ -17,8 +16,11 @@ from deepdataspace.constants import DatasetType
 from deepdataspace.constants import LabelName
 from deepdataspace.constants import LabelType
 from deepdataspace.constants import DatasetFileType
+from deepdataspace.environs import IMPORT_PROBE_THREADS
 from deepdataspace.io.importer import FileImporter
+from deepdataspace.plugins.tsv.reader import TSVReader
 from deepdataspace.utils.file import create_file_range_url
+from deepdataspace.utils.image_size import read_base64_image_size
 
 logger = logging.getLogger("plugins.tsv.importer")
 
@@ -28,6 +30,8 @@ class TSVImporter(FileImporter):
     Importer for tsv dataset.
     """
 
+    parse_version = 2  # offsets are byte offsets of the mapped files, see TSVReader
+
     def __init__(self, dataset_path: str, enforce: bool = False):
         """
         :param dataset_path: path to a tsv dataset.
@@ -45,7 +49,7 @@ class TSVImporter(FileImporter):
         for file_tag, file_path in self.dataset.files.items():
             if file_tag == DatasetFileType.GroundTruth or file_tag.startswith(f"{DatasetFileType.Prediction}/"):
                 self._files[file_tag] = {
-                    "fp": open(file_path, "r", encoding="utf8"),
+                    "reader": TSVReader(file_path),
                     "line_idx": 0,
                     "byte_idx": 0,
                     "path": file_path
@@ -58,9 +62,9 @@ class TSVImporter(FileImporter):
     def close_files(self):
         for file in self._files.values():
             try:
-                fp = file.get("fp", None)
-                if fp is not None:
-                    fp.close()
+                reader = file.get("reader", None)
+                if reader is not None:
+                    reader.close()
             except Exception as err:
                 logger.error(traceback.format_tb(err.__traceback__))
                 logger.error(str(err))
@@ -88,10 +92,11 @@ class TSVImporter(FileImporter):
                      label_type: str,
                      objects: list,
                      image_data_off: int,
-                     image_data_str: str,
+                     image_data: bytes,
                      file_path: str,
                      line_idx: int) -> List[Dict]:
         obj_list = []
+        alpha_pos = 0  # alpha payloads appear in the order of objects, each one is searched after the previous one
 
         warned_seg = False
         for obj_idx, obj in enumerate(objects):
@@ -135,23 +140,20 @@ class TSVImporter(FileImporter):
             # prepare alpha matting
             alpha = obj.get("alpha", None)
             if alpha is not None:
-                pattern_length = 6
-                pattern = alpha[:pattern_length]
-                while True:
-                    result = list(re.finditer(pattern, image_data_str))
-                    if len(result) > 1:
-                        pattern_length += 2
-                    else:
-                        result = result[0]
-                        break
-
-                beg_pos = image_data_off + result.start()
-                end_pos = beg_pos + len(alpha)
-                alpha = create_file_range_url(file_path=file_path,
-                                              file_encoding=ContentEncoding.Base64,
-                                              beg_pos=beg_pos,
-                                              end_pos=end_pos,
-                                              file_mime="image/png")
+                alpha_bytes = alpha.encode("utf8")
+                alpha_off = image_data.find(alpha_bytes, alpha_pos)
+                if alpha_off < 0:  # the payload is escaped in json, so it can't be served from the file
+                    logger.warning(f"[{file_path}@{line_idx}] alpha of object {obj_idx} is not found, skip it")
+                    alpha = None
+                else:
+                    alpha_pos = alpha_off + len(alpha_bytes)
+                    beg_pos = image_data_off + alpha_off
+                    end_pos = image_data_off + alpha_pos
+                    alpha = create_file_range_url(file_path=file_path,
+                                                  file_encoding=ContentEncoding.Base64,
+                                                  beg_pos=beg_pos,
+                                                  end_pos=end_pos,
+                                                  file_mime="image/png")
 
             # prepare is_group
             is_group = bool(obj.get("iscrowd", False))
@@ -171,27 +173,36 @@ class TSVImporter(FileImporter):
 
     @staticmethod
     def read_line(file_data: dict):
+        """
+        | Read the next line of a tsv file, its columns are image id, image data in json, and image content.
+        | Return the image data bytes, the (beg, end) byte offsets of the image content,
+          the line index, the byte offset of the line, and the byte offset of the image data.
+          The image content is not read, as it's usually a large base64 string served from the file by its offsets.
+        """
+
         line_idx = file_data["line_idx"]
         byte_idx = file_data["byte_idx"]
 
-        line = file_data["fp"].readline()
-        if len(line) == 0:
+        reader = file_data["reader"]
+        columns, next_pos = reader.read_columns(byte_idx)
+        if columns is None:
             return None, None, -1, -1, -1
         file_data["line_idx"] += 1
-        file_data["byte_idx"] += len(line)
+        file_data["byte_idx"] = next_pos
 
-        image_id, image_data_str, image_content_str = line.split("\t")
-        image_data_off = byte_idx + len(image_id) + 1
-        return image_data_str, image_content_str, line_idx, byte_idx, image_data_off
+        _, (data_beg, data_end), content_span = columns
+        image_data = reader.read(data_beg, data_end)
+        return image_data, content_span, line_idx, byte_idx, data_beg
 
     def load_groundtruth(self) -> Tuple[Union[Dict, None], Union[List[Dict], None]]:
         file = self._files[DatasetFileType.GroundTruth]
-        image_data_str, image_content_str, line_idx, byte_idx, image_data_off = self.read_line(file)
-        if image_data_str is None:
+        image_data_bytes, content_span, line_idx, byte_idx, image_data_off = self.read_line(file)
+        if image_data_bytes is None:
             return None, None
 
         file_path = file["path"]
-        image_data = json.loads(image_data_str)
+        reader = file["reader"]
+        image_data = json.loads(image_data_bytes)
 
         # prepare image metadata
         metadata = image_data.get("metadata", {})
@@ -199,14 +210,18 @@ class TSVImporter(FileImporter):
         image_height = metadata.get("height", None)
 
         # prepare image url
-        content_offset = image_data_off + len(image_data_str) + 1
-        content_length = len(image_content_str)
-        if image_content_str.startswith("http://") or image_content_str.startswith("https://"):
-            image_url = image_content_str
+        content_beg, content_end = content_span
+        content_head = reader.read(content_beg, min(content_end, content_beg + 8))
+        if content_head.startswith(b"http://") or content_head.startswith(b"https://"):
+            image_url = reader.read(content_beg, content_end).decode("utf8")
         else:
+            # the image is embedded in the line, so its size can be probed from the header bytes
+            if (image_width is None or image_height is None) and IMPORT_PROBE_THREADS > 0:
+                image_content = reader.read(content_beg, content_end)
+                image_width, image_height = read_base64_image_size(image_content) or (image_width, image_height)
             image_url = create_file_range_url(file_path=file_path,
                                               file_encoding=ContentEncoding.Base64,
-                                              beg_pos=content_offset, end_pos=content_offset + content_length,
+                                              beg_pos=content_beg, end_pos=content_end,
                                               file_mime="image/jpeg",
                                               )
 
@@ -218,25 +233,25 @@ class TSVImporter(FileImporter):
         # add annotations
         objects = image_data.get("objects", [])
         objects = self.load_objects(image, LabelName.GroundTruth, LabelType.GroundTruth,
-                                    objects, image_data_off, image_data_str,
+                                    objects, image_data_off, image_data_bytes,
                                     file_path, line_idx)
 
         return image, objects
 
-    def load_prediction(self, image: Dict, pred_name: str):
+    def load_prediction(self, image: Dict, pred_name: str) -> List[Dict]:
         file = self._files[pred_name]
-        image_data_str, image_content_str, line_idx, byte_idx, image_data_off = self.read_line(file)
-        if image_data_str is None:
-            return
+        image_data_bytes, _, line_idx, byte_idx, image_data_off = self.read_line(file)
+        if image_data_bytes is None:  # the prediction file is shorter than the ground truth
+            return []
 
         file_path = file["path"]
         pred_name = pred_name.split("/")[-1]
-        image_data = json.loads(image_data_str)
+        image_data = json.loads(image_data_bytes)
 
         # add annotations
         objects = image_data.get("objects", [])
         objects = self.load_objects(image, pred_name, LabelType.Prediction,
-                                    objects, image_data_off, image_data_str,
+                                    objects, image_data_off, image_data_bytes,
                                     file_path, line_idx)
         return objects
 
@@ -259,6 +274,120 @@ class TSVImporter(FileImporter):
             objects.extend(pred_objects)
             yield image, objects
 
+    def source_position(self) -> dict:
+        """
+        The line index and the byte offsets of the next line to read in the ground truth and prediction files.
+        """
+
+        offsets = {file_tag: file["byte_idx"] for file_tag, file in self._files.items() if "reader" in file}
+        return {"line_idx": self._files[DatasetFileType.GroundTruth]["line_idx"], "offsets": offsets}
+
+    def seek_source(self, position: dict):
+        for file_tag, offset in position["offsets"].items():
+            file = self._files[file_tag]
+            # a prediction file shorter than the ground truth file is read from its end
+            offset = file["reader"].size if offset is None else offset
+            file["line_idx"] = position["line_idx"]
+            file["byte_idx"] = offset
+
+    @staticmethod
+    def _scan_line_offsets(file_path: str, step: int, start: int = 0) -> Tuple[List[int], int, int]:
+        """
+        Get the byte offset of every step lines of a file, by its line index, see TSVReader.line_offsets.
+
+        :param start: begin with the line at this byte offset.
+        :return: the offsets, the number of lines since start, and the byte offset of the end of file.
+        """
+
+        import numpy as np
+
+        with TSVReader(file_path) as reader:
+            line_offsets = reader.line_offsets()
+            start_line = int(np.searchsorted(line_offsets, start))
+            offsets = line_offsets[start_line::step].tolist()
+            return offsets, len(line_offsets) - start_line, reader.size
+
+    def make_shards(self, position: dict = None, shard_size: int = None) -> list:
+        """
+        | Split the tsv files by line ranges.
+        | Line N of every prediction file is the prediction of line N of the ground truth file,
+          so a shard holds the byte offsets of the same line in all of them.
+
+        :param position: split from this source position, see source_position.
+        :param shard_size: the number of lines of a shard, defaults to the shard_size of the importer.
+        """
+
+        shard_size = shard_size or self.shard_size
+        start_line = position["line_idx"] if position else 0
+        start_offsets = position["offsets"] if position else {}
+
+        file_offsets = {}
+        end_offsets = {}
+        num_lines = 0
+        for file_tag, file_path in self.dataset.files.items():
+            if file_tag == DatasetFileType.GroundTruth or file_tag.startswith(f"{DatasetFileType.Prediction}/"):
+                start = start_offsets.get(file_tag, 0)
+                if start is None:  # a prediction file read to its end
+                    file_offsets[file_tag], end_offsets[file_tag] = [], None
+                    continue
+
+                offsets, tag_lines, end = self._scan_line_offsets(file_path, shard_size, start)
+                file_offsets[file_tag], end_offsets[file_tag] = offsets, end
+                if file_tag == DatasetFileType.GroundTruth:
+                    num_lines = tag_lines
+
+        shards = []
+        for shard_idx in range(len(file_offsets[DatasetFileType.GroundTruth])):
+            offsets = {}
+            for file_tag, tag_offsets in file_offsets.items():
+                # a prediction file shorter than the ground truth file is read from its end
+                offsets[file_tag] = tag_offsets[shard_idx] if shard_idx < len(tag_offsets) else None
+            line_idx = start_line + shard_idx * shard_size
+            shards.append({"line_idx": line_idx, "num_lines": shard_size, "offsets": offsets})
+
+        # a shard ends where the next one begins, and the last one ends at the end of files
+        for shard, next_shard in zip(shards, shards[1:]):
+            shard["end_position"] = {"line_idx": next_shard["line_idx"], "offsets": next_shard["offsets"]}
+        if shards:
+            shards[-1]["end_position"] = {"line_idx": start_line + num_lines, "offsets": end_offsets}
+        return shards
+
+    def make_ranges(self, num_ranges: int) -> list:
+        """
+        | Split the tsv files into line ranges of at least shard_size lines, by the line index of the ground truth file.
+        | Images are identified by their line index, so the images of a range are the ids of its lines,
+          and their idx are pre-assigned as the same line index.
+        """
+
+        with TSVReader(self.path) as reader:
+            num_lines = len(reader.line_offsets())
+        range_size = max(self.shard_size, -(-num_lines // num_ranges))
+        ranges = self.make_shards(shard_size=range_size)
+        if len(ranges) <= 1:
+            return []
+
+        for range_, next_range in zip(ranges, ranges[1:] + [None]):
+            range_["idx"] = range_["line_idx"]
+            range_["ids"] = [range_["line_idx"], next_range["line_idx"] if next_range else None]
+        return ranges
+
+    def parse_shard(self, shard: dict):
+        self._files = {}
+        self.open_files()
+        self.seek_source(shard)
+
+        try:
+            for _ in range(shard["num_lines"]):
+                image, objects = self.load_groundtruth()
+                if image is None:
+                    break
+
+                pred_objects = self.load_predictions(image)
+                objects.extend(pred_objects)
+                yield image, objects
+        finally:
+            self.close_files()
+
     @staticmethod
     def can_import(path: str):
         if os.path.isdir(path):
@@ -9,11 +9,9 @@ import json
 import logging
 from typing import List
 
-import numpy as np
-
+from deepdataspace.model._base import BatchWriter
 from deepdataspace.model.image import Image
 from deepdataspace.constants import DatasetType
-from deepdataspace.algos.refine_by_seed import refine
 from deepdataspace.process.processor import BaseProcessor
 
 logger = logging.getLogger("plugins.tsv.process")
@@ -33,6 +31,11 @@ class RankByFlags(BaseProcessor):
         return self.dataset.type == DatasetType.TSV
 
     def process_dataset(self):
+        # the ranking algorithm is imported only when it runs, which keeps plugin loading cheap
+        import numpy as np
+
+        from deepdataspace.algos.refine_by_seed import refine
+
         logger.info(f"process_dataset starts, dataset_id={self.dataset_id}, subset_name={self.dataset.name}")
 
         embd_file = self.dataset.files.get("Embedding", None)
@@ -42,8 +45,9 @@ class RankByFlags(BaseProcessor):
 
         # load seeds
         dataset = self.dataset
-        pos_ids = [img.id for img in Image(dataset.id).find_many({"flag": 1})]
-        neg_ids = [img.id for img in Image(dataset.id).find_many({"flag": 2})]
+        flags = Image(dataset.id).find_columns({"flag": {"$in": [1, 2]}}, ["image_id", "flag"], unwind=False)
+        pos_ids = flags["image_id"][flags["flag"] == 1].tolist()
+        neg_ids = flags["image_id"][flags["flag"] == 2].tolist()
 
         # load embeddings
         with open(embd_file, "r") as fp:
@@ -54,6 +58,7 @@ class RankByFlags(BaseProcessor):
         sorted_ids = refine(pos_ids, neg_ids, embeddings)
 
         # update idx field to rerank images
-        for new_idx, _id in enumerate(sorted_ids):
-            Image(dataset.id).batch_update({"id": int(_id)}, {"idx": int(new_idx)})
-        Image(dataset.id).finish_batch_update()
+        IModel = Image(dataset.id)
+        with BatchWriter(batch_size=1000, name=f"rank-{dataset.id}") as writer:
+            for new_idx, _id in enumerate(sorted_ids):
+                IModel.batch_update({"id": int(_id)}, {"idx": int(new_idx)}, writer=writer)
@@ -0,0 +1,151 @@
+"""
+deepdataspace.plugins.tsv.reader
+
+Read tsv dataset files by byte offsets, with a persistent index of line offsets.
+"""
+
+import logging
+import mmap
+import os
+import uuid
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+logger = logging.getLogger("plugins.tsv.reader")
+
+_INDEX_CHUNK_SIZE = 64 * 1024 * 1024  # the number of bytes scanned at once when building the line index
+
+
+class TSVReader:
+    """
+    | A tsv file mapped into memory, lines are split into columns by byte offsets,
+      so every offset is the exact byte offset in the file, whatever characters the lines contain.
+      Columns are only copied out when they are read, large image columns are never touched unless needed.
+    | The offset of every line is saved in a ``.lineidx`` file next to the tsv file, one offset per line,
+      so shards and random access of lines never scan the file again, see :meth:`line_offsets`.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: the tsv file path.
+        """
+
+        self.path = path
+        self.index_path = f"{os.path.splitext(path)[0]}.lineidx"
+        self._fp = open(path, "rb")
+        self.size = os.fstat(self._fp.fileno()).st_size
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self._offsets = None
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def read(self, beg: int, end: int) -> bytes:
+        """
+        Read the bytes in [beg, end) of the file.
+        """
+
+        return self._mm[beg:end]
+
+    def read_columns(self, pos: int) -> Tuple[Optional[List[Tuple[int, int]]], int]:
+        """
+        Split the line starting at pos into columns.
+        Return the (beg, end) byte offsets of every column, without the line break,
+        and the offset of the next line. The columns are None at the end of file.
+
+        :param pos: the byte offset of the line.
+        """
+
+        if pos >= self.size:
+            return None, self.size
+
+        mm = self._mm
+        end = mm.find(b"\n", pos)
+        next_pos = self.size if end < 0 else end + 1
+        end = self.size if end < 0 else end
+        if end > pos and mm[end - 1] == 13:  # \r\n
+            end -= 1
+
+        columns = []
+        beg = pos
+        tab = mm.find(b"\t", beg, end)
+        while tab >= 0:
+            columns.append((beg, tab))
+            beg = tab + 1
+            tab = mm.find(b"\t", beg, end)
+        columns.append((beg, end))
+        return columns, next_pos
+
+    def line_offsets(self):
+        """
+        The byte offset of every line as a numpy array, it's loaded from the .lineidx file,
+        or built by scanning the file and saved there if the index file is missing or older than the tsv file.
+        """
+
+        if self._offsets is None:
+            offsets = self._load_index()
+            if offsets is None:
+                offsets = self._build_index()
+                self._save_index(offsets)
+            self._offsets = offsets
+        return self._offsets
+
+    def line_offset(self, line_idx: int) -> int:
+        """
+        The byte offset of a line, for random access by read_columns.
+        """
+
+        return int(self.line_offsets()[line_idx])
+
+    def _load_index(self):
+        import numpy as np
+
+        try:
+            if os.path.getmtime(self.index_path) < os.path.getmtime(self.path):
+                return None
+            with open(self.index_path, "rb") as fp:
+                offsets = np.array(fp.read().split(), dtype=np.int64)
+        except (OSError, ValueError):
+            return None
+
+        # an index of another version of the file
+        if len(offsets) and (offsets[0] != 0 or offsets[-1] >= self.size):
+            return None
+        if not len(offsets) and self.size:
+            return None
+        return offsets
+
+    def _build_index(self):
+        import numpy as np
+
+        chunks = [np.zeros(1, dtype=np.int64)] if self.size else []
+        for beg in range(0, self.size, _INDEX_CHUNK_SIZE):
+            count = min(_INDEX_CHUNK_SIZE, self.size - beg)
+            data = np.frombuffer(self._mm, dtype=np.uint8, count=count, offset=beg)
+            chunks.append(np.flatnonzero(data == 10).astype(np.int64) + (beg + 1))
+            del data  # the mmap can't be closed while a view of it exists
+
+        offsets = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+        if len(offsets) and offsets[-1] == self.size:  # the line break of the last line
+            offsets = offsets[:-1]
+        return offsets
+
+    def _save_index(self, offsets):
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w") as fp:
+                fp.write("".join(f"{offset}\n" for offset in offsets.tolist()))
+            os.replace(tmp_path, self.index_path)
+        except OSError as err:
+            logger.warning(f"Failed to save line index {self.index_path}: {err}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,7 @@
+"""
+deepdataspace.plugins.voc
+
+This module supports pascal voc dataset format.
+"""
+
+from deepdataspace.plugins.voc.importer import VOCImporter
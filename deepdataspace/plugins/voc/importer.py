@@ -0,0 +1,169 @@
+"""
+Import the pascal voc dataset and save metadata into mongodb.
+"""
+
+import logging
+import os
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from xml.etree import ElementTree
+
+from deepdataspace.constants import DatasetType
+from deepdataspace.io.file_scan import read_files
+from deepdataspace.io.file_scan import scan_files
+from deepdataspace.io.importer import FileImporter
+
+logger = logging.getLogger("plugins.voc.importer")
+
+_ANNOTATION_DIR = "Annotations"
+_IMAGE_DIR = "JPEGImages"
+
+
+def _find_int(element: ElementTree.Element, path: str) -> Optional[int]:
+    value = element.findtext(path)
+    try:
+        return int(float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def _find_float(element: ElementTree.Element, path: str) -> Optional[float]:
+    value = element.findtext(path)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class VOCImporter(FileImporter):
+    """
+    | Importer for pascal voc dataset, which is a directory of ``Annotations/*.xml`` and ``JPEGImages/*.jpg``,
+      such as ``VOCdevkit/VOC2012``.
+    | Every xml file holds the annotations of an image::
+
+        <annotation>
+            <filename>2007_000027.jpg</filename>  <!-- the image file in JPEGImages -->
+            <size><width>486</width><height>500</height></size>
+            <object>
+                <name>person</name>
+                <bndbox><xmin>174</xmin><ymin>101</ymin><xmax>349</xmax><ymax>351</ymax></bndbox>
+            </object>
+        </annotation>
+
+    | Directories are listed and xml files are read in threads of DDS_IMPORT_SCAN_THREADS,
+      and parsed in the parse worker processes of DDS_IMPORT_WORKERS, images are imported in the order of xml paths.
+    """
+
+    priority = 20  # tried before directory importers of looser layouts, see FileImporter.priority
+
+    def __init__(self, dataset_path: str, enforce: bool = False):
+        """
+        :param dataset_path: path to the directory of Annotations and JPEGImages.
+        :param enforce: if True, the importer will re-import the dataset even if it is already imported.
+        """
+
+        super(VOCImporter, self).__init__(dataset_path, enforce=enforce)
+
+        self.dataset.type = DatasetType.VOC
+        self._annotations = []  # xml file paths relative to the annotation directory
+        self._image_idx = 0  # the index of the next image to read in self._annotations
+
+    def load_source(self):
+        annotation_dir = os.path.join(self.path, _ANNOTATION_DIR)
+        self._annotations = [os.path.relpath(path, annotation_dir) for path in scan_files(annotation_dir, [".xml"])]
+        logger.info(f"Found {len(self._annotations)} annotations of voc dataset {self.path}")
+
+    def parse_annotation(self, xml_path: str, content: bytes) -> Optional[Tuple[Dict, List[Dict]]]:
+        """
+        Parse the xml content of an image, return None if it's broken.
+        """
+
+        try:
+            root = ElementTree.fromstring(content)
+        except ElementTree.ParseError as err:
+            logger.warning(f"Failed to parse voc annotation {xml_path}: {err}")
+            return None
+
+        file_name = root.findtext("filename") or f"{os.path.splitext(os.path.basename(xml_path))[0]}.jpg"
+        image_path = os.path.join(self.path, _IMAGE_DIR, file_name.strip())
+        width = _find_int(root, "size/width") or None  # some tools save unknown sizes as 0
+        height = _find_int(root, "size/height") or None
+        image = self.format_image_data(f"file://{image_path}",
+                                       width=width, height=height,
+                                       metadata={"annotation": xml_path})
+
+        anno_list = []
+        for obj in root.iter("object"):
+            category_name = (obj.findtext("name") or "").strip()
+            if not category_name:
+                continue
+
+            bbox = None
+            coords = [_find_float(obj, f"bndbox/{name}") for name in ["xmin", "ymin", "xmax", "ymax"]]
+            if None not in coords:
+                xmin, ymin, xmax, ymax = coords
+                bbox = (xmin, ymin, xmax - xmin, ymax - ymin)
+
+            anno_list.append(self.format_annotation(category_name, bbox=bbox))
+        return image, anno_list
+
+    def _iter_images(self, beg: int, end: int) -> Iterable[Tuple[Dict, List[Dict]]]:
+        """
+        Iterate over images from index beg to end, xml files of shard_size images are read at once in threads.
+        """
+
+        annotation_dir = os.path.join(self.path, _ANNOTATION_DIR)
+        for batch_beg in range(beg, end, self.shard_size):
+            batch = self._annotations[batch_beg:min(batch_beg + self.shard_size, end)]
+            contents = read_files([os.path.join(annotation_dir, xml_path) for xml_path in batch])
+
+            for offset, (xml_path, content) in enumerate(zip(batch, contents)):
+                self._image_idx = batch_beg + offset + 1
+                record = self.parse_annotation(xml_path, content) if content is not None else None
+                if record is not None:
+                    yield record
+
+    def __iter__(self) -> Tuple[Dict, List[Dict]]:
+        return self._iter_images(self._image_idx, len(self._annotations))
+
+    def source_position(self) -> dict:
+        return {"image_idx": self._image_idx}
+
+    def seek_source(self, position: dict):
+        self._image_idx = position["image_idx"]
+
+    def make_shards(self, position: dict = None) -> list:
+        """
+        Split the xml files sorted by path into ranges of shard_size files.
+        """
+
+        start = position["image_idx"] if position else 0
+        shards = []
+        for beg in range(start, len(self._annotations), self.shard_size):
+            end = min(beg + self.shard_size, len(self._annotations))
+            shards.append({"beg": beg, "end": end, "end_position": {"image_idx": end}})
+        return shards
+
+    def parse_shard(self, shard: dict):
+        return self._iter_images(shard["beg"], shard["end"])
+
+    def worker_state(self) -> dict:
+        state = super(VOCImporter, self).worker_state()
+        state.update(path=self.path,
+                     shard_size=self.shard_size,
+                     _annotations=self._annotations)
+        return state
+
+    def open_parse_cache(self):
+        """
+        The stat of the dataset directory does not cover the xml files, so the parse cache is never used.
+        """
+
+        return None
+
+    @staticmethod
+    def can_import(path: str):
+        return os.path.isdir(os.path.join(path, _ANNOTATION_DIR)) and os.path.isdir(os.path.join(path, _IMAGE_DIR))
@@ -0,0 +1,7 @@
+"""
+deepdataspace.plugins.webdataset
+
+This module supports webdataset tar shards.
+"""
+
+from deepdataspace.plugins.webdataset.importer import WebDatasetImporter
@@ -0,0 +1,235 @@
+"""
+Import the webdataset tar shards and save metadata into mongodb.
+"""
+
+import json
+import logging
+import os
+import posixpath
+import tarfile
+from mimetypes import guess_type
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from deepdataspace.constants import DatasetType
+from deepdataspace.constants import FileReadMode
+from deepdataspace.constants import LabelName
+from deepdataspace.constants import LabelType
+from deepdataspace.constants import DatasetFileType
+from deepdataspace.environs import IMPORT_PROBE_THREADS
+from deepdataspace.io.importer import FileImporter
+from deepdataspace.utils.file import create_file_range_url
+from deepdataspace.utils.image_size import read_image_size
+
+logger = logging.getLogger("plugins.webdataset.importer")
+
+_IMAGE_EXTS = ["jpg", "jpeg", "png", "webp", "bmp", "gif"]  # the image of a sample is the first one found
+_MEMBER_CACHE_SIZE = 1000  # tarfile keeps every member read, they are dropped after this many members
+
+
+def _split_member_name(name: str) -> Tuple[str, str]:
+    """
+    Split a tar member name into the sample key and the extension by the first dot of its base name,
+    as webdataset does, e.g. "a/b.seg.png" to ("a/b", "seg.png").
+    """
+
+    dirname, basename = posixpath.split(name)
+    key, _, ext = basename.partition(".")
+    return posixpath.join(dirname, key), ext.lower()
+
+
+class WebDatasetImporter(FileImporter):
+    """
+    | Importer for webdataset tar shards, which is a directory of ``*.tar`` shards, or a single ``.tar`` shard.
+    | Every sample is the tar members of the same key, such as ``{key}.jpg`` and ``{key}.json``.
+      Images are never extracted, they are served from the shards by their byte ranges.
+    | The json of a sample holds its annotations, the other keys are saved as the image metadata::
+
+        {
+            "width": 640,  # optional, the image size is read from the image header if missing
+            "height": 480,
+            "objects": [  # ground truth objects
+                {
+                    "category": "cat",
+                    "bbox": [x, y, w, h],  # optional, in pixels
+                    "segmentation": [[x1, y1, x2, y2, ...], ...],  # optional, polygons in pixels
+                    "keypoints": [x1, y1, v1, conf1, ...],  # optional
+                    "iscrowd": 0,  # optional
+                    "caption": "a cat",  # optional
+                },
+            ],
+            "predictions": {  # optional, prediction objects by prediction name
+                "model_a": [{"category": "cat", "bbox": [x, y, w, h], "conf": 0.9}],
+            },
+        }
+    """
+
+    def __init__(self, dataset_path: str, enforce: bool = False):
+        """
+        :param dataset_path: path to a directory of tar shards, or a tar shard.
+        :param enforce: if True, the importer will re-import the dataset even if it is already imported.
+        """
+
+        dataset_path = os.path.abspath(dataset_path)
+        self.shards = self.list_shards(dataset_path)
+        super(WebDatasetImporter, self).__init__(dataset_path, enforce=enforce)
+
+        self.dataset.type = DatasetType.WebDataset
+        self._position = {"shard_idx": 0, "offset": 0}  # the shard and the byte offset of the next sample
+
+    @staticmethod
+    def list_shards(path: str) -> List[str]:
+        if os.path.isfile(path):
+            return [path]
+        return [os.path.join(path, item) for item in sorted(os.listdir(path)) if item.endswith(".tar")]
+
+    def load_sample(self,
+                    tar: tarfile.TarFile,
+                    shard_path: str,
+                    key: str,
+                    members: Dict[str, tarfile.TarInfo]) -> Tuple[Optional[Dict], List[Dict]]:
+        image_ext = next((ext for ext in _IMAGE_EXTS if ext in members), None)
+        if image_ext is None:
+            logger.warning(f"[{shard_path}@{key}] no image is found in the sample, skip it")
+            return None, []
+        image_member = members[image_ext]
+
+        sample = {}
+        if "json" in members:
+            sample = json.loads(tar.extractfile(members["json"]).read())
+
+        # prepare image size
+        width = sample.pop("width", None)
+        height = sample.pop("height", None)
+        if (width is None or height is None) and IMPORT_PROBE_THREADS > 0:
+            width, height = read_image_size(tar.extractfile(image_member)) or (width, height)
+
+        # prepare image url, the image is served from the shard by its byte range
+        beg_pos = image_member.offset_data
+        image_url = create_file_range_url(file_path=shard_path,
+                                          beg_pos=beg_pos, end_pos=beg_pos + image_member.size,
+                                          read_mode=FileReadMode.Binary,
+                                          file_mime=guess_type(f"image.{image_ext}")[0] or "image/jpeg")
+
+        # add annotations
+        objects = self.load_objects(sample.pop("objects", []), LabelName.GroundTruth, LabelType.GroundTruth)
+        for pred_name, pred_objects in sample.pop("predictions", {}).items():
+            objects.extend(self.load_objects(pred_objects, pred_name, LabelType.Prediction))
+
+        metadata = dict(sample, key=key, shard=os.path.basename(shard_path))
+        image = self.format_image_data(image_url, width=width, height=height, metadata=metadata)
+        return image, objects
+
+    def load_objects(self, objects: List[Dict], label_name: str, label_type: str) -> List[Dict]:
+        obj_list = []
+        for obj in objects:
+            category_name = obj.get("category", None)
+            if category_name is None:
+                continue
+
+            bbox = obj.get("bbox", None)
+            if bbox is not None:
+                bbox = tuple(bbox)
+
+            conf = 1.0 if label_type == LabelType.GroundTruth else obj.get("conf", 1.0)
+            obj = self.format_annotation(category_name,
+                                         label=label_name, label_type=label_type,
+                                         conf=conf, is_group=bool(obj.get("iscrowd", False)),
+                                         bbox=bbox, segmentation=obj.get("segmentation", None),
+                                         keypoints=obj.get("keypoints", None),
+                                         caption=obj.get("caption", None),
+                                         )
+            obj_list.append(obj)
+        return obj_list
+
+    def iter_shard(self, shard_idx: int, offset: int = 0) -> Iterable[Tuple[Dict, List[Dict]]]:
+        """
+        | Stream the samples of a shard from a byte offset, which is the header offset of a tar member.
+        | Members of a sample are adjacent in the shard, so a sample is complete once a member of another key is read.
+        """
+
+        shard_path = self.shards[shard_idx]
+        with open(shard_path, "rb") as fp:
+            fp.seek(offset)
+            # the tar is read from the current offset, and member offsets are still offsets in the shard
+            with tarfile.open(fileobj=fp, mode="r:") as tar:
+                sample_key, members = None, {}
+                member = tar.next()
+                while member is not None:
+                    if len(tar.members) > _MEMBER_CACHE_SIZE:
+                        tar.members = []
+                    if not member.isfile():
+                        member = tar.next()
+                        continue
+
+                    key, ext = _split_member_name(member.name)
+                    if key != sample_key and members:
+                        image, objects = self.load_sample(tar, shard_path, sample_key, members)
+                        self._position = {"shard_idx": shard_idx, "offset": member.offset}
+                        if image is not None:
+                            yield image, objects
+                        members = {}
+                    sample_key = key
+                    members[ext] = member
+                    member = tar.next()
+
+                if members:
+                    image, objects = self.load_sample(tar, shard_path, sample_key, members)
+                    self._position = {"shard_idx": shard_idx + 1, "offset": 0}
+                    if image is not None:
+                        yield image, objects
+        self._position = {"shard_idx": shard_idx + 1, "offset": 0}
+
+    def __iter__(self) -> Tuple[Dict, List[Dict]]:
+        start = self._position
+        for shard_idx in range(start["shard_idx"], len(self.shards)):
+            offset = start["offset"] if shard_idx == start["shard_idx"] else 0
+            yield from self.iter_shard(shard_idx, offset)
+
+    def source_position(self) -> dict:
+        """
+        The shard index and the byte offset in the shard of the next sample to read.
+        """
+
+        return dict(self._position)
+
+    def seek_source(self, position: dict):
+        self._position = dict(position)
+
+    def make_shards(self, position: dict = None) -> list:
+        """
+        Every tar shard is a shard of the pipelined import, so shards are parsed in parallel.
+        """
+
+        start = position or {"shard_idx": 0, "offset": 0}
+        shards = []
+        for shard_idx in range(start["shard_idx"], len(self.shards)):
+            offset = start["offset"] if shard_idx == start["shard_idx"] else 0
+            shards.append({"shard_idx"   : shard_idx,
+                           "offset"      : offset,
+                           "end_position": {"shard_idx": shard_idx + 1, "offset": 0}})
+        return shards
+
+    def parse_shard(self, shard: dict):
+        return self.iter_shard(shard["shard_idx"], shard["offset"])
+
+    def worker_state(self) -> dict:
+        state = super(WebDatasetImporter, self).worker_state()
+        state.update(path=self.path, shards=self.shards, _position=self._position)
+        return state
+
+    @staticmethod
+    def can_import(path: str):
+        if os.path.isfile(path):
+            return path.endswith(".tar")
+        if os.path.isdir(path):
+            # a directory of tar shards only, hidden files aside, a dataset of other types may hold tar archives
+            files = [entry.name for entry in os.scandir(path) if entry.is_file() and not entry.name.startswith(".")]
+            return bool(files) and all(name.endswith(".tar") for name in files)
+        return False
+
+    def collect_files(self) -> dict:
+        return {f"{DatasetFileType.GroundTruth}/{os.path.basename(shard)}": shard for shard in self.shards}
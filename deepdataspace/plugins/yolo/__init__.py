@@ -0,0 +1,7 @@
+"""
+deepdataspace.plugins.yolo
+
+This module supports yolo dataset format.
+"""
+
+from deepdataspace.plugins.yolo.importer import YOLOImporter
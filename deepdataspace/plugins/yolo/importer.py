@@ -0,0 +1,258 @@
+"""
+Import the yolo dataset and save metadata into mongodb.
+"""
+
+import logging
+import os
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import yaml
+
+from deepdataspace.constants import DatasetType
+from deepdataspace.environs import IMPORT_SCAN_THREADS
+from deepdataspace.io.file_scan import read_files
+from deepdataspace.io.file_scan import scan_files
+from deepdataspace.io.image_probe import probe_image_sizes
+from deepdataspace.io.importer import FileImporter
+
+logger = logging.getLogger("plugins.yolo.importer")
+
+_IMAGE_EXTS = [".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"]
+_YAML_NAMES = ["data.yaml", "dataset.yaml"]  # the dataset yaml file in a yolo dataset directory
+_SPLITS = ["train", "val", "test"]
+
+
+def find_yaml(path: str) -> Optional[str]:
+    """
+    Find the dataset yaml file of a yolo dataset, path is the yaml file or the directory of it.
+    """
+
+    if os.path.isfile(path):
+        return path if path.endswith((".yaml", ".yml")) else None
+    for name in _YAML_NAMES:
+        yaml_path = os.path.join(path, name)
+        if os.path.isfile(yaml_path):
+            return yaml_path
+    return None
+
+
+def label_path(image_path: str) -> str:
+    """
+    The label file of an image, in the labels directory next to the images directory, as yolo does,
+    e.g. "images/train/1.jpg" to "labels/train/1.txt".
+    """
+
+    image_dir = f"{os.sep}images{os.sep}"
+    label_dir = f"{os.sep}labels{os.sep}"
+    return os.path.splitext(label_dir.join(image_path.rsplit(image_dir, 1)))[0] + ".txt"
+
+
+class YOLOImporter(FileImporter):
+    """
+    | Importer for yolo dataset, which is described by a yaml file::
+
+        path: .  # optional, the dataset root relative to the yaml file
+        train: images/train  # image directories, or text files listing images, relative to the dataset root
+        val: images/val
+        test: [images/test1, images/test2]  # optional, a list of them is accepted too
+        names:  # category names by class id, a list of names is accepted too
+          0: person
+          1: bicycle
+
+    | The labels of ``images/train/1.jpg`` are in ``labels/train/1.txt``, one object per line,
+      ``class x_center y_center width height`` for a bbox, or ``class x1 y1 x2 y2 ...`` for a polygon,
+      all coordinates are normalized by the image size, which is probed from the image file.
+    | Directories are listed and label files are read in threads of DDS_IMPORT_SCAN_THREADS,
+      images are imported in the order of splits and then their paths.
+    """
+
+    priority = 30  # a dataset yaml file is the most explicit, see FileImporter.priority
+
+    def __init__(self, dataset_path: str, enforce: bool = False):
+        """
+        :param dataset_path: path to the dataset yaml file, or the directory of data.yaml or dataset.yaml.
+        :param enforce: if True, the importer will re-import the dataset even if it is already imported.
+        """
+
+        dataset_path = os.path.abspath(dataset_path)
+        self.yaml_path = find_yaml(dataset_path)
+        info = self.parse_yaml(self.yaml_path)
+        if info is None:
+            raise RuntimeError(f"Cannot import yolo dataset: {dataset_path}")
+
+        self.root = info["root"]
+        self.splits = info["splits"]
+        self.names = info["names"]
+        dataset_name = os.path.basename(self.root)
+        super(YOLOImporter, self).__init__(dataset_path, dataset_name, enforce=enforce)
+
+        self.dataset.type = DatasetType.YOLO
+        self._images = []  # [(split, image_path), ...]
+        self._image_idx = 0  # the index of the next image to read in self._images
+
+    @staticmethod
+    def parse_yaml(yaml_path: Optional[str]) -> Optional[dict]:
+        if yaml_path is None:
+            return None
+
+        try:
+            with open(yaml_path, "r", encoding="utf8") as fp:
+                data = yaml.safe_load(fp)
+        except (OSError, yaml.YAMLError) as err:
+            logger.warning(f"Failed to parse yolo yaml file {yaml_path}: {err}")
+            return None
+
+        if not isinstance(data, dict) or "names" not in data or "train" not in data:
+            return None
+
+        try:
+            root = os.path.abspath(os.path.join(os.path.dirname(yaml_path), data.get("path", None) or ""))
+            names = data["names"]
+            if isinstance(names, list):
+                names = dict(enumerate(names))
+            names = {int(k): str(v) for k, v in names.items()}
+
+            splits = {}
+            for split in _SPLITS:
+                sources = data.get(split, None) or []
+                sources = [sources] if isinstance(sources, str) else sources
+                splits[split] = [os.path.join(root, source) for source in sources]
+        except (TypeError, ValueError, AttributeError) as err:  # such as names: null, or names: {person: 0}
+            logger.warning(f"Invalid yolo yaml file {yaml_path}: {err}")
+            return None
+
+        return {"root": root, "splits": splits, "names": names}
+
+    def list_split_images(self, source: str) -> List[str]:
+        """
+        The images of a split source, which is an image directory or a text file listing images.
+        """
+
+        if os.path.isdir(source):
+            return scan_files(source, _IMAGE_EXTS)
+
+        with open(source, "r", encoding="utf8") as fp:
+            lines = [line.strip() for line in fp]
+        # images listed by a text file are relative to the dataset root, or to the text file if they start with ./
+        list_dir = os.path.dirname(source)
+        return [os.path.join(list_dir, line) if line.startswith("./") else os.path.join(self.root, line)
+                for line in lines if line]
+
+    def load_source(self):
+        images = {}  # {image_path: split}, an image listed by many splits is imported once
+        for split, sources in self.splits.items():
+            for source in sources:
+                for image_path in self.list_split_images(source):
+                    images.setdefault(os.path.normpath(image_path), split)
+        self._images = [(split, image_path) for image_path, split in images.items()]
+        logger.info(f"Found {len(self._images)} images of yolo dataset {self.root}")
+
+    def parse_labels(self, content: Optional[bytes], width: Optional[int], height: Optional[int]) -> List[Dict]:
+        """
+        Parse the lines of a yolo label file into annotations with coordinates in pixels.
+        Objects are imported without bboxes if the image size is unknown.
+        """
+
+        anno_list = []
+        for line in (content or b"").decode("utf8").splitlines():
+            values = line.split()
+            if not values:
+                continue
+
+            try:
+                class_id = int(float(values[0]))
+                coords = [float(value) for value in values[1:]]
+            except ValueError:
+                logger.warning(f"Invalid yolo label line: {line}")
+                continue
+            category_name = self.names.get(class_id, str(class_id))
+
+            polygon = None
+            if len(coords) in (4, 5):  # the 5th value is the confidence of a prediction, it's ignored
+                x_center, y_center, box_width, box_height = coords[:4]
+                bbox = (x_center - box_width / 2, y_center - box_height / 2, box_width, box_height)
+            elif len(coords) >= 6 and len(coords) % 2 == 0:
+                polygon = coords
+                xs, ys = coords[0::2], coords[1::2]
+                bbox = (min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+            else:
+                logger.warning(f"Invalid yolo label line: {line}")
+                continue
+
+            segmentation = None
+            if width is None or height is None:  # the coordinates can't be converted to pixels
+                bbox = None
+            else:
+                bbox = (bbox[0] * width, bbox[1] * height, bbox[2] * width, bbox[3] * height)
+                if polygon is not None:
+                    segmentation = [[value * (height if idx % 2 else width) for idx, value in enumerate(polygon)]]
+
+            anno_list.append(self.format_annotation(category_name, bbox=bbox, segmentation=segmentation))
+        return anno_list
+
+    def _iter_images(self, beg: int, end: int) -> Iterable[Tuple[Dict, List[Dict]]]:
+        """
+        Iterate over images from index beg to end, label files and image sizes of shard_size images are
+        read at once in threads.
+        """
+
+        for batch_beg in range(beg, end, self.shard_size):
+            batch = self._images[batch_beg:min(batch_beg + self.shard_size, end)]
+            image_paths = [image_path for _, image_path in batch]
+            labels = read_files([label_path(image_path) for image_path in image_paths])
+            sizes = probe_image_sizes(image_paths, num_threads=IMPORT_SCAN_THREADS)  # required by the coordinates
+
+            for offset, (split, image_path) in enumerate(batch):
+                self._image_idx = batch_beg + offset + 1
+                width, height = sizes.get(image_path, (None, None))
+                image = self.format_image_data(f"file://{image_path}",
+                                               width=width, height=height,
+                                               metadata={"split": split})
+                yield image, self.parse_labels(labels[offset], width, height)
+
+    def __iter__(self) -> Tuple[Dict, List[Dict]]:
+        return self._iter_images(self._image_idx, len(self._images))
+
+    def source_position(self) -> dict:
+        return {"image_idx": self._image_idx}
+
+    def seek_source(self, position: dict):
+        self._image_idx = position["image_idx"]
+
+    def make_shards(self, position: dict = None) -> list:
+        """
+        Split the images into ranges of shard_size images.
+        """
+
+        start = position["image_idx"] if position else 0
+        shards = []
+        for beg in range(start, len(self._images), self.shard_size):
+            end = min(beg + self.shard_size, len(self._images))
+            shards.append({"beg": beg, "end": end, "end_position": {"image_idx": end}})
+        return shards
+
+    def parse_shard(self, shard: dict):
+        return self._iter_images(shard["beg"], shard["end"])
+
+    def worker_state(self) -> dict:
+        state = super(YOLOImporter, self).worker_state()
+        state.update(root=self.root,
+                     names=self.names,
+                     shard_size=self.shard_size,
+                     _images=self._images)
+        return state
+
+    def open_parse_cache(self):
+        """
+        The stat of the yaml file does not cover the images and labels, so the parse cache is never used.
+        """
+
+        return None
+
+    @staticmethod
+    def can_import(path: str):
+        return YOLOImporter.parse_yaml(find_yaml(path)) is not None
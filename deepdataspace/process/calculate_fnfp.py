@@ -8,10 +8,13 @@ import logging
 from typing import Dict
 from typing import List
 
+import numpy as np
+
 from deepdataspace.algos import calculate_fnfp
 from deepdataspace.constants import AnnotationType
 from deepdataspace.constants import LabelCompareResult
 from deepdataspace.constants import LabelType
+from deepdataspace.model._base import BatchWriter
 from deepdataspace.model.image import Image
 from deepdataspace.model.label import Label
 from deepdataspace.process.processor import BaseProcessor
@@ -47,6 +50,24 @@ class FNFPCalculator(BaseProcessor):
 
         return True
 
+    @staticmethod
+    def _read_boxes(dataset_id: str, columns: List[str]):
+        """
+        Read the boxes of all objects in a dataset as columns, return (cols, boxes, is_gt, is_pred).
+        Objects without bounding box and group objects are masked out of the is_gt and is_pred arrays.
+        """
+
+        columns = ["width", "height", "label_type", "category_id", "xmin", "ymin", "xmax", "ymax", "is_group", *columns]
+        cols = Image(dataset_id).find_columns({}, columns)
+
+        valid = ~np.isnan(cols["xmin"]) & ~cols["is_group"]
+        width, height = cols["width"], cols["height"]
+        boxes = np.stack([cols["xmin"] * width, cols["ymin"] * height,
+                          cols["xmax"] * width, cols["ymax"] * height], axis=1)
+        is_gt = valid & (cols["label_type"] == cols.code_of("label_type", LabelType.GroundTruth))
+        is_pred = valid & (cols["label_type"] == cols.code_of("label_type", LabelType.Prediction))
+        return cols, boxes, is_gt, is_pred
+
     @staticmethod
     def calculate_detection_thresh(dataset_id: str):
         """
@@ -56,39 +77,22 @@ class FNFPCalculator(BaseProcessor):
         logger.info(f"calculate_detection_thresh for dataset[{dataset_id}] starts")
 
         # prepare data for calculation
-        all_gt = []
+        cols, boxes, is_gt, is_pred = FNFPCalculator._read_boxes(dataset_id, ["image_id", "label_id", "conf"])
+        image_ids = cols["image_id"]
+        cat_ids = cols["category_id"]
+
+        all_gt = [list(gt) for gt in zip(image_ids[is_gt].tolist(),
+                                         cat_ids[is_gt].tolist(),
+                                         boxes[is_gt].tolist())]
         all_det = {}
-        all_cat = {}
-        images = Image(dataset_id).find_many({})
-        for image_idx, image in enumerate(images):
-
-            image_width = image.width
-            image_height = image.height
-
-            for obj in image.objects:
-                if not obj.bounding_box:
-                    continue
-
-                if obj.is_group is True:
-                    continue
-
-                bbox = obj.bounding_box
-                x1, y1, x2, y2 = bbox["xmin"], bbox["ymin"], bbox["xmax"], bbox["ymax"]
-                x1, x2 = x1 * image_width, x2 * image_width
-                y1, y2 = y1 * image_height, y2 * image_height
-                bbox = [x1, y1, x2, y2]
-                cat_id = obj.category_id
-                cat_id = all_cat.setdefault(cat_id, len(all_cat))
-                label_id = obj.label_id
-
-                if obj.label_type == LabelType.GroundTruth:
-                    gt = [image_idx, cat_id, bbox]
-                    all_gt.append(gt)
-                elif obj.label_type == LabelType.Prediction:
-                    conf = obj.conf
-                    det = [image_idx, cat_id, bbox, conf, ]
-                    label_all_det = all_det.setdefault(label_id, [])
-                    label_all_det.append(det)
+        for label_code, label_id in enumerate(cols.values["label_id"]):
+            mask = is_pred & (cols["label_id"] == label_code)
+            if not mask.any():
+                continue
+            all_det[label_id] = [list(det) for det in zip(image_ids[mask].tolist(),
+                                                          cat_ids[mask].tolist(),
+                                                          boxes[mask].tolist(),
+                                                          cols["conf"][mask].tolist())]
         logger.info(f"calculate_detection_thresh prepare data done")
 
         # calculate thresholds for every label set
@@ -120,109 +124,87 @@ class FNFPCalculator(BaseProcessor):
 
         logger.info(f"calculate_detection_result starts, label_id={label_id}")
 
-        category_id_map = {}
-        images = Image(dataset_id).find_many({})
-
-        for image in images:
-            image_width = image.width
-            image_height = image.height
-
-            # prepare all ground truth and detection for this image
-            all_gt = []
-            all_det = []
-            gt_io_map = []
-            det_io_map = []
-            for idx, obj in enumerate(image.objects):
-                if obj.bounding_box is None:  # skip object without bounding box
-                    continue
-
-                if obj.is_group is True:  # skip group object
-                    continue
-
-                bbox = obj.bounding_box
-                x1, y1, x2, y2 = bbox["xmin"], bbox["ymin"], bbox["xmax"], bbox["ymax"]
-                x1, x2 = x1 * image_width, x2 * image_width
-                y1, y2 = y1 * image_height, y2 * image_height
-                bbox = [x1, y1, x2, y2]
-                cat_id = obj.category_id
-                cat_id = category_id_map.setdefault(cat_id, len(category_id_map))
-
-                if obj.label_type == LabelType.GroundTruth:
-                    gt = [cat_id, *bbox]
-                    all_gt.append(gt)
-                    gt_io_map.append(idx)
-                elif obj.label_type == LabelType.Prediction:
-                    if obj.label_id != label_id:
-                        continue
-                    det = [cat_id, *bbox, obj.conf, ]
-                    all_det.append(det)
-                    det_io_map.append(idx)
-
-            # calculate fn/fp
-            gt_results, det_results = calculate_fnfp.calculate_fnfp(all_gt, all_det)
-
-            # save the result in database for further query
-            for threshold in thresholds:
-                conf_thresh = threshold["threshold"]
-                precision_thresh = str(int(threshold["precision"] * 100))  # key 不能有点(.)
-
-                gt_valids = []
-                det_valids = []
-
-                det_idx_valids = {}
-                for idx, det in enumerate(all_det):
-                    if det[5] >= conf_thresh:
-                        det_valids.append(det_results[idx])
-                        det_idx_valids[idx] = True
-
-                for gt_matched_det_idx in gt_results:
-                    if det_idx_valids.get(gt_matched_det_idx, False) is True:
-                        gt_valids.append(1)
-                    else:
-                        gt_valids.append(0)
-
-                num_fn = len(gt_valids) - sum(gt_valids)
-                num_fp = len(det_valids) - sum(det_valids)
-
-                image.num_fn.setdefault(label_id, {})[precision_thresh] = num_fn
-                image.num_fp.setdefault(label_id, {})[precision_thresh] = num_fp
-
-                for idx, (gt_valid, gt_result) in enumerate(zip(gt_valids, gt_results)):
-                    idx = gt_io_map[idx]
-                    obj = image.objects[idx]
-                    if gt_valid == 1:
-                        compare_result = LabelCompareResult.OK
-                    else:
-                        compare_result = LabelCompareResult.FalseNegative
-
-                        cat_id = obj.category_id
-                        counter = image.num_fn_cat.setdefault(label_id, {}).setdefault(cat_id, {})
-                        counter.setdefault(precision_thresh, 0)
-                        counter[precision_thresh] += 1
-
-                    obj.compare_result[precision_thresh] = compare_result
-                    obj.matched_det_idx = int(gt_result)
-
-                for idx, det_result in enumerate(det_results):
-                    idx = det_io_map[idx]
-                    obj = image.objects[idx]
-
-                    if det_result == 1:
-                        compare_result = LabelCompareResult.OK
-                    else:
-                        compare_result = LabelCompareResult.FalsePositive
-
-                        cat_id = obj.category_id
-                        counter = image.num_fp_cat.setdefault(label_id, {}).setdefault(cat_id, {})
-                        counter.setdefault(precision_thresh, 0)
-                        counter[precision_thresh] += 1
-
-                    obj.compare_result[precision_thresh] = compare_result
-                    obj.matched_det_idx = None
-
-            image.save()
-            logger.debug(f"updated num_fp of image[{image.id}] of label[{label_id}] to {image.num_fp}")
-            logger.debug(f"updated num_fn of image[{image.id}] of label[{label_id}] to {image.num_fn}")
+        cols, boxes, is_gt, is_pred = FNFPCalculator._read_boxes(dataset_id,
+                                                                 ["image_id", "object_idx", "label_id", "conf"])
+        is_det = is_pred & (cols["label_id"] == cols.code_of("label_id", label_id))
+        image_ids = cols["image_id"]
+        object_idxes = cols["object_idx"]
+        cat_codes = cols["category_id"]
+        cat_values = cols.values["category_id"]
+        confs = cols["conf"]
+
+        if len(image_ids) == 0:
+            return
+
+        # rows of an image are adjacent, find the start and end of every image
+        starts = np.flatnonzero(np.r_[True, image_ids[1:] != image_ids[:-1]])
+        ends = np.r_[starts[1:], len(image_ids)]
+
+        IModel = Image(dataset_id)
+        with BatchWriter(name=f"fnfp-{dataset_id}") as writer:
+            for start, end in zip(starts, ends):
+                image_id = int(image_ids[start])
+                gt_rows = np.flatnonzero(is_gt[start:end]) + start
+                det_rows = np.flatnonzero(is_det[start:end]) + start
+
+                # prepare all ground truth and detection for this image
+                all_gt = np.c_[cat_codes[gt_rows], boxes[gt_rows]].tolist()
+                all_det = np.c_[cat_codes[det_rows], boxes[det_rows], confs[det_rows]].tolist()
+
+                # calculate fn/fp
+                gt_results, det_results = calculate_fnfp.calculate_fnfp(all_gt, all_det)
+                gt_results = np.asarray(gt_results, dtype=np.int64)
+                det_results = np.asarray(det_results, dtype=np.int64)
+
+                # save the result in database for further query
+                set_data = {}
+                for threshold in thresholds:
+                    conf_thresh = threshold["threshold"]
+                    precision_thresh = str(int(threshold["precision"] * 100))  # key 不能有点(.)
+
+                    det_valids = confs[det_rows] >= conf_thresh
+                    gt_valids = np.zeros(len(gt_results), dtype=bool)
+                    gt_matched = gt_results >= 0
+                    gt_valids[gt_matched] = det_valids[gt_results[gt_matched]]
+
+                    num_fn = int(len(gt_valids) - gt_valids.sum())
+                    num_fp = int(det_valids.sum() - det_results[det_valids].sum())
+                    set_data[f"num_fn.{label_id}.{precision_thresh}"] = num_fn
+                    set_data[f"num_fp.{label_id}.{precision_thresh}"] = num_fp
+
+                    num_fn_cat = {}
+                    for row, gt_valid, gt_result in zip(gt_rows, gt_valids, gt_results):
+                        obj_idx = object_idxes[row]
+                        if gt_valid:
+                            compare_result = LabelCompareResult.OK
+                        else:
+                            compare_result = LabelCompareResult.FalseNegative
+                            cat_id = cat_values[cat_codes[row]]
+                            num_fn_cat[cat_id] = num_fn_cat.get(cat_id, 0) + 1
+
+                        set_data[f"objects.{obj_idx}.compare_result.{precision_thresh}"] = compare_result
+                        set_data[f"objects.{obj_idx}.matched_det_idx"] = int(gt_result)
+
+                    num_fp_cat = {}
+                    for row, det_result in zip(det_rows, det_results):
+                        obj_idx = object_idxes[row]
+                        if det_result == 1:
+                            compare_result = LabelCompareResult.OK
+                        else:
+                            compare_result = LabelCompareResult.FalsePositive
+                            cat_id = cat_values[cat_codes[row]]
+                            num_fp_cat[cat_id] = num_fp_cat.get(cat_id, 0) + 1
+
+                        set_data[f"objects.{obj_idx}.compare_result.{precision_thresh}"] = compare_result
+                        set_data[f"objects.{obj_idx}.matched_det_idx"] = None
+
+                    for cat_id, num in num_fn_cat.items():
+                        set_data[f"num_fn_cat.{label_id}.{cat_id}.{precision_thresh}"] = num
+                    for cat_id, num in num_fp_cat.items():
+                        set_data[f"num_fp_cat.{label_id}.{cat_id}.{precision_thresh}"] = num
+
+                IModel.batch_update({"id": image_id}, set_data, writer=writer)
+                logger.debug(f"updated num_fp/num_fn of image[{image_id}] of label[{label_id}]")
 
     def process_dataset(self):
         """
@@ -6,8 +6,6 @@ This file adds dataset related sub-command to ddsop command.
 
 import os
 
-import pkg_resources
-
 import click
 
 from deepdataspace.scripts import ddsop
@@ -53,12 +51,19 @@ def import_all(data_dir, force):
 @click.option("--force", "-f",
               default=False, is_flag=True,
               help="Force import the dataset, even though it is imported before.")
-def import_one(dataset_path, force):
+@click.option("--resume", "-r",
+              default=False, is_flag=True,
+              help="Resume a failed import from its last checkpoint, instead of importing from the start.")
+@click.option("--incremental", "-i",
+              default=False, is_flag=True,
+              help="Re-import the existing images in place, only writing changed ones, instead of rebuilding.")
+def import_one(dataset_path, force, resume, incremental):
     from deepdataspace.task import import_and_process_dataset
 
     dataset_path = os.path.abspath(dataset_path)
 
-    import_and_process_dataset.apply_async(args=(dataset_path,), kwargs={"enforce": force})
+    kwargs = {"enforce": force, "resume": resume, "incremental": incremental}
+    import_and_process_dataset.apply_async(args=(dataset_path,), kwargs=kwargs)
     print(f"task of importing dataset [{dataset_path}] is arranged")
 
 
@@ -68,6 +73,8 @@ def import_one(dataset_path, force):
               default=".",
               help="Where to generate the coco meta file, default to current directory.")
 def import_coco(dataset_name, directory):
+    import pkg_resources
+
     directory = os.path.abspath(directory)
     targ_file = os.path.join(directory, f"{dataset_name}.py")
 
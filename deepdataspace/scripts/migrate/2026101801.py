@@ -0,0 +1,60 @@
+"""
+Encode segmentations and keypoints of objects of every dataset in the compact binary encoding.
+
+This converts datasets imported before DDS_BINARY_OBJECTS is enabled, see deepdataspace.model.object_codec.
+Run it while no dataset is being imported or labeled, as every changed image document is rewritten.
+"""
+
+import logging
+
+from pymongo import UpdateOne
+
+from deepdataspace.model import DataSet
+from deepdataspace.model.image import Image
+from deepdataspace.model.object_codec import encode_object
+
+logger = logging.getLogger("scripts.migrate")
+
+BATCH_SIZE = 500
+
+
+def encode_dataset_objects(dataset_id: str) -> int:
+    """
+    Encode the objects of all images of a dataset, return the number of changed images.
+    """
+
+    collection = Image(dataset_id).get_collection()
+    num_changed = 0
+    operations = []
+    for image in collection.find({"objects": {"$ne": []}}, {"objects": 1}):
+        objects = image.get("objects", None) or []
+        encoded = [encode_object(obj) for obj in objects]
+        if not any(encoded):
+            continue
+
+        operations.append(UpdateOne({"_id": image["_id"]}, {"$set": {"objects": objects}}))
+        if len(operations) >= BATCH_SIZE:
+            collection.bulk_write(operations, ordered=False)
+            num_changed += len(operations)
+            operations = []
+
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+        num_changed += len(operations)
+    return num_changed
+
+
+def encode_objects():
+    num = DataSet.count_num({})
+    logger.info(f"Encoding objects of {num} dataset(s)...")
+
+    datasets = DataSet.find_many({})
+    for idx, dataset in enumerate(datasets):
+        num_changed = encode_dataset_objects(dataset.id)
+        logger.info(f"[{idx + 1}/{num}]Encoded objects of {num_changed} images of dataset[{dataset.id}]")
+
+    logger.info("Finished encoding objects")
+
+
+def run():
+    encode_objects()
@@ -4,15 +4,22 @@ deepdataspace.server.middlewares.request_perf
 The request performance middleware.
 """
 
+import logging
 import time
 
 from django.utils.deprecation import MiddlewareMixin
 
+from deepdataspace.utils.db_perf import begin_scope
+from deepdataspace.utils.db_perf import end_scope
+
+logger = logging.getLogger("django")
+
 
 class RequestPerfMiddleware(MiddlewareMixin):
     def process_request(self, request):
         "Start time at request coming in"
         request.start_time = time.time()
+        request.db_perf = begin_scope(f"{request.method} {request.path}")
 
     def process_response(self, request, response):
         "End of request, take time"
@@ -20,4 +27,13 @@ class RequestPerfMiddleware(MiddlewareMixin):
 
         # Add the header.
         response["X-Django-Cost"] = int(total * 1000)
+
+        # Add mongodb commands issued by this request.
+        db_perf = getattr(request, "db_perf", None)
+        if db_perf is not None:
+            end_scope(db_perf)
+            response["X-DB-Count"] = db_perf.num_commands
+            response["X-DB-Cost"] = int(db_perf.cost_ms)
+            response["X-DB-Commands"] = ",".join(f"{k}={v}" for k, v in db_perf.commands.most_common())
+            logger.debug(f"{db_perf.name}: {db_perf.summary()}")
         return response
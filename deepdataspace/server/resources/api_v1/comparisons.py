@@ -10,7 +10,9 @@ from deepdataspace.constants import ErrCode
 from deepdataspace.constants import LabelType
 from deepdataspace.model import DataSet
 from deepdataspace.model import Label
+from deepdataspace.model._base import InvalidCursor
 from deepdataspace.model.image import Image
+from deepdataspace.model.object_codec import decode_object
 from deepdataspace.server.resources.api_v1.images import concat_url
 from deepdataspace.utils.http import Argument
 from deepdataspace.utils.http import BaseAPIView
@@ -33,12 +35,13 @@ class ComparisonsView(BaseAPIView):
         Argument("order_by", Argument.Choice(["fn", "fp"]), Argument.QUERY, required=False),
         Argument("display_category_id", str, Argument.QUERY, required=False),
         Argument("page_num", Argument.PositiveInt, Argument.QUERY, default=1),
-        Argument("page_size", Argument.PositiveInt, Argument.QUERY, default=100)
+        Argument("page_size", Argument.PositiveInt, Argument.QUERY, default=100),
+        Argument("cursor", str, Argument.QUERY, required=False, default=None),
     ]
 
     def _parse_args(self, request):
         args = parse_arguments(request, self.get_args)
-        dataset_id, label_id, precision, order_by, display_category_id, page_num, page_size = args
+        dataset_id, label_id, precision, order_by, display_category_id, page_num, page_size, cursor = args
 
         dataset = DataSet.find_one({"id": dataset_id})
         if dataset is None:
@@ -59,14 +62,15 @@ class ComparisonsView(BaseAPIView):
             raise_exception(ErrCode.DatasetFNFPPrecisionNotFound,
                             f"label[{label_id}] has no comparison data in precision of {precision}")
 
-        return dataset_id, label_id, precision, order_by, display_category_id, page_num, page_size,
+        return dataset_id, label_id, precision, order_by, display_category_id, page_num, page_size, cursor
 
     def get(self, request):
         """
         Get the comparison result of a label and ground truth of a dataset.
         """
 
-        dataset_id, label_id, precision, order_by, display_category_id, page_num, page_size = self._parse_args(request)
+        args = self._parse_args(request)
+        dataset_id, label_id, precision, order_by, display_category_id, page_num, page_size, cursor = args
 
         precision_level = str(int(precision * 100))
         if display_category_id is not None:
@@ -83,12 +87,13 @@ class ComparisonsView(BaseAPIView):
 
         image_list = []
         offset = max(0, page_size * (page_num - 1))
-        if offset > total:
+        if cursor is None and offset > total:
             data = {
-                "image_list": image_list,
-                "page_size" : page_size,
-                "page_num"  : page_num,
-                "total"     : total
+                "image_list" : image_list,
+                "page_size"  : page_size,
+                "page_num"   : page_num,
+                "next_cursor": None,
+                "total"      : total
             }
             return format_response(data)
 
@@ -111,7 +116,17 @@ class ComparisonsView(BaseAPIView):
         req_host = request.META["HTTP_HOST"]
         req_prefix = f"{req_scheme}://{req_host}"
 
-        for image in Image(dataset_id).find_many(filters, includes, sort_fields, offset, page_size, to_dict=True):
+        try:
+            images, next_cursor = Image(dataset_id).find_page(filters, sort_fields,
+                                                              cursor=cursor,
+                                                              size=page_size,
+                                                              skip=offset,
+                                                              includes=includes,
+                                                              to_dict=True)
+        except InvalidCursor as err:
+            raise_exception(ErrCode.BadRequest, str(err))
+
+        for image in images:
             objects = []
             for obj in image["objects"]:
                 if obj["label_id"] != label_id and obj["label_type"] != LabelType.GroundTruth:
@@ -121,6 +136,7 @@ class ComparisonsView(BaseAPIView):
                     continue
 
                 obj["source"] = obj["label_type"]  # TODO keep for compatibility, delete this in the future
+                decode_object(obj)
 
                 if "compare_result" in obj and precision_level in obj["compare_result"]:
                     compare_result = obj.pop("compare_result")
@@ -169,9 +185,10 @@ class ComparisonsView(BaseAPIView):
             image_list.append(image)
 
         data = {
-            "image_list": image_list,
-            "page_size" : page_size,
-            "page_num"  : page_num,
-            "total"     : total
+            "image_list" : image_list,
+            "page_size"  : page_size,
+            "page_num"   : page_num,
+            "next_cursor": next_cursor,
+            "total"      : total
         }
         return format_response(data, enable_cache=True)
@@ -13,7 +13,10 @@ from deepdataspace.constants import DatasetStatus
 from deepdataspace.constants import DatasetType
 from deepdataspace.constants import ErrCode
 from deepdataspace.model import DataSet
+from deepdataspace.model._base import InvalidCursor
 from deepdataspace.model.image import Image
+from deepdataspace.model.object_codec import decode_object
+from deepdataspace.model.object_codec import pass_through_object
 from deepdataspace.plugins.coco2017 import COCO2017Importer
 from deepdataspace.utils.http import Argument
 from deepdataspace.utils.http import BaseAPIView
@@ -62,6 +65,10 @@ def get_caption_func(dataset):
 class ImagesView(BaseAPIView):
     """
     - GET /api/v1/images
+
+    | Binary segmentations and keypoints of objects are decoded to text and lists by default.
+    | With object_encoding=binary, they are sent as the base64 strings of their stored bytes,
+      and every object lists such fields in "binary_fields", see :mod:`deepdataspace.model.object_codec`.
     """
 
     get_args = [
@@ -71,6 +78,8 @@ class ImagesView(BaseAPIView):
         Argument("page_num", Argument.PositiveInt, Argument.QUERY, default=1),
         Argument("page_size", Argument.PositiveInt, Argument.QUERY, default=100),
         Argument("offset", int, Argument.QUERY, required=False, default=None),
+        Argument("cursor", str, Argument.QUERY, required=False, default=None),
+        Argument("object_encoding", Argument.Choice(["text", "binary"]), Argument.QUERY, default="text"),
     ]
 
     def get(self, request):
@@ -79,7 +88,8 @@ class ImagesView(BaseAPIView):
         - GET /api/v1/images
         """
 
-        dataset_id, category_id, flag, page_num, page_size, offset = parse_arguments(request, self.get_args)
+        args = parse_arguments(request, self.get_args)
+        dataset_id, category_id, flag, page_num, page_size, offset, cursor, object_encoding = args
 
         dataset = DataSet.find_one({"_id": dataset_id})
         if dataset is None:
@@ -99,7 +109,9 @@ class ImagesView(BaseAPIView):
 
         total = Image(dataset_id).count_num(filters)
 
-        if offset is None:
+        if cursor is not None:  # continue from the previous page, the cursor already encodes the offset
+            skip = 0
+        elif offset is None:
             skip = max(0, page_size * (page_num - 1))
         else:
             skip = 0
@@ -131,11 +143,12 @@ class ImagesView(BaseAPIView):
 
         if skip > total:
             data = {
-                "image_list": [],
-                "offset"    : offset,
-                "page_size" : page_size,
-                "page_num"  : page_num,
-                "total"     : total
+                "image_list" : [],
+                "offset"     : offset,
+                "page_size"  : page_size,
+                "page_num"   : page_num,
+                "next_cursor": None,
+                "total"      : total
             }
             return format_response(data, enable_cache=True)
 
@@ -147,16 +160,27 @@ class ImagesView(BaseAPIView):
         req_host = request.META["HTTP_HOST"]
         req_prefix = f"{req_scheme}://{req_host}"
 
+        try:
+            images, next_cursor = Image(dataset_id).find_page(filters,
+                                                              sort=[("idx", 1)],
+                                                              cursor=cursor,
+                                                              size=page_size,
+                                                              skip=skip,
+                                                              includes=includes,
+                                                              to_dict=True)
+        except InvalidCursor as err:
+            raise_exception(ErrCode.BadRequest, str(err))
+
         image_list = []
-        for image in Image(dataset_id).find_many(filters,
-                                                 includes,
-                                                 sort=[("idx", 1)],
-                                                 skip=skip,
-                                                 size=page_size,
-                                                 to_dict=True):
+        for image in images:
             for obj in image["objects"]:
                 obj["source"] = obj["label_type"]  # TODO keep for compatibility, delete this in the future
 
+                if object_encoding == "binary":
+                    obj["binary_fields"] = pass_through_object(obj)
+                else:
+                    decode_object(obj)
+
                 alpha = obj.get("alpha", "")
                 if alpha is None:
                     obj["alpha"] = ""
@@ -192,10 +216,11 @@ class ImagesView(BaseAPIView):
             image_list.append(image)
 
         data = {
-            "image_list": image_list,
-            "offset"    : offset,
-            "page_size" : page_size,
-            "page_num"  : page_num,
-            "total"     : total
+            "image_list" : image_list,
+            "offset"     : offset,
+            "page_size"  : page_size,
+            "page_num"   : page_num,
+            "next_cursor": next_cursor,
+            "total"      : total
         }
         return format_response(data, enable_cache=True)
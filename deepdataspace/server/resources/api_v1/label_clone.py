@@ -15,6 +15,7 @@ from deepdataspace.globals import MongoDB
 from deepdataspace.model import DataSet
 from deepdataspace.model import Label
 from deepdataspace.model import Object
+from deepdataspace.model._base import BatchWriter
 from deepdataspace.model.image import Image
 from deepdataspace.utils.http import Argument
 from deepdataspace.utils.http import BaseAPIView
@@ -62,35 +63,28 @@ class LabelCloneView(BaseAPIView):
 
     @staticmethod
     def clone_images_collection(dataset_id, target_dataset_id, src_label_id, dst_label_id, dst_label_name):
-        for image in Image(dataset_id).find_many({}):
-            cloned = []
-
-            for obj in image.objects:
-                label_id = obj.label_id
-
-                if obj.label_id != src_label_id:
-                    continue
-
-                obj = Object(
-                        label_id=dst_label_id, label_name=dst_label_name, label_type=LabelType.User,
-                        category_id=obj.category_id, category_name=obj.category_name, conf=obj.conf,
-                        is_group=obj.is_group, bounding_box=obj.bounding_box, segmentation=obj.segmentation,
-                        alpha=obj.alpha, points=obj.points, lines=obj.lines, point_colors=obj.point_colors,
-                        point_names=obj.point_names
-                )
-                cloned.append(obj)
-            image.objects.extend(cloned)
-
-            try:
-                Image(target_dataset_id)(**image.to_dict()).batch_save()
-            except Exception as err:
-                logger.warning(f"Failed to clone label set, err={str(err)}")
-                Image(target_dataset_id).get_collection().drop()
-                raise_exception(ErrCode.FailedToCloneLabelSet, ErrCode.FailedToCloneLabelSetMsg)
-
         try:
-            Image(target_dataset_id).finish_batch_save()
+            with BatchWriter(name=f"clone-{target_dataset_id}", raise_on_error=True) as writer:
+                for image in Image(dataset_id).find_many({}, trusted=True):
+                    cloned = []
+
+                    for obj in image.objects:
+                        if obj.label_id != src_label_id:
+                            continue
+
+                        obj = Object(
+                                label_id=dst_label_id, label_name=dst_label_name, label_type=LabelType.User,
+                                category_id=obj.category_id, category_name=obj.category_name, conf=obj.conf,
+                                is_group=obj.is_group, bounding_box=obj.bounding_box, segmentation=obj.segmentation,
+                                alpha=obj.alpha, points=obj.points, lines=obj.lines, point_colors=obj.point_colors,
+                                point_names=obj.point_names
+                        )
+                        cloned.append(obj)
+                    image.objects.extend(cloned)
+
+                    Image(target_dataset_id).from_trusted_dict(image.to_dict()).batch_save(writer=writer)
         except Exception as err:
+            # the writer is closed before the target collection is dropped
             logger.warning(f"Failed to clone label set, err={str(err)}")
             Image(target_dataset_id).get_collection().drop()
             raise_exception(ErrCode.FailedToCloneLabelSet, ErrCode.FailedToCloneLabelSetMsg)
@@ -16,6 +16,7 @@ from deepdataspace.constants import LabelProjectRoles
 from deepdataspace.constants import LabelTaskImageStatus
 from deepdataspace.constants import LabelTaskQAActions
 from deepdataspace.constants import UserStatus
+from deepdataspace.model._base import InvalidCursor
 from deepdataspace.model.dataset import DataSet
 from deepdataspace.model.label_task import LabelProject
 from deepdataspace.model.label_task import LabelTask
@@ -122,7 +123,8 @@ class ProjectsView(AuthenticatedAPIView):
 
     get_args = [
         Argument("page_num", Argument.PositiveInt, Argument.QUERY, default=1),
-        Argument("page_size", Argument.PositiveInt, Argument.QUERY, default=100)
+        Argument("page_size", Argument.PositiveInt, Argument.QUERY, default=100),
+        Argument("cursor", str, Argument.QUERY, required=False, default=None),
     ]
 
     post_data = [
@@ -141,7 +143,7 @@ class ProjectsView(AuthenticatedAPIView):
         - GET /api/v1/label_projects
         """
 
-        page_num, page_size = parse_arguments(request, self.get_args)
+        page_num, page_size, cursor = parse_arguments(request, self.get_args)
 
         user_id = request.user.id
         project_roles = ProjectRole.find_many({"user_id": user_id}, includes={"project_id": 1, "role": 1}, to_dict=True)
@@ -151,7 +153,15 @@ class ProjectsView(AuthenticatedAPIView):
         filters = {"id": {"$in": project_ids}}
         total = LabelProject.count_num(filters)
         skip = max(0, page_size * (page_num - 1))
-        projects = LabelProject.find_many(filters, sort=[("created_ts", 1)], skip=skip, size=page_size, to_dict=True)
+        try:
+            projects, next_cursor = LabelProject.find_page(filters,
+                                                           sort=[("created_ts", 1), ("_id", 1)],
+                                                           cursor=cursor,
+                                                           size=page_size,
+                                                           skip=skip,
+                                                           to_dict=True)
+        except InvalidCursor as err:
+            raise_exception(ErrCode.BadRequest, str(err))
 
         can_view_progress = {}
         for role in project_roles:
@@ -169,6 +179,7 @@ class ProjectsView(AuthenticatedAPIView):
             "total"       : total,
             "page_size"   : page_size,
             "page_num"    : page_num,
+            "next_cursor" : next_cursor,
             "project_list": project_list
         }
         return format_response(data)
@@ -357,19 +368,14 @@ class TasksView(AuthenticatedAPIView):
     get_args = [
         Argument("project_id", str, Argument.QUERY, required=True),
         Argument("page_num", Argument.PositiveInt, Argument.QUERY, default=1),
-        Argument("page_size", Argument.PositiveInt, Argument.QUERY, default=100)
+        Argument("page_size", Argument.PositiveInt, Argument.QUERY, default=100),
+        Argument("cursor", str, Argument.QUERY, required=False, default=None),
     ]
 
-    def _query_tasks(self, request, project_id, page_num, page_size):
+    def _query_tasks(self, request, project_id, page_num, page_size, cursor):
         if ProjectRole.can_view_all_tasks(request.user, project_id):
             # owner and managers can see all tasks
             filters = {"project_id": project_id}
-            tasks = LabelTask.find_many(filters,
-                                        sort=[("idx", 1)],
-                                        skip=page_size * (page_num - 1),
-                                        size=page_size)
-            tasks = list(tasks)
-            total = LabelTask.count_num(filters)
         else:
             # others can only see tasks they are assigned to
             filters = {"project_id": project_id, "user_id": request.user.id, "is_active": True}
@@ -377,14 +383,18 @@ class TasksView(AuthenticatedAPIView):
 
             task_ids = list(set(t.task_id for t in task_roles))
             filters = {"project_id": project_id, "id": {"$in": task_ids}}
-            tasks = LabelTask.find_many(filters,
-                                        sort=[("idx", 1)],
-                                        skip=page_size * (page_num - 1),
-                                        size=page_size)
-            tasks = list(tasks)
-            total = LabelTask.count_num(filters)
 
-        return total, tasks
+        total = LabelTask.count_num(filters)
+        try:
+            tasks, next_cursor = LabelTask.find_page(filters,
+                                                     sort=[("idx", 1)],
+                                                     cursor=cursor,
+                                                     size=page_size,
+                                                     skip=page_size * (page_num - 1))
+        except InvalidCursor as err:
+            raise_exception(ErrCode.BadRequest, str(err))
+
+        return total, tasks, next_cursor
 
     def _query_roles(self, request, tasks, is_supper):
         task_ids = list(set(t.id for t in tasks))
@@ -438,7 +448,7 @@ class TasksView(AuthenticatedAPIView):
         - GET /api/v1/label_tasks
         """
 
-        project_id, page_num, page_size = parse_arguments(request, self.get_args)
+        project_id, page_num, page_size, cursor = parse_arguments(request, self.get_args)
         project = LabelProject.find_one({"id": project_id})
         if project is None:
             raise_exception(ErrCode.LabelProjectNotFound, f"project[id={project_id}] is not found")
@@ -448,7 +458,7 @@ class TasksView(AuthenticatedAPIView):
                             f"user[{request.user.id}] is not allowed to view project[{project_id}]")
 
         is_supper = ProjectRole.can_view_all_tasks(request.user, project_id)
-        total, tasks = self._query_tasks(request, project_id, page_num, page_size)
+        total, tasks, next_cursor = self._query_tasks(request, project_id, page_num, page_size, cursor)
 
         task_roles = self._query_roles(request, tasks, is_supper)
 
@@ -460,10 +470,11 @@ class TasksView(AuthenticatedAPIView):
             task_list.append(task_data)
 
         data = {
-            "task_list": task_list,
-            "page_size": page_size,
-            "page_num" : page_num,
-            "total"    : total
+            "task_list"  : task_list,
+            "page_size"  : page_size,
+            "page_num"   : page_num,
+            "next_cursor": next_cursor,
+            "total"      : total
         }
         return format_response(data)
 
@@ -767,7 +778,8 @@ class TaskImagesView(AuthenticatedAPIView):
         Argument("status", Argument.Choice(status_choices), Argument.QUERY, default=LabelTaskImageStatus.Labeling),
         Argument("role_id", str, Argument.QUERY, default=None),
         Argument("page_num", Argument.PositiveInt, Argument.QUERY, default=1),
-        Argument("page_size", Argument.PositiveInt, Argument.QUERY, default=100)
+        Argument("page_size", Argument.PositiveInt, Argument.QUERY, default=100),
+        Argument("cursor", str, Argument.QUERY, required=False, default=None),
     ]
 
     @staticmethod
@@ -841,7 +853,8 @@ class TaskImagesView(AuthenticatedAPIView):
             image_list.append(image)
         return image_list
 
-    def _get_task_images_for_role(self, task: LabelTask, role: TaskRole, status, page_size: int, page_num: int):
+    def _get_task_images_for_role(self, task: LabelTask, role: TaskRole, status,
+                                  page_size: int, page_num: int, cursor: str = None):
         LTIModel = LabelTaskImage(task.dataset_id)
 
         filters = {"task_id": task.id}
@@ -852,18 +865,22 @@ class TaskImagesView(AuthenticatedAPIView):
         elif role.role == LabelProjectRoles.Reviewer:
             filters[f"role_status.reviewer_{role.user_id}"] = status
         else:
-            return 0, []
+            return 0, [], None
         total = LTIModel.count_num(filters)
 
         offset = max(0, (page_num - 1) * page_size)
         includes = ["id", "idx", "task_id", "url", "url_full_res", "labels", "reviews", "default_labels"]
         includes = {k: 1 for k in includes}
-        images = LTIModel.find_many(filters,
-                                    includes=includes,
-                                    sort=[("idx", 1)],
-                                    skip=offset,
-                                    size=page_size,
-                                    to_dict=True)
+        try:
+            images, next_cursor = LTIModel.find_page(filters,
+                                                     sort=[("idx", 1)],
+                                                     cursor=cursor,
+                                                     size=page_size,
+                                                     skip=offset,
+                                                     includes=includes,
+                                                     to_dict=True)
+        except InvalidCursor as err:
+            raise_exception(ErrCode.BadRequest, str(err))
 
         if role.role == LabelProjectRoles.Reviewer:
             image_list = self._format_data_for_reviewer(images, role)
@@ -872,7 +889,7 @@ class TaskImagesView(AuthenticatedAPIView):
         else:
             image_list = self._format_data_for_gte_leaders(images, role)
 
-        return total, image_list
+        return total, image_list, next_cursor
 
     @staticmethod
     def concat_url(prefix, path):
@@ -902,21 +919,23 @@ class TaskImagesView(AuthenticatedAPIView):
         """
 
         user = request.user
-        status, role_id, page_num, page_size = parse_arguments(request, self.get_args)
+        status, role_id, page_num, page_size, cursor = parse_arguments(request, self.get_args)
 
         task = LabelTask.find_one({"id": task_id})
         if task is None:
             raise_exception(ErrCode.LabelProjectTaskNotFound, f"task[id={task_id}] is not found")
 
         view_role = _get_view_role(user, task, role_id)
-        total, image_list = self._get_task_images_for_role(task, view_role, status, page_size, page_num)
+        total, image_list, next_cursor = self._get_task_images_for_role(task, view_role, status,
+                                                                        page_size, page_num, cursor)
         self._add_url_prefix(request, image_list)
 
         data = {
-            "page_num"  : page_num,
-            "page_size" : page_size,
-            "total"     : total,
-            "image_list": image_list
+            "page_num"   : page_num,
+            "page_size"  : page_size,
+            "next_cursor": next_cursor,
+            "total"      : total,
+            "image_list" : image_list
         }
         return format_response(data)
 
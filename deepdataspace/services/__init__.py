@@ -4,5 +4,13 @@ deepdataspace.services
 This module wraps all service components for dds and provides a common interface to control them.
 """
 
-from deepdataspace.services.dds import DDS
 from deepdataspace.services.config import load_all_env
+
+
+def __getattr__(name: str):
+    # DDS pulls in every service component, only import it when it is used
+    if name == "DDS":
+        from deepdataspace.services.dds import DDS
+        return DDS
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
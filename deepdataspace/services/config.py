@@ -7,8 +7,6 @@ This file defines global config variables shared by all services.
 import os
 from pathlib import Path
 
-import requests
-
 from deepdataspace.utils.os import PLATFORM
 from deepdataspace.utils.os import Platforms
 from deepdataspace.utils.string import gen_random_str
@@ -111,6 +109,8 @@ _env_checked = False
 
 
 def _check_api_health(environs):
+    import requests
+
     if "DDS_DJANGO_HOST" in environs and "DDS_DJANGO_PORT" in environs:
         django_host = f"http://{environs['DDS_DJANGO_HOST']}:{environs['DDS_DJANGO_PORT']}"
         ping_api = f"{django_host}/api/v1/ping"
@@ -10,18 +10,24 @@ import traceback
 from logging import StreamHandler
 
 from celery.signals import after_setup_logger
+from celery.signals import task_postrun
+from celery.signals import task_prerun
 from celery.signals import worker_ready
 
 from deepdataspace import environs
 from deepdataspace.model.dataset import DataSet
 from deepdataspace.model.dataset import DatasetStatus
-from deepdataspace.model.image import Image
+from deepdataspace.model.indexes import ensure_indexes
 from deepdataspace.task.celery import app
 from deepdataspace.task.celery import app
 from deepdataspace.task.ping import ping
+from deepdataspace.utils.db_perf import begin_scope
+from deepdataspace.utils.db_perf import end_scope
 
 logger = logging.getLogger("celery")
 
+_task_db_perf = {}  # the mongodb perf scope of every running task, {task_id: CommandStats}
+
 
 @after_setup_logger.connect
 def logger_setup_handler(logger, **kwargs):
@@ -34,14 +40,34 @@ def logger_setup_handler(logger, **kwargs):
         logger.addHandler(handler)
 
 
+@task_prerun.connect
+def begin_task_db_perf(task_id=None, task=None, **kwargs):
+    _task_db_perf[task_id] = begin_scope(f"task {task.name}[{task_id}]")
+
+
+@task_postrun.connect
+def end_task_db_perf(task_id=None, **kwargs):
+    db_perf = _task_db_perf.pop(task_id, None)
+    if db_perf is not None:
+        end_scope(db_perf)
+        logger.info(f"{db_perf.name}: {db_perf.summary()}")
+
+
 @app.task
-def import_and_process_dataset(dataset_dir: str, enforce: bool = False, auto_triggered: bool = False):
+def import_and_process_dataset(dataset_dir: str, enforce: bool = False, auto_triggered: bool = False,
+                               resume: bool = False, incremental: bool = False):
     from deepdataspace.model.dataset import DataSet
     from deepdataspace.task.import_dataset import import_dataset
+    from deepdataspace.task.import_dataset import import_dataset_by_ranges
     from deepdataspace.task.process_dataset import process_dataset
 
-    logger.info(f"import_and_process_dataset starts, dataset_dir={dataset_dir}, enforce={enforce}")
-    result = import_dataset(dataset_dir, enforce)
+    logger.info(f"import_and_process_dataset starts, dataset_dir={dataset_dir}, enforce={enforce}, resume={resume}, "
+                f"incremental={incremental}")
+    # a resumed import continues from its checkpoint, which is never saved by an import by ranges
+    if not resume and import_dataset_by_ranges(dataset_dir, enforce, auto_triggered, incremental):
+        return None
+
+    result = import_dataset(dataset_dir, enforce, resume, incremental)
     if isinstance(result, list):
         for dataset in result:
             process_dataset(dataset.path, enforce, auto_triggered=auto_triggered)
@@ -78,28 +104,15 @@ def import_and_process_data_dir(data_dir: str, enforce: bool = False, auto_trigg
 @app.task
 def create_dataset_index():
     """
-    Create index for all datasets.
+    Create the declared indexes missing from all collections, including the per-dataset ones.
     """
 
     logger.info(f"create_dataset_index starts")
 
-    total = DataSet.count_num({})
-    datasets = DataSet.find_many({})
-    for idx, dataset in enumerate(datasets):
-        logger.info(f"[{idx + 1}/{total}] creating index for dataset {dataset.id}")
-        if dataset.status != DatasetStatus.Ready:
-            logger.info(f"dataset status is not {DatasetStatus.Ready}, skip it")
-        else:
-            ImageModel = Image(dataset.id)
-            ImageModel.get_collection().create_index([
-                ("objects.category_id", 1),
-            ])
-            logger.info(f"dataset created index on field: objects.category_id")
-
-            ImageModel.get_collection().create_index([
-                ("idx", 1)
-            ])
-            logger.info(f"dataset created index on field: idx")
+    dataset_ids = [d.id for d in DataSet.find_many({}) if d.status == DatasetStatus.Ready]
+    created = ensure_indexes(dataset_ids)
+    for name, indexes in created.items():
+        logger.info(f"created indexes {indexes} on {name}")
 
 
 @worker_ready.connect
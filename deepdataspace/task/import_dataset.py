@@ -6,17 +6,85 @@ Tasks about importing datasets.
 
 import logging
 
+from celery import chord
+
+from deepdataspace.environs import IMPORT_TASK_RANGES
 from deepdataspace.io import import_dataset as imp_ds
+from deepdataspace.io.importer import abort_dataset_ranges as abort_ranges
+from deepdataspace.io.importer import finish_dataset_ranges as finish_ranges
+from deepdataspace.io.importer import import_dataset_range as imp_range
+from deepdataspace.io.importer import prepare_dataset_ranges
 from deepdataspace.task.celery import app
 
 logger = logging.getLogger("celery")
 
 
 @app.task
-def import_dataset(target_path: str, enforce: bool = False):
+def import_dataset(target_path: str, enforce: bool = False, resume: bool = False, incremental: bool = False):
     """
     Import all datasets under target path.
     """
 
-    logger.info(f"import_dataset starts, target_path={target_path}, enforce={enforce}")
-    return imp_ds(target_path, enforce)
+    logger.info(f"import_dataset starts, target_path={target_path}, enforce={enforce}, resume={resume}, "
+                f"incremental={incremental}")
+    return imp_ds(target_path, enforce, resume, incremental)
+
+
+@app.task(ignore_result=False)
+def import_dataset_range(target_path: str, range_: dict) -> dict:
+    """
+    Import a range of a dataset, the result is collected by the chord of import_dataset_by_ranges.
+    """
+
+    logger.info(f"import_dataset_range starts, target_path={target_path}, "
+                f"idx={range_['idx']}, num_lines={range_['num_lines']}")
+    return imp_range(target_path, range_)
+
+
+@app.task
+def finish_dataset_ranges(results: list, target_path: str, staging: bool,
+                          enforce: bool = False, auto_triggered: bool = False):
+    """
+    The callback of the chord of import_dataset_by_ranges, it finishes the dataset and processes it.
+    """
+
+    from deepdataspace.task.process_dataset import process_dataset
+
+    logger.info(f"finish_dataset_ranges starts, target_path={target_path}, num_ranges={len(results)}")
+    dataset = finish_ranges(target_path, results, staging)
+    process_dataset(dataset.path, enforce, auto_triggered=auto_triggered)
+
+
+@app.task
+def abort_dataset_ranges(request, exc, traceback, target_path: str, range_: dict):
+    """
+    The error callback of the chord of import_dataset_by_ranges, it's called if any range fails.
+    """
+
+    logger.error(f"import of dataset [{target_path}] by ranges failed, task={request.id}, err={exc}")
+    abort_ranges(target_path, range_)
+
+
+def import_dataset_by_ranges(target_path: str,
+                             enforce: bool = False,
+                             auto_triggered: bool = False,
+                             incremental: bool = False) -> bool:
+    """
+    | Split a large dataset into DDS_IMPORT_TASK_RANGES ranges, and import them in parallel by a chord of tasks,
+      the dataset is finished and processed by the chord callback.
+    | Return False if the dataset is not imported by ranges, then it should be imported as usual.
+    """
+
+    if IMPORT_TASK_RANGES <= 1:
+        return False
+
+    ranges = prepare_dataset_ranges(target_path, enforce, IMPORT_TASK_RANGES, incremental)
+    if not ranges:
+        return False
+
+    header = [import_dataset_range.s(target_path, range_) for range_ in ranges]
+    callback = finish_dataset_ranges.s(target_path, ranges[0]["staging"],
+                                       enforce=enforce, auto_triggered=auto_triggered)
+    chord(header)(callback.on_error(abort_dataset_ranges.s(target_path, ranges[0])))
+    logger.info(f"import_dataset_by_ranges arranged {len(ranges)} tasks, target_path={target_path}")
+    return True
@@ -9,3 +9,5 @@ from deepdataspace import environs
 broker_url = environs.CELERY_BROKER
 worker_pool = environs.CELERY_WORKER_POOL
 task_acks_late = True
+result_backend = environs.CELERY_BROKER
+task_ignore_result = True  # only results collected by chords are kept, see task.import_dataset
@@ -0,0 +1,257 @@
+"""
+deepdataspace.utils.db_perf
+
+Instrumentation of mongodb commands.
+
+| Every mongodb command is attributed to the current perf scope, such as a http request or a celery task.
+| Slow commands are logged with their collection, filter and sort,
+  and a sample of them are explained in background to find out whether an index is used.
+"""
+
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+logger = logging.getLogger("utils.db_perf")
+slow_logger = logging.getLogger("db.slow")
+
+_current_scope = contextvars.ContextVar("db_perf_scope", default=None)
+
+# the field holding the query of every command we may log as slow command
+_QUERY_FIELDS = {"find"     : "filter",
+                 "aggregate": "pipeline",
+                 "count"    : "query",
+                 "distinct" : "query",
+                 "update"   : "updates",
+                 "delete"   : "deletes"}
+_EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+
+
+class CommandStats:
+    """
+    The mongodb command counters of a perf scope.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.num_commands = 0
+        self.num_failed = 0
+        self.cost_ms = 0.0
+        self.commands = Counter()  # {command_name: count}
+        self.slowest_ms = 0.0
+        self.slowest_command = None
+
+        self._token = None
+        self._lock = threading.Lock()
+
+    def add(self, command_name: str, cost_ms: float, failed: bool = False):
+        with self._lock:
+            self.num_commands += 1
+            self.num_failed += 1 if failed else 0
+            self.cost_ms += cost_ms
+            self.commands[command_name] += 1
+            if cost_ms > self.slowest_ms:
+                self.slowest_ms = cost_ms
+                self.slowest_command = command_name
+
+    def summary(self) -> str:
+        commands = ",".join(f"{k}={v}" for k, v in self.commands.most_common())
+        return f"{self.num_commands} mongodb commands[{commands}] in {self.cost_ms:.1f}ms, " \
+               f"slowest {self.slowest_command} in {self.slowest_ms:.1f}ms"
+
+
+def begin_scope(name: str) -> CommandStats:
+    """
+    Start attributing mongodb commands of current thread or coroutine to a new perf scope.
+    """
+
+    stats = CommandStats(name)
+    stats._token = _current_scope.set(stats)
+    return stats
+
+
+def end_scope(stats: CommandStats):
+    """
+    Stop attributing mongodb commands to the perf scope.
+    """
+
+    if stats._token is None:
+        return
+
+    try:
+        _current_scope.reset(stats._token)
+    except ValueError:  # the scope is ended in another context, such as another thread
+        pass
+    stats._token = None
+
+
+def current_scope() -> CommandStats:
+    return _current_scope.get()
+
+
+@contextmanager
+def db_perf_scope(name: str):
+    """
+    Attribute all mongodb commands in the code block to a perf scope.
+
+    Example:
+        with db_perf_scope("my_job") as stats:
+            DataSet.find_one({"id": "xxx"})
+
+        print(stats.summary())
+    """
+
+    stats = begin_scope(name)
+    try:
+        yield stats
+    finally:
+        end_scope(stats)
+
+
+def _truncate(value, limit: int = 1000) -> str:
+    text = json.dumps(value, default=str)
+    if len(text) > limit:
+        text = f"{text[:limit]}...({len(text)} chars)"
+    return text
+
+
+def _find_index_usage(plan: dict) -> str:
+    """
+    Find the used indexes, or COLLSCAN, from the winning plan of an explain result.
+    """
+
+    used = []
+    stages = [plan]
+    while stages:
+        stage = stages.pop()
+        if not isinstance(stage, dict):
+            continue
+        if stage.get("stage") == "IXSCAN":
+            used.append(stage.get("indexName", "?"))
+        elif stage.get("stage") == "COLLSCAN":
+            used.append("COLLSCAN")
+        for key in ("inputStage", "queryPlan"):
+            stages.append(stage.get(key, None))
+        stages.extend(stage.get("inputStages", []))
+    return ",".join(used) or "unknown"
+
+
+class CommandPerfListener(monitoring.CommandListener):
+    """
+    | A pymongo command listener, it:
+    - adds every command to the current perf scope.
+    - logs commands slower than slow_ms to the 'db.slow' logger.
+    - explains a sample of slow commands in background, and logs the indexes used.
+    """
+
+    def __init__(self, slow_ms: float = 100, explain_rate: float = 0):
+        """
+        :param slow_ms: commands slower than this are logged as slow commands.
+        :param explain_rate: the sample rate of slow commands to explain, 0 to disable explaining.
+        """
+
+        self.slow_ms = slow_ms
+        self.explain_rate = explain_rate
+        self.client = None  # the mongodb client to run explain, see bind
+
+        self._pending = {}  # the started commands, {request_key: (command_name, database, command, scope)}
+        self._lock = threading.Lock()
+        self._explainer = None
+
+    def bind(self, client):
+        """
+        Bind the mongodb client used for explaining slow commands.
+        A new client is bound after fork, so the explainer thread of the parent process is dropped too.
+        """
+
+        self.client = client
+        self._explainer = None
+
+    @staticmethod
+    def _request_key(event):
+        return event.connection_id, event.request_id, event.operation_id
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name == "explain":
+            return
+
+        command = None
+        if event.command_name in _QUERY_FIELDS:
+            command = event.command  # keep the command only if we may log it
+
+        with self._lock:
+            self._pending[self._request_key(event)] = (event.command_name,
+                                                       event.database_name,
+                                                       command,
+                                                       _current_scope.get())
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop(self._request_key(event), None)
+        if pending is None:
+            return
+
+        command_name, database, command, scope = pending
+        cost_ms = event.duration_micros / 1000
+        if scope is not None:
+            scope.add(command_name, cost_ms, failed)
+
+        if cost_ms < self.slow_ms or command is None:
+            return
+
+        self._log_slow(command_name, database, command, cost_ms, scope)
+        if self.explain_rate > 0 and command_name in _EXPLAINABLE and random.random() < self.explain_rate:
+            self._explain(command_name, database, command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, failed=True)
+
+    @staticmethod
+    def _log_slow(command_name: str, database: str, command: dict, cost_ms: float, scope: CommandStats):
+        collection = command.get(command_name, None)
+        query = command.get(_QUERY_FIELDS[command_name], None)
+        sort = command.get("sort", None)
+        scope_name = scope.name if scope is not None else None
+        slow_logger.warning(f"slow {command_name} on {database}.{collection} in {cost_ms:.1f}ms, "
+                            f"scope={scope_name}, query={_truncate(query)}, sort={_truncate(sort)}")
+
+    def _explain(self, command_name: str, database: str, command: dict):
+        if self.client is None:
+            return
+
+        if self._explainer is None:
+            with self._lock:
+                if self._explainer is None:
+                    self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-explain")
+
+        # the command document holds session and cluster fields, keep only the query part
+        explain_keys = {command_name, _QUERY_FIELDS[command_name], "sort", "projection", "limit", "skip", "key"}
+        query = {k: v for k, v in command.items() if k in explain_keys}
+        if command_name == "aggregate":
+            query["cursor"] = {}
+        self._explainer.submit(self._run_explain, database, query)
+
+    def _run_explain(self, database: str, query: dict):
+        start = time.perf_counter()
+        try:
+            result = self.client[database].command("explain", query, verbosity="queryPlanner")
+        except Exception as err:
+            logger.warning(f"failed to explain command {_truncate(query)}, err={str(err)}")
+            return
+
+        plan = result.get("queryPlanner", {}).get("winningPlan", {})
+        if not plan and "stages" in result:  # explain of aggregation
+            plan = result["stages"][0].get("$cursor", {}).get("queryPlanner", {}).get("winningPlan", {})
+        cost_ms = (time.perf_counter() - start) * 1000
+        slow_logger.warning(f"explained {_truncate(query)} in {cost_ms:.1f}ms, index={_find_index_usage(plan)}")
@@ -0,0 +1,32 @@
+"""
+deepdataspace.utils.exception
+
+The exceptions shared by models and http apis.
+This module doesn't import django or drf, so models can raise api exceptions without loading the web framework.
+"""
+
+
+class APIException(Exception):
+    def __init__(self, code: int, msg: str, http_status: int):
+        """
+        A custom exception class, which can be raised anywhere in the code, and will be handled by django drf.
+        This avoids try-catch layer by layer in deep function calls.
+        Before this works, you need to set drf to use resource.common.handle_api_exception as exception handler.
+
+        :param code: the error code in json response.
+        :param msg: the error message in json response.
+        :param http_status: the http status_code
+        """
+        self._code = code
+        self._msg = msg
+        self._http_status = http_status
+
+    def to_json_rsp(self):
+        """
+        Generate a Json Response.
+
+        :return: Response
+        """
+        from deepdataspace.utils.http import format_response
+
+        return format_response(data={}, status=self._http_status, code=self._code, msg=self._msg)
@@ -8,6 +8,8 @@ import os
 from contextlib import contextmanager
 from mimetypes import guess_type
 from typing import Literal
+from typing import Tuple
+from typing import Union
 
 from deepdataspace.constants import ContentEncoding
 from deepdataspace.constants import FileReadMode
@@ -136,3 +138,29 @@ def create_file_range_url(file_path: str,
     local_path = os.path.abspath(file_path)
     url_prefix = url_prefix or "/files/local_files"
     return f"{url_prefix}/{read_mode}/{file_encoding}/{position}/{mime}/{local_path}"
+
+
+def parse_file_url(url: str, url_prefix: str = None) -> Union[Tuple[str, str, str, int, int], None]:
+    """
+    Parse a file url created by create_file_url or create_file_range_url.
+    Return (file_path, file_encoding, read_mode, beg_pos, end_pos), or None if it's not such an url.
+    The positions are -1 for the whole file.
+
+    :param url: the file url.
+    :param url_prefix: the file url path prefix, see create_file_url.
+    """
+
+    url_prefix = url_prefix or "/files/local_files"
+    if not url or not url.startswith(f"{url_prefix}/"):
+        return None
+
+    parts = url[len(url_prefix) + 1:].split("/", 4)
+    if len(parts) != 5:
+        return None
+
+    read_mode, file_encoding, position, _, local_path = parts
+    try:
+        beg_pos, end_pos = [int(pos) for pos in position.split("_")]
+    except ValueError:
+        return None
+    return local_path, file_encoding, read_mode, beg_pos, end_pos
@@ -17,6 +17,7 @@ from deepdataspace.constants import ErrCode
 from deepdataspace.constants import UserStatus
 from deepdataspace.model.user import User
 from deepdataspace.model.user import UserToken
+from deepdataspace.utils.exception import APIException
 
 logger = logging.getLogger("utils.http")
 
@@ -49,30 +50,6 @@ def format_response(data: dict, status: int = 200, code: int = 0, msg: str = "su
     return rsp
 
 
-class APIException(Exception):
-    def __init__(self, code: int, msg: str, http_status: int):
-        """
-        A custom exception class, which can be raised anywhere in the code, and will be handled by django drf.
-        This avoids try-catch layer by layer in deep function calls.
-        Before this works, you need to set drf to use resource.common.handle_api_exception as exception handler.
-
-        :param code: the error code in json response.
-        :param msg: the error message in json response.
-        :param http_status: the http status_code
-        """
-        self._code = code
-        self._msg = msg
-        self._http_status = http_status
-
-    def to_json_rsp(self) -> Response:
-        """
-        Generate a Json Response.
-
-        :return: Response
-        """
-        return format_response(data={}, status=self._http_status, code=self._code, msg=self._msg)
-
-
 def raise_exception(code: int, msg: str, status: int = None):
     """
     Use this function to raise APIException anywhere in the code and return a json response to client directly.
@@ -0,0 +1,131 @@
+"""
+deepdataspace.utils.image_size
+
+Convenient functions about reading the width and height of images from their header bytes,
+without decoding the images.
+"""
+
+import base64
+import io
+import struct
+from typing import BinaryIO
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+# jpeg start of frame markers, which carry the image size, 0xc4, 0xc8 and 0xcc are other markers
+_JPEG_SOF_MARKERS = {0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7, 0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf}
+_JPEG_STANDALONE_MARKERS = {0x01, 0xd0, 0xd1, 0xd2, 0xd3, 0xd4, 0xd5, 0xd6, 0xd7, 0xd8}
+
+
+def _jpeg_size(fp: BinaryIO) -> Optional[Tuple[int, int]]:
+    """
+    Walk over the jpeg segments until the start of frame, seeking over the others, such as large exif segments.
+    """
+
+    fp.seek(2)
+    while True:
+        byte = fp.read(1)
+        while byte and byte != b"\xff":
+            byte = fp.read(1)
+        while byte == b"\xff":  # markers may be padded by any number of 0xff
+            byte = fp.read(1)
+        if not byte:
+            return None
+
+        marker = byte[0]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xd9, 0xda):  # the end of image, or the start of scan before any frame
+            return None
+
+        data = fp.read(2)
+        if len(data) < 2:
+            return None
+        length = struct.unpack(">H", data)[0]
+
+        if marker in _JPEG_SOF_MARKERS:
+            data = fp.read(5)
+            if len(data) < 5:
+                return None
+            _, height, width = struct.unpack(">BHH", data)
+            return width, height
+        fp.seek(length - 2, io.SEEK_CUR)
+
+
+def _webp_size(head: bytes) -> Optional[Tuple[int, int]]:
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":  # lossy
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3fff, height & 0x3fff
+    if chunk == b"VP8L" and head[20] == 0x2f:  # lossless
+        b0, b1, b2, b3 = head[21:25]
+        return 1 + (b0 | (b1 & 0x3f) << 8), 1 + (b1 >> 6 | b2 << 2 | (b3 & 0x0f) << 10)
+    if chunk == b"VP8X":  # extended
+        return 1 + int.from_bytes(head[24:27], "little"), 1 + int.from_bytes(head[27:30], "little")
+    return None
+
+
+def read_image_size(fp: BinaryIO) -> Optional[Tuple[int, int]]:
+    """
+    | Read the (width, height) of a jpeg, png, webp, gif or bmp image from a seekable binary file object.
+    | Only header bytes are read, the image is never decoded.
+      Return None if the format is not supported or the header is broken.
+    """
+
+    head = fp.read(32)
+    if len(head) < 26:
+        return None
+
+    size = None
+    if head.startswith(b"\xff\xd8"):
+        size = _jpeg_size(fp)
+    elif head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+        size = struct.unpack(">II", head[16:24])
+    elif head.startswith(b"RIFF") and head[8:12] == b"WEBP" and len(head) >= 30:
+        size = _webp_size(head)
+    elif head[:6] in (b"GIF87a", b"GIF89a"):
+        size = struct.unpack("<HH", head[6:10])
+    elif head.startswith(b"BM"):
+        if struct.unpack("<I", head[14:18])[0] == 12:  # the old os/2 header
+            size = struct.unpack("<HH", head[18:22])
+        else:
+            width, height = struct.unpack("<ii", head[18:26])
+            size = width, abs(height)  # the height is negative for top-down bitmaps
+
+    if size is None or size[0] <= 0 or size[1] <= 0:
+        return None
+    return tuple(size)
+
+
+def read_file_image_size(file_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Read the (width, height) of an image file, see :func:`read_image_size`.
+    Return None if the file can't be read.
+    """
+
+    try:
+        with open(file_path, "rb") as fp:
+            return read_image_size(fp)
+    except OSError:
+        return None
+
+
+def read_base64_image_size(content: Union[str, bytes], prefix_size: int = 4096) -> Optional[Tuple[int, int]]:
+    """
+    | Read the (width, height) of a base64 encoded image, see :func:`read_image_size`.
+    | Only a prefix is decoded at first, it's enlarged until the header is found, as jpeg headers may be long.
+    """
+
+    content = content.strip()
+    size = prefix_size
+    while True:
+        try:
+            data = base64.b64decode(content[:size - size % 4])
+        except ValueError:
+            return None
+
+        result = read_image_size(io.BytesIO(data))
+        if result is not None or size >= len(content):
+            return result
+        size *= 8
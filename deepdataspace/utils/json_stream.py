@@ -0,0 +1,152 @@
+"""
+deepdataspace.utils.json_stream
+
+Convenient functions about reading large json files with bounded memory.
+"""
+
+import json
+import re
+from typing import Any
+from typing import Iterator
+from typing import Set
+from typing import Tuple
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+_MAX_CUT_LEN = 6  # a value cut by the end of chunk fails to decode this close to the end, such as \uXXXX and false
+
+
+def _may_be_cut(err: json.JSONDecodeError) -> bool:
+    """
+    Can the decoding error be caused by a value cut by the end of the text, instead of a malformed value?
+    """
+
+    return err.pos >= len(err.doc) - _MAX_CUT_LEN or err.msg.startswith("Unterminated string")
+
+
+class _StreamReader:
+    """
+    A text buffer over a file, which only holds the unread part of the current chunk.
+    """
+
+    def __init__(self, fp, chunk_size: int, max_value_size: int):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.max_value_size = max_value_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size: int = None) -> bool:
+        """
+        Drop the consumed text and read another chunk of size characters, return False at the end of file.
+        """
+
+        chunk = self.fp.read(size or self.chunk_size)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def peek(self) -> str:
+        """
+        Skip whitespaces, and return the next character, or an empty string at the end of file.
+        """
+
+        while True:
+            self.pos = _whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        """
+        Consume the next character, which must be one of chars.
+        """
+
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"expecting one of {chars!r} at position {self.pos} of the chunk, got {char!r}")
+        self.pos += 1
+        return char
+
+    def decode(self) -> Tuple[Any, str]:
+        """
+        Decode the next json value, and return it along with its json text.
+        """
+
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as err:
+                if not _may_be_cut(err):
+                    raise
+
+                pending = len(self.buf) - self.pos
+                if pending > self.max_value_size:
+                    raise ValueError(f"a json value is larger than {self.max_value_size} characters, "
+                                     f"or it's malformed: {err}") from err
+
+                # the value is cut by the end of chunk, read as much as buffered,
+                # so a large value is decoded again only a logarithmic number of times
+                if self.fill(max(self.chunk_size, pending)):
+                    continue
+                raise
+
+            # a number at the end of chunk may be cut too, such as 12 of 123
+            if end == len(self.buf) and not self.eof and self.fill():
+                continue
+
+            text = self.buf[self.pos:end]
+            self.pos = end
+            return obj, text
+
+
+def _iter_array(reader: _StreamReader) -> Iterator[Tuple[Any, str]]:
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.expect("]")
+        return
+
+    while True:
+        yield reader.decode()
+        if reader.expect(",]") == "]":
+            return
+
+
+def iter_json_arrays(file_path: str,
+                     keys: Set[str],
+                     chunk_size: int = 1 << 20,
+                     max_value_size: int = 1 << 26) -> Iterator[Tuple[str, Any, str]]:
+    """
+    | Iterate over elements of the top level arrays of a json object file, such as annotations of a coco file.
+    | Only one element is decoded at a time, so the memory is bounded by the chunk size and the largest element.
+    | Elements of other top level arrays are decoded one by one and dropped, other top level values are dropped.
+
+    :param file_path: the json file path, its top level value must be an object.
+    :param keys: the keys of top level arrays to iterate over.
+    :param chunk_size: the number of characters to read from the file at a time.
+    :param max_value_size: the max characters of an element or a top level value which is not an array,
+        a larger or malformed one raises ValueError instead of being read into memory entirely.
+    :return: an iterator of (key, element, element json text), in the order of the file.
+    """
+
+    with open(file_path, "r", encoding="utf8") as fp:
+        reader = _StreamReader(fp, chunk_size, max_value_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+
+        while True:
+            key, _ = reader.decode()
+            reader.expect(":")
+            if reader.peek() == "[":
+                for element, text in _iter_array(reader):
+                    if key in keys:
+                        yield key, element, text
+            else:
+                reader.decode()
+
+            if reader.expect(",}") == "}":
+                return
@@ -0,0 +1,115 @@
+"""
+This module benchmarks normalizing annotations of coco person keypoints into objects ready to insert.
+
+It builds synthetic coco images with person annotations of 17 keypoints, a bbox and a polygon,
+runs them through the coco importer, and compares normalizing every annotation one by one
+by Importer.image_import_annotation against normalizing them in batches by Importer.normalize_records.
+Only bboxes are converted in bulk, and polygon strings dominate both ways, so the two costs are close.
+
+It only reports the costs, as they vary with the machine too much to be asserted,
+and it's not collected by pytest. Run it directly to print the report:
+    python tests/benchmark/bench_annotation_normalize.py
+"""
+
+import copy
+import random
+import time
+from types import SimpleNamespace
+
+from deepdataspace.plugins.coco2017.importer import COCO2017Importer
+
+NUM_IMAGES = 2000
+NUM_OBJECTS = 8  # about 11 persons in every image of coco person keypoints, and half of them have keypoints
+NUM_KEYPOINTS = 17
+NUM_VERTICES = 24  # the number of vertices of a person polygon
+BATCH_SIZE = 200  # the number of images normalized together, it's the size of a flush batch
+NUM_RUNS = 3  # the best of these runs is reported, to smooth out a busy machine
+
+
+def gen_coco_records(num_images: int = NUM_IMAGES, num_objects: int = NUM_OBJECTS):
+    """
+    Generate coco images and their annotations, as the coco importer holds them before iterating.
+    """
+
+    rand = random.Random(0)
+    category = {"id": 1, "name": "person", "keypoints": [f"kp{idx}" for idx in range(NUM_KEYPOINTS)],
+                "skeleton": [[idx, idx + 1] for idx in range(1, NUM_KEYPOINTS)]}
+    records = []
+    for image_id in range(num_images):
+        image = {"id": image_id, "width": 640, "height": 480,
+                 "coco_url": f"http://images.cocodataset.org/val2017/{image_id:012d}.jpg"}
+        annotations = []
+        for _ in range(num_objects):
+            x, y = rand.random() * 400, rand.random() * 300
+            keypoints = []
+            for _ in range(NUM_KEYPOINTS):
+                keypoints.extend([round(x + rand.random() * 100, 2), round(y + rand.random() * 80, 2), rand.randint(0, 2)])
+            polygon = [round(rand.random() * 100 + (x if idx % 2 == 0 else y), 2) for idx in range(NUM_VERTICES * 2)]
+            annotations.append({"id": len(annotations), "image_id": image_id, "category_id": 1,
+                                "bbox": [x, y, 100.0, 80.0], "area": 8000.0, "iscrowd": 0,
+                                "segmentation": [polygon], "keypoints": keypoints,
+                                "num_keypoints": NUM_KEYPOINTS, "label_name": "GroundTruth", "label_type": "GT"})
+        records.append((image, annotations))
+    return {1: category}, records
+
+
+def iter_importer_records(categories: dict, coco_records: list):
+    """
+    Convert coco records to the records yielded by the coco importer, skipping the database.
+    """
+
+    importer = COCO2017Importer.__new__(COCO2017Importer)
+    importer.image_root = None
+    importer._categories = categories
+    importer._image_idx = 0
+    return list(importer._iter_images(coco_records))
+
+
+def normalize_one_by_one(records: list):
+    result = []
+    for image, anno_list in records:
+        holder = {"width": image["width"], "height": image["height"], "objects": []}
+        for anno in anno_list:
+            COCO2017Importer.image_import_annotation(holder, **anno)
+        result.append((image, holder["objects"]))
+    return result
+
+
+def normalize_in_batches(records: list):
+    # fingerprints are not a part of normalizing, they are skipped in both ways,
+    # and sizes are never probed, the images are remote with known sizes
+    importer = SimpleNamespace(record_fingerprint=lambda image, anno_list: None,
+                               probe_image_sizes=COCO2017Importer.probe_image_sizes,
+                               _format_object=COCO2017Importer._format_object)
+    result = []
+    for beg in range(0, len(records), BATCH_SIZE):
+        result.extend(COCO2017Importer.normalize_records(importer, records[beg:beg + BATCH_SIZE]))
+    return result
+
+
+def run_benchmark():
+    categories, coco_records = gen_coco_records()
+    num_annotations = NUM_IMAGES * NUM_OBJECTS
+
+    costs = {"coco iteration": [], "one by one": [], "in batches": []}
+    results = {}
+    for _ in range(NUM_RUNS):
+        batch = copy.deepcopy(coco_records)  # the coco importer consumes its records
+        start = time.time()
+        records = iter_importer_records(categories, batch)
+        costs["coco iteration"].append(time.time() - start)
+
+        for name, func in [("one by one", normalize_one_by_one), ("in batches", normalize_in_batches)]:
+            batch = copy.deepcopy(records)
+            start = time.time()
+            results[name] = func(batch)
+            costs[name].append(time.time() - start)
+
+    report = {name: min(items) / num_annotations * 1e6 for name, items in costs.items()}  # us per annotation
+    return report, results
+
+
+if __name__ == "__main__":
+    result, _ = run_benchmark()
+    for name, cost in result.items():
+        print(f"{name:<16}{cost:>8.2f}us per annotation")
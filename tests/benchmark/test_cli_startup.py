@@ -0,0 +1,80 @@
+"""
+This module benchmarks the cold start of the ddsop command line tool by ``python -X importtime``.
+
+Every case imports what a ddsop sub command imports before it does any real work,
+in a fresh interpreter, and fails if the import time exceeds its budget,
+or if a heavy package which the sub command never needs is imported.
+
+Run it directly to print the report:
+    python tests/benchmark/test_cli_startup.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+NUM_RUNS = 3  # the best of these runs is reported, to smooth out a busy machine
+
+# heavy packages no cli command needs before it runs
+HEAVY_MODULES = ["numpy", "sklearn", "django", "rest_framework", "celery", "sentry_sdk", "pkg_resources", "requests"]
+
+# {case name: (code to import, import time budget in millisecond, forbidden top level modules)}
+CASES = {
+    "ddsop --help": ("import deepdataspace.scripts", 500, HEAVY_MODULES + ["pymongo", "pydantic", "redis"]),
+    "ddsop useradd": ("import deepdataspace.scripts; from deepdataspace.model import User", 1000, HEAVY_MODULES),
+}
+
+
+def measure(code: str):
+    """
+    Import the code in a fresh interpreter.
+
+    :return: the import time in millisecond, and the names of all imported top level modules.
+    """
+
+    code = f"{code}; import sys, json; print(json.dumps(sorted(sys.modules)))"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT_DIR, env.get("PYTHONPATH", None)]))
+    ret = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         env=env, cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+
+    # every line of stderr is like: "import time: self [us] | cumulative | imported package",
+    # the cumulative time of top level imports adds up to the total import time.
+    total_us = 0
+    for line in ret.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            total_us += int(cumulative)
+
+    modules = json.loads(ret.stdout.strip().splitlines()[-1])
+    modules = {m.split(".")[0] for m in modules}
+    return total_us / 1000, modules
+
+
+def run_benchmark():
+    report = {}
+    for name, (code, budget, forbidden) in CASES.items():
+        costs = []
+        modules = set()
+        for _ in range(NUM_RUNS):
+            cost, modules = measure(code)
+            costs.append(cost)
+        report[name] = {"cost": min(costs), "budget": budget, "heavy": sorted(modules.intersection(forbidden))}
+    return report
+
+
+def test_cli_startup_within_budget():
+    report = run_benchmark()
+    for name, result in report.items():
+        assert not result["heavy"], f"{name} imports heavy modules {result['heavy']}"
+        assert result["cost"] < result["budget"], f"{name} takes {result['cost']:.1f}ms to import"
+
+
+if __name__ == "__main__":
+    result = run_benchmark()
+    for name, item in result.items():
+        print(f"{name:<16}{item['cost']:>10.1f}ms  budget {item['budget']}ms  heavy modules {item['heavy']}")
@@ -0,0 +1,103 @@
+"""
+This module benchmarks the peak memory of parsing a coco dataset, loaded into memory versus streamed to disk.
+
+It writes a synthetic coco dataset with a prediction file, then parses and iterates over all of its images
+in a fresh interpreter for each mode, skipping the database, and reports the peak memory traced by tracemalloc.
+
+Run it directly to print the report:
+    python tests/benchmark/test_coco_import_memory.py
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+NUM_IMAGES = 10000
+NUM_OBJECTS = 10  # the number of ground truth annotations of every image, and the same number of predictions
+
+# parse and iterate over the dataset, print the time cost and the peak memory allocated by python in bytes
+MEASURE_CODE = """
+import sys, time, tracemalloc
+from types import SimpleNamespace
+from deepdataspace.plugins.coco2017.importer import COCO2017Importer
+
+meta_dir, stream = sys.argv[1], sys.argv[2] == "stream"
+importer = COCO2017Importer.__new__(COCO2017Importer)  # skip the database
+importer.ground_truth = f"{meta_dir}/gt.json"
+importer.image_root = None
+importer.dataset = SimpleNamespace(files={"Prediction/pred": f"{meta_dir}/pred.json"})
+importer._images, importer._categories, importer._annotations = {}, {}, {}
+importer._image_idx, importer._store = 0, None
+importer.stream_min_size = 0 if stream else float("inf")
+
+tracemalloc.start()
+start = time.time()
+if importer.should_stream():
+    importer.stream_data()
+else:
+    importer.load_ground_truth()
+    importer.load_predictions()
+    importer.format_data()
+num_images = sum(1 for _ in importer)
+importer.close_store()
+cost = time.time() - start
+print(num_images, cost, tracemalloc.get_traced_memory()[1])
+"""
+
+
+def gen_coco_files(meta_dir: str, num_images: int = NUM_IMAGES, num_objects: int = NUM_OBJECTS):
+    rand = random.Random(0)
+    images, annotations, predictions = [], [], []
+    for image_id in range(num_images):
+        images.append({"id": image_id, "width": 640, "height": 480, "file_name": f"{image_id:012d}.jpg",
+                       "coco_url": f"http://images.cocodataset.org/val2017/{image_id:012d}.jpg"})
+        for _ in range(num_objects):
+            x, y = rand.random() * 400, rand.random() * 300
+            annotation = {"id": len(annotations), "image_id": image_id, "category_id": rand.randint(1, 80),
+                          "bbox": [x, y, 100.0, 80.0], "area": 8000.0, "iscrowd": 0,
+                          "segmentation": [[x, y, x + 100, y, x + 100, y + 80, x, y + 80]]}
+            annotations.append(annotation)
+            predictions.append(dict(annotation, score=rand.random()))
+    categories = [{"id": i, "name": f"category_{i}"} for i in range(1, 81)]
+
+    with open(os.path.join(meta_dir, "gt.json"), "w", encoding="utf8") as fp:
+        json.dump({"images": images, "categories": categories, "annotations": annotations}, fp)
+    with open(os.path.join(meta_dir, "pred.json"), "w", encoding="utf8") as fp:
+        json.dump({"annotations": predictions}, fp)
+
+
+def measure(meta_dir: str, mode: str):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT_DIR, env.get("PYTHONPATH", None)]))
+    ret = subprocess.run([sys.executable, "-c", MEASURE_CODE, meta_dir, mode],
+                         env=env, cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    num_images, cost, peak = ret.stdout.strip().splitlines()[-1].split()
+    return int(num_images), float(cost), int(peak) / 1024 / 1024
+
+
+def run_benchmark():
+    report = {}
+    with tempfile.TemporaryDirectory() as meta_dir:
+        gen_coco_files(meta_dir)
+        size = sum(os.path.getsize(os.path.join(meta_dir, f)) for f in os.listdir(meta_dir)) / 1024 / 1024
+        for mode in ["memory", "stream"]:
+            num_images, cost, peak = measure(meta_dir, mode)
+            report[mode] = {"num_images": num_images, "cost": cost, "peak": peak, "file_size": size}
+    return report
+
+
+def test_streaming_bounds_peak_memory():
+    report = run_benchmark()
+    assert report["memory"]["num_images"] == report["stream"]["num_images"] == NUM_IMAGES
+    assert report["stream"]["peak"] < report["memory"]["peak"] / 4, report
+
+
+if __name__ == "__main__":
+    result = run_benchmark()
+    for mode, item in result.items():
+        print(f"{mode:<8}{item['num_images']:>8} images of {item['file_size']:.1f}MB files"
+              f"{item['cost']:>8.2f}s  peak memory {item['peak']:.1f}MB")
@@ -0,0 +1,106 @@
+"""
+This module benchmarks hydrating image documents read back from mongodb into model objects.
+
+It builds a synthetic image collection of COCO val2017 size in memory,
+and compares the validated hydration path against the trusted hydration path of BaseModel.
+
+Run it directly to print the report:
+    python tests/benchmark/test_model_hydration.py
+"""
+
+import random
+import time
+
+from deepdataspace.constants import LabelType
+from deepdataspace.model.image import Image
+
+NUM_IMAGES = 5000  # the number of images in coco val2017
+NUM_OBJECTS = 8  # about 36k annotations in coco val2017, plus a prediction set of similar size
+
+
+def gen_image_docs(num_images: int = NUM_IMAGES, num_objects: int = NUM_OBJECTS):
+    """
+    Generate image documents as they are stored in mongodb.
+    """
+
+    rand = random.Random(0)
+    docs = []
+    for image_id in range(num_images):
+        objects = []
+        for obj_idx in range(num_objects):
+            label_type = LabelType.GroundTruth if obj_idx % 2 == 0 else LabelType.Prediction
+            xmin, ymin = rand.random() * 0.5, rand.random() * 0.5
+            objects.append({
+                "label_name"     : label_type,
+                "label_type"     : label_type,
+                "label_id"       : f"label_{label_type}",
+                "category_id"    : f"category_{rand.randint(0, 79)}",
+                "category_name"  : "person",
+                "conf"           : rand.random(),
+                "is_group"       : False,
+                "bounding_box"   : {"xmin": xmin, "ymin": ymin, "xmax": xmin + 0.3, "ymax": ymin + 0.3},
+                "segmentation"   : "",
+                "alpha"          : "",
+                "points"         : [],
+                "lines"          : [],
+                "point_colors"   : [],
+                "point_names"    : [],
+                "caption"        : "",
+                "compare_result" : {"90": "OK", "80": "FP"},
+                "matched_det_idx": None,
+            })
+        docs.append({
+            "_id"         : image_id,
+            "idx"         : image_id,
+            "url"         : f"/files/local_files/b/1/-1_-1/image_jpeg/val2017/{image_id:012d}.jpg",
+            "url_full_res": f"/files/local_files/b/1/-1_-1/image_jpeg/val2017/{image_id:012d}.jpg",
+            "dataset_id"  : "benchmark",
+            "type"        : "coco2017",
+            "width"       : 640,
+            "height"      : 480,
+            "metadata"    : "{}",
+            "objects"     : objects,
+            "num_fn"      : {"label_Pred": {"90": 1, "80": 2}},
+            "num_fp"      : {"label_Pred": {"90": 1, "80": 2}},
+        })
+    return docs
+
+
+def hydrate(docs, trusted: bool, touch_objects: bool):
+    """
+    Hydrate all documents and return the time cost in seconds.
+    """
+
+    IModel = Image("benchmark")
+    docs = [dict(d) for d in docs]  # _from_mongo_doc modifies the document in place
+
+    start = time.perf_counter()
+    for doc in docs:
+        image = IModel._from_mongo_doc(doc, trusted=trusted)
+        if touch_objects:
+            for obj in image.objects:
+                _ = obj.bounding_box
+    return time.perf_counter() - start
+
+
+def run_benchmark():
+    docs = gen_image_docs()
+    report = {
+        "validated"               : hydrate(docs, trusted=False, touch_objects=True),
+        "trusted"                 : hydrate(docs, trusted=True, touch_objects=False),
+        "trusted, objects touched": hydrate(docs, trusted=True, touch_objects=True),
+    }
+    return report
+
+
+def test_trusted_hydration_is_faster():
+    report = run_benchmark()
+    assert report["trusted"] < report["validated"]
+    assert report["trusted, objects touched"] < report["validated"]
+
+
+if __name__ == "__main__":
+    result = run_benchmark()
+    base = result["validated"]
+    for name, cost in result.items():
+        print(f"{name:<26}{cost * 1000:>10.1f}ms{base / cost:>8.1f}x")
@@ -0,0 +1,84 @@
+"""
+This module benchmarks the size of image documents with objects stored as text and lists versus in binary.
+
+It builds synthetic images of person objects with a polygon of many vertices and 17 keypoints,
+normalizes them as an importer does with DDS_BINARY_OBJECTS off and on,
+and reports the bson size of the image documents and of their segmentations and keypoints,
+and the cost of reading a page of images and decoding their objects as the images api does.
+
+Run it directly to print the report:
+    python tests/benchmark/test_object_encoding_size.py
+"""
+
+import random
+import time
+
+from bson import BSON
+
+from deepdataspace.io import importer
+from deepdataspace.io.importer import Importer
+from deepdataspace.model.object_codec import BINARY_FIELDS
+from deepdataspace.model.object_codec import decode_object
+
+NUM_IMAGES = 100  # a page of the images api
+NUM_OBJECTS = 10
+NUM_KEYPOINTS = 17
+NUM_VERTICES = 100  # the number of vertices of a dense polygon
+
+
+def gen_annotations(num_objects: int = NUM_OBJECTS):
+    rand = random.Random(0)
+    annotations = []
+    for _ in range(num_objects):
+        x, y = rand.random() * 400, rand.random() * 300
+        polygon = [round(rand.random() * 100 + (x if idx % 2 == 0 else y), 2) for idx in range(NUM_VERTICES * 2)]
+        keypoints = []
+        for _ in range(NUM_KEYPOINTS):
+            keypoints.extend([round(x + rand.random() * 100, 2), round(y + rand.random() * 80, 2),
+                              rand.randint(0, 2), 1.0])
+        annotations.append({"category": "person", "segmentation": [polygon], "keypoints": keypoints})
+    return annotations
+
+
+def gen_images(binary: bool):
+    bbox = {"xmin": 0.1, "ymin": 0.1, "xmax": 0.5, "ymax": 0.5}
+    old_value = importer.BINARY_OBJECTS
+    importer.BINARY_OBJECTS = binary
+    try:
+        images = []
+        for idx in range(NUM_IMAGES):
+            objects = [Importer._format_object(anno, bbox) for anno in gen_annotations()]
+            images.append({"_id": idx, "idx": idx, "width": 640, "height": 480, "objects": objects})
+        return images
+    finally:
+        importer.BINARY_OBJECTS = old_value
+
+
+def run_benchmark():
+    report = {}
+    for name, binary in [("text", False), ("binary", True)]:
+        images = gen_images(binary)
+        docs = [BSON.encode(image) for image in images]
+        size = sum(len(doc) for doc in docs) / NUM_IMAGES / 1024
+        fields = [{k: obj[k] for k in BINARY_FIELDS} for image in images for obj in image["objects"]]
+        field_size = sum(len(BSON.encode(item)) for item in fields) / NUM_IMAGES / 1024
+
+        start = time.time()
+        for doc in docs:  # as the images api reads a page and decodes its objects
+            for obj in BSON(doc).decode()["objects"]:
+                decode_object(obj)
+        report[name] = {"size": size, "field_size": field_size, "cost": time.time() - start}
+    return report
+
+
+def test_binary_objects_shrink_image_documents():
+    report = run_benchmark()
+    assert report["binary"]["field_size"] < report["text"]["field_size"] / 3, report
+    assert report["binary"]["size"] < report["text"]["size"], report
+
+
+if __name__ == "__main__":
+    result = run_benchmark()
+    for mode, item in result.items():
+        print(f"{mode:<8}{item['size']:>8.1f}KB per image document, {item['field_size']:.1f}KB of which are "
+              f"segmentations and keypoints, {item['cost'] * 1000:.1f}ms to read a page of {NUM_IMAGES} images")
@@ -0,0 +1,99 @@
+"""
+This module tests re-importing a dataset, by rebuilding it from scratch or incrementally.
+"""
+
+import json
+
+import pytest
+
+from deepdataspace.constants import DatasetStatus
+from deepdataspace.constants import LabelType
+from deepdataspace.io.importer import Importer
+from deepdataspace.io.importer import import_dataset
+from deepdataspace.model.dataset import DataSet
+from deepdataspace.model.image import Image
+from deepdataspace.plugins.tsv import TSVImporter  # noqa: F401, registers the importer of tsv datasets
+
+
+def _write_tsv(path, num_lines: int, changed: int = None):
+    with open(path, "w", encoding="utf8") as fp:
+        for idx in range(num_lines):
+            category = "dog" if idx == changed else f"cat{idx % 3}"
+            obj = {"class": category, "bounding_box": {"xmin": 0.1, "ymin": 0.2, "xmax": 0.5, "ymax": 0.6}}
+            data = {"metadata": {"width": 100, "height": 80}, "objects": [obj]}
+            fp.write(f"{idx}\t{json.dumps(data)}\thttp://images/{idx}.jpg\n")
+
+
+def _prepare_dataset(tmp_path):
+    path = str(tmp_path / "reimport.tsv")
+    _write_tsv(path, 10)
+    dataset = import_dataset(path, enforce=True)
+
+    # mark every image, and add a user object to image 3
+    co = Image(dataset.id).get_collection()
+    co.update_many({}, {"$set": {"marker": 1}})
+    user_object = dict(co.find_one({"_id": 3})["objects"][0], label_type=LabelType.User, label_name=LabelType.User)
+    co.update_one({"_id": 3}, {"$push": {"objects": user_object}, "$set": {"flag": 1}})
+
+    _write_tsv(path, 8, changed=5)  # image 5 changes, images 8 and 9 vanish
+    return path, dataset, co
+
+
+def _check_reimported(co):
+    images = {image["_id"]: image for image in co.find({})}
+    assert sorted(images.keys()) == list(range(8))
+    assert [obj["category_name"] for obj in images[5]["objects"]] == ["dog"]
+    assert images[3]["flag"] == 1
+    assert sorted(obj["label_type"] for obj in images[3]["objects"]) == sorted([LabelType.GroundTruth, LabelType.User])
+    return images
+
+
+def test_enforce_rebuilds_the_dataset_from_scratch(tmp_path):
+    path, dataset, co = _prepare_dataset(tmp_path)
+    try:
+        dataset = import_dataset(path, enforce=True)
+
+        # every image is written again, so none of them keeps the marker
+        images = _check_reimported(co)
+        assert [_id for _id, image in images.items() if "marker" in image] == []
+        assert dataset.num_images == 8
+    finally:
+        DataSet.cascade_delete(DataSet.find_one({"id": dataset.id}))
+
+
+def test_incremental_reimport_updates_images_in_place(tmp_path):
+    path, dataset, co = _prepare_dataset(tmp_path)
+    try:
+        dataset = import_dataset(path, enforce=True, incremental=True)
+
+        # images are updated in place instead of rebuilt, so all of them keep the marker
+        images = _check_reimported(co)
+        assert [_id for _id, image in images.items() if "marker" not in image] == []
+        assert dataset.num_images == 8
+    finally:
+        DataSet.cascade_delete(DataSet.find_one({"id": dataset.id}))
+
+
+def test_failed_reimport_keeps_the_existing_images(tmp_path, monkeypatch):
+    path, dataset, co = _prepare_dataset(tmp_path)
+    staged = []
+
+    def swap_staging_collection(importer):
+        # the new version is built aside, the existing images are not touched yet
+        staged.extend(image["_id"] for image in importer.get_images_collection().find({}))
+        assert co.count_documents({"marker": 1}) == 10
+        raise RuntimeError("swap failed")
+
+    monkeypatch.setattr(Importer, "swap_staging_collection", swap_staging_collection)
+    try:
+        with pytest.raises(RuntimeError):
+            import_dataset(path, enforce=True)
+
+        assert sorted(staged) == list(range(8))
+        assert co.count_documents({"marker": 1}) == 10
+        assert f"{co.name}@staging" not in co.database.list_collection_names()
+        dataset = DataSet.find_one({"id": dataset.id})
+        assert dataset.status == DatasetStatus.Ready
+        assert dataset.num_images == 10
+    finally:
+        DataSet.cascade_delete(DataSet.find_one({"id": dataset.id}))
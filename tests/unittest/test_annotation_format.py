@@ -0,0 +1,39 @@
+"""
+Unit tests of converting annotations to the internal format in batches.
+"""
+
+import copy
+
+from deepdataspace.model.image import ImageModel
+from tests.benchmark.bench_annotation_normalize import gen_coco_records
+from tests.benchmark.bench_annotation_normalize import iter_importer_records
+from tests.benchmark.bench_annotation_normalize import normalize_in_batches
+from tests.benchmark.bench_annotation_normalize import normalize_one_by_one
+
+
+def test_format_bboxes_is_the_same_as_format_bbox():
+    bboxes = [(10, 20, 30, 40), None, [0.5, 1.25, 100, 7.75], (), (3, 4, 5, 6)]
+    widths = [640, 640, 333, 333, 100]
+    heights = [480, 480, 250, 250, 99]
+
+    expected = [ImageModel.format_bbox(w, h, b) for b, w, h in zip(bboxes, widths, heights)]
+    assert ImageModel.format_bboxes(bboxes, widths, heights) == expected
+    assert ImageModel.format_bboxes([None, None], [1, 1], [1, 1]) == [{}, {}]
+
+
+def test_format_keypoints_keeps_value_types():
+    points, colors, lines, names = ImageModel.format_keypoints([1, 2.5, 2.0, 0.9, 3, 4, 1, 1])
+    assert points == [1.0, 2.5, 0.0, 1.0, 2, 0.9, 3.0, 4.0, 0.0, 1.0, 1, 1]
+    assert [type(p) for p in points[:6]] == [float, float, float, float, int, float]
+    assert colors and lines and names
+
+
+def test_normalize_records_is_the_same_as_one_by_one():
+    categories, coco_records = gen_coco_records(num_images=5, num_objects=3)
+    records = iter_importer_records(categories, coco_records)
+
+    expected = normalize_one_by_one(copy.deepcopy(records))
+    result = normalize_in_batches(copy.deepcopy(records))
+    assert [objects for _, objects in result] == [objects for _, objects in expected]
+    assert all(image.pop("fingerprint") is None for image, _ in result)
+    assert [image for image, _ in result] == [image for image, _ in expected]
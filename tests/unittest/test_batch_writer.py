@@ -0,0 +1,114 @@
+"""
+Unit tests of the per-job batch writer.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from pymongo.operations import UpdateOne
+
+from deepdataspace.model._base import BatchWriteError
+from deepdataspace.model._base import BatchWriter
+from deepdataspace.model._base import WriteBehindFlusher
+from deepdataspace.model.image import Image
+from deepdataspace.model.label_task import LabelTaskImage
+
+
+class _FakeCollection:
+    full_name = "dds.images"
+
+    def __init__(self):
+        self.writes = []
+
+    def with_options(self, **kwargs):
+        return self
+
+    def bulk_write(self, ops, ordered=True):
+        self.writes.append([op._filter["_id"] for op in ops])
+        return SimpleNamespace(acknowledged=True, inserted_count=0, matched_count=len(ops),
+                               modified_count=len(ops), upserted_count=0)
+
+
+class _BrokenCollection(_FakeCollection):
+    full_name = "dds.broken"
+
+    def bulk_write(self, ops, ordered=True):
+        raise ValueError("invalid operation")
+
+
+class _FakeModel:
+    collection = _FakeCollection()
+    num_invalidated = 0
+
+    @classmethod
+    def get_collection(cls):
+        return cls.collection
+
+    @classmethod
+    def invalidate_cache(cls, broadcast: bool = True):
+        cls.num_invalidated += 1
+
+
+def _update(_id: int):
+    return UpdateOne({"_id": _id}, {"$set": {"idx": _id}})
+
+
+def test_writers_are_isolated():
+    co = _FakeModel.collection
+    writer_a = BatchWriter(batch_size=100, max_age=60)
+    writer_b = BatchWriter(batch_size=100, max_age=60)
+    for _id in range(3):
+        writer_a.submit(_FakeModel, co, _update(_id))
+        writer_b.submit(_FakeModel, co, _update(_id + 10))
+
+    # flushing one job never sends the pending operations of another job
+    writer_a.flush(_FakeModel)
+    assert co.writes == [[0, 1, 2]]
+    assert writer_a.stats.submitted == 3
+    assert writer_a.stats.matched == 3
+    assert writer_b.stats.flushes == 0
+
+    with writer_b:
+        writer_b.submit(_FakeModel, co, _update(13))
+    assert co.writes == [[0, 1, 2], [10, 11, 12, 13]]
+    assert writer_b.stats.flushes == 1
+    assert _FakeModel.num_invalidated == 2
+
+    writer_a.close()
+
+
+def test_unexpected_errors_fail_the_operations():
+    flusher = WriteBehindFlusher(batch_size=100, max_age=60)
+    co = _BrokenCollection()
+    for _id in range(2):
+        flusher.submit(co, _update(_id))
+
+    with pytest.raises(BatchWriteError) as err:
+        flusher.flush(co, raise_on_error=True)
+    assert [detail["errmsg"] for _, detail in err.value.failed_ops] == ["invalid operation"] * 2
+
+    # the writer thread survives the error
+    co = _FakeCollection()
+    flusher.submit(co, _update(0))
+    assert flusher.flush(co)[0].ok
+    flusher.close()
+
+
+def test_flush_raises_if_the_writer_thread_is_dead():
+    flusher = WriteBehindFlusher(batch_size=100, max_age=60)
+    flusher.submit(object(), _update(0))  # not a collection, it kills the writer thread
+
+    with pytest.raises(RuntimeError):
+        flusher.flush()
+
+
+def test_datasets_have_their_own_models():
+    # jobs of two datasets in one process never rebind the model of each other
+    model_a, model_b = Image("a"), Image("b")
+    assert model_a is not model_b
+    assert model_a is Image("a")
+    assert (model_a.get_collection().name, model_b.get_collection().name) == ("images@dataset_a", "images@dataset_b")
+    assert (model_a.get_cls_id(), model_b.get_cls_id()) == ("ImageModel.a", "ImageModel.b")
+
+    assert LabelTaskImage("a") is not LabelTaskImage("b")
+    assert LabelTaskImage("a").get_collection().name == "label_task_images@dataset_a"
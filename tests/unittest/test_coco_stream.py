@@ -0,0 +1,87 @@
+"""
+Unit tests of streaming a coco json file into the on-disk annotation store.
+"""
+
+import json
+import tracemalloc
+
+import pytest
+
+from deepdataspace.plugins.coco2017.store import AnnotationStore
+from deepdataspace.utils.json_stream import iter_json_arrays
+
+
+def _coco_data():
+    images = [{"id": i, "file_name": f"{i}.jpg", "width": 640, "height": 480} for i in (7, 3, 12345, 5)]
+    annotations = [{"id": i, "image_id": images[i % 3]["id"], "bbox": [1.5, 2, 3e2, -4], "category_id": 1}
+                   for i in range(6)]
+    return {"info": {"year": 2017, "tags": ["a", "]"]},
+            "images": images,
+            "categories": [{"id": 1, "name": "cat \"1\" {"}],
+            "annotations": annotations,
+            "empty": []}
+
+
+def test_iter_json_arrays_with_any_chunk_size(tmp_path):
+    path = str(tmp_path / "coco.json")
+    data = _coco_data()
+    with open(path, "w", encoding="utf8") as fp:
+        json.dump(data, fp, indent=1)
+
+    expected = [(key, obj) for key in ("images", "annotations", "empty") for obj in data[key]]
+    for chunk_size in (1, 2, 3, 7, 64, 1 << 20):
+        items = list(iter_json_arrays(path, {"images", "annotations", "empty"}, chunk_size=chunk_size))
+        assert [(key, obj) for key, obj, _ in items] == expected
+        assert all(json.loads(text) == obj for _, obj, text in items)
+
+
+def test_malformed_or_large_elements_are_not_buffered(tmp_path):
+    path = str(tmp_path / "broken.json")
+    garbage = "x" * (3 << 20)
+    with open(path, "w", encoding="utf8") as fp:
+        fp.write('{"images": [{"id": 1}, {"id": 2, "file_name": bad}, ' + garbage + "]}")
+
+    tracemalloc.start()
+    with pytest.raises(ValueError):
+        list(iter_json_arrays(path, {"images"}, chunk_size=1024))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 1 << 20
+
+    # an unterminated string may be cut by the end of chunk, it's read until the size limit
+    with open(path, "w", encoding="utf8") as fp:
+        fp.write('{"images": [{"id": 1, "file_name": "' + garbage + "]}")
+    with pytest.raises(ValueError, match="larger than"):
+        list(iter_json_arrays(path, {"images"}, chunk_size=1024, max_value_size=1 << 20))
+
+    # a large element is read in growing chunks
+    images = [{"id": 1, "file_name": garbage}, {"id": 2}]
+    with open(path, "w", encoding="utf8") as fp:
+        json.dump({"images": images}, fp)
+    assert [obj for _, obj, _ in iter_json_arrays(path, {"images"}, chunk_size=1024)] == images
+
+
+def test_store_yields_images_sorted_by_id_with_annotations(tmp_path):
+    data = _coco_data()
+    store = AnnotationStore(str(tmp_path / "coco.sqlite"))
+    store.page_size = 2
+    store.add_images((i["id"], json.dumps(i)) for i in data["images"])
+    store.add_annotations((a["image_id"], "GroundTruth", "GT", json.dumps(a)) for a in data["annotations"])
+    store.add_annotations([(7, "pred", "Pred", json.dumps({"id": 100, "image_id": 7}))])
+    store.finish_loading()
+
+    records = list(store.iter_images())
+    assert [image["id"] for image, _ in records] == [3, 5, 7, 12345]
+    assert store.count_images() == 4
+
+    annotations = dict((image["id"], [(a["id"], a["label_name"]) for a in anno_list]) for image, anno_list in records)
+    assert annotations == {3: [(1, "GroundTruth"), (4, "GroundTruth")],
+                           5: [],
+                           7: [(0, "GroundTruth"), (3, "GroundTruth"), (100, "pred")],
+                           12345: [(2, "GroundTruth"), (5, "GroundTruth")]}
+
+    assert list(store.iter_images(1, 3)) == records[1:3]
+    assert list(store.iter_images(3)) == records[3:]
+
+    store.remove()
+    assert not (tmp_path / "coco.sqlite").exists()
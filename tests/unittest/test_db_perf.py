@@ -0,0 +1,35 @@
+"""
+Unit tests of the mongodb command instrumentation.
+"""
+
+from types import SimpleNamespace
+
+from deepdataspace.utils.db_perf import CommandPerfListener
+from deepdataspace.utils.db_perf import _find_index_usage
+from deepdataspace.utils.db_perf import db_perf_scope
+
+
+def _run_command(listener, request_id, command_name, duration_ms):
+    key = {"connection_id": 1, "request_id": request_id, "operation_id": request_id}
+    command = {command_name: "images", "filter": {"idx": 1}}
+    listener.started(SimpleNamespace(command_name=command_name, database_name="dds", command=command, **key))
+    listener.succeeded(SimpleNamespace(duration_micros=duration_ms * 1000, **key))
+
+
+def test_commands_are_attributed_to_scope():
+    listener = CommandPerfListener(slow_ms=1000)
+    with db_perf_scope("request") as stats:
+        _run_command(listener, 1, "find", 3)
+        _run_command(listener, 2, "count", 5)
+    _run_command(listener, 3, "find", 7)  # out of scope
+
+    assert stats.num_commands == 2
+    assert stats.cost_ms == 8
+    assert stats.commands == {"find": 1, "count": 1}
+    assert stats.slowest_command == "count"
+
+
+def test_find_index_usage():
+    plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "idx_1"}}
+    assert _find_index_usage(plan) == "idx_1"
+    assert _find_index_usage({"stage": "COLLSCAN"}) == "COLLSCAN"
@@ -0,0 +1,138 @@
+"""
+Unit tests of importing yolo and voc datasets, whose files are listed and read in threads.
+"""
+
+import os
+from types import SimpleNamespace
+
+from deepdataspace.io import image_probe
+from deepdataspace.io.file_scan import read_files
+from deepdataspace.io.file_scan import scan_files
+from deepdataspace.io.importer import choose_importer_cls
+from deepdataspace.plugins.voc.importer import VOCImporter
+from deepdataspace.plugins.webdataset.importer import WebDatasetImporter
+from deepdataspace.plugins.yolo.importer import YOLOImporter
+from deepdataspace.plugins.yolo.importer import label_path
+from tests.unittest.test_image_size import _png
+
+
+def _write(path, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fp:
+        fp.write(content)
+
+
+def _new_importer(importer_cls, **attrs):
+    importer = importer_cls.__new__(importer_cls)  # skip the database
+    importer.shard_size = 2
+    importer.dataset = SimpleNamespace()
+    for key, value in attrs.items():
+        setattr(importer, key, value)
+    importer.load_source()
+    importer.seek_source({"image_idx": 0})
+    return importer
+
+
+def _check_shards_and_resume(importer):
+    serial = list(importer)
+    shards = importer.make_shards()
+    assert [item for shard in shards for item in importer.parse_shard(shard)] == serial
+
+    importer.seek_source({"image_idx": 0})
+    iterator = iter(importer)
+    next(iterator)
+    importer.seek_source(importer.source_position())
+    assert list(importer) == serial[1:]
+    return serial
+
+
+def test_scan_and_read_files(tmp_path):
+    for name in ["b/2.JPG", "b/c/3.png", "a.jpg", "b/skip.txt", "d/e/f/4.jpg"]:
+        _write(str(tmp_path / name), name.encode("utf8"))
+
+    for num_threads in [0, 4]:
+        paths = scan_files(str(tmp_path), [".jpg", ".png"], num_threads=num_threads)
+        assert [os.path.relpath(path, tmp_path) for path in paths] == ["a.jpg", "b/2.JPG", "b/c/3.png", "d/e/f/4.jpg"]
+        assert read_files(paths + [str(tmp_path / "missing")], num_threads=num_threads)[-2:] == [b"d/e/f/4.jpg", None]
+
+
+def test_yolo_labels_are_converted_to_pixels(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_probe, "IMPORT_CACHE_DIR", str(tmp_path / "cache"))
+    _write(str(tmp_path / "data.yaml"), b"train: images/train\nval: [images/val]\nnames: [cat, dog]\n")
+    for idx in range(3):
+        _write(str(tmp_path / f"images/train/{idx}.png"), _png(100, 50))
+    _write(str(tmp_path / "images/val/3.png"), _png(10, 10))
+    _write(str(tmp_path / "images/val/broken.jpg"), b"broken")
+    _write(str(tmp_path / "labels/train/0.txt"), b"0 0.5 0.5 0.2 0.4\n\n1 0.1 0.2 0.3 0.2 0.5 0.6\n7 bad\n")
+    _write(str(tmp_path / "labels/train/2.txt"), b"1 0.5 0.5 1 1 0.9\n")
+    _write(str(tmp_path / "labels/val/broken.txt"), b"0 0.5 0.5 0.2 0.4\n")
+
+    assert YOLOImporter.can_import(str(tmp_path))
+    assert not YOLOImporter.can_import(str(tmp_path / "images"))
+    assert label_path("/d/images/train/images/1.jpg") == "/d/images/train/labels/1.txt"
+
+    info = YOLOImporter.parse_yaml(str(tmp_path / "data.yaml"))
+    importer = _new_importer(YOLOImporter, **info)
+    records = _check_shards_and_resume(importer)
+
+    assert [(os.path.basename(image["uri"]), image["width"], image["metadata"]["split"]) for image, _ in records] == [
+        ("0.png", 100, "train"), ("1.png", 100, "train"), ("2.png", 100, "train"),
+        ("3.png", 10, "val"), ("broken.jpg", None, "val")]
+
+    objects = records[0][1]
+    assert [(obj["category"], obj["bbox"]) for obj in objects] == [("cat", (40.0, 15.0, 20.0, 20.0)),
+                                                                  ("dog", (10.0, 10.0, 40.0, 20.0))]
+    assert objects[1]["segmentation"] == [[10.0, 10.0, 30.0, 10.0, 50.0, 30.0]]
+    assert records[1][1] == []
+    assert [(obj["category"], obj["bbox"]) for obj in records[2][1]] == [("dog", (0.0, 0.0, 100.0, 50.0))]
+    assert [(obj["category"], obj["bbox"]) for obj in records[4][1]] == [("cat", None)]  # the size is unknown
+
+
+def test_invalid_yolo_yaml_is_not_importable(tmp_path):
+    for idx, content in enumerate([b"train: images\nnames: {person: 0}\n", b"train: images\nnames:\n",
+                                   b"train: images\nnames: 3\n"]):
+        _write(str(tmp_path / f"{idx}/data.yaml"), content)
+        assert not YOLOImporter.can_import(str(tmp_path / str(idx)))
+
+
+def test_voc_annotations(tmp_path):
+    xml = b"""<annotation><filename>%s</filename><size><width>%d</width><height>20</height></size>
+    <object><name>cat</name><bndbox><xmin>1</xmin><ymin>2</ymin><xmax>11</xmax><ymax>7.5</ymax></bndbox></object>
+    <object><name>dog</name></object><object><name> </name></object></annotation>"""
+    _write(str(tmp_path / "Annotations/b.xml"), xml % (b"b.jpg", 30))
+    _write(str(tmp_path / "Annotations/a.xml"), xml % (b"a.png", 0))
+    _write(str(tmp_path / "Annotations/sub/c.xml"), b"<annotation><size>")  # broken
+    _write(str(tmp_path / "Annotations/sub/d.xml"), b"<annotation></annotation>")
+    os.makedirs(str(tmp_path / "JPEGImages"))
+
+    assert VOCImporter.can_import(str(tmp_path))
+    assert not VOCImporter.can_import(str(tmp_path / "Annotations"))
+
+    importer = _new_importer(VOCImporter, path=str(tmp_path))
+    records = _check_shards_and_resume(importer)
+
+    assert [(image["uri"], image["width"], image["height"], image["metadata"]) for image, _ in records] == [
+        (f"file://{tmp_path}/JPEGImages/a.png", None, 20, {"annotation": "a.xml"}),
+        (f"file://{tmp_path}/JPEGImages/b.jpg", 30, 20, {"annotation": "b.xml"}),
+        (f"file://{tmp_path}/JPEGImages/d.jpg", None, None, {"annotation": "sub/d.xml"})]
+    assert [(obj["category"], obj["bbox"]) for obj in records[0][1]] == [("cat", (1.0, 2.0, 10.0, 5.5)),
+                                                                        ("dog", None)]
+    assert records[2][1] == []
+
+
+def test_importers_are_chosen_by_priority(tmp_path):
+    _write(str(tmp_path / "shards/shard-000.tar"), b"")
+    _write(str(tmp_path / "shards/.DS_Store"), b"")
+    assert choose_importer_cls(str(tmp_path / "shards")) is WebDatasetImporter
+
+    # a voc dataset holding a tar archive is not a webdataset
+    _write(str(tmp_path / "voc/Annotations/1.xml"), b"<annotation/>")
+    _write(str(tmp_path / "voc/JPEGImages/1.jpg"), b"")
+    _write(str(tmp_path / "voc/backup.tar"), b"")
+    _write(str(tmp_path / "voc/README"), b"")
+    assert not WebDatasetImporter.can_import(str(tmp_path / "voc"))
+    assert choose_importer_cls(str(tmp_path / "voc")) is VOCImporter
+
+    # the dataset yaml of a yolo dataset wins over the layout of others
+    _write(str(tmp_path / "voc/data.yaml"), b"train: JPEGImages\nnames: [cat]\n")
+    assert choose_importer_cls(str(tmp_path / "voc")) is YOLOImporter
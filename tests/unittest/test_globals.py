@@ -0,0 +1,24 @@
+"""
+Unit tests of the lazy database clients.
+"""
+
+from deepdataspace.globals import LazyClient
+
+
+def test_lazy_client_is_created_on_use_and_after_fork():
+    created = []
+
+    def factory():
+        created.append({"name": f"client-{len(created)}"})
+        return created[-1]
+
+    proxy = LazyClient(factory, "test")
+    assert not hasattr(proxy, "__validator_config__")  # probes of special attributes never create the client
+    assert created == []
+
+    assert proxy["name"] == "client-0"
+    assert proxy["name"] == "client-0"
+
+    proxy.__dict__["_pid"] = -1  # pretend we are in a forked child
+    assert proxy["name"] == "client-1"
+    assert len(created) == 2
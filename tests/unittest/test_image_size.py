@@ -0,0 +1,88 @@
+"""
+Unit tests of reading image sizes from header bytes, and probing sizes of local image files.
+"""
+
+import base64
+import io
+import os
+import struct
+import zlib
+
+from deepdataspace.io import image_probe
+from deepdataspace.io.image_probe import probe_image_sizes
+from deepdataspace.utils.image_size import read_base64_image_size
+from deepdataspace.utils.image_size import read_image_size
+
+
+def _png(width: int, height: int) -> bytes:
+    def chunk(name: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + name + data + struct.pack(">I", zlib.crc32(name + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    pixels = zlib.compress(b"".join(b"\x00" + b"\x00" * width for _ in range(height)))
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+
+
+def _jpeg(width: int, height: int, exif_size: int = 0) -> bytes:
+    data = b"\xff\xd8"
+    data += b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    if exif_size:  # a large segment before the frame, which must be skipped instead of scanned
+        data += b"\xff\xe1" + struct.pack(">H", exif_size + 2) + b"\xff\xc0" * (exif_size // 2)
+    data += b"\xff\xdb" + struct.pack(">H", 67) + b"\x00" * 65
+    data += b"\xff\xff\xc2" + struct.pack(">HBHHB", 17, 8, height, width, 3) + b"\x00" * 9
+    return data + b"\xff\xda" + b"\x00" * 32 + b"\xff\xd9"
+
+
+def test_read_image_size_from_headers():
+    assert read_image_size(io.BytesIO(_png(37, 21))) == (37, 21)
+    assert read_image_size(io.BytesIO(_jpeg(640, 480))) == (640, 480)
+    assert read_image_size(io.BytesIO(_jpeg(1920, 1080, exif_size=60000))) == (1920, 1080)
+
+    vp8 = b"RIFF\x00\x00\x00\x00WEBPVP8 \x00\x00\x00\x00\x00\x00\x00\x9d\x01\x2a" + struct.pack("<HH", 300, 200)
+    assert read_image_size(io.BytesIO(vp8 + b"\x00" * 8)) == (300, 200)
+    bits = (300 - 1) | (200 - 1) << 14
+    vp8l = b"RIFF\x00\x00\x00\x00WEBPVP8L\x00\x00\x00\x00\x2f" + struct.pack("<I", bits)
+    assert read_image_size(io.BytesIO(vp8l + b"\x00" * 8)) == (300, 200)
+    vp8x = b"RIFF\x00\x00\x00\x00WEBPVP8X\x0a\x00\x00\x00\x00\x00\x00\x00"
+    vp8x += (5000 - 1).to_bytes(3, "little") + (4000 - 1).to_bytes(3, "little")
+    assert read_image_size(io.BytesIO(vp8x + b"\x00" * 8)) == (5000, 4000)
+
+    assert read_image_size(io.BytesIO(b"GIF89a" + struct.pack("<HH", 12, 34) + b"\x00" * 20)) == (12, 34)
+    bmp = b"BM" + b"\x00" * 12 + struct.pack("<Iii", 40, 64, -32) + b"\x00" * 8
+    assert read_image_size(io.BytesIO(bmp)) == (64, 32)
+
+    assert read_image_size(io.BytesIO(b"not an image" * 4)) is None
+    assert read_image_size(io.BytesIO(_jpeg(640, 480)[:40])) is None
+
+
+def test_read_base64_image_size_decodes_more_for_long_headers():
+    content = base64.b64encode(_jpeg(800, 600, exif_size=20000)).decode("ascii")
+    assert read_base64_image_size(content + "\n", prefix_size=100) == (800, 600)
+    assert read_base64_image_size("bm90IGFuIGltYWdl") is None
+
+
+def test_probe_image_sizes_caches_by_file_stat(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_probe, "IMPORT_CACHE_DIR", str(tmp_path / "cache"))
+    paths = []
+    for idx in range(5):
+        path = str(tmp_path / f"{idx}.png")
+        with open(path, "wb") as fp:
+            fp.write(_png(10 + idx, 20))
+        paths.append(path)
+    broken = str(tmp_path / "broken.jpg")
+    with open(broken, "wb") as fp:
+        fp.write(b"broken")
+
+    expected = {path: (10 + idx, 20) for idx, path in enumerate(paths)}
+    assert probe_image_sizes(paths + [broken, str(tmp_path / "missing.png")], num_threads=4) == expected
+
+    probed = []
+    monkeypatch.setattr(image_probe, "read_file_image_size", lambda path: probed.append(path) or (1, 1))
+    assert probe_image_sizes(paths + [broken], num_threads=4) == expected  # all read from the cache
+    assert probed == []
+
+    with open(paths[0], "wb") as fp:  # a changed file is probed again
+        fp.write(_png(99, 20) + b"\x00")
+    assert probe_image_sizes(paths, num_threads=4)[paths[0]] == (1, 1)
+    assert probed == [paths[0]]
+    assert os.path.exists(tmp_path / "cache" / "image_sizes.sqlite3")
@@ -0,0 +1,134 @@
+"""
+Unit tests of splitting a tsv dataset into shards for the pipelined import, resuming it from a position,
+and fingerprinting its records for the incremental re-import.
+"""
+
+import json
+from types import SimpleNamespace
+
+from deepdataspace.constants import DatasetFileType
+from deepdataspace.plugins.tsv.importer import TSVImporter
+
+
+def _write_tsv(path, num_lines: int, pred: bool):
+    with open(path, "w", encoding="utf8") as fp:
+        for idx in range(num_lines):
+            obj = {"class": f"cat{idx % 3}", "bounding_box": {"xmin": 0.1, "ymin": 0.2, "xmax": 0.5, "ymax": 0.6}}
+            if pred:
+                obj["conf"] = idx / num_lines
+            data = {"metadata": {"width": 100, "height": 80}, "objects": [obj]}
+            fp.write(f"{idx}\t{json.dumps(data)}\thttp://images/{idx}.jpg\n")
+
+
+def _make_importer(tmp_path, num_lines: int = 10):
+    files = {DatasetFileType.GroundTruth: str(tmp_path / "ds.tsv"),
+             f"{DatasetFileType.Prediction}/pred": str(tmp_path / "ds.pred.pred")}
+    _write_tsv(files[DatasetFileType.GroundTruth], num_lines, pred=False)
+    _write_tsv(files[f"{DatasetFileType.Prediction}/pred"], num_lines, pred=True)
+
+    importer = TSVImporter.__new__(TSVImporter)  # skip the database
+    importer.dataset = SimpleNamespace(path=str(tmp_path), files=files)
+    importer.path = files[DatasetFileType.GroundTruth]
+    importer._files = {}
+    importer.shard_size = 4
+    return importer
+
+
+def test_shards_yield_the_same_images_as_serial_iteration(tmp_path):
+    importer = _make_importer(tmp_path)
+
+    importer.open_files()
+    serial = list(importer)
+    importer.close_files()
+
+    shards = importer.make_shards()
+    assert [s["line_idx"] for s in shards] == [0, 4, 8]
+
+    sharded = [item for shard in shards for item in importer.parse_shard(shard)]
+    assert sharded == serial
+    assert [image["id_"] for image, _ in sharded] == list(range(10))
+
+
+def test_resume_from_source_position(tmp_path):
+    importer = _make_importer(tmp_path)
+
+    importer.open_files()
+    serial = list(importer)
+    importer.close_files()
+
+    # stop after 5 images, as if the import failed after a checkpoint
+    importer.open_files()
+    iterator = iter(importer)
+    for _ in range(5):
+        next(iterator)
+    position = json.loads(json.dumps(importer.source_position()))  # it's saved as json in the checkpoint
+    importer.close_files()
+    assert position["line_idx"] == 5
+
+    importer.open_files()
+    importer.seek_source(position)
+    assert list(importer) == serial[5:]
+    importer.close_files()
+
+    shards = importer.make_shards(position)
+    assert [s["line_idx"] for s in shards] == [5, 9]
+    assert shards[0]["end_position"] == {"line_idx": 9, "offsets": shards[1]["offsets"]}
+    assert shards[1]["end_position"]["line_idx"] == 10
+
+    sharded = [item for shard in shards for item in importer.parse_shard(shard)]
+    assert sharded == serial[5:]
+
+
+def test_ranges_cover_lines_with_preassigned_idx(tmp_path):
+    importer = _make_importer(tmp_path, num_lines=25)
+
+    importer.open_files()
+    serial = list(importer)
+    importer.close_files()
+
+    ranges = importer.make_ranges(3)
+    assert [(r["idx"], r["num_lines"], r["ids"]) for r in ranges] == [(0, 9, [0, 9]), (9, 9, [9, 18]),
+                                                                     (18, 9, [18, None])]
+    assert [item for r in ranges for item in importer.parse_shard(r)] == serial
+
+    assert importer.make_ranges(1) == []
+    importer.shard_size = 30  # a range is never smaller than a shard
+    assert importer.make_ranges(3) == []
+
+
+def test_fingerprint_changes_with_prediction_records(tmp_path):
+    importer = _make_importer(tmp_path)
+
+    def fingerprints():
+        importer.open_files()
+        result = [importer.record_fingerprint(image, objects) for image, objects in importer]
+        importer.close_files()
+        return result
+
+    before = fingerprints()
+    assert before == fingerprints()
+
+    # change the prediction of line 3 only
+    pred_path = importer.dataset.files[f"{DatasetFileType.Prediction}/pred"]
+    with open(pred_path, "r", encoding="utf8") as fp:
+        lines = fp.readlines()
+    lines[3] = lines[3].replace('"conf": 0.3', '"conf": 0.35')
+    with open(pred_path, "w", encoding="utf8") as fp:
+        fp.writelines(lines)
+
+    after = fingerprints()
+    assert [idx for idx in range(10) if before[idx] != after[idx]] == [3]
+
+
+def test_prediction_shorter_than_groundtruth(tmp_path):
+    importer = _make_importer(tmp_path)
+    _write_tsv(importer.dataset.files[f"{DatasetFileType.Prediction}/pred"], 6, pred=True)
+
+    importer.open_files()
+    serial = list(importer)
+    importer.close_files()
+
+    # images after the end of the prediction file have ground truth objects only
+    assert [len(objects) for _, objects in serial] == [2] * 6 + [1] * 4
+    sharded = [item for shard in importer.make_shards() for item in importer.parse_shard(shard)]
+    assert sharded == serial
@@ -0,0 +1,126 @@
+"""
+Unit tests of the model read-through cache, and of model lookups and writes going through it.
+"""
+
+import time
+from typing import ClassVar
+
+import pytest
+
+from deepdataspace.model import _cache
+from deepdataspace.model._base import BaseModel
+from deepdataspace.model._base import BatchWriter
+from deepdataspace.model._cache import ModelCache
+
+
+def test_cache_lru_and_ttl():
+    cache = ModelCache("test", max_size=2, ttl=0.2)
+    cache.set("a", {"v": 1}, cache.generation)
+    cache.set("b", {"v": 2}, cache.generation)
+    assert cache.get("a") == (True, {"v": 1})
+
+    cache.set("c", {"v": 3}, cache.generation)  # "b" is the least recently used one
+    assert cache.get("b") == (False, None)
+    assert cache.get("c") == (True, {"v": 3})
+
+    time.sleep(0.3)
+    assert cache.get("a") == (False, None)
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_cache_values_are_copied():
+    cache = ModelCache("test")
+    value = {"objects": [1, 2]}
+    cache.set("a", value, cache.generation)
+    value["objects"].append(3)
+
+    _, cached = cache.get("a")
+    cached["objects"].append(4)
+    assert cache.get("a") == (True, {"objects": [1, 2]})
+
+
+def test_cache_drops_stale_values():
+    cache = ModelCache("test")
+    generation = cache.generation
+    cache.invalidate(broadcast=False)  # a write happened while we were reading
+    cache.set("a", {"v": 1}, generation)
+    assert cache.get("a") == (False, None)
+
+
+class _CachedModel(BaseModel):
+    cache_ttl: ClassVar[float] = 60
+
+    name: str
+    id: str = ""
+
+    @classmethod
+    def get_collection(cls, *args, **kwargs):
+        return cls.db["cached_models"]
+
+
+@pytest.fixture
+def cached_model(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    monkeypatch.setattr(_CachedModel, "db", mongomock.MongoClient().db)
+    monkeypatch.setattr(_cache, "_ensure_subscriber", lambda: None)  # no redis listener
+    broadcasts = []
+    monkeypatch.setattr(_cache, "_broadcast_invalidation", broadcasts.append)
+
+    _CachedModel(name="a", id="a").save()
+    _CachedModel(name="b", id="b").save()
+    _CachedModel.invalidate_cache(broadcast=False)
+    broadcasts.clear()
+    return _CachedModel, broadcasts
+
+
+def _lookup(model):
+    """
+    Look up by find_one and find_many, and return the names read and how many lookups missed the cache.
+    """
+
+    misses = model.cache_stats()["misses"]
+    names = [model.find_one({"id": "a"}).name, sorted(m.name for m in model.find_many({}))]
+    return names, model.cache_stats()["misses"] - misses
+
+
+def _rename_behind_cache(model):
+    model.get_collection().update_many({}, {"$set": {"name": "x"}})
+
+
+@pytest.mark.parametrize("write", [
+    lambda model: model(name="c", id="c").save(),
+    lambda model: model.update_one({"id": "a"}, {"name": "x"}),
+    lambda model: model.update_many({}, {"name": "x"}),
+    lambda model: model.find_one({"id": "b"}).delete(),
+    lambda model: model.delete_many({"id": "c"}),
+])
+def test_model_writes_invalidate_lookups(cached_model, write):
+    model, broadcasts = cached_model
+    assert _lookup(model) == (["a", ["a", "b"]], 2)
+    assert _lookup(model) == (["a", ["a", "b"]], 0)
+
+    # a write behind the model is not seen until the cache is invalidated
+    _rename_behind_cache(model)
+    assert _lookup(model) == (["a", ["a", "b"]], 0)
+
+    write(model)
+    names, misses = _lookup(model)
+    assert misses == 2
+    assert names[0] == "x"
+    assert broadcasts and set(broadcasts) == {model.get_cls_id()}
+
+
+def test_batch_writes_invalidate_lookups_and_broadcast_when_finished(cached_model):
+    model, broadcasts = cached_model
+    with BatchWriter(max_age=60) as writer:
+        assert _lookup(model) == (["a", ["a", "b"]], 2)
+        model.batch_update({"id": "a"}, {"name": "y"}, writer=writer)
+
+        # the pending write invalidates lookups of current process only
+        assert _lookup(model)[1] == 2
+        assert broadcasts == []
+
+    # other processes are notified when the batch is written
+    assert broadcasts == [model.get_cls_id()]
+    assert _lookup(model) == (["y", ["b", "y"]], 2)
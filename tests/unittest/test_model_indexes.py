@@ -0,0 +1,43 @@
+"""
+Unit tests of the declared model indexes, and ensuring them on a collection.
+"""
+
+from deepdataspace.model._base import ensure_collection_indexes
+from deepdataspace.model.label_task import LabelTaskImageModel
+
+
+class _FakeCollection:
+    name = "label_task_images@dataset_1"
+
+    def __init__(self):
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    def index_information(self):
+        return self.indexes
+
+    def create_indexes(self, indexes):
+        for index in indexes:
+            self.indexes[index.document["name"]] = {"key": list(index.document["key"].items())}
+
+
+def _covering_index(field: str):
+    for index in LabelTaskImageModel.indexes:
+        for key in index.document["key"].keys():
+            if key == field or (key.endswith(".$**") and field.startswith(key[:-3])):
+                return index.document["name"]
+    return None
+
+
+def test_role_status_of_every_user_is_indexed():
+    for field in ["role_status.label_leader", "role_status.labeler_1", "role_status.reviewer_2"]:
+        assert _covering_index(field) is not None, field
+    assert _covering_index("role_status.labeler_1") == "role_status.$**_1"
+
+
+def test_ensure_indexes_creates_missing_ones_only():
+    co = _FakeCollection()
+    created = ensure_collection_indexes(co, LabelTaskImageModel.indexes)
+    assert "role_status.$**_1" in created
+    assert len(created) == len(LabelTaskImageModel.indexes)
+
+    assert ensure_collection_indexes(co, LabelTaskImageModel.indexes) == []
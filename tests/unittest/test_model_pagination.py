@@ -0,0 +1,35 @@
+"""
+Unit tests of the keyset pagination cursor.
+"""
+
+import pytest
+
+from deepdataspace.model._base import InvalidCursor
+from deepdataspace.model._base import _decode_cursor
+from deepdataspace.model._base import _encode_cursor
+from deepdataspace.model._base import _make_seek_filters
+
+
+def test_cursor_round_trip():
+    sort = [("num_fp.label.90", -1), ("idx", 1)]
+    cursor = _encode_cursor(sort, [3, 42])
+    assert _decode_cursor(sort, cursor) == [3, 42]
+
+    with pytest.raises(InvalidCursor):
+        _decode_cursor([("idx", 1)], cursor)  # made by another sort
+
+    with pytest.raises(InvalidCursor):
+        _decode_cursor(sort, "not a cursor")
+
+
+def test_seek_filters():
+    sort = [("num_fp.label.90", -1), ("idx", 1)]
+    assert _make_seek_filters(sort, [3, 42]) == {"$or": [
+        {"$and": [{}, {"$or": [{"num_fp.label.90": {"$lt": 3}}, {"num_fp.label.90": None}]}]},
+        {"num_fp.label.90": 3, "idx": {"$gt": 42}},
+    ]}
+
+    # missing values are sorted as null, which is the smallest
+    assert _make_seek_filters(sort, [None, 42]) == {"$or": [
+        {"num_fp.label.90": None, "idx": {"$gt": 42}},
+    ]}
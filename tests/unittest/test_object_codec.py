@@ -0,0 +1,77 @@
+"""
+Unit tests of the binary encoding of object segmentations and keypoints.
+"""
+
+import base64
+
+from bson import BSON
+
+from deepdataspace.model.image import ImageModel
+from deepdataspace.model.object import Object
+from deepdataspace.model.object_codec import decode_object
+from deepdataspace.model.object_codec import decode_points
+from deepdataspace.model.object_codec import decode_segmentation
+from deepdataspace.model.object_codec import encode_object
+from deepdataspace.model.object_codec import encode_points
+from deepdataspace.model.object_codec import encode_segmentation
+from deepdataspace.model.object_codec import pass_through_object
+
+
+def _parse_segmentation(segmentation: str):
+    return [[float(v) for v in polygon.split(",")] for polygon in segmentation.split("/")]
+
+
+def test_segmentation_round_trip():
+    polygons = [[239.97, 260.24, 222.04, 270.49, 199.84, 253.41], [1.5, 2.25, 3.0, 4.0]]
+    binary = encode_segmentation(polygons)
+    assert decode_segmentation(binary) == "239.97,260.24,222.04,270.49,199.84,253.41/1.50,2.25,3.00,4.00"
+    assert _parse_segmentation(decode_segmentation(binary)) == polygons
+    assert len(binary) < len(ImageModel.format_segmentation(polygons))
+
+    int_polygons = [[10, 20, 30, 40, 50, 60], [-5, 32767]]
+    binary = encode_segmentation(int_polygons)
+    assert decode_segmentation(binary) == ImageModel.format_segmentation(int_polygons)
+
+    # values of too many decimals are stored as float32
+    polygons = [[0.1234567, 100.7654321, 3.0, 4.0]]
+    assert decode_segmentation(encode_segmentation(polygons)) == "0.1234567,100.765434,3.0,4.0"
+
+    # values can't be encoded are left to the text format
+    assert encode_segmentation({"counts": [1, 2], "size": [3, 4]}) is None
+    assert encode_segmentation([["a", "b"]]) is None
+    assert encode_segmentation([[float("nan"), 1.0]]) is None
+    assert encode_segmentation([]) is None
+    assert decode_segmentation("1,2,3,4") == "1,2,3,4"
+
+
+def test_points_round_trip():
+    points, _, _, _ = ImageModel.format_keypoints([1, 2.5, 2, 0.9, 327.12, 4.75, 0, 1])
+    binary = encode_points(points)
+    assert decode_points(binary) == points
+    assert [type(p) for p in decode_points(binary)[:6]] == [float, float, float, float, int, float]
+
+    assert encode_points([1.0, 2.0, 0.5, 1.0, 2, 1.0]) is None  # z is not 0
+    assert encode_points([1.0, 2.0, 0.0, 1.0, 2]) is None
+    assert encode_points([]) is None
+    assert decode_points([1.0]) == [1.0]
+
+
+def test_objects_are_decoded_when_read():
+    obj = {"label_name": "GroundTruth", "label_type": "GT", "segmentation": "1.5,2,3,4/5,6,7,8",
+           "points": [1.0, 2.0, 0.0, 1.0, 2, 1.0]}
+    assert encode_object(obj) is True
+    assert encode_object(obj) is False  # already encoded
+    doc = BSON.decode(BSON.encode(obj))  # as read back from mongodb
+
+    expected = {"segmentation": "1.5,2.0,3.0,4.0/5.0,6.0,7.0,8.0", "points": [1.0, 2.0, 0.0, 1.0, 2, 1.0]}
+    for hydrate in [Object.from_dict, Object.from_trusted_dict]:
+        model = hydrate(doc)
+        assert {"segmentation": model.segmentation, "points": model.points} == expected
+    assert isinstance(doc["segmentation"], bytes)  # hydrating never changes the document
+
+    raw = dict(doc)
+    assert pass_through_object(raw) == ["segmentation", "points"]
+    assert base64.b64decode(raw["segmentation"]) == bytes(doc["segmentation"])
+
+    decode_object(doc)
+    assert {"segmentation": doc["segmentation"], "points": doc["points"]} == expected
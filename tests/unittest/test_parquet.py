@@ -0,0 +1,121 @@
+"""
+Unit tests of importing datasets of parquet and arrow tables, boxes are joined to images by image_id.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from deepdataspace.plugins.parquet.importer import ParquetImporter
+from deepdataspace.plugins.parquet.importer import _ImageIndex
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _write_arrow(table, path: str):
+    with pa.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table, max_chunksize=3)
+
+
+def _make_dataset(tmp_path, arrow_boxes: bool = False):
+    images = pa.table({"image_id": [30, 10, 20, 40, 10],  # image 10 is duplicated
+                       "url"     : ["c.jpg", "a.jpg", "/data/b.jpg", "https://host/d.jpg", "dup.jpg"],
+                       "width"   : [300, 100, 200, 400, 100],
+                       "height"  : [30, 10, 20, 40, 10],
+                       "split"   : ["val", "train", "train", None, "train"]})
+    pq.write_table(images, str(tmp_path / "images.parquet"))
+
+    gt = pa.table({"image_id": [20, 10, 10, 99, 30],  # image 99 does not exist
+                   "category": ["dog", "cat", "dog", "cat", None],
+                   "x"       : [1.0, 2.0, 3.0, 4.0, 5.0],
+                   "y"       : [1.0, 2.0, None, 4.0, 5.0],
+                   "w"       : [5.0, 5.0, 5.0, 5.0, 5.0],
+                   "h"       : [6.0, 6.0, 6.0, 6.0, 6.0]})
+    pq.write_table(gt, str(tmp_path / "boxes.parquet"), row_group_size=2)
+
+    preds = pa.table({"image_id" : [10, 30, 20, 10],
+                      "category" : [7, 7, 8, 8],
+                      "x"        : [0, 1, 2, 3],
+                      "y"        : [0, 1, 2, 3],
+                      "w"        : [9, 9, 9, 9],
+                      "h"        : [9, 9, 9, 9],
+                      "score"    : [0.5, 0.6, None, 0.8],
+                      "label_set": ["model", "model", "GroundTruth", None]})
+    if arrow_boxes:
+        _write_arrow(preds, str(tmp_path / "preds.arrow"))
+    else:
+        pq.write_table(preds, str(tmp_path / "preds.parquet"), row_group_size=3)
+
+    importer = ParquetImporter.__new__(ParquetImporter)  # skip the database
+    importer.path = str(tmp_path)
+    importer.tables = ParquetImporter.list_tables(str(tmp_path))
+    importer.shard_size = 2
+    importer.dataset = SimpleNamespace(path=str(tmp_path))
+    importer.seek_source({"image_idx": 0})
+    importer.load_source()
+    return importer
+
+
+def _boxes(anno_list):
+    return [(anno["category"], anno["label"], anno["label_type"], anno["conf"], anno["bbox"]) for anno in anno_list]
+
+
+@pytest.mark.parametrize("arrow_boxes", [False, True])
+def test_boxes_are_grouped_by_image(tmp_path, arrow_boxes):
+    importer = _make_dataset(tmp_path, arrow_boxes=arrow_boxes)
+    records = list(importer)
+
+    assert [image["id_"] for image, _ in records] == [10, 20, 30, 40]
+    assert [image["uri"] for image, _ in records] == [f"file://{tmp_path}/a.jpg", "file:///data/b.jpg",
+                                                      f"file://{tmp_path}/c.jpg", "https://host/d.jpg"]
+    assert [(image["width"], image["height"], image["metadata"]) for image, _ in records][0] == \
+           (100, 10, {"split": "train"})
+
+    assert [_boxes(anno_list) for _, anno_list in records] == [
+        [("cat", "GroundTruth", "GT", 1.0, (2.0, 2.0, 5.0, 6.0)),
+         ("dog", "GroundTruth", "GT", 1.0, None),
+         ("7", "model", "Pred", 0.5, (0.0, 0.0, 9.0, 9.0)),
+         ("8", "GroundTruth", "GT", 1.0, (3.0, 3.0, 9.0, 9.0))],
+        [("dog", "GroundTruth", "GT", 1.0, (1.0, 1.0, 5.0, 6.0)),
+         ("8", "GroundTruth", "GT", 1.0, (2.0, 2.0, 9.0, 9.0))],
+        [("7", "model", "Pred", 0.6, (1.0, 1.0, 9.0, 9.0))],
+        [],
+    ]
+
+    assert ParquetImporter.can_import(str(tmp_path))
+    assert not ParquetImporter.can_import(str(tmp_path / "boxes.parquet"))
+
+
+def test_shards_and_resume_positions(tmp_path):
+    importer = _make_dataset(tmp_path)
+    serial = list(importer)
+
+    shards = importer.make_shards()
+    assert [shard["end_position"] for shard in shards] == [{"image_idx": 2}, {"image_idx": 4}]
+    assert [item for shard in shards for item in importer.parse_shard(shard)] == serial
+
+    importer.seek_source({"image_idx": 0})
+    iterator = iter(importer)
+    for _ in range(3):
+        next(iterator)
+    assert importer.source_position() == {"image_idx": 3}
+
+    importer.seek_source(importer.source_position())
+    assert list(importer) == serial[3:]
+
+
+def test_image_index_of_dense_and_sparse_ids():
+    np = pytest.importorskip("numpy")
+    ids = np.array([-3, 5, 7, 99, 100, 10 ** 12, 42])
+    expected = [0, 1, 2, -1, -1, -1, -1]
+
+    dense = _ImageIndex(np.array([-3, 5, 7]))
+    assert dense.lookup is not None
+    assert dense.positions(ids).tolist() == expected
+
+    sparse = _ImageIndex(np.array([-3, 5, 7, 10 ** 12]))
+    assert sparse.lookup is None
+    assert sparse.positions(ids).tolist() == [0, 1, 2, -1, -1, 3, -1]
+
+    assert _ImageIndex(np.array([], dtype=np.int64)).positions(ids).tolist() == [-1] * len(ids)
@@ -0,0 +1,78 @@
+"""
+Unit tests of the parse cache of dataset files, and the memo of can_import.
+"""
+
+import os
+
+from deepdataspace.io import parse_cache
+from deepdataspace.io.parse_cache import ParseCache
+from deepdataspace.io.parse_cache import memoized_can_import
+
+
+class _FakeImporter:
+    parse_version = 1
+    calls = []
+
+    @staticmethod
+    def can_import(path: str):
+        _FakeImporter.calls.append(path)
+        return path.endswith(".tsv")
+
+
+def test_cache_is_keyed_by_files_and_importer_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "IMPORT_CACHE_DIR", str(tmp_path / "cache"))
+    data_path = tmp_path / "ds.tsv"
+    data_path.write_text("1\t{}\n")
+    files = {"GroundTruth": str(data_path)}
+
+    records = [({"uri": f"{idx}.jpg", "fingerprint": str(idx)}, [{"label_name": "GT"}]) for idx in range(5)]
+    cache = ParseCache(_FakeImporter, files)
+    assert not cache.exists()
+    cache.begin_write()
+    for image, objects in records:
+        cache.write((image, objects))
+        objects[0]["label_id"] = "changed after written"  # the import changes records after they are cached
+    assert not ParseCache(_FakeImporter, files).exists()  # invisible until committed
+    cache.commit()
+
+    cache = ParseCache(_FakeImporter, files)
+    assert cache.exists()
+    assert [image["uri"] for image, _ in cache.read()] == [f"{idx}.jpg" for idx in range(5)]
+    assert [image["uri"] for image, _ in cache.read(skip=3)] == ["3.jpg", "4.jpg"]
+    assert all(objects == [{"label_name": "GT"}] for _, objects in cache.read())
+
+    monkeypatch.setattr(_FakeImporter, "parse_version", 2)
+    assert not ParseCache(_FakeImporter, files).exists()
+    monkeypatch.setattr(_FakeImporter, "parse_version", 1)
+
+    # a changed file misses the cache, and the outdated cache is removed by the new one
+    data_path.write_text("1\t{}\n2\t{}\n")
+    cache = ParseCache(_FakeImporter, files)
+    assert not cache.exists()
+    cache.begin_write()
+    cache.commit()
+    assert [name for name in os.listdir(tmp_path / "cache") if name.endswith(".pkl")] == [os.path.basename(cache.path)]
+
+
+def test_can_import_is_memoized_until_the_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "IMPORT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(parse_cache, "_can_import_memo", None)
+    _FakeImporter.calls.clear()
+    data_path = tmp_path / "ds.tsv"
+    data_path.write_text("1\t{}\n")
+
+    assert memoized_can_import(_FakeImporter, str(data_path)) is True
+    assert memoized_can_import(_FakeImporter, str(data_path)) is True
+    assert len(_FakeImporter.calls) == 1
+
+    monkeypatch.setattr(parse_cache, "_can_import_memo", None)  # as if in another process
+    assert memoized_can_import(_FakeImporter, str(data_path)) is True
+    assert len(_FakeImporter.calls) == 1
+
+    os.utime(data_path, ns=(0, 0))
+    assert memoized_can_import(_FakeImporter, str(data_path)) is True
+    assert len(_FakeImporter.calls) == 2
+
+    assert memoized_can_import(_FakeImporter, str(tmp_path)) is False  # directories are never memoized
+    assert memoized_can_import(_FakeImporter, str(tmp_path)) is False
+    assert len(_FakeImporter.calls) == 4
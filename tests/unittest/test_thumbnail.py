@@ -0,0 +1,92 @@
+"""
+Unit tests of parsing local file urls, and generating thumbnails of imported images.
+"""
+
+import base64
+import io
+import os
+
+import pytest
+
+from deepdataspace.constants import ContentEncoding
+from deepdataspace.constants import FileReadMode
+from deepdataspace.io import thumbnail
+from deepdataspace.io.thumbnail import make_thumbnail
+from deepdataspace.io.thumbnail import read_image_url
+from deepdataspace.utils.file import create_file_range_url
+from deepdataspace.utils.file import create_file_url
+from deepdataspace.utils.file import parse_file_url
+
+
+def test_parse_file_url(tmp_path):
+    path = str(tmp_path / "a b" / "1.jpg")
+    url = create_file_url(path, read_mode=FileReadMode.Binary)
+    assert parse_file_url(url) == (path, ContentEncoding.Plain, FileReadMode.Binary, -1, -1)
+
+    url = create_file_range_url(path, 10, 20, read_mode=FileReadMode.Text, file_encoding=ContentEncoding.Base64)
+    assert parse_file_url(url) == (path, ContentEncoding.Base64, FileReadMode.Text, 10, 20)
+
+    assert parse_file_url("http://example.com/1.jpg") is None
+    assert parse_file_url("/files/local_files/1/1/a_b/image_jpeg//1.jpg") is None
+    assert parse_file_url(None) is None
+
+
+def test_read_image_url(tmp_path):
+    path = str(tmp_path / "images.tsv")
+    with open(path, "wb") as fp:
+        fp.write(b"1\t" + base64.b64encode(b"image bytes") + b"\n")
+    url = create_file_range_url(path, 2, 18, read_mode=FileReadMode.Text, file_encoding=ContentEncoding.Base64)
+    assert read_image_url(url) == b"image bytes"
+    assert read_image_url(create_file_url(path)).startswith(b"1\t")
+
+
+def test_make_thumbnail(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setattr(thumbnail, "THUMBNAIL_DIR", str(tmp_path / "thumbnails"))
+
+    path = str(tmp_path / "large.png")
+    Image.new("RGB", (400, 100), (255, 0, 0)).save(path)
+    url = create_file_url(path)
+    thumb_path = make_thumbnail(url, 64)
+    assert thumb_path.startswith(str(tmp_path / "thumbnails")) and thumb_path.endswith("-64.jpg")
+    with Image.open(thumb_path) as img:
+        assert (img.format, img.size) == ("JPEG", (64, 16))
+
+    # an existing thumbnail of the same content is never generated again
+    mtime = os.stat(thumb_path).st_mtime_ns
+    copied = str(tmp_path / "copied.png")
+    with open(path, "rb") as src, open(copied, "wb") as dst:
+        dst.write(src.read())
+    assert make_thumbnail(create_file_url(copied), 64) == thumb_path
+    assert os.stat(thumb_path).st_mtime_ns == mtime
+
+    thumb_path = make_thumbnail(url, 64, fmt="webp")
+    with Image.open(thumb_path) as img:
+        assert (img.format, img.size) == ("WEBP", (64, 16))
+
+    # small or broken images have no thumbnail
+    small = str(tmp_path / "small.png")
+    Image.new("RGB", (32, 32)).save(small)
+    assert make_thumbnail(create_file_url(small), 64) is None
+    broken = str(tmp_path / "broken.jpg")
+    with open(broken, "wb") as fp:
+        fp.write(b"broken")
+    assert make_thumbnail(create_file_url(broken), 64) is None
+    assert make_thumbnail(create_file_url(str(tmp_path / "missing.jpg")), 64) is None
+
+
+def test_make_thumbnail_of_base64_range(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.setattr(thumbnail, "THUMBNAIL_DIR", str(tmp_path / "thumbnails"))
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 300)).save(buffer, "JPEG")
+    content = base64.b64encode(buffer.getvalue())
+    path = str(tmp_path / "images.tsv")
+    with open(path, "wb") as fp:
+        fp.write(b"1\t" + content + b"\n")
+
+    url = create_file_range_url(path, 2, 2 + len(content),
+                                read_mode=FileReadMode.Text, file_encoding=ContentEncoding.Base64)
+    with Image.open(make_thumbnail(url, 30)) as img:
+        assert img.size == (10, 30)
@@ -0,0 +1,99 @@
+"""
+Unit tests of reading tsv files by exact byte offsets, and the persistent line index.
+"""
+
+import base64
+import json
+import os
+from types import SimpleNamespace
+
+from deepdataspace.constants import DatasetFileType
+from deepdataspace.plugins.tsv import reader as tsv_reader
+from deepdataspace.plugins.tsv.importer import TSVImporter
+from deepdataspace.plugins.tsv.reader import TSVReader
+from deepdataspace.utils.file import parse_file_url
+
+
+def _range(url: str) -> bytes:
+    path, _, _, beg, end = parse_file_url(url)
+    with open(path, "rb") as fp:
+        fp.seek(beg)
+        return fp.read(end - beg)
+
+
+def test_read_columns_by_byte_offsets(tmp_path):
+    path = str(tmp_path / "ds.tsv")
+    with open(path, "wb") as fp:
+        fp.write("0\t{\"name\": \"猫\"}\tAAAA\n1\t{}\tBBBB\r\n2\t{\"x\": \"é\"}\tCCCC".encode("utf8"))
+
+    with TSVReader(path) as reader:
+        pos, lines = 0, []
+        while True:
+            columns, pos = reader.read_columns(pos)
+            if columns is None:
+                break
+            lines.append([reader.read(beg, end) for beg, end in columns])
+        assert lines == [[b"0", "{\"name\": \"猫\"}".encode("utf8"), b"AAAA"],
+                         [b"1", b"{}", b"BBBB"],
+                         [b"2", "{\"x\": \"é\"}".encode("utf8"), b"CCCC"]]
+        assert pos == reader.size
+
+        assert reader.line_offsets().tolist() == [0, 23, 34]
+        columns, _ = reader.read_columns(reader.line_offset(2))
+        assert reader.read(*columns[2]) == b"CCCC"
+
+    with open(str(tmp_path / "empty.tsv"), "wb"):
+        pass
+    with TSVReader(str(tmp_path / "empty.tsv")) as reader:
+        assert reader.read_columns(0) == (None, 0)
+        assert reader.line_offsets().tolist() == []
+
+
+def test_line_index_is_saved_and_reused(tmp_path, monkeypatch):
+    path = str(tmp_path / "ds.tsv")
+    with open(path, "w", encoding="utf8") as fp:
+        fp.writelines(f"{idx}\t{{}}\t{'ü' * idx}\n" for idx in range(100))
+
+    with TSVReader(path) as reader:
+        offsets = reader.line_offsets().tolist()
+    assert os.path.exists(str(tmp_path / "ds.lineidx"))
+
+    monkeypatch.setattr(tsv_reader, "_INDEX_CHUNK_SIZE", 7)  # a rebuilt index is scanned in tiny chunks
+    monkeypatch.setattr(TSVReader, "_build_index", lambda self: None)
+    with TSVReader(path) as reader:
+        assert reader.line_offsets().tolist() == offsets  # loaded from the index file
+    monkeypatch.undo()
+
+    # a changed tsv file makes the index outdated
+    with open(path, "a", encoding="utf8") as fp:
+        fp.write("100\t{}\tx\n")
+    os.utime(str(tmp_path / "ds.lineidx"), (0, 0))
+    monkeypatch.setattr(tsv_reader, "_INDEX_CHUNK_SIZE", 7)
+    with TSVReader(path) as reader:
+        assert reader.line_offsets().tolist() == offsets + [os.path.getsize(path) - len("100\t{}\tx\n")]
+
+
+def test_importer_urls_are_byte_accurate(tmp_path):
+    path = str(tmp_path / "ds.tsv")
+    alpha = base64.b64encode(b"alpha matte").decode()
+    lines = []
+    for idx in range(3):
+        content = base64.b64encode(f"image {idx}".encode()).decode()
+        objects = [{"class": "猫", "alpha": alpha}, {"alpha": "ignored"}, {"class": "犬", "alpha": alpha}]
+        data = {"metadata": {"width": 100, "height": 80, "caption": "ünïcödé" * idx}, "objects": objects}
+        lines.append(f"{idx}\t{json.dumps(data, ensure_ascii=False)}\t{content}\n")
+    with open(path, "w", encoding="utf8") as fp:
+        fp.writelines(lines)
+
+    importer = TSVImporter.__new__(TSVImporter)  # skip the database
+    importer.dataset = SimpleNamespace(path=str(tmp_path), files={DatasetFileType.GroundTruth: path})
+    importer._files = {}
+    importer.open_files()
+    records = list(importer)
+    importer.close_files()
+
+    for idx, (image, objects) in enumerate(records):
+        assert base64.b64decode(_range(image["uri"])) == f"image {idx}".encode()
+        assert [obj["category"] for obj in objects] == ["猫", "犬"]
+        assert [base64.b64decode(_range(obj["alpha_uri"])) for obj in objects] == [b"alpha matte"] * 2
+        assert objects[0]["alpha_uri"] != objects[1]["alpha_uri"]  # every object points to its own payload
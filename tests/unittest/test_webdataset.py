@@ -0,0 +1,92 @@
+"""
+Unit tests of importing webdataset tar shards, whose images are served from the shards by byte ranges.
+"""
+
+import io
+import json
+import tarfile
+from types import SimpleNamespace
+
+from deepdataspace.plugins.webdataset.importer import WebDatasetImporter
+from deepdataspace.utils.file import parse_file_url
+from tests.unittest.test_image_size import _png
+
+
+def _write_shard(path, beg: int, end: int):
+    with tarfile.open(path, "w") as tar:
+        for idx in range(beg, end):
+            files = {f"sample{idx:04d}.png": _png(10 + idx, 20)}
+            if idx % 3 != 2:  # some samples have no annotation
+                sample = {"caption": f"sample {idx}", "objects": [{"category": "cat", "bbox": [1, 2, 3, 4]}]}
+                if idx % 2:
+                    sample["width"], sample["height"] = 10 + idx, 20
+                    sample["predictions"] = {"model": [{"category": "dog", "bbox": [0, 0, 5, 5], "conf": 0.5}]}
+                files[f"sample{idx:04d}.json"] = json.dumps(sample).encode("utf8")
+            files[f"sample{idx:04d}.seg.png"] = b"not the image"
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        info = tarfile.TarInfo("readme")  # a sample without any image
+        tar.addfile(info, io.BytesIO(b""))
+
+
+def _make_importer(tmp_path):
+    _write_shard(str(tmp_path / "shard-000.tar"), 0, 7)
+    _write_shard(str(tmp_path / "shard-001.tar"), 7, 12)
+
+    importer = WebDatasetImporter.__new__(WebDatasetImporter)  # skip the database
+    importer.path = str(tmp_path)
+    importer.shards = WebDatasetImporter.list_shards(str(tmp_path))
+    importer.dataset = SimpleNamespace(path=str(tmp_path))
+    importer.seek_source({"shard_idx": 0, "offset": 0})
+    return importer
+
+
+def test_samples_are_served_by_byte_ranges(tmp_path):
+    importer = _make_importer(tmp_path)
+    records = list(importer)
+    assert len(records) == 12
+
+    for idx, (image, objects) in enumerate(records):
+        assert (image["width"], image["height"]) == (10 + idx, 20)
+        path, _, _, beg, end = parse_file_url(image["uri"])
+        with open(path, "rb") as fp:
+            fp.seek(beg)
+            assert fp.read(end - beg) == _png(10 + idx, 20)
+        assert image["metadata"]["key"] == f"sample{idx:04d}"
+
+        if idx % 3 == 2:
+            assert objects == []
+            continue
+        assert image["metadata"]["caption"] == f"sample {idx}"
+        assert [(obj["category"], obj["label"], obj["bbox"]) for obj in objects][0] == ("cat", "GroundTruth",
+                                                                                      (1, 2, 3, 4))
+        if idx % 2:
+            assert (objects[1]["label"], objects[1]["label_type"], objects[1]["conf"]) == ("model", "Pred", 0.5)
+
+    assert WebDatasetImporter.can_import(str(tmp_path))
+    assert WebDatasetImporter.can_import(str(tmp_path / "shard-000.tar"))
+    assert not WebDatasetImporter.can_import(str(tmp_path / "missing"))
+
+
+def test_shards_and_resume_positions(tmp_path):
+    importer = _make_importer(tmp_path)
+    serial = list(importer)
+
+    shards = importer.make_shards()
+    assert [item for shard in shards for item in importer.parse_shard(shard)] == serial
+
+    # stop after 4 samples, as if the import failed after a checkpoint
+    importer.seek_source({"shard_idx": 0, "offset": 0})
+    iterator = iter(importer)
+    for _ in range(4):
+        next(iterator)
+    position = json.loads(json.dumps(importer.source_position()))
+    assert position["shard_idx"] == 0 and position["offset"] > 0
+
+    importer.seek_source(position)
+    assert list(importer) == serial[4:]
+    shards = importer.make_shards(position)
+    assert [shard["offset"] for shard in shards] == [position["offset"], 0]
+    assert [item for shard in shards for item in importer.parse_shard(shard)] == serial[4:]